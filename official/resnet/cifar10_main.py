@@ -25,6 +25,7 @@ from absl import flags
 import tensorflow as tf  # pylint: disable=g-bad-import-order
 
 from official.utils.flags import core as flags_core
+from official.resnet import image_cache
 from official.resnet import resnet_model
 from official.resnet import resnet_run_loop
 
@@ -65,26 +66,31 @@ def get_filenames(is_training, data_dir):
     return [os.path.join(data_dir, 'test_batch.bin')]
 
 
-def parse_record(raw_record, is_training):
-  """Parse CIFAR-10 image and label from a raw record."""
+def _decode_record(raw_record):
+  """Decode the uint8 CIFAR-10 image and the int32 label of a raw record."""
   # Convert bytes to a vector of uint8 that is record_bytes long.
   record_vector = tf.decode_raw(raw_record, tf.uint8)
 
-  # The first byte represents the label, which we convert from uint8 to int32
-  # and then to one-hot.
+  # The first byte represents the label, which we convert from uint8 to int32.
   label = tf.cast(record_vector[0], tf.int32)
-  label = tf.one_hot(label, _NUM_CLASSES)
 
   # The remaining bytes after the label represent the image, which we reshape
   # from [depth * height * width] to [depth, height, width].
   depth_major = tf.reshape(record_vector[1:_RECORD_BYTES],
                            [_NUM_CHANNELS, _HEIGHT, _WIDTH])
 
-  # Convert from [depth, height, width] to [height, width, depth], and cast as
-  # float32.
-  image = tf.cast(tf.transpose(depth_major, [1, 2, 0]), tf.float32)
+  # Convert from [depth, height, width] to [height, width, depth].
+  image = tf.transpose(depth_major, [1, 2, 0])
+
+  return image, label
+
 
-  image = preprocess_image(image, is_training)
+def parse_record(raw_record, is_training):
+  """Parse CIFAR-10 image and label from a raw record."""
+  image, label = _decode_record(raw_record)
+
+  label = tf.one_hot(label, _NUM_CLASSES)
+  image = preprocess_image(tf.cast(image, tf.float32), is_training)
 
   return image, label
 
@@ -107,7 +113,38 @@ def preprocess_image(image, is_training):
   return image
 
 
-def input_fn(is_training, data_dir, batch_size, num_epochs=1):
+def preprocess_cached_images(images, labels, is_training):
+  """Preprocess a batch of uint8 images and labels read from an image cache.
+
+  This applies the same random crop and flip as preprocess_image, to the
+  whole batch at once.
+
+  Args:
+    images: uint8 tensor of shape [batch_size, height, width, depth].
+    labels: int32 tensor of shape [batch_size].
+    is_training: A boolean denoting whether the input is for training.
+
+  Returns:
+    Tuple with the processed images and the one-hot-encoded labels.
+  """
+  images = tf.cast(images, tf.float32)
+  if is_training:
+    # Add four extra pixels on each side, and randomly crop and flip.
+    images = tf.pad(images, [[0, 0], [4, 4], [4, 4], [0, 0]])
+    images = image_cache.random_crop_and_flip(images, _HEIGHT, _WIDTH)
+
+  # The same standardization as tf.image.per_image_standardization, for each
+  # image of the batch.
+  mean, variance = tf.nn.moments(images, axes=[1, 2, 3], keep_dims=True)
+  num_pixels = _HEIGHT * _WIDTH * _NUM_CHANNELS
+  stddev = tf.maximum(tf.sqrt(variance), num_pixels ** -0.5)
+  images = (images - mean) / stddev
+
+  return images, tf.one_hot(labels, _NUM_CLASSES)
+
+
+def input_fn(is_training, data_dir, batch_size, num_epochs=1,
+             image_cache_dir=None):
   """Input_fn using the tf.data input pipeline for CIFAR-10 dataset.
 
   Args:
@@ -115,11 +152,23 @@ def input_fn(is_training, data_dir, batch_size, num_epochs=1):
     data_dir: The directory containing the input data.
     batch_size: The number of samples per batch.
     num_epochs: The number of epochs to repeat the dataset.
+    image_cache_dir: Optional directory of the decoded images. If set, the
+      images are decoded into the cache the first time, and are then read
+      from the cache.
 
   Returns:
     A dataset that can be used for iteration.
   """
   filenames = get_filenames(is_training, data_dir)
+
+  if image_cache_dir:
+    return image_cache.get_cached_dataset(
+        os.path.join(image_cache_dir, 'train' if is_training else 'test'),
+        lambda: tf.data.FixedLengthRecordDataset(
+            filenames, _RECORD_BYTES).map(_decode_record),
+        is_training, batch_size, preprocess_cached_images, num_epochs,
+        examples_per_shard=_NUM_IMAGES['validation'])
+
   dataset = tf.data.FixedLengthRecordDataset(filenames, _RECORD_BYTES)
 
   return resnet_run_loop.process_record_dataset(
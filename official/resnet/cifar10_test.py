@@ -17,6 +17,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
 from tempfile import mkstemp
 
 import numpy as np
@@ -76,6 +77,41 @@ class BaseTest(tf.test.TestCase):
         for pixel in row:
           self.assertAllClose(pixel, np.array([-1.225, 0., 1.225]), rtol=1e-3)
 
+  def test_cached_input_fn(self):
+    data_dir = self.get_temp_dir()
+    tf.gfile.MakeDirs(os.path.join(data_dir, 'cifar-10-batches-bin'))
+    filename = os.path.join(data_dir, 'cifar-10-batches-bin', 'test_batch.bin')
+    record_bytes = cifar10_main._RECORD_BYTES  # pylint: disable=protected-access
+    records = np.random.randint(0, 256, size=[5, record_bytes])
+    records[:, 0] = np.arange(5)
+    with open(filename, 'wb') as f:
+      f.write(records.astype(np.uint8).tobytes())
+
+    expected_dataset = tf.data.FixedLengthRecordDataset(filename, record_bytes)
+    expected_dataset = expected_dataset.map(
+        lambda val: cifar10_main.parse_record(val, False)).batch(5)
+    expected = expected_dataset.make_one_shot_iterator().get_next()
+
+    image_cache_dir = os.path.join(self.get_temp_dir(), 'cache')
+    images, labels = cifar10_main.input_fn(
+        False, data_dir, 5, image_cache_dir=image_cache_dir
+    ).make_one_shot_iterator().get_next()
+    with self.test_session() as sess:
+      images, labels, expected = sess.run([images, labels, expected])
+    self.assertAllClose(expected[0], images, atol=1e-5)
+    self.assertAllEqual(expected[1], labels)
+
+    # There are no training files, so read the test images as training data.
+    tf.gfile.Rename(os.path.join(image_cache_dir, 'test'),
+                    os.path.join(image_cache_dir, 'train'))
+    images, labels = cifar10_main.input_fn(
+        True, data_dir, 5, image_cache_dir=image_cache_dir
+    ).make_one_shot_iterator().get_next()
+    with self.test_session() as sess:
+      images, labels = sess.run([images, labels])
+    self.assertEqual((5, _HEIGHT, _WIDTH, _NUM_CHANNELS), images.shape)
+    self.assertAllEqual(expected[1].sum(axis=0), labels.sum(axis=0))
+
   def cifar10_model_fn_helper(self, mode, resnet_version, dtype):
     input_fn = cifar10_main.get_synth_input_fn()
     dataset = input_fn(True, '', _BATCH_SIZE)
@@ -0,0 +1,235 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Cache of images after the deterministic part of their preprocessing.
+
+A cache is a directory of shards. Each shard is a pair of .npy files: the
+images, a uint8 array of shape [num_examples, height, width, channels], and
+the labels, an int32 array of shape [num_examples]. The shards are memory
+mapped when they are read, so that a batch is sliced out of the page cache
+without decoding or copying the rest of the shard. A metadata.json file,
+written last, lists the shards and marks the cache as complete.
+
+Only the random part of the preprocessing (e.g. cropping and flipping) and the
+conversion to float are then applied to each batch of images.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import multiprocessing
+import os
+
+import numpy as np
+import tensorflow as tf
+
+METADATA_FILENAME = 'metadata.json'
+DEFAULT_EXAMPLES_PER_SHARD = 1024
+
+
+def _shard_paths(cache_dir, shard):
+  return (os.path.join(cache_dir, 'images-%05d.npy' % shard),
+          os.path.join(cache_dir, 'labels-%05d.npy' % shard))
+
+
+def cache_exists(cache_dir):
+  """Returns whether a complete cache was written to cache_dir."""
+  return tf.gfile.Exists(os.path.join(cache_dir, METADATA_FILENAME))
+
+
+def write_cache(dataset, cache_dir, examples_per_shard=None,
+                session_config=None):
+  """Writes the examples of a dataset to a cache.
+
+  Args:
+    dataset: A dataset of (image, label) pairs, where the images are uint8
+      tensors of the same shape and the labels are integer scalars. It is
+      iterated once, in a session of the default graph.
+    cache_dir: The directory of the cache.
+    examples_per_shard: The number of examples per shard.
+    session_config: Optional tf.ConfigProto for the session.
+
+  Returns:
+    Dictionary with the metadata of the cache.
+  """
+  examples_per_shard = examples_per_shard or DEFAULT_EXAMPLES_PER_SHARD
+  tf.gfile.MakeDirs(cache_dir)
+  shard_sizes = []
+  image_shape = None
+
+  # Each batch of the dataset is one shard.
+  images, labels = dataset.batch(examples_per_shard).make_one_shot_iterator(
+  ).get_next()
+  with tf.Session(config=session_config) as sess:
+    while True:
+      try:
+        images_value, labels_value = sess.run([images, labels])
+      except tf.errors.OutOfRangeError:
+        break
+      images_path, labels_path = _shard_paths(cache_dir, len(shard_sizes))
+      np.save(images_path, images_value)
+      np.save(labels_path, labels_value.astype(np.int32))
+      shard_sizes.append(len(labels_value))
+      image_shape = list(images_value.shape[1:])
+
+  metadata = {
+      'image_shape': image_shape,
+      'shard_sizes': shard_sizes,
+      'num_examples': sum(shard_sizes),
+  }
+  with tf.gfile.Open(os.path.join(cache_dir, METADATA_FILENAME), 'w') as f:
+    json.dump(metadata, f)
+  tf.logging.info('Wrote %d examples in %d shards to %s',
+                  metadata['num_examples'], len(shard_sizes), cache_dir)
+  return metadata
+
+
+def _generate_batches(cache_dir, metadata, batch_size, shuffle):
+  """Yields batches of (images, labels) from the memory mapped shards.
+
+  Args:
+    cache_dir: The directory of the cache.
+    metadata: Dictionary with the metadata of the cache.
+    batch_size: The number of examples per batch.
+    shuffle: Whether to shuffle all the examples of the cache.
+
+  Yields:
+    Tuple of uint8 images and int32 labels arrays. Only the last batch may
+    have less than batch_size examples.
+  """
+  shards = []
+  for shard in range(len(metadata['shard_sizes'])):
+    images_path, labels_path = _shard_paths(cache_dir, shard)
+    shards.append((np.load(images_path, mmap_mode='r'),
+                   np.load(labels_path, mmap_mode='r')))
+  offsets = np.cumsum([0] + metadata['shard_sizes'])
+  num_examples = offsets[-1]
+  if shuffle:
+    order = np.random.permutation(num_examples)
+
+  for start in range(0, num_examples, batch_size):
+    if shuffle:
+      # Read the examples of the batch in increasing index order.
+      indices = np.sort(order[start:start + batch_size])
+    else:
+      indices = np.arange(start, min(start + batch_size, num_examples))
+    shard_ids = np.searchsorted(offsets, indices, side='right') - 1
+    batch_images, batch_labels = [], []
+    for shard in np.unique(shard_ids):
+      images, labels = shards[shard]
+      shard_indices = indices[shard_ids == shard] - offsets[shard]
+      if not shuffle:
+        # Contiguous examples are sliced without copying.
+        shard_indices = slice(shard_indices[0], shard_indices[-1] + 1)
+      batch_images.append(images[shard_indices])
+      batch_labels.append(labels[shard_indices])
+    if len(batch_images) == 1:
+      yield batch_images[0], batch_labels[0]
+    else:
+      yield np.concatenate(batch_images), np.concatenate(batch_labels)
+
+
+def read_cache(cache_dir, is_training, batch_size, preprocess_batch_fn,
+               num_epochs=1):
+  """Returns a dataset of preprocessed batches read from a cache.
+
+  Args:
+    cache_dir: The directory of the cache.
+    is_training: A boolean denoting whether the input is for training. The
+      examples are shuffled for training.
+    batch_size: The number of examples per batch.
+    preprocess_batch_fn: A function that takes a uint8 tensor of images, an
+      int32 tensor of labels and is_training, and returns the corresponding
+      (images, labels) pair.
+    num_epochs: The number of epochs to repeat the dataset.
+
+  Returns:
+    Dataset of (images, labels) batches ready for iteration.
+  """
+  with tf.gfile.Open(os.path.join(cache_dir, METADATA_FILENAME)) as f:
+    metadata = json.load(f)
+
+  dataset = tf.data.Dataset.from_generator(
+      lambda: _generate_batches(cache_dir, metadata, batch_size, is_training),
+      output_types=(tf.uint8, tf.int32),
+      output_shapes=(tf.TensorShape([None] + metadata['image_shape']),
+                     tf.TensorShape([None])))
+  dataset = dataset.prefetch(buffer_size=1)
+  dataset = dataset.repeat(num_epochs)
+  dataset = dataset.map(
+      lambda images, labels: preprocess_batch_fn(images, labels, is_training),
+      num_parallel_calls=multiprocessing.cpu_count())
+  return dataset.prefetch(buffer_size=tf.contrib.data.AUTOTUNE)
+
+
+def get_cached_dataset(cache_dir, make_cache_dataset, is_training, batch_size,
+                       preprocess_batch_fn, num_epochs=1,
+                       examples_per_shard=None):
+  """Writes the cache if it does not exist yet, and reads it.
+
+  Args:
+    cache_dir: The directory of the cache.
+    make_cache_dataset: A function that takes no arguments and returns the
+      dataset of examples to write, see write_cache.
+    is_training: A boolean denoting whether the input is for training.
+    batch_size: The number of examples per batch.
+    preprocess_batch_fn: See read_cache.
+    num_epochs: The number of epochs to repeat the dataset.
+    examples_per_shard: The number of examples per shard when writing.
+
+  Returns:
+    Dataset of (images, labels) batches ready for iteration.
+  """
+  if not cache_exists(cache_dir):
+    # The cache is written in its own graph, so that the graph of the caller
+    # only contains the reading pipeline.
+    with tf.Graph().as_default():
+      write_cache(make_cache_dataset(), cache_dir, examples_per_shard)
+  return read_cache(cache_dir, is_training, batch_size, preprocess_batch_fn,
+                    num_epochs)
+
+
+def random_crop_and_flip(images, crop_height, crop_width):
+  """Crops a random window of each image, and flips half of the images.
+
+  Args:
+    images: 4-D tensor of images of shape [batch_size, height, width, depth].
+    crop_height: The height of the crops.
+    crop_width: The width of the crops.
+
+  Returns:
+    Float tensor of shape [batch_size, crop_height, crop_width, depth].
+  """
+  shape = tf.shape(images)
+  batch_size, height, width = shape[0], shape[1], shape[2]
+  top = tf.random_uniform([batch_size], maxval=height - crop_height + 1,
+                          dtype=tf.int32)
+  left = tf.random_uniform([batch_size], maxval=width - crop_width + 1,
+                           dtype=tf.int32)
+
+  # crop_and_resize samples the images at integer coordinates only, so the
+  # crops are exact.
+  height = tf.to_float(height - 1)
+  width = tf.to_float(width - 1)
+  top, left = tf.to_float(top), tf.to_float(left)
+  boxes = tf.stack([top / height, left / width,
+                    (top + crop_height - 1) / height,
+                    (left + crop_width - 1) / width], axis=1)
+  images = tf.image.crop_and_resize(
+      images, boxes, tf.range(batch_size), [crop_height, crop_width])
+
+  flip = tf.random_uniform([batch_size]) < 0.5
+  return tf.where(flip, tf.reverse(images, axis=[2]), images)
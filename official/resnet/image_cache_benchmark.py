@@ -0,0 +1,120 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Compare the epoch wall time of the input pipeline with an image cache.
+
+Writes the image cache of the training and evaluation data if it does not
+exist yet, then reads one epoch of each split through the default input
+pipeline and through the cache, without running a model.
+
+Example:
+  python image_cache_benchmark.py --dataset=cifar10 --data_dir=/tmp/cifar10_data
+      --image_cache_dir=/tmp/cifar10_cache
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+# pylint: disable=g-bad-import-order
+from absl import app as absl_app
+from absl import flags
+import tensorflow as tf
+# pylint: enable=g-bad-import-order
+
+from official.resnet import cifar10_main
+from official.resnet import imagenet_main
+from official.resnet import resnet_run_loop
+from official.utils.flags import core as flags_core
+
+INPUT_FNS = {
+    'cifar10': cifar10_main.input_fn,
+    'imagenet': imagenet_main.input_fn,
+}
+
+
+def run_benchmark(input_function, data_dir, image_cache_dir, batch_size):
+  """Time one epoch of each split with and without the image cache.
+
+  Args:
+    input_function: The input function of the dataset, which takes the
+      image_cache_dir argument.
+    data_dir: The directory containing the input data.
+    image_cache_dir: The directory of the image cache.
+    batch_size: The number of images per batch.
+
+  Returns:
+    Dictionary mapping 'train' and 'eval' to dictionaries with the seconds to
+    write the cache ('write_secs', zero if it existed), and the results of
+    resnet_run_loop.benchmark_input_fn for the default pipeline ('default')
+    and for the cache ('cached').
+  """
+  results = {}
+  for split, is_training in [('train', True), ('eval', False)]:
+    def make_input_fn(cache_dir, is_training=is_training):
+      return lambda: input_function(
+          is_training=is_training, data_dir=data_dir, batch_size=batch_size,
+          num_epochs=1, image_cache_dir=cache_dir)
+
+    # Building the cached input pipeline writes the cache if needed.
+    start = time.time()
+    with tf.Graph().as_default():
+      make_input_fn(image_cache_dir)()
+    results[split] = {'write_secs': time.time() - start}
+
+    for name, cache_dir in [('default', None), ('cached', image_cache_dir)]:
+      results[split][name] = resnet_run_loop.benchmark_input_fn(
+          make_input_fn(cache_dir), num_batches=None, num_warmup_batches=0)
+  return results
+
+
+def main(unused_argv):
+  results = run_benchmark(INPUT_FNS[FLAGS.dataset], FLAGS.data_dir,
+                          FLAGS.image_cache_dir, FLAGS.batch_size)
+  for split in ['train', 'eval']:
+    result = results[split]
+    tf.logging.info('%s: wrote the cache in %.1f sec', split,
+                    result['write_secs'])
+    for name in ['default', 'cached']:
+      tf.logging.info(
+          '%s %-7s: %d images, epoch in %.1f sec, %.1f images/sec', split,
+          name, result[name]['num_images'], result[name]['secs'],
+          result[name]['images_per_sec'])
+    tf.logging.info('%s speedup: %.2fx', split, result['default']['secs'] /
+                    max(result['cached']['secs'], 1e-9))
+
+
+def define_image_cache_benchmark_flags():
+  """Add flags for benchmarking the image cache."""
+  flags_core.define_base(
+      model_dir=False, train_epochs=False, epochs_between_evals=False,
+      stop_threshold=False, multi_gpu=False, num_gpu=False, hooks=False,
+      export_dir=False)
+  flags.DEFINE_enum(
+      name='dataset', short_name='ds', default='cifar10',
+      enum_values=sorted(INPUT_FNS),
+      help=flags_core.help_wrap('The dataset to read.'))
+  flags.DEFINE_string(
+      name='image_cache_dir', short_name='icd', default=None,
+      help=flags_core.help_wrap('Local directory of the image cache.'))
+  flags.mark_flag_as_required('image_cache_dir')
+
+
+if __name__ == '__main__':
+  tf.logging.set_verbosity(tf.logging.INFO)
+  define_image_cache_benchmark_flags()
+  FLAGS = flags.FLAGS
+  absl_app.run(main)
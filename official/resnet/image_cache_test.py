@@ -0,0 +1,97 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import numpy as np
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+from official.resnet import image_cache
+
+tf.logging.set_verbosity(tf.logging.ERROR)
+
+
+class ImageCacheTest(tf.test.TestCase):
+
+  def _write_cache(self, num_examples, examples_per_shard):
+    images = np.random.randint(
+        0, 256, size=[num_examples, 6, 5, 3]).astype(np.uint8)
+    labels = np.arange(num_examples, dtype=np.int64)
+    cache_dir = os.path.join(self.get_temp_dir(), 'cache')
+    with tf.Graph().as_default():
+      metadata = image_cache.write_cache(
+          tf.data.Dataset.from_tensor_slices((images, labels)), cache_dir,
+          examples_per_shard)
+    return images, cache_dir, metadata
+
+  def _read_cache(self, cache_dir, is_training, batch_size, num_epochs=1):
+    """Returns the list of (images, labels) batches read from the cache."""
+    batches = []
+    with tf.Graph().as_default():
+      dataset = image_cache.read_cache(
+          cache_dir, is_training, batch_size,
+          lambda images, labels, _: (images, labels), num_epochs)
+      next_batch = dataset.make_one_shot_iterator().get_next()
+      with self.test_session() as sess:
+        while True:
+          try:
+            batches.append(sess.run(next_batch))
+          except tf.errors.OutOfRangeError:
+            return batches
+
+  def test_write_cache(self):
+    _, cache_dir, metadata = self._write_cache(10, 4)
+    self.assertEqual([4, 4, 2], metadata['shard_sizes'])
+    self.assertEqual([6, 5, 3], metadata['image_shape'])
+    self.assertTrue(image_cache.cache_exists(cache_dir))
+
+  def test_read_cache_in_order(self):
+    images, cache_dir, _ = self._write_cache(10, 4)
+    batches = self._read_cache(cache_dir, False, 3)
+    self.assertEqual([3, 3, 3, 1], [len(labels) for _, labels in batches])
+    self.assertAllEqual(images, np.concatenate([b[0] for b in batches]))
+    self.assertAllEqual(np.arange(10),
+                        np.concatenate([b[1] for b in batches]))
+
+  def test_read_cache_shuffled(self):
+    images, cache_dir, _ = self._write_cache(10, 4)
+    batches = self._read_cache(cache_dir, True, 3, num_epochs=2)
+    self.assertEqual([3, 3, 3, 1] * 2, [len(labels) for _, labels in batches])
+    for epoch in range(2):
+      epoch_batches = batches[4 * epoch:4 * (epoch + 1)]
+      labels = np.concatenate([b[1] for b in epoch_batches])
+      self.assertAllEqual(np.arange(10), np.sort(labels))
+      self.assertAllEqual(images[labels],
+                          np.concatenate([b[0] for b in epoch_batches]))
+
+  def test_random_crop_and_flip(self):
+    images = np.random.uniform(0, 255, size=[8, 7, 6, 3]).astype(np.float32)
+    with self.test_session() as sess:
+      crops = sess.run(image_cache.random_crop_and_flip(
+          tf.constant(images), 4, 3))
+    self.assertEqual((8, 4, 3, 3), crops.shape)
+    for image, crop in zip(images, crops):
+      windows = [image[top:top + 4, left:left + 3]
+                 for top in range(4) for left in range(4)]
+      windows += [w[:, ::-1] for w in windows]
+      self.assertLess(min(abs(w - crop).max() for w in windows), 1e-2)
+
+
+if __name__ == '__main__':
+  tf.test.main()
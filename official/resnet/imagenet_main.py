@@ -25,6 +25,7 @@ from absl import flags
 import tensorflow as tf  # pylint: disable=g-bad-import-order
 
 from official.utils.flags import core as flags_core
+from official.resnet import image_cache
 from official.resnet import imagenet_preprocessing
 from official.resnet import resnet_model
 from official.resnet import resnet_run_loop
@@ -58,6 +59,27 @@ def get_filenames(is_training, data_dir):
         for i in range(128)]
 
 
+def _get_feature_map():
+  """Returns the features of the Example protos that are parsed."""
+  # Dense features in Example proto.
+  feature_map = {
+      'image/encoded': tf.FixedLenFeature([], dtype=tf.string,
+                                          default_value=''),
+      'image/class/label': tf.FixedLenFeature([1], dtype=tf.int64,
+                                              default_value=-1),
+      'image/class/text': tf.FixedLenFeature([], dtype=tf.string,
+                                             default_value=''),
+  }
+  sparse_float32 = tf.VarLenFeature(dtype=tf.float32)
+  # Sparse features in Example proto.
+  feature_map.update(
+      {k: sparse_float32 for k in ['image/object/bbox/xmin',
+                                   'image/object/bbox/ymin',
+                                   'image/object/bbox/xmax',
+                                   'image/object/bbox/ymax']})
+  return feature_map
+
+
 def _parse_example_proto(example_serialized):
   """Parses an Example proto containing a training example of an image.
 
@@ -92,24 +114,7 @@ def _parse_example_proto(example_serialized):
       where each coordinate is [0, 1) and the coordinates are arranged as
       [ymin, xmin, ymax, xmax].
   """
-  # Dense features in Example proto.
-  feature_map = {
-      'image/encoded': tf.FixedLenFeature([], dtype=tf.string,
-                                          default_value=''),
-      'image/class/label': tf.FixedLenFeature([1], dtype=tf.int64,
-                                              default_value=-1),
-      'image/class/text': tf.FixedLenFeature([], dtype=tf.string,
-                                             default_value=''),
-  }
-  sparse_float32 = tf.VarLenFeature(dtype=tf.float32)
-  # Sparse features in Example proto.
-  feature_map.update(
-      {k: sparse_float32 for k in ['image/object/bbox/xmin',
-                                   'image/object/bbox/ymin',
-                                   'image/object/bbox/xmax',
-                                   'image/object/bbox/ymax']})
-
-  features = tf.parse_single_example(example_serialized, feature_map)
+  features = tf.parse_single_example(example_serialized, _get_feature_map())
   label = tf.cast(features['image/class/label'], dtype=tf.int32)
 
   xmin = tf.expand_dims(features['image/object/bbox/xmin'].values, 0)
@@ -128,6 +133,40 @@ def _parse_example_proto(example_serialized):
   return features['image/encoded'], label, bbox
 
 
+def _parse_example_protos(examples_serialized):
+  """Parses a batch of Example protos with a single op.
+
+  See _parse_example_proto for the fields of the Example protos.
+
+  Args:
+    examples_serialized: 1-D Tensor tf.string containing serialized Example
+      protocol buffers.
+
+  Returns:
+    image_buffers: 1-D Tensor tf.string containing the contents of the JPEG
+      files.
+    labels: 2-D Tensor tf.int32 of shape [batch_size, 1] containing the labels.
+    bboxes: 3-D float Tensor of bounding boxes arranged
+      [batch_size, max_num_boxes, coords], padded with zeros, where the
+      coordinates are arranged as [ymin, xmin, ymax, xmax].
+    num_boxes: 1-D Tensor tf.int32 containing the number of bounding boxes of
+      each example.
+  """
+  features = tf.parse_example(examples_serialized, _get_feature_map())
+  labels = tf.cast(features['image/class/label'], dtype=tf.int32)
+
+  coords = [tf.sparse_tensor_to_dense(features['image/object/bbox/' + k])
+            for k in ['ymin', 'xmin', 'ymax', 'xmax']]
+  bboxes = tf.stack(coords, axis=2)
+
+  xmin = features['image/object/bbox/xmin']
+  num_boxes = tf.sparse_reduce_sum(
+      tf.SparseTensor(xmin.indices, tf.ones_like(xmin.values, tf.int32),
+                      xmin.dense_shape), axis=1)
+
+  return features['image/encoded'], labels, bboxes, num_boxes
+
+
 def parse_record(raw_record, is_training):
   """Parses a record containing a training example of an image.
 
@@ -157,7 +196,89 @@ def parse_record(raw_record, is_training):
   return image, label
 
 
-def input_fn(is_training, data_dir, batch_size, num_epochs=1):
+def parse_parsed_record(features, is_training):
+  """Preprocesses one example of a batch parsed by _parse_example_protos.
+
+  Unlike parse_record, the evaluation images are decoded with a fused decode
+  and crop, so that only the central crop of the JPEG is decoded.
+
+  Args:
+    features: Tuple (image_buffer, label, bbox, num_boxes) of one example, as
+      returned by _parse_example_protos and unbatched.
+    is_training: A boolean denoting whether the input is for training.
+
+  Returns:
+    Tuple with processed image tensor and one-hot-encoded label tensor.
+  """
+  image_buffer, label, bbox, num_boxes = features
+  # Drop the padding boxes, and use the shape [1, num_boxes, coords].
+  bbox = tf.expand_dims(bbox[:num_boxes], 0)
+
+  image = imagenet_preprocessing.preprocess_image(
+      image_buffer=image_buffer,
+      bbox=bbox,
+      output_height=_DEFAULT_IMAGE_SIZE,
+      output_width=_DEFAULT_IMAGE_SIZE,
+      num_channels=_NUM_CHANNELS,
+      is_training=is_training,
+      fused_central_crop=True)
+
+  label = tf.one_hot(tf.reshape(label, shape=[]), _NUM_CLASSES)
+
+  return image, label
+
+
+def parse_record_for_cache(raw_record, is_training):
+  """Parses a record into the uint8 image and int32 label of an image cache.
+
+  Args:
+    raw_record: scalar Tensor tf.string containing a serialized
+      Example protocol buffer.
+    is_training: A boolean denoting whether the input is for training.
+
+  Returns:
+    Tuple with the uint8 image tensor and the scalar label tensor.
+  """
+  image_buffer, label, _ = _parse_example_proto(raw_record)
+
+  image = imagenet_preprocessing.preprocess_image_for_cache(
+      image_buffer=image_buffer,
+      output_height=_DEFAULT_IMAGE_SIZE,
+      output_width=_DEFAULT_IMAGE_SIZE,
+      num_channels=_NUM_CHANNELS,
+      is_training=is_training)
+
+  return image, tf.reshape(label, shape=[])
+
+
+def preprocess_cached_images(images, labels, is_training):
+  """Preprocesses a batch of images and labels read from an image cache.
+
+  Args:
+    images: uint8 tensor of shape [batch_size, height, width, channels].
+    labels: int32 tensor of shape [batch_size].
+    is_training: A boolean denoting whether the input is for training.
+
+  Returns:
+    Tuple with the processed images and the one-hot-encoded labels.
+  """
+  images = imagenet_preprocessing.preprocess_cached_images(
+      images, _DEFAULT_IMAGE_SIZE, _DEFAULT_IMAGE_SIZE, is_training)
+  return images, tf.one_hot(labels, _NUM_CLASSES)
+
+
+def _get_cache_dataset(is_training, data_dir, num_parallel_calls):
+  """Returns the dataset of examples to write to the image cache."""
+  dataset = tf.data.Dataset.from_tensor_slices(
+      get_filenames(is_training, data_dir))
+  dataset = dataset.flat_map(tf.data.TFRecordDataset)
+  return dataset.map(lambda value: parse_record_for_cache(value, is_training),
+                     num_parallel_calls=num_parallel_calls)
+
+
+def input_fn(is_training, data_dir, batch_size, num_epochs=1,
+             parse_in_batches=False, num_parallel_calls=1,
+             image_cache_dir=None):
   """Input function which provides batches for train or eval.
 
   Args:
@@ -165,10 +286,24 @@ def input_fn(is_training, data_dir, batch_size, num_epochs=1):
     data_dir: The directory containing the input data.
     batch_size: The number of samples per batch.
     num_epochs: The number of epochs to repeat the dataset.
+    parse_in_batches: If true, the Example protos of a batch are parsed with a
+      single op, and the images are then decoded and preprocessed in parallel.
+    num_parallel_calls: The number of images that are preprocessed in
+      parallel when parse_in_batches is true, or when the image cache is
+      written.
+    image_cache_dir: Optional directory of the resized and cropped images. If
+      set, the images are preprocessed into the cache the first time, and are
+      then read from the cache.
 
   Returns:
     A dataset that can be used for iteration.
   """
+  if image_cache_dir:
+    return image_cache.get_cached_dataset(
+        os.path.join(image_cache_dir, 'train' if is_training else 'validation'),
+        lambda: _get_cache_dataset(is_training, data_dir, num_parallel_calls),
+        is_training, batch_size, preprocess_cached_images, num_epochs)
+
   filenames = get_filenames(is_training, data_dir)
   dataset = tf.data.Dataset.from_tensor_slices(filenames)
 
@@ -179,6 +314,12 @@ def input_fn(is_training, data_dir, batch_size, num_epochs=1):
   # Convert to individual records
   dataset = dataset.flat_map(tf.data.TFRecordDataset)
 
+  if parse_in_batches:
+    return resnet_run_loop.process_record_dataset(
+        dataset, is_training, batch_size, _SHUFFLE_BUFFER, parse_parsed_record,
+        num_epochs, parse_batch_fn=_parse_example_protos,
+        num_parallel_calls=num_parallel_calls)
+
   return resnet_run_loop.process_record_dataset(
       dataset, is_training, batch_size, _SHUFFLE_BUFFER, parse_record,
       num_epochs
@@ -298,7 +439,8 @@ def imagenet_model_fn(features, labels, mode, params):
 
 def define_imagenet_flags():
   resnet_run_loop.define_resnet_flags(
-      resnet_size_choices=['18', '34', '50', '101', '152', '200'])
+      resnet_size_choices=['18', '34', '50', '101', '152', '200'],
+      parse_in_batches=True)
   flags.adopt_module_key_flags(resnet_run_loop)
   flags_core.set_defaults(train_epochs=100)
 
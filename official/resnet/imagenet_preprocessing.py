@@ -29,6 +29,8 @@ and instead does an aspect-preserving resize followed by random crop during
 training. (These both differ from "Inception preprocessing," which introduces
 color distortion steps.)
 
+Images read from an image cache were resized and cropped once when the cache
+was written, see preprocess_image_for_cache and preprocess_cached_images.
 """
 
 from __future__ import absolute_import
@@ -37,6 +39,8 @@ from __future__ import print_function
 
 import tensorflow as tf
 
+from official.resnet import image_cache
+
 _R_MEAN = 123.68
 _G_MEAN = 116.78
 _B_MEAN = 103.94
@@ -119,6 +123,47 @@ def _central_crop(image, crop_height, crop_width):
       image, [crop_top, crop_left, 0], [crop_height, crop_width, -1])
 
 
+def _decode_and_central_crop(image_buffer, crop_height, crop_width,
+                             resize_min, num_channels):
+  """Decodes only the central crop of a JPEG, and resizes it.
+
+  The crop window is the window that _aspect_preserving_resize followed by
+  _central_crop would select, mapped back to the coordinates of the encoded
+  image. The result is the same as the separate resize and crop up to the
+  rounding of the window and the interpolation at its border, but only the
+  crop is decoded and resized.
+
+  Args:
+    image_buffer: scalar string Tensor representing the raw JPEG image buffer.
+    crop_height: the height of the image following the crop.
+    crop_width: the width of the image following the crop.
+    resize_min: A python integer or scalar `Tensor` indicating the size of
+      the smallest side of the image before the crop.
+    num_channels: Integer depth of the image buffer for decoding.
+
+  Returns:
+    3-D tensor with the cropped and resized image.
+  """
+  shape = tf.image.extract_jpeg_shape(image_buffer)
+  height = tf.cast(shape[0], tf.float32)
+  width = tf.cast(shape[1], tf.float32)
+
+  # The size of the crop before resizing.
+  scale_ratio = tf.minimum(height, width) / tf.cast(resize_min, tf.float32)
+  window_height = tf.minimum(
+      tf.cast(tf.round(crop_height * scale_ratio), tf.int32), shape[0])
+  window_width = tf.minimum(
+      tf.cast(tf.round(crop_width * scale_ratio), tf.int32), shape[1])
+
+  crop_window = tf.stack([(shape[0] - window_height) // 2,
+                          (shape[1] - window_width) // 2,
+                          window_height, window_width])
+  image = tf.image.decode_and_crop_jpeg(
+      image_buffer, crop_window, channels=num_channels)
+
+  return _resize_image(image, crop_height, crop_width)
+
+
 def _mean_image_subtraction(image, means, num_channels):
   """Subtracts the given means from each image channel.
 
@@ -224,7 +269,8 @@ def _resize_image(image, height, width):
 
 
 def preprocess_image(image_buffer, bbox, output_height, output_width,
-                     num_channels, is_training=False):
+                     num_channels, is_training=False,
+                     fused_central_crop=False):
   """Preprocesses the given image.
 
   Preprocessing includes decoding, cropping, and resizing for both training
@@ -241,6 +287,9 @@ def preprocess_image(image_buffer, bbox, output_height, output_width,
     num_channels: Integer depth of the image buffer for decoding.
     is_training: `True` if we're preprocessing the image for training and
       `False` otherwise.
+    fused_central_crop: If `True`, validation images are cropped while they
+      are decoded, and only the crop is resized. This is much cheaper, and
+      approximately equal to the default resize then crop.
 
   Returns:
     A preprocessed image.
@@ -249,6 +298,9 @@ def preprocess_image(image_buffer, bbox, output_height, output_width,
     # For training, we want to randomize some of the distortions.
     image = _decode_crop_and_flip(image_buffer, bbox, num_channels)
     image = _resize_image(image, output_height, output_width)
+  elif fused_central_crop:
+    image = _decode_and_central_crop(
+        image_buffer, output_height, output_width, _RESIZE_MIN, num_channels)
   else:
     # For validation, we want to decode, resize, then just crop the middle.
     image = tf.image.decode_jpeg(image_buffer, channels=num_channels)
@@ -258,3 +310,58 @@ def preprocess_image(image_buffer, bbox, output_height, output_width,
   image.set_shape([output_height, output_width, num_channels])
 
   return _mean_image_subtraction(image, _CHANNEL_MEANS, num_channels)
+
+
+def preprocess_image_for_cache(image_buffer, output_height, output_width,
+                               num_channels, is_training=False):
+  """Applies the deterministic part of the preprocessing to an image.
+
+  For evaluation this is the full preprocessing except the mean subtraction.
+  For training, the aspect-preserving resize is followed by a central crop of
+  size [_RESIZE_MIN, _RESIZE_MIN], from which preprocess_cached_images takes
+  random crops. Training from the cache is thus closer to "VGG preprocessing"
+  than to the bounding box sampling of preprocess_image.
+
+  Args:
+    image_buffer: scalar string Tensor representing the raw JPEG image buffer.
+    output_height: The height of the image after preprocessing.
+    output_width: The width of the image after preprocessing.
+    num_channels: Integer depth of the image buffer for decoding.
+    is_training: `True` if we're preprocessing the image for training and
+      `False` otherwise.
+
+  Returns:
+    A uint8 image to write to the cache.
+  """
+  image = tf.image.decode_jpeg(image_buffer, channels=num_channels)
+  image = _aspect_preserving_resize(image, _RESIZE_MIN)
+  if is_training:
+    # The smallest side may be a pixel short of _RESIZE_MIN after rounding.
+    image = tf.image.resize_image_with_crop_or_pad(
+        image, _RESIZE_MIN, _RESIZE_MIN)
+    image.set_shape([_RESIZE_MIN, _RESIZE_MIN, num_channels])
+  else:
+    image = _central_crop(image, output_height, output_width)
+    image.set_shape([output_height, output_width, num_channels])
+  return tf.cast(tf.round(image), tf.uint8)
+
+
+def preprocess_cached_images(images, output_height, output_width,
+                             is_training=False):
+  """Preprocesses a batch of images written by preprocess_image_for_cache.
+
+  Args:
+    images: uint8 Tensor of shape [batch_size, height, width, channels].
+    output_height: The height of the images after preprocessing.
+    output_width: The width of the images after preprocessing.
+    is_training: `True` if we're preprocessing the images for training and
+      `False` otherwise.
+
+  Returns:
+    The preprocessed images.
+  """
+  images = tf.cast(images, tf.float32)
+  if is_training:
+    images = image_cache.random_crop_and_flip(
+        images, output_height, output_width)
+  return images - _CHANNEL_MEANS
@@ -310,6 +310,82 @@ class BaseTest(tf.test.TestCase):
           extra_flags=['-resnet_version', '1', '-dtype', 'fp16']
       )
 
+  def _serialized_examples(self, sess):
+    """Returns Example protos with smooth random JPEGs and 0 to 2 boxes."""
+    examples = []
+    for i, (height, width) in enumerate([(300, 400), (250, 260), (420, 280)]):
+      image = tf.cast(tf.image.resize_images(
+          tf.random_uniform([4, 4, 3], maxval=255), [height, width]), tf.uint8)
+      encoded = sess.run(tf.image.encode_jpeg(image))
+      boxes = [[0.1 * j, 0.2, 0.5 + 0.1 * j, 0.9] for j in range(i)]
+      feature = {
+          'image/encoded': tf.train.Feature(
+              bytes_list=tf.train.BytesList(value=[encoded])),
+          'image/class/label': tf.train.Feature(
+              int64_list=tf.train.Int64List(value=[i + 1])),
+      }
+      for k, name in enumerate(['ymin', 'xmin', 'ymax', 'xmax']):
+        feature['image/object/bbox/' + name] = tf.train.Feature(
+            float_list=tf.train.FloatList(value=[b[k] for b in boxes]))
+      examples.append(tf.train.Example(
+          features=tf.train.Features(feature=feature)).SerializeToString())
+    return examples
+
+  def test_parse_example_protos(self):
+    with self.test_session() as sess:
+      examples = self._serialized_examples(sess)
+      # pylint: disable=protected-access
+      buffers, labels, bboxes, num_boxes = sess.run(
+          imagenet_main._parse_example_protos(tf.constant(examples)))
+      self.assertAllEqual([0, 1, 2], num_boxes)
+      for i, example in enumerate(examples):
+        buffer_i, label_i, bbox_i = sess.run(
+            imagenet_main._parse_example_proto(tf.constant(example)))
+        # pylint: enable=protected-access
+        self.assertEqual(buffer_i, buffers[i])
+        self.assertAllEqual(label_i, labels[i])
+        self.assertAllClose(bbox_i[0], bboxes[i, :num_boxes[i]])
+
+  def test_parse_parsed_record(self):
+    with self.test_session() as sess:
+      examples = self._serialized_examples(sess)
+      for is_training in [True, False]:
+        # pylint: disable=protected-access
+        features = imagenet_main._parse_example_protos(tf.constant(examples))
+        # pylint: enable=protected-access
+        for i, example in enumerate(examples):
+          image, label = imagenet_main.parse_parsed_record(
+              [f[i] for f in features], is_training)
+          expected_image, expected_label = imagenet_main.parse_record(
+              tf.constant(example), is_training)
+          self.assertAllEqual(expected_image.shape, image.shape)
+          self.assertAllEqual(sess.run(expected_label), sess.run(label))
+          if not is_training:
+            # The fused decode and crop only differs by the rounding of the
+            # crop window and the interpolation at its border.
+            image, expected_image = sess.run([image, expected_image])
+            self.assertLess(abs(image - expected_image).mean(), 2.)
+
+  def test_preprocess_cached_images(self):
+    with self.test_session() as sess:
+      examples = self._serialized_examples(sess)
+      for is_training in [True, False]:
+        for example in examples:
+          image, label = imagenet_main.parse_record_for_cache(
+              tf.constant(example), is_training)
+          self.assertEqual(tf.uint8, image.dtype)
+          images, labels = imagenet_main.preprocess_cached_images(
+              tf.expand_dims(image, 0), tf.expand_dims(label, 0), is_training)
+          expected_image, expected_label = imagenet_main.parse_record(
+              tf.constant(example), is_training)
+          images, labels, expected_image, expected_label = sess.run(
+              [images, labels, expected_image, expected_label])
+          self.assertAllEqual(expected_image.shape, images[0].shape)
+          self.assertAllEqual(expected_label, labels[0])
+          if not is_training:
+            # The cached images are only rounded to uint8.
+            self.assertAllClose(expected_image, images[0], atol=0.5)
+
 
 if __name__ == '__main__':
   tf.test.main()
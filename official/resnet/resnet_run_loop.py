@@ -24,6 +24,7 @@ from __future__ import division
 from __future__ import print_function
 
 import os
+import time
 
 # pylint: disable=g-bad-import-order
 from absl import flags
@@ -42,7 +43,8 @@ from official.utils.misc import model_helpers
 # Functions for input processing.
 ################################################################################
 def process_record_dataset(dataset, is_training, batch_size, shuffle_buffer,
-                           parse_record_fn, num_epochs=1):
+                           parse_record_fn, num_epochs=1, parse_batch_fn=None,
+                           num_parallel_calls=1):
   """Given a Dataset with raw records, return an iterator over the records.
 
   Args:
@@ -55,6 +57,12 @@ def process_record_dataset(dataset, is_training, batch_size, shuffle_buffer,
     parse_record_fn: A function that takes a raw record and returns the
       corresponding (image, label) pair.
     num_epochs: The number of epochs to repeat the dataset.
+    parse_batch_fn: Optional function that takes a vector of raw records and
+      returns a tuple of batched features. If set, records are batched before
+      they are parsed, and parse_record_fn takes the tuple of features of one
+      record instead of a raw record.
+    num_parallel_calls: The number of records that are preprocessed in
+      parallel when parse_batch_fn is set.
 
   Returns:
     Dataset of (image, label) pairs ready for iteration.
@@ -72,14 +80,27 @@ def process_record_dataset(dataset, is_training, batch_size, shuffle_buffer,
   # dataset for the appropriate number of epochs.
   dataset = dataset.repeat(num_epochs)
 
-  # Parse the raw records into images and labels. Testing has shown that setting
-  # num_parallel_batches > 1 produces no improvement in throughput, since
-  # batch_size is almost always much greater than the number of CPU cores.
-  dataset = dataset.apply(
-      tf.contrib.data.map_and_batch(
-          lambda value: parse_record_fn(value, is_training),
-          batch_size=batch_size,
-          num_parallel_batches=1))
+  if parse_batch_fn is None:
+    # Parse the raw records into images and labels. Testing has shown that
+    # setting num_parallel_batches > 1 produces no improvement in throughput,
+    # since batch_size is almost always much greater than the number of CPU
+    # cores.
+    dataset = dataset.apply(
+        tf.contrib.data.map_and_batch(
+            lambda value: parse_record_fn(value, is_training),
+            batch_size=batch_size,
+            num_parallel_batches=1))
+  else:
+    # Parse the features of a whole batch of records with one op, then
+    # preprocess the records (e.g. decode images) in parallel and batch them
+    # again.
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(parse_batch_fn, num_parallel_calls=num_parallel_calls)
+    dataset = dataset.apply(tf.contrib.data.unbatch())
+    dataset = dataset.map(
+        lambda *features: parse_record_fn(features, is_training),
+        num_parallel_calls=num_parallel_calls)
+    dataset = dataset.batch(batch_size)
 
   # Operations between the final prefetch and the get_next call to the iterator
   # will happen synchronously during run time. We prefetch here again to
@@ -87,7 +108,7 @@ def process_record_dataset(dataset, is_training, batch_size, shuffle_buffer,
   # critical training path. Setting buffer_size to tf.contrib.data.AUTOTUNE
   # allows DistributionStrategies to adjust how many batches to fetch based
   # on how many devices are present.
-  dataset.prefetch(buffer_size=tf.contrib.data.AUTOTUNE)
+  dataset = dataset.prefetch(buffer_size=tf.contrib.data.AUTOTUNE)
 
   return dataset
 
@@ -117,6 +138,48 @@ def get_synth_input_fn(height, width, num_channels, num_classes):
   return input_fn
 
 
+def benchmark_input_fn(input_fn, num_batches, session_config=None,
+                       num_warmup_batches=10):
+  """Time an input function without running a model on its output.
+
+  Args:
+    input_fn: A function that takes no arguments and returns a dataset of
+      (images, labels) batches.
+    num_batches: The number of batches to time, or None to time all the
+      batches of the dataset.
+    session_config: Optional tf.ConfigProto for the session.
+    num_warmup_batches: The number of batches read before timing starts, so
+      that the buffers of the pipeline are filled.
+
+  Returns:
+    Dictionary with the number of images read, the elapsed seconds and the
+    images/sec.
+  """
+  with tf.Graph().as_default():
+    images, _ = input_fn().make_one_shot_iterator().get_next()
+    # Only the batch size is fetched, so the images are not copied out of the
+    # runtime.
+    num_images = tf.shape(images)[0]
+    with tf.Session(config=session_config) as sess:
+      for _ in range(num_warmup_batches):
+        sess.run(num_images)
+      total_images = 0
+      start = time.time()
+      batch = 0
+      while num_batches is None or batch < num_batches:
+        try:
+          total_images += sess.run(num_images)
+        except tf.errors.OutOfRangeError:
+          break
+        batch += 1
+      secs = time.time() - start
+  return {
+      'num_images': total_images,
+      'secs': secs,
+      'images_per_sec': total_images / max(secs, 1e-9),
+  }
+
+
 ################################################################################
 # Functions for running training/eval/validation loops for the model.
 ################################################################################
@@ -402,19 +465,40 @@ def resnet_main(
       flags_obj.hooks,
       batch_size=flags_obj.batch_size)
 
+  # Options that are only passed to the input functions that support them.
+  input_kwargs = {}
+  if getattr(flags_obj, 'parse_in_batches', False):
+    input_kwargs['parse_in_batches'] = True
+  if flags_obj.image_cache_dir:
+    input_kwargs['image_cache_dir'] = flags_obj.image_cache_dir
+  if input_kwargs and hasattr(flags_obj, 'num_parallel_calls'):
+    input_kwargs['num_parallel_calls'] = flags_obj.num_parallel_calls
+
   def input_fn_train():
     return input_function(
         is_training=True, data_dir=flags_obj.data_dir,
         batch_size=per_device_batch_size(
             flags_obj.batch_size, flags_core.get_num_gpus(flags_obj)),
-        num_epochs=flags_obj.epochs_between_evals)
+        num_epochs=flags_obj.epochs_between_evals, **input_kwargs)
 
   def input_fn_eval():
     return input_function(
         is_training=False, data_dir=flags_obj.data_dir,
         batch_size=per_device_batch_size(
             flags_obj.batch_size, flags_core.get_num_gpus(flags_obj)),
-        num_epochs=1)
+        num_epochs=1, **input_kwargs)
+
+  if flags_obj.input_benchmark_steps:
+    # Measure the input pipeline throughput only, without the model.
+    results = benchmark_input_fn(
+        input_fn_train, flags_obj.input_benchmark_steps, session_config)
+    tf.logging.info('Input pipeline: %d images in %.2f sec, %.1f images/sec',
+                    results['num_images'], results['secs'],
+                    results['images_per_sec'])
+    benchmark_logger.log_metric(
+        'input_images_per_sec', results['images_per_sec'],
+        unit='images/sec')
+    return
 
   total_training_cycle = (flags_obj.train_epochs //
                           flags_obj.epochs_between_evals)
@@ -449,14 +533,41 @@ def resnet_main(
     classifier.export_savedmodel(flags_obj.export_dir, input_receiver_fn)
 
 
-def define_resnet_flags(resnet_size_choices=None):
-  """Add flags and validators for ResNet."""
+def define_resnet_flags(resnet_size_choices=None, parse_in_batches=False):
+  """Add flags and validators for ResNet.
+
+  Args:
+    resnet_size_choices: Optional list of allowed values of --resnet_size.
+    parse_in_batches: Create the --parse_in_batches and --num_parallel_calls
+      flags, for input functions that can parse records in batches.
+  """
   flags_core.define_base()
-  flags_core.define_performance(num_parallel_calls=False)
+  flags_core.define_performance(num_parallel_calls=parse_in_batches)
   flags_core.define_image()
   flags_core.define_benchmark()
   flags.adopt_module_key_flags(flags_core)
 
+  flags.DEFINE_integer(
+      name='input_benchmark_steps', short_name='ibs', default=0,
+      help=flags_core.help_wrap(
+          'If positive, read this many batches from the training input '
+          'pipeline without running the model, log the images/sec and exit.'))
+
+  flags.DEFINE_string(
+      name='image_cache_dir', short_name='icd', default=None,
+      help=flags_core.help_wrap(
+          'Local directory of the images after the deterministic part of '
+          'their preprocessing. If set, the images are written to it the '
+          'first time, and later epochs and evaluations read them from it '
+          'and only apply the random crop and flip.'))
+
+  if parse_in_batches:
+    flags.DEFINE_bool(
+        name='parse_in_batches', default=False,
+        help=flags_core.help_wrap(
+            'If true, a batch of records is parsed with one op before the '
+            'images are decoded in parallel (see --num_parallel_calls).'))
+
   flags.DEFINE_enum(
       name='resnet_version', short_name='rv', default='2',
       enum_values=['1', '2'],
@@ -0,0 +1,185 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Report the padding of the default and fitted length buckets.
+
+Computes (or loads) the length histogram of the TFRecord files in --data_dir,
+fits bucket boundaries to it, and logs the number of batches and the padding
+ratio of each bucket for both the default and the fitted boundaries. With
+--measure_batches, the input pipeline is also timed and the tokens/sec of each
+bucket are logged.
+
+Example:
+  python bucket_stats.py --data_dir=/tmp/translate_ende --num_length_buckets=20
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import os
+import time
+
+# pylint: disable=g-bad-import-order
+from absl import app as absl_app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+# pylint: enable=g-bad-import-order
+
+from official.transformer.model import model_params
+from official.transformer.utils import dataset
+from official.utils.flags import core as flags_core
+
+PARAMS_MAP = {
+    "base": model_params.TransformerBaseParams,
+    "big": model_params.TransformerBigParams,
+}
+
+
+def log_bucket_statistics(name, statistics):
+  """Log the statistics from dataset.get_bucket_statistics."""
+  tf.logging.info("%s buckets:" % name)
+  tf.logging.info("  lengths    batch size  examples   batches  padding")
+  for s in statistics:
+    tf.logging.info("  [%3d, %3d)  %10d  %8d  %8d  %6.1f%%" % (
+        s["min_length"], s["max_length"], s["batch_size"], s["num_examples"],
+        s["num_batches"], 100 * s["padding_ratio"]))
+  num_tokens = sum(s["num_tokens"] for s in statistics)
+  num_padded_tokens = sum(s["num_padded_tokens"] for s in statistics)
+  tf.logging.info("  total: %d batches, %.1f%% padding" % (
+      sum(s["num_batches"] for s in statistics),
+      100 * (1. - num_tokens / max(num_padded_tokens, 1))))
+
+
+def measure_bucket_throughput(file_pattern, batch_size, max_length, buckets,
+                              num_batches):
+  """Time the input pipeline, and collect the tokens/sec of each bucket.
+
+  Args:
+    file_pattern: String used to match the input TFRecord files.
+    batch_size: Maximum number of tokens per batch of examples.
+    max_length: Maximum number of tokens per example.
+    buckets: Tuple of lists (buckets_min, buckets_max, bucket_batch_sizes).
+    num_batches: Number of batches to time.
+
+  Returns:
+    Dictionary mapping the bucket index to a dictionary with the keys
+    "num_batches", "num_tokens", "num_padded_tokens" and "secs".
+  """
+  buckets_max = buckets[1]
+  with tf.Graph().as_default():
+    # pylint: disable=protected-access
+    inputs, targets = dataset._read_and_batch_from_files(
+        file_pattern, batch_size, max_length, num_parallel_calls=1,
+        shuffle=False, repeat=1, buckets=buckets).make_one_shot_iterator(
+        ).get_next()
+    # pylint: enable=protected-access
+    results = collections.defaultdict(lambda: collections.defaultdict(float))
+    with tf.Session() as sess:
+      for _ in range(num_batches):
+        start = time.time()
+        try:
+          inputs_value, targets_value = sess.run([inputs, targets])
+        except tf.errors.OutOfRangeError:
+          break
+        secs = time.time() - start
+
+        example_lengths = np.maximum(
+            np.count_nonzero(inputs_value, axis=1),
+            np.count_nonzero(targets_value, axis=1))
+        bucket = int(np.searchsorted(
+            buckets_max, example_lengths.max(), side="right"))
+        result = results[bucket]
+        result["num_batches"] += 1
+        result["num_tokens"] += (np.count_nonzero(inputs_value) +
+                                 np.count_nonzero(targets_value))
+        result["num_padded_tokens"] += inputs_value.size + targets_value.size
+        result["secs"] += secs
+  return results
+
+
+def log_bucket_throughput(name, buckets, results):
+  """Log the results of measure_bucket_throughput."""
+  tf.logging.info("%s buckets input pipeline:" % name)
+  tf.logging.info("  lengths    batches  tokens/sec  padded tokens/sec")
+  for bucket in sorted(results):
+    result = results[bucket]
+    secs = max(result["secs"], 1e-9)
+    tf.logging.info("  [%3d, %3d)  %7d  %10.0f  %17.0f" % (
+        buckets[0][bucket], buckets[1][bucket], result["num_batches"],
+        result["num_tokens"] / secs, result["num_padded_tokens"] / secs))
+
+
+def main(unused_argv):
+  params = PARAMS_MAP[FLAGS.param_set]
+  batch_size = FLAGS.batch_size or params.batch_size
+  max_length = FLAGS.max_length or params.max_length
+  file_pattern = os.path.join(FLAGS.data_dir, "*%s*" % FLAGS.split)
+
+  counts = dataset.load_length_histogram(file_pattern, os.path.join(
+      FLAGS.data_dir, dataset.LENGTH_HISTOGRAM_FILENAME))
+  all_buckets = [
+      ("Default", dataset.get_default_buckets(batch_size, max_length)),
+      ("Fitted", dataset.create_buckets_from_histogram(
+          counts, batch_size, max_length, FLAGS.num_length_buckets))]
+
+  for name, buckets in all_buckets:
+    log_bucket_statistics(name, dataset.get_bucket_statistics(
+        counts, *buckets))
+  if FLAGS.measure_batches:
+    for name, buckets in all_buckets:
+      log_bucket_throughput(name, buckets, measure_bucket_throughput(
+          file_pattern, batch_size, max_length, buckets,
+          FLAGS.measure_batches))
+
+
+def define_bucket_stats_flags():
+  """Add flags for reporting bucket statistics."""
+  flags_core.define_base(
+      model_dir=False, train_epochs=False, epochs_between_evals=False,
+      stop_threshold=False, multi_gpu=False, num_gpu=False, hooks=False,
+      export_dir=False)
+  flags_core.set_defaults(data_dir="/tmp/translate_ende", batch_size=None)
+  flags.DEFINE_enum(
+      name="param_set", short_name="mp", default="big",
+      enum_values=["base", "big"],
+      help=flags_core.help_wrap(
+          "Parameter set that defines the default batch size and max length."))
+  flags.DEFINE_integer(
+      name="max_length", short_name="ml", default=None,
+      help=flags_core.help_wrap(
+          "Maximum number of tokens per example. Defaults to the value in the "
+          "parameter set."))
+  flags.DEFINE_enum(
+      name="split", short_name="sp", default="train",
+      enum_values=["train", "dev"],
+      help=flags_core.help_wrap("Which TFRecord files in --data_dir to use."))
+  flags.DEFINE_integer(
+      name="num_length_buckets", short_name="nlb", default=20,
+      help=flags_core.help_wrap(
+          "Number of buckets to fit to the length histogram."))
+  flags.DEFINE_integer(
+      name="measure_batches", short_name="mb", default=0,
+      help=flags_core.help_wrap(
+          "If positive, time this many batches of the input pipeline with "
+          "each set of buckets, and report the tokens/sec of each bucket."))
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  define_bucket_stats_flags()
+  FLAGS = flags.FLAGS
+  absl_app.run(main)
@@ -22,6 +22,11 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
+import hashlib
+import itertools
+import multiprocessing
+import os
 import re
 import sys
 import unicodedata
@@ -36,6 +41,11 @@ import tensorflow as tf
 from official.transformer.utils import metrics
 from official.utils.flags import core as flags_core
 
+# Number of lines scored together by a worker.
+_CHUNK_SIZE = 10000
+# Number of bytes read from a file at a time.
+_READ_SIZE = 1 << 24
+
 
 class UnicodeRegex(object):
   """Ad-hoc hack to recognize all punctuation and symbols."""
@@ -84,29 +94,212 @@ def bleu_tokenize(string):
   return string.split()
 
 
-def bleu_wrapper(ref_filename, hyp_filename, case_sensitive=False):
-  """Compute BLEU for two files (reference and hypothesis translation)."""
-  ref_lines = tf.gfile.Open(ref_filename).read().strip().splitlines()
-  hyp_lines = tf.gfile.Open(hyp_filename).read().strip().splitlines()
+def bleu_wrapper(ref_filename, hyp_filename, case_sensitive=False,
+                 num_workers=1, chunk_size=_CHUNK_SIZE, cache_dir=None):
+  """Compute BLEU for two files (reference and hypothesis translation).
+
+  The files are read in chunks of lines. The BLEU sufficient statistics of each
+  chunk are computed (in parallel if num_workers > 1) and summed, which gives
+  exactly the same score as scoring the whole corpus at once.
+
+  Args:
+    ref_filename: File containing reference translations, one per line.
+    hyp_filename: File containing hypothesis translations, one per line.
+    case_sensitive: If false, lowercase the lines before tokenizing.
+    num_workers: Number of processes used to tokenize and count n-grams.
+    chunk_size: Number of lines scored together by a worker.
+    cache_dir: Optional directory in which the tokenized references are cached.
+      The cache is keyed by the reference path, size, modification time and
+      case sensitivity, so later scores against the same reference file skip
+      its tokenization.
+
+  Returns:
+    BLEU score.
+
+  Raises:
+    ValueError: if the files have a different number of lines.
+  """
+  cache_file = None
+  ref_tokens_cached = False
+  if cache_dir is not None:
+    cache_file = _reference_cache_filename(
+        cache_dir, ref_filename, case_sensitive)
+    ref_tokens_cached = tf.gfile.Exists(cache_file)
+    if ref_tokens_cached:
+      tf.logging.info("Using tokenized references from %s" % cache_file)
+
+  if ref_tokens_cached:
+    ref_lines = _read_lines(cache_file, strip=False)
+  else:
+    ref_lines = _read_lines(ref_filename)
+  hyp_lines = _read_lines(hyp_filename)
+  chunks = _paired_chunks(ref_lines, hyp_lines, chunk_size)
+  write_cache = cache_file is not None and not ref_tokens_cached
+  score_fn = functools.partial(
+      _chunk_statistics, case_sensitive=case_sensitive,
+      ref_tokens_cached=ref_tokens_cached, return_ref_tokens=write_cache)
+
+  statistics = []
+  if not write_cache:
+    for chunk_statistics, _ in _map_chunks(score_fn, chunks, num_workers):
+      statistics.append(chunk_statistics)
+  else:
+    tf.gfile.MakeDirs(cache_dir)
+    tmp_cache_file = cache_file + ".incomplete"
+    try:
+      with tf.gfile.Open(tmp_cache_file, "w") as cache_writer:
+        for chunk_statistics, ref_tokens in _map_chunks(
+            score_fn, chunks, num_workers):
+          statistics.append(chunk_statistics)
+          for tokens in ref_tokens:
+            cache_writer.write(" ".join(tokens) + "\n")
+    except Exception:
+      tf.gfile.Remove(tmp_cache_file)
+      raise
+    tf.gfile.Rename(tmp_cache_file, cache_file, overwrite=True)
 
-  if len(ref_lines) != len(hyp_lines):
-    raise ValueError("Reference and translation files have different number of "
-                     "lines.")
+  return metrics.bleu_from_statistics(
+      metrics.merge_bleu_statistics(statistics)) * 100
+
+
+def _map_chunks(fn, chunks, num_workers):
+  """Yield fn(chunk) for each chunk in order, using a pool if num_workers > 1.
+
+  Only a few chunks per worker are read ahead, so that the number of lines held
+  in memory does not grow with the size of the files.
+  """
+  group_size = 2 * max(num_workers, 1)
+  pool = multiprocessing.Pool(num_workers) if num_workers > 1 else None
+  try:
+    while True:
+      group = list(itertools.islice(chunks, group_size))
+      if not group:
+        return
+      for result in pool.map(fn, group) if pool else map(fn, group):
+        yield result
+  finally:
+    if pool is not None:
+      pool.close()
+      pool.join()
+
+
+def _chunk_statistics(
+    chunk, case_sensitive, ref_tokens_cached, return_ref_tokens):
+  """Compute the BLEU statistics of a chunk of (reference, hypothesis) lines.
+
+  Args:
+    chunk: Tuple of (reference lines, hypothesis lines).
+    case_sensitive: If false, lowercase the lines before tokenizing.
+    ref_tokens_cached: If true, the reference lines are already tokenized and
+      their tokens are separated by single spaces.
+    return_ref_tokens: If true, also return the tokenized references.
+
+  Returns:
+    Tuple of (BleuStatistics, list of reference token lists or None).
+  """
+  ref_lines, hyp_lines = chunk
+  if ref_tokens_cached:
+    ref_tokens = [x.split() for x in ref_lines]
+  else:
+    if not case_sensitive:
+      ref_lines = [x.lower() for x in ref_lines]
+    ref_tokens = [bleu_tokenize(x) for x in ref_lines]
   if not case_sensitive:
-    ref_lines = [x.lower() for x in ref_lines]
     hyp_lines = [x.lower() for x in hyp_lines]
-  ref_tokens = [bleu_tokenize(x) for x in ref_lines]
   hyp_tokens = [bleu_tokenize(x) for x in hyp_lines]
-  return metrics.compute_bleu(ref_tokens, hyp_tokens) * 100
+  statistics = metrics.compute_bleu_statistics(ref_tokens, hyp_tokens)
+  return statistics, ref_tokens if return_ref_tokens else None
+
+
+def _paired_chunks(ref_lines, hyp_lines, chunk_size):
+  """Yield (reference lines, hypothesis lines) tuples of chunk_size lines."""
+  while True:
+    ref_chunk = list(itertools.islice(ref_lines, chunk_size))
+    hyp_chunk = list(itertools.islice(hyp_lines, chunk_size))
+    if len(ref_chunk) != len(hyp_chunk):
+      raise ValueError("Reference and translation files have different number "
+                       "of lines.")
+    if not ref_chunk:
+      return
+    yield ref_chunk, hyp_chunk
+
+
+def _read_lines(filename, strip=True):
+  """Yield the lines of a file without reading it into memory at once.
+
+  If strip is true, the lines are the same as those returned by
+  f.read().strip().splitlines(): leading and trailing lines that only contain
+  whitespace are dropped, and the first and last lines are stripped.
+
+  Args:
+    filename: Name of the file to read.
+    strip: If true, strip whitespace from the beginning and end of the file.
+
+  Yields:
+    Lines of the file, without line break characters.
+  """
+  lines = _split_lines(filename)
+  if not strip:
+    for line in lines:
+      yield line
+    return
+
+  first = True
+  # Whitespace only lines, which are dropped if they are at the end of the file.
+  blank_lines = []
+  previous = None
+  for line in lines:
+    if not line.strip():
+      if not first:
+        blank_lines.append(line)
+      continue
+    if previous is not None:
+      yield previous
+    for blank_line in blank_lines:
+      yield blank_line
+    blank_lines = []
+    previous = line.lstrip() if first else line
+    first = False
+  if previous is not None:
+    yield previous.rstrip()
+
+
+def _split_lines(filename):
+  """Yield the lines of a file as split by str.splitlines()."""
+  remainder = b""
+  with tf.gfile.Open(filename, "rb") as f:
+    while True:
+      data = f.read(_READ_SIZE)
+      if not data:
+        break
+      data = remainder + data
+      # Only split up to the last newline, so that "\r\n" and multibyte
+      # characters are never split between reads.
+      end = data.rfind(b"\n") + 1
+      remainder = data[end:]
+      for line in tf.compat.as_text(data[:end]).splitlines():
+        yield line
+  for line in tf.compat.as_text(remainder).splitlines():
+    yield line
+
+
+def _reference_cache_filename(cache_dir, ref_filename, case_sensitive):
+  """Return the name of the file caching the tokenized reference file."""
+  stat = tf.gfile.Stat(ref_filename)
+  key = "%s:%d:%d:%s" % (os.path.abspath(ref_filename), stat.length,
+                         stat.mtime_nsec, case_sensitive)
+  return os.path.join(
+      cache_dir, "bleu_ref_%s" % hashlib.sha1(key.encode("utf-8")).hexdigest())
 
 
 def main(unused_argv):
+  kwargs = {"num_workers": FLAGS.num_workers, "cache_dir": FLAGS.cache_dir}
   if FLAGS.bleu_variant in ("both", "uncased"):
-    score = bleu_wrapper(FLAGS.reference, FLAGS.translation, False)
+    score = bleu_wrapper(FLAGS.reference, FLAGS.translation, False, **kwargs)
     tf.logging.info("Case-insensitive results: %f" % score)
 
   if FLAGS.bleu_variant in ("both", "cased"):
-    score = bleu_wrapper(FLAGS.reference, FLAGS.translation, True)
+    score = bleu_wrapper(FLAGS.reference, FLAGS.translation, True, **kwargs)
     tf.logging.info("Case-sensitive results: %f" % score)
 
 
@@ -129,6 +322,17 @@ def define_compute_bleu_flags():
           "Specify one or more BLEU variants to calculate. Variants: \"cased\""
           ", \"uncased\", or \"both\"."))
 
+  flags.DEFINE_integer(
+      name="num_workers", short_name="nw", default=1,
+      help=flags_core.help_wrap(
+          "Number of processes used to tokenize the lines and count n-grams."))
+
+  flags.DEFINE_string(
+      name="cache_dir", default=None,
+      help=flags_core.help_wrap(
+          "If set, tokenized references are cached in this directory and "
+          "reused when the same reference file is scored again."))
+
 
 if __name__ == "__main__":
   tf.logging.set_verbosity(tf.logging.INFO)
@@ -20,6 +20,7 @@ import unittest
 import tensorflow as tf  # pylint: disable=g-bad-import-order
 
 from official.transformer import compute_bleu
+from official.transformer.utils import metrics
 
 
 class ComputeBleuTest(unittest.TestCase):
@@ -55,6 +56,41 @@ class ComputeBleuTest(unittest.TestCase):
     self.assertLess(uncased_score, 100)
     self.assertLess(cased_score, 100)
 
+  def test_bleu_chunked_matches_corpus_bleu(self):
+    ref_lines = ["The cat sat on the mat.", "", "It rained, 3,000 times!",
+                 "A dog.", "Testing more tests"]
+    hyp_lines = ["the cat sat on a mat .", "nothing", "It rained 3,000 times",
+                 "A dog barked.", "Testing tests"]
+    ref = self._create_temp_file("\n " + "\n".join(ref_lines) + " \n\n")
+    hyp = self._create_temp_file("\n".join(hyp_lines) + "\n")
+    expected = metrics.compute_bleu(
+        [compute_bleu.bleu_tokenize(x.lower()) for x in ref_lines],
+        [compute_bleu.bleu_tokenize(x.lower()) for x in hyp_lines]) * 100
+
+    cache_dir = tempfile.mkdtemp()
+    for num_workers in (1, 2):
+      for chunk_size in (1, 2, 100):
+        score = compute_bleu.bleu_wrapper(
+            ref, hyp, False, num_workers=num_workers, chunk_size=chunk_size,
+            cache_dir=cache_dir)
+        self.assertEqual(expected, score)
+
+  def test_bleu_different_number_of_lines(self):
+    ref = self._create_temp_file("test 1\ntest 2\ntest 3")
+    hyp = self._create_temp_file("test 1\ntest 2")
+    with self.assertRaises(ValueError):
+      compute_bleu.bleu_wrapper(ref, hyp, chunk_size=2)
+
+  def test_merge_bleu_statistics(self):
+    refs = [["a", "b", "c", "d"], ["b", "c"], ["a", "a", "b"]]
+    hyps = [["a", "b", "c"], ["b", "c", "d"], ["a", "b"]]
+    merged = metrics.merge_bleu_statistics([
+        metrics.compute_bleu_statistics(refs[:1], hyps[:1]),
+        metrics.compute_bleu_statistics(refs[1:], hyps[1:])])
+    self.assertEqual(metrics.compute_bleu_statistics(refs, hyps), merged)
+    self.assertEqual(metrics.compute_bleu(refs, hyps),
+                     metrics.bleu_from_statistics(merged))
+
   def test_bleu_tokenize(self):
     s = "Test0, 1 two, 3"
     tokenized = compute_bleu.bleu_tokenize(s)
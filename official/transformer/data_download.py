@@ -18,9 +18,13 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
+import math
+import multiprocessing
 import os
 import random
 import tarfile
+import time
 
 # pylint: disable=g-bad-import-order
 import six
@@ -84,6 +88,10 @@ _EVAL_TAG = "dev"  # Following WMT and Tensor2Tensor conventions, in which the
 _TRAIN_SHARDS = 100
 _EVAL_SHARDS = 1
 
+# Shards larger than this are shuffled in two passes through temporary bucket
+# files, so that no more than about this many bytes are held in memory.
+_MAX_SHUFFLE_BYTES = 1 << 30
+
 
 def find_file(path, filename, max_depth=5):
   """Returns full filepath if the file is in path or a subdirectory."""
@@ -258,9 +266,14 @@ def write_file(writer, filename):
 # Data preprocessing
 ###############################################################################
 def encode_and_save_files(
-    subtokenizer, data_dir, raw_files, tag, total_shards):
+    subtokenizer, data_dir, raw_files, tag, total_shards, num_workers=1):
   """Save data from files as encoded Examples in TFrecord format.
 
+  Examples are assigned to the shards in round robin order. When num_workers is
+  greater than 1, each worker process streams through the data files, encodes
+  only the lines that belong to its own subset of the shards and writes those
+  shards, so the output is the same as with a single worker.
+
   Args:
     subtokenizer: Subtokenizer object that will be used to encode the strings.
     data_dir: The directory in which to write the examples
@@ -268,6 +281,7 @@ def encode_and_save_files(
       the corresponding line in target file will be saved in a tf.Example.
     tag: String that will be added onto the file names.
     total_shards: Number of files to divide the data into.
+    num_workers: Number of processes used to encode and write the shards.
 
   Returns:
     List of all files produced.
@@ -281,30 +295,57 @@ def encode_and_save_files(
     return filepaths
 
   tf.logging.info("Saving files with tag %s." % tag)
-  input_file = raw_files[0]
-  target_file = raw_files[1]
-
-  # Write examples to each shard in round robin order.
+  start_time = time.time()
   tmp_filepaths = [fname + ".incomplete" for fname in filepaths]
-  writers = [tf.python_io.TFRecordWriter(fname) for fname in tmp_filepaths]
-  counter, shard = 0, 0
+  num_workers = max(1, min(num_workers, total_shards))
+  shard_groups = [list(range(w, total_shards, num_workers))
+                  for w in range(num_workers)]
+  encode_fn = functools.partial(
+      _encode_and_save_shards, subtokenizer, raw_files[0], raw_files[1],
+      tmp_filepaths)
+  counts = _map(encode_fn, shard_groups, num_workers)
+
+  for tmp_name, final_name in zip(tmp_filepaths, filepaths):
+    tf.gfile.Rename(tmp_name, final_name)
+
+  counter = sum(counts)
+  tf.logging.info("Saved %d Examples", counter)
+  log_throughput("Encoding %s" % tag, counter, time.time() - start_time)
+  return filepaths
+
+
+def _encode_and_save_shards(
+    subtokenizer, input_file, target_file, filepaths, shard_nums):
+  """Encode the lines that belong to some of the shards, and write the shards.
+
+  Args:
+    subtokenizer: Subtokenizer object that will be used to encode the strings.
+    input_file: File containing data in the input language.
+    target_file: File containing the corresponding lines in target language.
+    filepaths: List of the file paths of all shards.
+    shard_nums: List of 0-based indices of the shards to write.
+
+  Returns:
+    Number of examples written.
+  """
+  total_shards = len(filepaths)
+  writers = {n: tf.python_io.TFRecordWriter(filepaths[n]) for n in shard_nums}
+  count = 0
   for counter, (input_line, target_line) in enumerate(zip(
       txt_line_iterator(input_file), txt_line_iterator(target_file))):
+    writer = writers.get(counter % total_shards)
+    if writer is None:
+      continue
     if counter > 0 and counter % 100000 == 0:
       tf.logging.info("\tSaving case %d." % counter)
     example = dict_to_example(
         {"inputs": subtokenizer.encode(input_line, add_eos=True),
          "targets": subtokenizer.encode(target_line, add_eos=True)})
-    writers[shard].write(example.SerializeToString())
-    shard = (shard + 1) % total_shards
-  for writer in writers:
+    writer.write(example.SerializeToString())
+    count += 1
+  for writer in writers.values():
     writer.close()
-
-  for tmp_name, final_name in zip(tmp_filepaths, filepaths):
-    tf.gfile.Rename(tmp_name, final_name)
-
-  tf.logging.info("Saved %d Examples", counter + 1)
-  return filepaths
+  return count
 
 
 def shard_filename(path, tag, shard_num, total_shards):
@@ -313,31 +354,99 @@ def shard_filename(path, tag, shard_num, total_shards):
       path, "%s-%s-%.5d-of-%.5d" % (_PREFIX, tag, shard_num, total_shards))
 
 
-def shuffle_records(fname):
-  """Shuffle records in a single file."""
+def shuffle_records(fname, max_shuffle_bytes=_MAX_SHUFFLE_BYTES):
+  """Shuffle records in a single file.
+
+  Files that are larger than max_shuffle_bytes are shuffled in two passes. The
+  first pass scatters the records into randomly chosen temporary bucket files,
+  each expected to fit in memory. The second pass shuffles each bucket in
+  memory and appends it to the output. Every permutation of the records is
+  equally likely in both cases.
+
+  Args:
+    fname: Path of the TFRecord file to shuffle in place.
+    max_shuffle_bytes: Approximate maximum number of bytes of records that are
+      held in memory at once.
+
+  Returns:
+    Number of records in the file.
+  """
   tf.logging.info("Shuffling records in file %s" % fname)
 
   # Rename file prior to shuffling
   tmp_fname = fname + ".unshuffled"
   tf.gfile.Rename(fname, tmp_fname)
 
-  reader = tf.python_io.tf_record_iterator(tmp_fname)
+  num_buckets = int(math.ceil(
+      tf.gfile.Stat(tmp_fname).length / float(max_shuffle_bytes)))
+  if num_buckets <= 1:
+    bucket_fnames = [tmp_fname]
+  else:
+    bucket_fnames = _scatter_records(tmp_fname, num_buckets)
+    tf.gfile.Remove(tmp_fname)
+
+  # Write shuffled records to original file name
+  count = 0
+  with tf.python_io.TFRecordWriter(fname) as w:
+    for bucket_fname in bucket_fnames:
+      records = _read_records(bucket_fname)
+      random.shuffle(records)
+      for record in records:
+        w.write(record)
+        count += 1
+        if count % 100000 == 0:
+          tf.logging.info("\tWriting record: %d" % count)
+      tf.gfile.Remove(bucket_fname)
+  return count
+
+
+def _scatter_records(fname, num_buckets):
+  """Write each record in the file to a random one of num_buckets files."""
+  bucket_fnames = ["%s.bucket-%.5d" % (fname, n) for n in range(num_buckets)]
+  writers = [tf.python_io.TFRecordWriter(f) for f in bucket_fnames]
+  for count, record in enumerate(tf.python_io.tf_record_iterator(fname)):
+    writers[random.randrange(num_buckets)].write(record)
+    if count > 0 and count % 100000 == 0:
+      tf.logging.info("\tScattered: %d", count)
+  for writer in writers:
+    writer.close()
+  return bucket_fnames
+
+
+def _read_records(fname):
+  """Return a list of all records in a TFRecord file."""
   records = []
-  for record in reader:
+  for record in tf.python_io.tf_record_iterator(fname):
     records.append(record)
     if len(records) % 100000 == 0:
       tf.logging.info("\tRead: %d", len(records))
+  return records
 
-  random.shuffle(records)
 
-  # Write shuffled records to original file name
-  with tf.python_io.TFRecordWriter(fname) as w:
-    for count, record in enumerate(records):
-      w.write(record)
-      if count > 0 and count % 100000 == 0:
-        tf.logging.info("\tWriting record: %d" % count)
+def shuffle_files(filepaths, num_workers=1):
+  """Shuffle the records in each of the files, shuffling files in parallel."""
+  start_time = time.time()
+  counts = _map(shuffle_records, filepaths, num_workers)
+  log_throughput("Shuffling", sum(counts), time.time() - start_time)
+
+
+def log_throughput(stage, num_records, elapsed_seconds):
+  """Log the number of records processed per second in a stage."""
+  tf.logging.info("%s: %d records in %.1f sec (%.1f records/sec)" % (
+      stage, num_records, elapsed_seconds,
+      num_records / max(elapsed_seconds, 1e-6)))
 
-  tf.gfile.Remove(tmp_fname)
+
+def _map(fn, iterable, num_workers):
+  """Map fn over iterable, using a process pool if num_workers > 1."""
+  if num_workers <= 1:
+    return [fn(x) for x in iterable]
+  pool = multiprocessing.Pool(num_workers)
+  try:
+    return pool.map(fn, iterable)
+  finally:
+    pool.close()
+    pool.join()
 
 
 def dict_to_example(dictionary):
@@ -378,7 +487,8 @@ def main(unused_argv):
   vocab_file = os.path.join(FLAGS.data_dir, VOCAB_FILE)
   subtokenizer = tokenizer.Subtokenizer.init_from_files(
       vocab_file, train_files_flat, _TARGET_VOCAB_SIZE, _TARGET_THRESHOLD,
-      min_count=None if FLAGS.search else _TRAIN_DATA_MIN_COUNT)
+      min_count=None if FLAGS.search else _TRAIN_DATA_MIN_COUNT,
+      num_workers=FLAGS.num_workers)
 
   tf.logging.info("Step 3/4: Compiling training and evaluation data")
   compiled_train_files = compile_files(FLAGS.raw_dir, train_files, _TRAIN_TAG)
@@ -388,13 +498,12 @@ def main(unused_argv):
   tf.logging.info("Step 4/4: Preprocessing and saving data")
   train_tfrecord_files = encode_and_save_files(
       subtokenizer, FLAGS.data_dir, compiled_train_files, _TRAIN_TAG,
-      _TRAIN_SHARDS)
+      _TRAIN_SHARDS, num_workers=FLAGS.num_workers)
   encode_and_save_files(
       subtokenizer, FLAGS.data_dir, compiled_eval_files, _EVAL_TAG,
-      _EVAL_SHARDS)
+      _EVAL_SHARDS, num_workers=FLAGS.num_workers)
 
-  for fname in train_tfrecord_files:
-    shuffle_records(fname)
+  shuffle_files(train_tfrecord_files, num_workers=FLAGS.num_workers)
 
 
 def define_data_download_flags():
@@ -412,6 +521,12 @@ def define_data_download_flags():
       help=flags_core.help_wrap(
           "If set, use binary search to find the vocabulary set with size"
           "closest to the target size (%d)." % _TARGET_VOCAB_SIZE))
+  flags.DEFINE_integer(
+      name="num_workers", short_name="nw", default=1,
+      help=flags_core.help_wrap(
+          "Number of processes used to generate the vocabulary, and to "
+          "encode and shuffle the data shards. If 1, all work is done in the "
+          "main process."))
 
 
 if __name__ == "__main__":
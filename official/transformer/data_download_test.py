@@ -0,0 +1,80 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Test encoding and shuffling functions in data_download.py."""
+
+import os
+import tempfile
+import unittest
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+from official.transformer import data_download
+from official.transformer.utils import tokenizer
+
+
+class DataDownloadTest(unittest.TestCase):
+
+  def _create_temp_file(self, lines):
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    with tf.gfile.Open(temp_file.name, "w") as w:
+      for line in lines:
+        w.write(line + "\n")
+    return temp_file.name
+
+  def _init_subtokenizer(self):
+    vocab_list = ["test", "ing_", "123_", "_"] + [str(i) for i in range(10)]
+    vocab_file = self._create_temp_file(["'%s'" % t for t in vocab_list])
+    return tokenizer.Subtokenizer(vocab_file, reserved_tokens=[])
+
+  def _read_all_records(self, filepaths):
+    return [[record for record in tf.python_io.tf_record_iterator(f)]
+            for f in filepaths]
+
+  def test_encode_and_save_files_parallel(self):
+    subtokenizer = self._init_subtokenizer()
+    lines = ["testing %d" % i for i in range(20)]
+    raw_files = (self._create_temp_file(lines),
+                 self._create_temp_file(list(reversed(lines))))
+
+    serial_dir = tempfile.mkdtemp()
+    parallel_dir = tempfile.mkdtemp()
+    serial_files = data_download.encode_and_save_files(
+        subtokenizer, serial_dir, raw_files, "test", 3)
+    parallel_files = data_download.encode_and_save_files(
+        subtokenizer, parallel_dir, raw_files, "test", 3, num_workers=2)
+
+    serial_records = self._read_all_records(serial_files)
+    self.assertEqual([7, 7, 6], [len(r) for r in serial_records])
+    self.assertEqual(serial_records, self._read_all_records(parallel_files))
+
+  def test_shuffle_records_in_buckets(self):
+    fname = os.path.join(tempfile.mkdtemp(), "records")
+    records = [("record %d" % i).encode("utf-8") for i in range(100)]
+    with tf.python_io.TFRecordWriter(fname) as w:
+      for record in records:
+        w.write(record)
+
+    # Use a small memory budget to force the two pass bucket shuffle.
+    count = data_download.shuffle_records(fname, max_shuffle_bytes=256)
+
+    self.assertEqual(100, count)
+    shuffled = self._read_all_records([fname])[0]
+    self.assertEqual(sorted(records), sorted(shuffled))
+    self.assertEqual([os.path.basename(fname)],
+                     os.listdir(os.path.dirname(fname)))
+
+
+if __name__ == "__main__":
+  unittest.main()
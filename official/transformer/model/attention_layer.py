@@ -83,7 +83,7 @@ class Attention(tf.layers.Layer):
       x = tf.transpose(x, [0, 2, 1, 3])  # --> [batch, length, num_heads, depth]
       return tf.reshape(x, [batch_size, length, self.hidden_size])
 
-  def call(self, x, y, bias, cache=None):
+  def call(self, x, y, bias, cache=None, decode_loop_step=None):
     """Apply attention mechanism to x and y.
 
     Args:
@@ -95,6 +95,10 @@ class Attention(tf.layers.Layer):
             {"k": tensor with shape [batch_size, i, key_channels],
              "v": tensor with shape [batch_size, i, value_channels]}
         where i is the current decoded length.
+      decode_loop_step: (Used during prediction with a fixed size cache) loop
+        index i. If set, the cache tensors have shape
+        [batch_size, max_decode_length, channels], and the new key and value
+        are written at position i instead of being appended.
 
     Returns:
       Attention layer output with shape [batch_size, length_x, hidden_size]
@@ -108,9 +112,18 @@ class Attention(tf.layers.Layer):
     v = self.v_dense_layer(y)
 
     if cache is not None:
-      # Combine cached keys and values with new keys and values.
-      k = tf.concat([cache["k"], k], axis=1)
-      v = tf.concat([cache["v"], v], axis=1)
+      if decode_loop_step is not None:
+        # Write the new keys and values into the preallocated position, which
+        # keeps the cache shape the same in every decoding step.
+        indices = tf.one_hot(
+            decode_loop_step, tf.shape(cache["k"])[1], dtype=k.dtype)
+        indices = tf.reshape(indices, [1, -1, 1])
+        k = cache["k"] + k * indices
+        v = cache["v"] + v * indices
+      else:
+        # Combine cached keys and values with new keys and values.
+        k = tf.concat([cache["k"], k], axis=1)
+        v = tf.concat([cache["v"], v], axis=1)
 
       # Update cache
       cache["k"] = k
@@ -144,5 +157,6 @@ class Attention(tf.layers.Layer):
 class SelfAttention(Attention):
   """Multiheaded self-attention layer."""
 
-  def call(self, x, bias, cache=None):
-    return super(SelfAttention, self).call(x, x, bias, cache)
+  def call(self, x, bias, cache=None, decode_loop_step=None):
+    return super(SelfAttention, self).call(
+        x, x, bias, cache, decode_loop_step=decode_loop_step)
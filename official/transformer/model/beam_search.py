@@ -34,7 +34,10 @@ class _StateKeys(object):
   # Top sequences that are alive for each batch item. Alive sequences are ones
   # that have not generated an EOS token. Sequences that reach EOS are marked as
   # finished and moved to the FINISHED_SEQ tensor.
-  # Has shape [batch_size, beam_size, CUR_INDEX + 1]
+  # Has shape [batch_size, beam_size, CUR_INDEX + 1], or
+  # [num_active, beam_size, max_decode_length + 1] when the state has a fixed
+  # size (ids after CUR_INDEX are then 0s). The other alive values also only
+  # hold the items in ACTIVE_BATCH_INDICES when the state has a fixed size.
   ALIVE_SEQ = "ALIVE_SEQ"
   # Log probabilities of each alive sequence. Shape [batch_size, beam_size]
   ALIVE_LOG_PROBS = "ALIVE_LOG_PROBS"
@@ -44,8 +47,8 @@ class _StateKeys(object):
   ALIVE_CACHE = "ALIVE_CACHE"
 
   # Top finished sequences for each batch item.
-  # Has shape [batch_size, beam_size, CUR_INDEX + 1]. Sequences that are
-  # shorter than CUR_INDEX + 1 are padded with 0s.
+  # Has shape [batch_size, beam_size, CUR_INDEX + 1] (or max_decode_length + 1
+  # with a fixed size state). Sequences that are shorter are padded with 0s.
   FINISHED_SEQ = "FINISHED_SEQ"
   # Scores for each finished sequence. Score = log probability / length norm
   # Shape [batch_size, beam_size]
@@ -55,12 +58,18 @@ class _StateKeys(object):
   # True -> finished sequence, False -> filler. Shape [batch_size, beam_size]
   FINISHED_FLAGS = "FINISHED_FLAGS"
 
+  # Only used with a fixed size state. Batch indices of the items in the alive
+  # state. Items are removed when their finished sequences can no longer
+  # change. Shape [num_active]
+  ACTIVE_BATCH_INDICES = "ACTIVE_BATCH_INDICES"
+
 
 class SequenceBeamSearch(object):
   """Implementation of beam search loop."""
 
   def __init__(self, symbols_to_logits_fn, vocab_size, batch_size,
-               beam_size, alpha, max_decode_length, eos_id):
+               beam_size, alpha, max_decode_length, eos_id,
+               static_cache_keys=None, fixed_size_state=False):
     self.symbols_to_logits_fn = symbols_to_logits_fn
     self.vocab_size = vocab_size
     self.batch_size = batch_size
@@ -68,6 +77,8 @@ class SequenceBeamSearch(object):
     self.alpha = alpha
     self.max_decode_length = max_decode_length
     self.eos_id = eos_id
+    self.static_cache_keys = frozenset(static_cache_keys or [])
+    self.fixed_size_state = fixed_size_state
 
   def search(self, initial_ids, initial_cache):
     """Beam search for sequences with highest scores."""
@@ -84,6 +95,16 @@ class SequenceBeamSearch(object):
     finished_scores = finished_state[_StateKeys.FINISHED_SCORES]
     finished_flags = finished_state[_StateKeys.FINISHED_FLAGS]
 
+    if self.fixed_size_state:
+      # Return the alive state to the whole batch. The items that were dropped
+      # have finished sequences, so their alive values are not used.
+      active_indices = tf.expand_dims(
+          finished_state[_StateKeys.ACTIVE_BATCH_INDICES], 1)
+      alive_seq = tf.scatter_nd(
+          active_indices, alive_seq, tf.shape(finished_seq))
+      alive_log_probs = tf.scatter_nd(
+          active_indices, alive_log_probs, tf.shape(finished_scores))
+
     # Account for corner case where there are no finished sequences for a
     # particular batch item. In that case, return alive sequences for that batch
     # item.
@@ -91,6 +112,12 @@ class SequenceBeamSearch(object):
         tf.reduce_any(finished_flags, 1), finished_seq, alive_seq)
     finished_scores = tf.where(
         tf.reduce_any(finished_flags, 1), finished_scores, alive_log_probs)
+
+    if self.fixed_size_state:
+      # Drop the unused end of the preallocated sequences, so that the output
+      # has the same length as when the sequences grow every step.
+      final_length = finished_state[_StateKeys.CUR_INDEX] + 1
+      finished_seq = finished_seq[:, :, :final_length]
     return finished_seq, finished_scores
 
   def _create_initial_state(self, initial_ids, initial_cache):
@@ -111,6 +138,10 @@ class SequenceBeamSearch(object):
     # Create alive sequence with shape [batch_size, beam_size, 1]
     alive_seq = _expand_to_beam_size(initial_ids, self.beam_size)
     alive_seq = tf.expand_dims(alive_seq, axis=2)
+    if self.fixed_size_state:
+      # Preallocate ids for the whole decode length.
+      alive_seq = tf.pad(
+          alive_seq, [[0, 0], [0, 0], [0, self.max_decode_length]])
 
     # Create tensor for storing initial log probabilities.
     # Assume initial_ids are prob 1.0
@@ -159,6 +190,11 @@ class SequenceBeamSearch(object):
         _StateKeys.FINISHED_FLAGS: tf.TensorShape([None, self.beam_size])
     }
 
+    if self.fixed_size_state:
+      state[_StateKeys.ACTIVE_BATCH_INDICES] = tf.range(self.batch_size)
+      state_shape_invariants[_StateKeys.ACTIVE_BATCH_INDICES] = (
+          tf.TensorShape([None]))
+
     return state, state_shape_invariants
 
   def _continue_search(self, state):
@@ -182,6 +218,13 @@ class SequenceBeamSearch(object):
     finished_scores = state[_StateKeys.FINISHED_SCORES]
     finished_flags = state[_StateKeys.FINISHED_FLAGS]
 
+    if self.fixed_size_state:
+      # Batch items that are not in the alive state have final finished
+      # sequences. The loop ends when no items are left.
+      active_indices = state[_StateKeys.ACTIVE_BATCH_INDICES]
+      finished_scores = tf.gather(finished_scores, active_indices)
+      finished_flags = tf.gather(finished_flags, active_indices)
+
     not_at_max_decode_length = tf.less(i, self.max_decode_length)
 
     # Calculate largest length penalty (the larger penalty, the better score).
@@ -224,54 +267,177 @@ class SequenceBeamSearch(object):
     Returns:
       new state dictionary.
     """
+    if self.fixed_size_state:
+      return [self._fixed_size_search_step(state)]
+
+    # Increment loop index and create new state dictionary
+    i = state[_StateKeys.CUR_INDEX]
+    new_state = {_StateKeys.CUR_INDEX: i + 1}
+    new_state.update(self._batch_search_step(i, state))
+    return [new_state]
+
+  def _batch_search_step(self, i, state):
+    """Grow the alive sequences, and update the alive and finished state.
+
+    Args:
+      i: Loop index.
+      state: A dictionary with the alive and finished state. The batch size is
+        taken from the tensors in the state.
+
+    Returns:
+      Dictionary with the new alive and finished state.
+    """
     # Grow alive sequences by one token.
-    new_seq, new_log_probs, new_cache = self._grow_alive_seq(state)
+    new_seq, new_ids, new_log_probs, topk_beam_indices, new_cache = (
+        self._grow_alive_seq(i, state))
     # Collect top beam_size alive sequences
-    alive_state = self._get_new_alive_state(new_seq, new_log_probs, new_cache)
+    alive_state = self._get_new_alive_state(
+        new_seq, new_ids, new_log_probs, topk_beam_indices, new_cache)
 
     # Combine newly finished sequences with existing finished sequences, and
     # collect the top k scoring sequences.
-    finished_state = self._get_new_finished_state(state, new_seq, new_log_probs)
+    finished_state = self._get_new_finished_state(
+        i, state, new_seq, new_ids, new_log_probs)
 
-    # Increment loop index and create new state dictionary
-    new_state = {_StateKeys.CUR_INDEX: state[_StateKeys.CUR_INDEX] + 1}
+    new_state = {}
     new_state.update(alive_state)
     new_state.update(finished_state)
-    return [new_state]
+    return new_state
+
+  def _fixed_size_search_step(self, state):
+    """Beam search loop body for the fixed size state.
+
+    The alive state only holds the batch items listed in ACTIVE_BATCH_INDICES.
+    Once the finished sequences of a batch item are final, the item is dropped
+    from the alive state (including its cache), so it is not decoded further.
+
+    Args:
+      state: A dictionary with the current loop state.
+
+    Returns:
+      new state dictionary.
+    """
+    i = state[_StateKeys.CUR_INDEX]
+    active_indices = state[_StateKeys.ACTIVE_BATCH_INDICES]
+    finished_keys = [_StateKeys.FINISHED_SEQ, _StateKeys.FINISHED_SCORES,
+                     _StateKeys.FINISHED_FLAGS]
+
+    # Run the step on the active batch items, and write their new finished
+    # state back to the finished state of the whole batch.
+    active_state = dict(state)
+    for key in finished_keys:
+      active_state[key] = tf.gather(state[key], active_indices)
+    new_active_state = self._batch_search_step(i, active_state)
+
+    new_state = {_StateKeys.CUR_INDEX: i + 1}
+    batch_indices = tf.range(tf.shape(state[_StateKeys.FINISHED_SCORES])[0])
+    for key in finished_keys:
+      new_state[key] = tf.dynamic_stitch(
+          [batch_indices, active_indices], [state[key], new_active_state[key]])
+
+    alive_keys = [_StateKeys.ALIVE_SEQ, _StateKeys.ALIVE_LOG_PROBS,
+                  _StateKeys.ALIVE_CACHE]
+    alive_state = {key: new_active_state[key] for key in alive_keys}
+    alive_state[_StateKeys.ACTIVE_BATCH_INDICES] = active_indices
+    done = self._batch_items_done(new_active_state)
+
+    def drop_done_batch_items():
+      keep = tf.to_int32(tf.where(tf.logical_not(done))[:, 0])
+      return nest.map_structure(lambda t: tf.gather(t, keep), alive_state)
+
+    new_state.update(tf.cond(
+        tf.reduce_any(done), drop_done_batch_items, lambda: alive_state))
+    return new_state
+
+  def _batch_items_done(self, state):
+    """Return whether the finished sequences of each batch item are final.
+
+    The finished sequences of a batch item can no longer change once all of
+    them are real (not filler) sequences, and the worst finished score is
+    better than the best score any alive sequence can reach.
 
-  def _grow_alive_seq(self, state):
+    Args:
+      state: A dictionary with the current loop state.
+
+    Returns:
+      bool tensor with shape [batch_size].
+    """
+    alive_log_probs = state[_StateKeys.ALIVE_LOG_PROBS]
+    finished_scores = state[_StateKeys.FINISHED_SCORES]
+    finished_flags = state[_StateKeys.FINISHED_FLAGS]
+
+    max_length_norm = _length_normalization(self.alpha, self.max_decode_length)
+    best_alive_scores = alive_log_probs[:, 0] / max_length_norm
+    lowest_finished_scores = tf.reduce_min(finished_scores, axis=1)
+    return tf.logical_and(
+        tf.reduce_all(finished_flags, 1),
+        tf.greater(lowest_finished_scores, best_alive_scores))
+
+  def _map_dynamic_cache(self, fn, *caches):
+    """Apply fn to the cache values that are not static.
+
+    Values under the static_cache_keys are the same for all beams of a batch
+    item and are never updated, so gathering beams from them is a no-op. They
+    are taken from the first cache unchanged.
+
+    Args:
+      fn: Function applied to the corresponding tensors of each cache.
+      *caches: Cache dictionaries with the same structure.
+
+    Returns:
+      Cache dictionary with the results of fn.
+    """
+    new_cache = {}
+    for key in caches[0]:
+      if key in self.static_cache_keys:
+        new_cache[key] = caches[0][key]
+      else:
+        new_cache[key] = nest.map_structure(fn, *[c[key] for c in caches])
+    return new_cache
+
+  def _grow_alive_seq(self, i, state):
     """Grow alive sequences by one token, and collect top 2*beam_size sequences.
 
     2*beam_size sequences are collected because some sequences may have reached
     the EOS token. 2*beam_size ensures that at least beam_size sequences are
     still alive.
 
+    The cache is not gathered here. Only the beam_size sequences that stay alive
+    need their cache, so _get_new_alive_state gathers it once using the
+    returned beam indices.
+
     Args:
+      i: Loop index.
       state: A dictionary with the current loop state.
     Returns:
       Tuple of
-      (Top 2*beam_size sequences [batch_size, 2 * beam_size, cur_index + 1],
+      (Top 2*beam_size sequences [batch_size, 2 * beam_size, cur_index + 2],
+       Last ids of the sequences [batch_size, 2 * beam_size],
        Scores of returned sequences [batch_size, 2 * beam_size],
-       New alive cache, for each of the 2 * beam_size sequences)
+       Alive beam that each sequence was grown from [batch_size, 2 * beam_size],
+       New cache of the current alive sequences)
     """
-    i = state[_StateKeys.CUR_INDEX]
     alive_seq = state[_StateKeys.ALIVE_SEQ]
     alive_log_probs = state[_StateKeys.ALIVE_LOG_PROBS]
     alive_cache = state[_StateKeys.ALIVE_CACHE]
+    batch_size = tf.shape(alive_log_probs)[0]
 
     beams_to_keep = 2 * self.beam_size
 
     # Get logits for the next candidate IDs for the alive sequences. Get the new
     # cache values at the same time.
-    flat_ids = _flatten_beam_dim(alive_seq)  # [batch_size * beam_size]
+    if self.fixed_size_state:
+      flat_ids = _flatten_beam_dim(alive_seq[:, :, :i + 1])
+    else:
+      flat_ids = _flatten_beam_dim(alive_seq)  # [batch_size * beam_size]
     flat_cache = nest.map_structure(_flatten_beam_dim, alive_cache)
 
     flat_logits, flat_cache = self.symbols_to_logits_fn(flat_ids, i, flat_cache)
 
     # Unflatten logits to shape [batch_size, beam_size, vocab_size]
-    logits = _unflatten_beam_dim(flat_logits, self.batch_size, self.beam_size)
+    logits = _unflatten_beam_dim(flat_logits, batch_size, self.beam_size)
     new_cache = nest.map_structure(
-        lambda t: _unflatten_beam_dim(t, self.batch_size, self.beam_size),
+        lambda t: _unflatten_beam_dim(t, batch_size, self.beam_size),
         flat_cache)
 
     # Convert logits to normalized log probs
@@ -291,25 +457,34 @@ class SequenceBeamSearch(object):
     # Extract the alive sequences that generate the highest log probabilities
     # after being extended.
     topk_beam_indices = topk_indices // self.vocab_size
-    topk_seq, new_cache = _gather_beams(
-        [alive_seq, new_cache], topk_beam_indices, self.batch_size,
-        beams_to_keep)
+    topk_seq = _gather_beams(
+        alive_seq, topk_beam_indices, batch_size, beams_to_keep)
 
     # Append the most probable IDs to the topk sequences
     topk_ids = topk_indices % self.vocab_size
-    topk_ids = tf.expand_dims(topk_ids, axis=2)
-    topk_seq = tf.concat([topk_seq, topk_ids], axis=2)
-    return topk_seq, topk_log_probs, new_cache
-
-  def _get_new_alive_state(self, new_seq, new_log_probs, new_cache):
+    if self.fixed_size_state:
+      # Write the IDs into the preallocated column, which is all 0s.
+      new_column = tf.one_hot(
+          i + 1, tf.shape(topk_seq)[2], dtype=tf.int32)
+      topk_seq += tf.expand_dims(topk_ids, axis=2) * new_column
+    else:
+      topk_seq = tf.concat([topk_seq, tf.expand_dims(topk_ids, axis=2)], axis=2)
+    return topk_seq, topk_ids, topk_log_probs, topk_beam_indices, new_cache
+
+  def _get_new_alive_state(self, new_seq, new_ids, new_log_probs,
+                           new_beam_indices, cache):
     """Gather the top k sequences that are still alive.
 
     Args:
       new_seq: New sequences generated by growing the current alive sequences
-        int32 tensor with shape [batch_size, 2 * beam_size, cur_index + 1]
+        int32 tensor with shape [batch_size, 2 * beam_size, cur_index + 2]
+      new_ids: Last ids of the new sequences
+        int32 tensor with shape [batch_size, 2 * beam_size]
       new_log_probs: Log probabilities of new sequences
-        float32 tensor with shape [batch_size, beam_size]
-      new_cache: Dict of cached values for each sequence.
+        float32 tensor with shape [batch_size, 2 * beam_size]
+      new_beam_indices: Index of the alive beam each new sequence was grown from
+        int32 tensor with shape [batch_size, 2 * beam_size]
+      cache: Dict of cached values for each of the current alive sequences.
 
     Returns:
       Dictionary with alive keys from _StateKeys:
@@ -317,29 +492,42 @@ class SequenceBeamSearch(object):
          Log probabilities of top alive sequences
          Dict cache storing decoder states for top alive sequences}
     """
+    batch_size = tf.shape(new_log_probs)[0]
+
     # To prevent finished sequences from being considered, set log probs to -INF
-    new_finished_flags = tf.equal(new_seq[:, :, -1], self.eos_id)
+    new_finished_flags = tf.equal(new_ids, self.eos_id)
     new_log_probs += tf.to_float(new_finished_flags) * -INF
 
-    top_alive_seq, top_alive_log_probs, top_alive_cache = _gather_topk_beams(
-        [new_seq, new_log_probs, new_cache], new_log_probs, self.batch_size,
+    _, topk_indexes = tf.nn.top_k(new_log_probs, k=self.beam_size)
+    top_alive_seq, top_alive_log_probs, top_alive_beam_indices = _gather_beams(
+        [new_seq, new_log_probs, new_beam_indices], topk_indexes, batch_size,
         self.beam_size)
 
+    # Gather the cache of the surviving sequences from the current alive beams
+    # in a single step.
+    top_alive_cache = self._map_dynamic_cache(
+        lambda t: _gather_beams(
+            t, top_alive_beam_indices, batch_size, self.beam_size),
+        cache)
+
     return {
         _StateKeys.ALIVE_SEQ: top_alive_seq,
         _StateKeys.ALIVE_LOG_PROBS: top_alive_log_probs,
         _StateKeys.ALIVE_CACHE: top_alive_cache
     }
 
-  def _get_new_finished_state(self, state, new_seq, new_log_probs):
+  def _get_new_finished_state(self, i, state, new_seq, new_ids, new_log_probs):
     """Combine new and old finished sequences, and gather the top k sequences.
 
     Args:
+      i: Loop index.
       state: A dictionary with the current loop state.
       new_seq: New sequences generated by growing the current alive sequences
-        int32 tensor with shape [batch_size, beam_size, i + 1]
+        int32 tensor with shape [batch_size, 2 * beam_size, i + 2]
+      new_ids: Last ids of the new sequences
+        int32 tensor with shape [batch_size, 2 * beam_size]
       new_log_probs: Log probabilities of new sequences
-        float32 tensor with shape [batch_size, beam_size]
+        float32 tensor with shape [batch_size, 2 * beam_size]
 
     Returns:
       Dictionary with finished keys from _StateKeys:
@@ -347,23 +535,24 @@ class SequenceBeamSearch(object):
          Scores of finished sequences,
          Finished flags of finished sequences}
     """
-    i = state[_StateKeys.CUR_INDEX]
     finished_seq = state[_StateKeys.FINISHED_SEQ]
     finished_scores = state[_StateKeys.FINISHED_SCORES]
     finished_flags = state[_StateKeys.FINISHED_FLAGS]
+    batch_size = tf.shape(finished_scores)[0]
 
-    # First append a column of 0-ids to finished_seq to increment the length.
-    # New shape of finished_seq: [batch_size, beam_size, i + 1]
-    finished_seq = tf.concat(
-        [finished_seq,
-         tf.zeros([self.batch_size, self.beam_size, 1], tf.int32)], axis=2)
+    if not self.fixed_size_state:
+      # First append a column of 0-ids to finished_seq to increment the length.
+      # New shape of finished_seq: [batch_size, beam_size, i + 2]
+      finished_seq = tf.concat(
+          [finished_seq,
+           tf.zeros([batch_size, self.beam_size, 1], tf.int32)], axis=2)
 
     # Calculate new seq scores from log probabilities.
     length_norm = _length_normalization(self.alpha, i + 1)
     new_scores = new_log_probs / length_norm
 
     # Set the scores of the still-alive seq in new_seq to large negative values.
-    new_finished_flags = tf.equal(new_seq[:, :, -1], self.eos_id)
+    new_finished_flags = tf.equal(new_ids, self.eos_id)
     new_scores += (1. - tf.to_float(new_finished_flags)) * -INF
 
     # Combine sequences, scores, and flags.
@@ -374,7 +563,7 @@ class SequenceBeamSearch(object):
     # Return the finished sequences with the best scores.
     top_finished_seq, top_finished_scores, top_finished_flags = (
         _gather_topk_beams([finished_seq, finished_scores, finished_flags],
-                           finished_scores, self.batch_size, self.beam_size))
+                           finished_scores, batch_size, self.beam_size))
 
     return {
         _StateKeys.FINISHED_SEQ: top_finished_seq,
@@ -385,7 +574,8 @@ class SequenceBeamSearch(object):
 
 def sequence_beam_search(
     symbols_to_logits_fn, initial_ids, initial_cache, vocab_size, beam_size,
-    alpha, max_decode_length, eos_id):
+    alpha, max_decode_length, eos_id, static_cache_keys=None,
+    fixed_size_state=False):
   """Search for sequence of subtoken ids with the largest probability.
 
   Args:
@@ -405,6 +595,13 @@ def sequence_beam_search(
     alpha: float defining the strength of length normalization
     max_decode_length: maximum length to decoded sequence
     eos_id: int id of eos token, used to determine when a sequence has finished
+    static_cache_keys: Optional list of top-level keys of initial_cache whose
+      values are never updated by symbols_to_logits_fn (e.g. encoder outputs).
+      These values are not gathered when beams are reordered.
+    fixed_size_state: If true, sequences are preallocated to max_decode_length,
+      and symbols_to_logits_fn must return cache tensors with the same shape
+      as its input (e.g. fixed size buffers written at the loop index). Batch
+      items whose results can no longer change are skipped by later steps.
 
   Returns:
     Top decoded sequences [batch_size, beam_size, max_decode_length]
@@ -412,7 +609,9 @@ def sequence_beam_search(
   """
   batch_size = tf.shape(initial_ids)[0]
   sbs = SequenceBeamSearch(symbols_to_logits_fn, vocab_size, batch_size,
-                           beam_size, alpha, max_decode_length, eos_id)
+                           beam_size, alpha, max_decode_length, eos_id,
+                           static_cache_keys=static_cache_keys,
+                           fixed_size_state=fixed_size_state)
   return sbs.search(initial_ids, initial_cache)
 
 
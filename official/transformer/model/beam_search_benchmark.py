@@ -0,0 +1,235 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark the growing and fixed size beam search decoder states.
+
+The decoder is a small stack of single head self-attention and feed-forward
+layers with random weights, which caches keys and values the same way as the
+Transformer. Each mode runs in its own process, so that the peak memory is
+measured separately.
+
+Example:
+  python beam_search_benchmark.py --batch_size=32 --max_decode_length=100
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import resource
+import time
+
+# pylint: disable=g-bad-import-order
+from absl import app as absl_app
+from absl import flags
+import numpy as np
+import tensorflow as tf
+# pylint: enable=g-bad-import-order
+
+from official.transformer.model import beam_search
+from official.transformer.model import model_utils
+from official.utils.flags import core as flags_core
+
+_EOS_ID = 1
+
+
+def _get_toy_decoder(config, fixed_size_state):
+  """Returns symbols_to_logits_fn and initial cache of a random decoder."""
+  rng = np.random.RandomState(0)
+  batch_size = config["batch_size"]
+  hidden_size = config["hidden_size"]
+  vocab_size = config["vocab_size"]
+  max_decode_length = config["max_decode_length"]
+
+  embedding = tf.constant(
+      rng.randn(vocab_size, hidden_size).astype(np.float32))
+  def random_weights(input_size, output_size):
+    return tf.constant(
+        (rng.randn(input_size, output_size) /
+         np.sqrt(input_size)).astype(np.float32))
+  layer_weights = [
+      [random_weights(hidden_size, hidden_size) for _ in range(3)] +
+      [random_weights(hidden_size, 4 * hidden_size),
+       random_weights(4 * hidden_size, hidden_size)]
+      for _ in range(config["num_layers"])]
+  # Make each batch item more likely to end at a different length.
+  eos_rates = tf.constant(
+      rng.uniform(0.05, 3.0, size=[batch_size, 1]).astype(np.float32))
+  self_attention_bias = model_utils.get_decoder_self_attention_bias(
+      max_decode_length)
+
+  def symbols_to_logits_fn(ids, i, cache):
+    """Run one step of the toy decoder."""
+    x = tf.gather(embedding, ids[:, -1])
+    if fixed_size_state:
+      bias = self_attention_bias[0, 0, i, :]
+      position = tf.reshape(
+          tf.one_hot(i, max_decode_length), [1, max_decode_length, 1])
+    else:
+      bias = self_attention_bias[0, 0, i, :i + 1]
+    for n, (wq, wk, wv, w_filter, w_output) in enumerate(layer_weights):
+      layer_cache = cache["layer_%d" % n]
+      k = tf.expand_dims(tf.matmul(x, wk), 1)
+      v = tf.expand_dims(tf.matmul(x, wv), 1)
+      if fixed_size_state:
+        k = layer_cache["k"] + k * position
+        v = layer_cache["v"] + v * position
+      else:
+        k = tf.concat([layer_cache["k"], k], axis=1)
+        v = tf.concat([layer_cache["v"], v], axis=1)
+      layer_cache["k"], layer_cache["v"] = k, v
+      q = tf.matmul(x, wq) * hidden_size ** -0.5
+      weights = tf.nn.softmax(tf.einsum("bh,blh->bl", q, k) + bias)
+      x = tf.tanh(x + tf.einsum("bl,blh->bh", weights, v))
+      x = tf.tanh(x + tf.matmul(tf.nn.relu(tf.matmul(x, w_filter)), w_output))
+    logits = tf.matmul(x, embedding, transpose_b=True)
+    logits += (tf.to_float(i) * cache["eos_rates"] *
+               tf.one_hot(_EOS_ID, vocab_size))
+    return logits, cache
+
+  cache_length = max_decode_length if fixed_size_state else 0
+  cache = {
+      "layer_%d" % n: {
+          "k": tf.zeros([batch_size, cache_length, hidden_size]),
+          "v": tf.zeros([batch_size, cache_length, hidden_size]),
+      } for n in range(config["num_layers"])}
+  cache["eos_rates"] = eos_rates
+  return symbols_to_logits_fn, cache
+
+
+def _run_mode(config, fixed_size_state):
+  """Time the beam search in this process.
+
+  Args:
+    config: Dictionary with the benchmark settings.
+    fixed_size_state: Whether to use the fixed size decoder state.
+
+  Returns:
+    Dictionary with the decoded ids, the average number of decoding steps and
+    seconds per run, and the growth of the peak RSS in kilobytes.
+  """
+  start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  with tf.Graph().as_default():
+    symbols_to_logits_fn, cache = _get_toy_decoder(config, fixed_size_state)
+    static_cache_keys = ["eos_rates"] if fixed_size_state else None
+    decoded_ids, _ = beam_search.sequence_beam_search(
+        symbols_to_logits_fn=symbols_to_logits_fn,
+        initial_ids=tf.zeros([config["batch_size"]], tf.int32),
+        initial_cache=cache, vocab_size=config["vocab_size"],
+        beam_size=config["beam_size"], alpha=0.6,
+        max_decode_length=config["max_decode_length"], eos_id=_EOS_ID,
+        static_cache_keys=static_cache_keys,
+        fixed_size_state=fixed_size_state)
+    with tf.Session() as sess:
+      ids = sess.run(decoded_ids)  # Warm up.
+      start = time.time()
+      for _ in range(config["num_runs"]):
+        sess.run(decoded_ids)
+      secs = (time.time() - start) / config["num_runs"]
+  return {
+      "ids": ids,
+      "steps": ids.shape[2] - 1,
+      "sec_per_run": secs,
+      "peak_rss_kb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss -
+                      start_rss),
+  }
+
+
+def _run_mode_in_subprocess(args):
+  return _run_mode(*args)
+
+
+def run_benchmark(config):
+  """Benchmark both decoder states and check that they decode the same ids.
+
+  Args:
+    config: Dictionary with the keys batch_size, beam_size, hidden_size,
+      num_layers, vocab_size, max_decode_length and num_runs.
+
+  Returns:
+    Dictionary mapping "growing" and "fixed_size" to the results of each mode.
+
+  Raises:
+    ValueError: if the modes decode different ids.
+  """
+  results = {}
+  for name, fixed_size_state in [("growing", False), ("fixed_size", True)]:
+    pool = multiprocessing.Pool(1)
+    try:
+      results[name] = pool.apply(
+          _run_mode_in_subprocess, ((config, fixed_size_state),))
+    finally:
+      pool.close()
+      pool.join()
+
+  if not np.array_equal(results["growing"]["ids"],
+                        results["fixed_size"]["ids"]):
+    raise ValueError("The fixed size decoder state decoded different ids.")
+  return results
+
+
+def main(unused_argv):
+  config = {
+      "batch_size": FLAGS.batch_size,
+      "beam_size": FLAGS.beam_size,
+      "hidden_size": FLAGS.hidden_size,
+      "num_layers": FLAGS.num_layers,
+      "vocab_size": FLAGS.vocab_size,
+      "max_decode_length": FLAGS.max_decode_length,
+      "num_runs": FLAGS.num_runs,
+  }
+  results = run_benchmark(config)
+  for name in ["growing", "fixed_size"]:
+    result = results[name]
+    tf.logging.info(
+        "%-10s: %d steps, %.2f ms/step, %.3f sec/run, peak RSS +%.1f MB" %
+        (name, result["steps"],
+         1000 * result["sec_per_run"] / max(result["steps"], 1),
+         result["sec_per_run"], result["peak_rss_kb"] / 1024.))
+  tf.logging.info("Decoded ids are identical. Speedup: %.2fx" % (
+      results["growing"]["sec_per_run"] /
+      max(results["fixed_size"]["sec_per_run"], 1e-9)))
+
+
+def define_beam_search_benchmark_flags():
+  """Add flags for benchmarking beam search."""
+  flags.DEFINE_integer(
+      name="batch_size", short_name="bs", default=16,
+      help=flags_core.help_wrap("Number of sequences decoded together."))
+  flags.DEFINE_integer(
+      name="beam_size", short_name="beam", default=4,
+      help=flags_core.help_wrap("Beam size."))
+  flags.DEFINE_integer(
+      name="hidden_size", short_name="hs", default=256,
+      help=flags_core.help_wrap("Hidden size of the toy decoder."))
+  flags.DEFINE_integer(
+      name="num_layers", short_name="nl", default=6,
+      help=flags_core.help_wrap("Number of layers in the toy decoder."))
+  flags.DEFINE_integer(
+      name="vocab_size", short_name="vs", default=8192,
+      help=flags_core.help_wrap("Vocabulary size of the toy decoder."))
+  flags.DEFINE_integer(
+      name="max_decode_length", short_name="mdl", default=64,
+      help=flags_core.help_wrap("Maximum number of decoding steps."))
+  flags.DEFINE_integer(
+      name="num_runs", short_name="nr", default=5,
+      help=flags_core.help_wrap("Number of timed runs of each mode."))
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  define_beam_search_benchmark_flags()
+  FLAGS = flags.FLAGS
+  absl_app.run(main)
@@ -18,6 +18,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
 import tensorflow as tf  # pylint: disable=g-bad-import-order
 
 from official.transformer.model import beam_search
@@ -97,5 +98,57 @@ class BeamSearchHelperTests(tf.test.TestCase):
                         y)
 
 
+class SequenceBeamSearchTest(tf.test.TestCase):
+
+  def _get_symbols_to_logits_fn(self, vocab_size, eos_id, fixed_size_state):
+    """Returns a decoder with a growing or fixed size history in its cache."""
+    weights = tf.constant(
+        np.random.RandomState(0).randn(vocab_size, vocab_size), tf.float32)
+    def symbols_to_logits_fn(ids, i, cache):
+      new_ids = tf.one_hot(ids[:, -1], vocab_size)
+      if fixed_size_state:
+        position = tf.one_hot(i, tf.shape(cache["history"])[1])
+        cache["history"] += (tf.expand_dims(new_ids, 1) *
+                             tf.reshape(position, [1, -1, 1]))
+      else:
+        cache["history"] = tf.concat(
+            [cache["history"], tf.expand_dims(new_ids, 1)], axis=1)
+      logits = tf.matmul(tf.reduce_sum(cache["history"], 1), weights)
+      logits += (cache["eos_bias"] * tf.to_float(i) - 5.) * tf.one_hot(
+          eos_id, vocab_size)
+      return logits, cache
+    return symbols_to_logits_fn
+
+  def _search(self, fixed_size_state, static_cache_keys=None):
+    batch_size, vocab_size, max_decode_length, eos_id = 5, 6, 10, 1
+    history_length = max_decode_length if fixed_size_state else 0
+    cache = {
+        "history": tf.zeros([batch_size, history_length, vocab_size]),
+        # Batch items end at different lengths.
+        "eos_bias": tf.constant([[0.1], [3.], [0.5], [10.], [1.]]),
+    }
+    ids, scores = beam_search.sequence_beam_search(
+        self._get_symbols_to_logits_fn(vocab_size, eos_id, fixed_size_state),
+        tf.zeros([batch_size], tf.int32), cache, vocab_size, beam_size=3,
+        alpha=0.6, max_decode_length=max_decode_length, eos_id=eos_id,
+        static_cache_keys=static_cache_keys, fixed_size_state=fixed_size_state)
+    with self.test_session() as sess:
+      return sess.run([ids, scores])
+
+  def test_static_cache_keys(self):
+    ids, scores = self._search(fixed_size_state=False)
+    static_ids, static_scores = self._search(
+        fixed_size_state=False, static_cache_keys=["eos_bias"])
+    self.assertAllEqual(ids, static_ids)
+    self.assertAllClose(scores, static_scores)
+
+  def test_fixed_size_state(self):
+    ids, scores = self._search(fixed_size_state=False)
+    fixed_ids, fixed_scores = self._search(
+        fixed_size_state=True, static_cache_keys=["eos_bias"])
+    self.assertAllEqual(ids, fixed_ids)
+    self.assertAllClose(scores, fixed_scores)
+
+
 if __name__ == "__main__":
   tf.test.main()
@@ -49,6 +49,9 @@ class TransformerBaseParams(object):
   extra_decode_length = 50
   beam_size = 4
   alpha = 0.6  # used to calculate length normalization in beam search
+  # Preallocate the decoder cache to the maximum decode length, and stop
+  # decoding batch items whose beam search results are final.
+  fixed_size_decode_cache = False
 
 
 class TransformerBigParams(TransformerBaseParams):
@@ -193,10 +193,18 @@ class Transformer(object):
       decoder_input = self.embedding_softmax_layer(decoder_input)
       decoder_input += timing_signal[i:i + 1]
 
-      self_attention_bias = decoder_self_attention_bias[:, :, i:i + 1, :i + 1]
+      if self.params.fixed_size_decode_cache:
+        # Attend over the whole preallocated cache. Positions after i are
+        # masked by the bias.
+        self_attention_bias = decoder_self_attention_bias[:, :, i:i + 1, :]
+        decode_loop_step = i
+      else:
+        self_attention_bias = decoder_self_attention_bias[:, :, i:i + 1, :i + 1]
+        decode_loop_step = None
       decoder_outputs = self.decoder_stack(
           decoder_input, cache.get("encoder_outputs"), self_attention_bias,
-          cache.get("encoder_decoder_attention_bias"), cache)
+          cache.get("encoder_decoder_attention_bias"), cache,
+          decode_loop_step=decode_loop_step)
       logits = self.embedding_softmax_layer.linear(decoder_outputs)
       logits = tf.squeeze(logits, axis=[1])
       return logits, cache
@@ -213,11 +221,14 @@ class Transformer(object):
     # Create initial set of IDs that will be passed into symbols_to_logits_fn.
     initial_ids = tf.zeros([batch_size], dtype=tf.int32)
 
-    # Create cache storing decoder attention values for each layer.
+    # Create cache storing decoder attention values for each layer. The fixed
+    # size cache is preallocated to the maximum decode length.
+    cache_length = (max_decode_length if self.params.fixed_size_decode_cache
+                    else 0)
     cache = {
         "layer_%d" % layer: {
-            "k": tf.zeros([batch_size, 0, self.params.hidden_size]),
-            "v": tf.zeros([batch_size, 0, self.params.hidden_size]),
+            "k": tf.zeros([batch_size, cache_length, self.params.hidden_size]),
+            "v": tf.zeros([batch_size, cache_length, self.params.hidden_size]),
         } for layer in range(self.params.num_hidden_layers)}
 
     # Add encoder output and attention bias to the cache.
@@ -233,7 +244,9 @@ class Transformer(object):
         beam_size=self.params.beam_size,
         alpha=self.params.alpha,
         max_decode_length=max_decode_length,
-        eos_id=EOS_ID)
+        eos_id=EOS_ID,
+        static_cache_keys=["encoder_outputs", "encoder_decoder_attention_bias"],
+        fixed_size_state=self.params.fixed_size_decode_cache)
 
     # Get the top sequence for each batch element
     top_decoded_ids = decoded_ids[:, 0, 1:]
@@ -370,7 +383,7 @@ class DecoderStack(tf.layers.Layer):
     self.output_normalization = LayerNormalization(params.hidden_size)
 
   def call(self, decoder_inputs, encoder_outputs, decoder_self_attention_bias,
-           attention_bias, cache=None):
+           attention_bias, cache=None, decode_loop_step=None):
     """Return the output of the decoder layer stacks.
 
     Args:
@@ -385,6 +398,8 @@ class DecoderStack(tf.layers.Layer):
           {layer_n: {"k": tensor with shape [batch_size, i, key_channels],
                      "v": tensor with shape [batch_size, i, value_channels]},
            ...}
+      decode_loop_step: (Used for fast decoding with a fixed size cache) loop
+        index at which the new self-attention keys and values are written.
 
     Returns:
       Output of decoder layer stack.
@@ -401,7 +416,8 @@ class DecoderStack(tf.layers.Layer):
       with tf.variable_scope(layer_name):
         with tf.variable_scope("self_attention"):
           decoder_inputs = self_attention_layer(
-              decoder_inputs, decoder_self_attention_bias, cache=layer_cache)
+              decoder_inputs, decoder_self_attention_bias, cache=layer_cache,
+              decode_loop_step=decode_loop_step)
         with tf.variable_scope("encdec_attention"):
           decoder_inputs = enc_dec_attention_layer(
               decoder_inputs, encoder_outputs, attention_bias)
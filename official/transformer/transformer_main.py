@@ -340,6 +340,15 @@ def define_transformer_flags():
           "default batch size, embedding/hidden size, and filter size. For a "
           "complete list of parameters, please see model/model_params.py."))
 
+  flags.DEFINE_integer(
+      name="num_length_buckets", short_name="nlb", default=0,
+      help=flags_core.help_wrap(
+          "If positive, examples are batched with this many length buckets "
+          "fitted to the length histogram of the data, instead of the default "
+          "geometric buckets. The histogram is computed on the first run and "
+          "saved to the --data_dir. See bucket_stats.py to compare the "
+          "padding of both."))
+
   # Flags for training with steps (may be used for debugging)
   flags.DEFINE_integer(
       name="train_steps", short_name="ts", default=None,
@@ -426,6 +435,7 @@ def run_transformer(flags_obj):
   params.epochs_between_evals = flags_obj.epochs_between_evals
   params.repeat_dataset = single_iteration_train_epochs
   params.batch_size = flags_obj.batch_size or params.batch_size
+  params.num_length_buckets = flags_obj.num_length_buckets
 
   # Create hooks that log information about the training and metric values
   train_hooks = hooks_helper.get_train_hooks(
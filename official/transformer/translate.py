@@ -18,9 +18,12 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import json
 import os
 
 # pylint: disable=g-bad-import-order
+import numpy as np
 from six.moves import xrange  # pylint: disable=redefined-builtin
 from absl import app as absl_app
 from absl import flags
@@ -37,6 +40,11 @@ _EXTRA_DECODE_LENGTH = 100
 _BEAM_SIZE = 4
 _ALPHA = 0.6
 
+# Defaults for streaming translation (see translate_file_streaming).
+_STREAMING_WINDOW_SIZE = 10000
+_STREAMING_MAX_TOKENS_PER_BATCH = 4096
+_PROGRESS_SUFFIX = ".progress"
+
 
 def _get_sorted_inputs(filename):
   """Read and sort lines from the file sorted by decreasing length.
@@ -138,6 +146,185 @@ def translate_file(
         f.write("%s\n" % translations[sorted_keys[index]])
 
 
+def _token_budget_batches(lengths, max_tokens):
+  """Group sequences into batches whose padded size fits in a token budget.
+
+  Args:
+    lengths: List of sequence lengths.
+    max_tokens: Maximum number of tokens in a padded batch, i.e. the number of
+      sequences times the length of the longest sequence. A sequence longer
+      than max_tokens is placed in a batch of its own.
+
+  Returns:
+    List of batches, where each batch is a list of indices into lengths. The
+    indices are ordered by decreasing length, so that sequences of similar
+    length are batched together.
+  """
+  order = sorted(xrange(len(lengths)), key=lambda i: lengths[i], reverse=True)
+  batches = []
+  batch = []
+  for index in order:
+    # Since the indices are sorted by decreasing length, the first sequence of
+    # each batch is its longest.
+    if batch and (len(batch) + 1) * lengths[batch[0]] > max_tokens:
+      batches.append(batch)
+      batch = []
+    batch.append(index)
+  if batch:
+    batches.append(batch)
+  return batches
+
+
+def _read_progress(output_file):
+  """Return (input lines translated, output bytes written) of a previous run."""
+  progress_file = output_file + _PROGRESS_SUFFIX
+  if not tf.gfile.Exists(progress_file):
+    return 0, 0
+  with tf.gfile.Open(progress_file) as f:
+    progress = json.load(f)
+  return progress["input_lines"], progress["output_bytes"]
+
+
+def _write_progress(output_file, input_lines, output_bytes):
+  """Atomically record how much of the input has been translated."""
+  progress_file = output_file + _PROGRESS_SUFFIX
+  tmp_file = progress_file + ".incomplete"
+  with tf.gfile.Open(tmp_file, "w") as f:
+    json.dump({"input_lines": input_lines, "output_bytes": output_bytes}, f)
+  tf.gfile.Rename(tmp_file, progress_file, overwrite=True)
+
+
+def _truncate_file(filename, size, chunk_size=1 << 24):
+  """Truncate the file to size bytes, discarding output of an aborted run."""
+  if not tf.gfile.Exists(filename):
+    if size:
+      raise ValueError("Output file %s is missing, but the progress file "
+                       "records %d written bytes." % (filename, size))
+    return
+  if tf.gfile.Stat(filename).length == size:
+    return
+  tmp_file = filename + ".truncated"
+  with tf.gfile.Open(filename, "rb") as src, tf.gfile.Open(tmp_file, "wb") as dst:
+    remaining = size
+    while remaining > 0:
+      chunk = src.read(min(chunk_size, remaining))
+      if not chunk:
+        raise ValueError("Output file %s is shorter than the %d bytes recorded "
+                         "in its progress file." % (filename, size))
+      dst.write(chunk)
+      remaining -= len(chunk)
+  tf.gfile.Rename(tmp_file, filename, overwrite=True)
+
+
+def _read_windows(input_file, window_size, skip_lines=0):
+  """Yield lists of at most window_size stripped lines, after skip_lines."""
+  window = []
+  with tf.gfile.Open(input_file) as f:
+    for i, line in enumerate(f):
+      if i < skip_lines:
+        continue
+      window.append(line.strip())
+      if len(window) == window_size:
+        yield window
+        window = []
+  if window:
+    yield window
+
+
+def translate_file_streaming(
+    estimator, subtokenizer, input_file, output_file,
+    window_size=_STREAMING_WINDOW_SIZE,
+    max_tokens_per_batch=_STREAMING_MAX_TOKENS_PER_BATCH,
+    print_all_translations=False):
+  """Translate a large file with bounded memory, writing output as it goes.
+
+  The input is read in windows of window_size lines. The lines in each window
+  are sorted by encoded length and grouped into batches of at most
+  max_tokens_per_batch padded tokens. Translations are written in the original
+  line order as soon as all preceding lines are translated.
+
+  After each window, the number of translated lines and the size of the output
+  file are saved to output_file + ".progress". If that file exists, translation
+  resumes from the recorded line, and any output written after the recorded
+  size is discarded.
+
+  Args:
+    estimator: tf.Estimator used to generate the translations.
+    subtokenizer: Subtokenizer object for encoding and decoding source and
+       translated lines.
+    input_file: file containing lines to translate
+    output_file: file that stores the generated translations.
+    window_size: Number of lines that are read and sorted at a time.
+    max_tokens_per_batch: Maximum number of (padded) input tokens in a batch.
+    print_all_translations: If true, all translations are printed to stdout.
+
+  Raises:
+    ValueError: if output file is invalid.
+  """
+  if tf.gfile.IsDirectory(output_file):
+    raise ValueError("File output is a directory, will not save outputs to "
+                     "file.")
+
+  start_line, output_bytes = _read_progress(output_file)
+  _truncate_file(output_file, output_bytes)
+  if start_line:
+    tf.logging.info("Resuming translation from line %d." % start_line)
+
+  # Original line index of each example, in the order they are fed to the
+  # estimator. Predictions are returned in the same order.
+  pending_indices = collections.deque()
+  # Index of the line following each window that has been fed to the estimator.
+  window_ends = collections.deque()
+  # Source lines that are being translated, only kept for printing.
+  window_lines = {}
+  windows = _read_windows(input_file, window_size, skip_lines=start_line)
+
+  def input_generator():
+    """Yield padded batches of encoded lines, window by window."""
+    line_offset = start_line
+    for window in windows:
+      ids, offsets = subtokenizer.encode_batch(window, add_eos=True)
+      lengths = np.diff(offsets).tolist()
+      window_ends.append(line_offset + len(window))
+      for batch in _token_budget_batches(lengths, max_tokens_per_batch):
+        padded = np.zeros([len(batch), lengths[batch[0]]], dtype=np.int64)
+        for row, index in enumerate(batch):
+          padded[row, :lengths[index]] = ids[offsets[index]:offsets[index + 1]]
+          if print_all_translations:
+            window_lines[line_offset + index] = window[index]
+          pending_indices.append(line_offset + index)
+        yield padded
+      line_offset += len(window)
+
+  def input_fn():
+    """Create dataset of variable size batches of encoded inputs."""
+    return tf.data.Dataset.from_generator(
+        input_generator, tf.int64, tf.TensorShape([None, None]))
+
+  next_line = start_line
+  finished = {}
+  with tf.gfile.Open(output_file, "a" if output_bytes else "w") as f:
+    for prediction in estimator.predict(input_fn):
+      index = pending_indices.popleft()
+      translation = _trim_and_decode(prediction["outputs"], subtokenizer)
+      if print_all_translations:
+        tf.logging.info("Translating:\n\tInput: %s\n\tOutput: %s" %
+                        (window_lines.pop(index), translation))
+      finished[index] = translation
+
+      while next_line in finished:
+        f.write("%s\n" % finished.pop(next_line))
+        next_line += 1
+
+      # Save progress once all lines of a window are written.
+      if window_ends and next_line >= window_ends[0]:
+        while window_ends and next_line >= window_ends[0]:
+          window_ends.popleft()
+        f.flush()
+        _write_progress(output_file, next_line, f.tell())
+        tf.logging.info("Translated %d lines." % next_line)
+
+
 def translate_text(estimator, subtokenizer, txt):
   """Translate a single string."""
   encoded_txt = _encode_and_add_eos(txt, subtokenizer)
@@ -191,7 +378,15 @@ def main(unused_argv):
       output_file = os.path.abspath(FLAGS.file_out)
       tf.logging.info("File output specified: %s" % output_file)
 
-    translate_file(estimator, subtokenizer, input_file, output_file)
+    if FLAGS.streaming:
+      if output_file is None:
+        raise ValueError("--file_out must be specified with --streaming.")
+      translate_file_streaming(
+          estimator, subtokenizer, input_file, output_file,
+          window_size=FLAGS.window_size,
+          max_tokens_per_batch=FLAGS.max_tokens_per_batch)
+    else:
+      translate_file(estimator, subtokenizer, input_file, output_file)
 
 
 def define_translate_flags():
@@ -236,6 +431,23 @@ def define_translate_flags():
       help=flags_core.help_wrap(
           "If --file flag is specified, save translation to this file."))
 
+  flags.DEFINE_bool(
+      name="streaming", default=False,
+      help=flags_core.help_wrap(
+          "If set, translate --file in windows of lines with token-budget "
+          "batches, writing translations to --file_out as they finish. An "
+          "interrupted translation resumes where it left off."))
+  flags.DEFINE_integer(
+      name="window_size", default=_STREAMING_WINDOW_SIZE,
+      help=flags_core.help_wrap(
+          "With --streaming, number of lines read and sorted by length at a "
+          "time."))
+  flags.DEFINE_integer(
+      name="max_tokens_per_batch", default=_STREAMING_MAX_TOKENS_PER_BATCH,
+      help=flags_core.help_wrap(
+          "With --streaming, maximum number of padded input tokens in a "
+          "decoding batch."))
+
 
 if __name__ == "__main__":
   define_translate_flags()
@@ -0,0 +1,110 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Test streaming translation functions in translate.py."""
+
+import os
+import tempfile
+import unittest
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+from official.transformer import translate
+from official.transformer.utils import tokenizer
+
+
+class _EchoEstimator(object):
+  """Estimator stand-in whose "translation" of a batch is the batch itself."""
+
+  def __init__(self, max_predictions=None):
+    self.max_predictions = max_predictions
+    self.batch_shapes = []
+
+  def predict(self, input_fn):
+    next_batch = input_fn().make_one_shot_iterator().get_next()
+    num_predictions = 0
+    with tf.Session() as sess:
+      while True:
+        try:
+          batch = sess.run(next_batch)
+        except tf.errors.OutOfRangeError:
+          return
+        self.batch_shapes.append(batch.shape)
+        for row in batch:
+          if num_predictions == self.max_predictions:
+            raise KeyboardInterrupt()
+          num_predictions += 1
+          yield {"outputs": row}
+
+
+class TranslateStreamingTest(unittest.TestCase):
+
+  def _create_temp_file(self, lines):
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    with tf.gfile.Open(temp_file.name, "w") as w:
+      for line in lines:
+        w.write(line + "\n")
+    return temp_file.name
+
+  def _init_subtokenizer(self):
+    vocab_list = ["test", "ing_", "a_", "_"] + [str(i) for i in range(10)]
+    vocab_file = self._create_temp_file(["'%s'" % t for t in vocab_list])
+    return tokenizer.Subtokenizer(vocab_file)
+
+  def _read_lines(self, filename):
+    with tf.gfile.Open(filename) as f:
+      return f.read().splitlines()
+
+  def test_token_budget_batches(self):
+    lengths = [3, 10, 2, 5, 5, 12]
+    batches = translate._token_budget_batches(lengths, max_tokens=20)
+    self.assertEqual([[5], [1, 3], [4, 0, 2]], batches)
+
+  def test_translate_file_streaming(self):
+    subtokenizer = self._init_subtokenizer()
+    lines = ["test " * (i % 7) + "a %d" % i for i in range(25)]
+    input_file = self._create_temp_file(lines)
+    output_file = os.path.join(tempfile.mkdtemp(), "output")
+    estimator = _EchoEstimator()
+
+    translate.translate_file_streaming(
+        estimator, subtokenizer, input_file, output_file, window_size=10,
+        max_tokens_per_batch=32)
+
+    self.assertEqual([l.strip() for l in lines], self._read_lines(output_file))
+    for batch_shape in estimator.batch_shapes:
+      self.assertTrue(batch_shape[0] == 1 or
+                      batch_shape[0] * batch_shape[1] <= 32)
+
+  def test_translate_file_streaming_resume(self):
+    subtokenizer = self._init_subtokenizer()
+    lines = ["test " * (i % 3) + "a %d" % i for i in range(25)]
+    input_file = self._create_temp_file(lines)
+    output_file = os.path.join(tempfile.mkdtemp(), "output")
+
+    # Interrupt the first run partway through the second window.
+    with self.assertRaises(KeyboardInterrupt):
+      translate.translate_file_streaming(
+          _EchoEstimator(max_predictions=15), subtokenizer, input_file,
+          output_file, window_size=10, max_tokens_per_batch=32)
+    self.assertEqual(10, translate._read_progress(output_file)[0])
+
+    translate.translate_file_streaming(
+        _EchoEstimator(), subtokenizer, input_file, output_file,
+        window_size=10, max_tokens_per_batch=32)
+    self.assertEqual([l.strip() for l in lines], self._read_lines(output_file))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -39,6 +39,12 @@ Two things to note in the pipeline:
    This batching scheme decreases the fraction of padding tokens per training
    batch, thus improving the training speed significantly.
 
+   By default the group boundaries grow geometrically. Alternatively, the
+   boundaries can be fitted to the example lengths of the data: the lengths
+   are counted once, saved to a histogram file in the data directory, and
+   used to pick the boundaries that need the fewest batches (see
+   `create_buckets_from_histogram`).
+
 2. Shuffling
 
    While training, the dataset is shuffled in two places in the code. The first
@@ -51,8 +57,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import json
 import os
 
+import numpy as np
 import tensorflow as tf
 
 # Use the number of training files as the shuffle buffer.
@@ -66,6 +74,10 @@ _READ_RECORD_BUFFER = 8 * 1000 * 1000
 _MIN_BOUNDARY = 8
 _BOUNDARY_SCALE = 1.1
 
+# Name of the file in the data directory storing the example length histograms.
+# The name must not match the "*train*" and "*dev*" file patterns.
+LENGTH_HISTOGRAM_FILENAME = "length_histogram.json"
+
 
 def _load_records(filename):
   """Read file and return a dataset of tf.Examples."""
@@ -128,7 +140,184 @@ def _create_min_max_boundaries(
   return buckets_min, buckets_max
 
 
-def _batch_examples(dataset, batch_size, max_length):
+def compute_length_histogram(file_pattern):
+  """Count the examples of each length in TFRecord files.
+
+  Args:
+    file_pattern: String used to match the input TFRecord files.
+
+  Returns:
+    Dictionary with the keys:
+      "files": list of [file path, file size] of the matched files.
+      "counts": list where counts[n] is the number of examples with length n
+        (the maximum between the "inputs" and "targets" length).
+  """
+  filepaths = sorted(tf.gfile.Glob(file_pattern))
+  counts = []
+  for filepath in filepaths:
+    for record in tf.python_io.tf_record_iterator(filepath):
+      features = tf.train.Example.FromString(record).features.feature
+      length = max(len(features["inputs"].int64_list.value),
+                   len(features["targets"].int64_list.value))
+      if length >= len(counts):
+        counts.extend([0] * (length + 1 - len(counts)))
+      counts[length] += 1
+  return {
+      "files": [[f, tf.gfile.Stat(f).length] for f in filepaths],
+      "counts": counts,
+  }
+
+
+def load_length_histogram(file_pattern, histogram_path):
+  """Return the length histogram of the files, computing it if necessary.
+
+  Histograms are stored in a JSON file keyed by file pattern. A stored
+  histogram is recomputed if the matched files or their sizes changed.
+
+  Args:
+    file_pattern: String used to match the input TFRecord files.
+    histogram_path: Path of the JSON file storing the histograms.
+
+  Returns:
+    List where element n is the number of examples with length n.
+  """
+  histograms = {}
+  if tf.gfile.Exists(histogram_path):
+    with tf.gfile.Open(histogram_path) as f:
+      histograms = json.load(f)
+
+  filepaths = sorted(tf.gfile.Glob(file_pattern))
+  files = [[f, tf.gfile.Stat(f).length] for f in filepaths]
+  histogram = histograms.get(file_pattern)
+  if histogram is None or histogram["files"] != files:
+    tf.logging.info("Computing length histogram of %s" % file_pattern)
+    histogram = compute_length_histogram(file_pattern)
+    histograms[file_pattern] = histogram
+    with tf.gfile.Open(histogram_path, "w") as f:
+      json.dump(histograms, f)
+  return histogram["counts"]
+
+
+def _bucket_cost(num_examples, batch_size, length):
+  """Returns the expected number of batches of examples padded to length."""
+  return num_examples / max(batch_size // max(length, 1), 1)
+
+
+def create_buckets_from_histogram(counts, batch_size, max_length, num_buckets):
+  """Fit bucket boundaries and batch sizes to a length histogram.
+
+  Each bucket holds the examples with lengths in [buckets_min, buckets_max),
+  and is batched with bucket_batch_size * (buckets_max - 1) <= batch_size.
+  The boundaries are picked by dynamic programming to minimize the number of
+  batches, i.e. the number of token budgets spent on the examples (including
+  their padding).
+
+  Args:
+    counts: List where element n is the number of examples with length n.
+    batch_size: Max number of tokens per batch of examples.
+    max_length: Max number of tokens in an example input or target sequence.
+    num_buckets: Maximum number of buckets with examples.
+
+  Returns:
+    Tuple of lists (buckets_min, buckets_max, bucket_batch_sizes). If the
+    histogram has no examples up to max_length, the last bucket covers the
+    lengths between the longest example and max_length.
+  """
+  counts = np.array(counts[:max_length + 1], np.float64)
+  lengths = np.nonzero(counts)[0]
+  cumulative_counts = np.concatenate([[0.], np.cumsum(counts[lengths])])
+  num_lengths = len(lengths)
+  num_buckets = max(min(num_buckets, num_lengths), 1)
+  batch_sizes = np.maximum(batch_size // np.maximum(lengths, 1), 1)
+
+  # best_cost[k, j] is the lowest cost of putting the first j observed lengths
+  # into k + 1 buckets, and best_start[k, j] is the first length of the last
+  # bucket.
+  best_cost = np.full([num_buckets, num_lengths + 1], np.inf)
+  best_start = np.zeros([num_buckets, num_lengths + 1], np.int64)
+  for j in range(1, num_lengths + 1):
+    best_cost[0, j] = cumulative_counts[j] / batch_sizes[j - 1]
+  for k in range(1, num_buckets):
+    for j in range(k + 1, num_lengths + 1):
+      # Last bucket holds lengths[i:j] for i in [k, j).
+      starts = np.arange(k, j)
+      costs = (best_cost[k - 1, starts] +
+               (cumulative_counts[j] - cumulative_counts[starts]) /
+               batch_sizes[j - 1])
+      best = np.argmin(costs)
+      best_cost[k, j] = costs[best]
+      best_start[k, j] = starts[best]
+
+  buckets_max = []
+  end = num_lengths
+  for k in reversed(range(num_buckets)):
+    if end == 0:
+      break
+    buckets_max.append(int(lengths[end - 1]) + 1)
+    end = best_start[k, end] if k else 0
+  buckets_max.reverse()
+
+  if not buckets_max or buckets_max[-1] <= max_length:
+    # Lengths not in the histogram.
+    buckets_max.append(max_length + 1)
+  buckets_min = [0] + buckets_max[:-1]
+  bucket_batch_sizes = [max(batch_size // max(x - 1, 1), 1)
+                        for x in buckets_max]
+  return buckets_min, buckets_max, bucket_batch_sizes
+
+
+def get_bucket_statistics(counts, buckets_min, buckets_max, bucket_batch_sizes):
+  """Estimate the padding of each bucket from a length histogram.
+
+  Examples are assumed to be padded to the longest length in their bucket.
+  Since the histogram stores the longer of the inputs and targets lengths, this
+  is the padding of the longer sequence.
+
+  Args:
+    counts: List where element n is the number of examples with length n.
+    buckets_min: Minimum example length of each bucket.
+    buckets_max: Maximum example length (exclusive) of each bucket.
+    bucket_batch_sizes: Number of examples in each batch of a bucket.
+
+  Returns:
+    List of dictionaries with the keys "min_length", "max_length",
+    "batch_size", "num_examples", "num_batches", "num_tokens" (not counting
+    padding), "num_padded_tokens" and "padding_ratio".
+  """
+  statistics = []
+  for min_length, max_length, bucket_batch_size in zip(
+      buckets_min, buckets_max, bucket_batch_sizes):
+    bucket_counts = np.array(counts[min_length:max_length], np.int64)
+    bucket_lengths = np.arange(min_length, min_length + len(bucket_counts))
+    num_examples = int(bucket_counts.sum())
+    num_tokens = int((bucket_counts * bucket_lengths).sum())
+    if num_examples:
+      num_padded_tokens = num_examples * int(
+          bucket_lengths[bucket_counts > 0].max())
+    else:
+      num_padded_tokens = 0
+    statistics.append({
+        "min_length": min_length,
+        "max_length": max_length,
+        "batch_size": bucket_batch_size,
+        "num_examples": num_examples,
+        "num_batches": -(-num_examples // bucket_batch_size),
+        "num_tokens": num_tokens,
+        "num_padded_tokens": num_padded_tokens,
+        "padding_ratio": (1. - num_tokens / num_padded_tokens
+                          if num_padded_tokens else 0.),
+    })
+  return statistics
+
+
+def get_default_buckets(batch_size, max_length):
+  """Return the default bucket boundaries and batch sizes."""
+  buckets_min, buckets_max = _create_min_max_boundaries(max_length)
+  bucket_batch_sizes = [batch_size // x for x in buckets_max]
+  return buckets_min, buckets_max, bucket_batch_sizes
+
+
+def _batch_examples(dataset, batch_size, max_length, buckets=None):
   """Group examples by similar lengths, and return batched dataset.
 
   Each batch of similar-length examples are padded to the same length, and may
@@ -142,6 +331,9 @@ def _batch_examples(dataset, batch_size, max_length):
     dataset: Dataset of unbatched examples.
     batch_size: Max number of tokens per batch of examples.
     max_length: Max number of tokens in an example input or target sequence.
+    buckets: Optional tuple of lists (buckets_min, buckets_max,
+      bucket_batch_sizes), e.g. from create_buckets_from_histogram. Defaults to
+      the boundaries from _create_min_max_boundaries.
 
   Returns:
     Dataset of batched examples with similar lengths.
@@ -150,11 +342,11 @@ def _batch_examples(dataset, batch_size, max_length):
   # the `bucket_id`, which is the index at which:
   # buckets_min[bucket_id] <= len(example) < buckets_max[bucket_id]
   # Note that using both min and max lists improves the performance.
-  buckets_min, buckets_max = _create_min_max_boundaries(max_length)
-
-  # Create list of batch sizes for each bucket_id, so that
+  # The default list of batch sizes for each bucket_id is such that
   # bucket_batch_size[bucket_id] * buckets_max[bucket_id] <= batch_size
-  bucket_batch_sizes = [batch_size // x for x in buckets_max]
+  buckets_min, buckets_max, bucket_batch_sizes = (
+      buckets or get_default_buckets(batch_size, max_length))
+
   # bucket_id will be a tensor, so convert this list to a tensor as well.
   bucket_batch_sizes = tf.constant(bucket_batch_sizes, dtype=tf.int64)
 
@@ -190,7 +382,8 @@ def _batch_examples(dataset, batch_size, max_length):
 
 
 def _read_and_batch_from_files(
-    file_pattern, batch_size, max_length, num_parallel_calls, shuffle, repeat):
+    file_pattern, batch_size, max_length, num_parallel_calls, shuffle, repeat,
+    buckets=None):
   """Create dataset where each item is a dict of "inputs" and "targets".
 
   Args:
@@ -201,6 +394,8 @@ def _read_and_batch_from_files(
     shuffle: If true, randomizes order of elements.
     repeat: Number of times to repeat the dataset. If None, the dataset is
       repeated forever.
+    buckets: Optional tuple of lists (buckets_min, buckets_max,
+      bucket_batch_sizes) used to batch examples of similar length.
 
   Returns:
     tf.data.Dataset object containing examples loaded from the files.
@@ -226,7 +421,7 @@ def _read_and_batch_from_files(
   dataset = dataset.filter(lambda x, y: _filter_max_length((x, y), max_length))
 
   # Batch such that each batch has examples of similar length.
-  dataset = _batch_examples(dataset, batch_size, max_length)
+  dataset = _batch_examples(dataset, batch_size, max_length, buckets)
   dataset = dataset.repeat(repeat)
 
   # Prefetch the next element to improve speed of input pipeline.
@@ -234,12 +429,24 @@ def _read_and_batch_from_files(
   return dataset
 
 
+def _get_buckets(params, file_pattern):
+  """Return buckets fitted to the data if params.num_length_buckets is set."""
+  num_length_buckets = getattr(params, "num_length_buckets", 0)
+  if not num_length_buckets:
+    return None
+  counts = load_length_histogram(file_pattern, os.path.join(
+      getattr(params, "data_dir", ""), LENGTH_HISTOGRAM_FILENAME))
+  return create_buckets_from_histogram(
+      counts, params.batch_size, params.max_length, num_length_buckets)
+
+
 def train_input_fn(params):
   """Load and return dataset of batched examples for use during training."""
   file_pattern = os.path.join(getattr(params, "data_dir", ""), "*train*")
   return _read_and_batch_from_files(
       file_pattern, params.batch_size, params.max_length,
-      params.num_parallel_calls, shuffle=True, repeat=params.repeat_dataset)
+      params.num_parallel_calls, shuffle=True, repeat=params.repeat_dataset,
+      buckets=_get_buckets(params, file_pattern))
 
 
 def eval_input_fn(params):
@@ -247,4 +454,5 @@ def eval_input_fn(params):
   file_pattern = os.path.join(getattr(params, "data_dir", ""), "*dev*")
   return _read_and_batch_from_files(
       file_pattern, params.batch_size, params.max_length,
-      params.num_parallel_calls, shuffle=False, repeat=1)
+      params.num_parallel_calls, shuffle=False, repeat=1,
+      buckets=_get_buckets(params, file_pattern))
@@ -0,0 +1,116 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Test the length histogram and bucketing functions in dataset.py."""
+
+import itertools
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+from official.transformer.utils import dataset
+
+
+def _num_batches(counts, batch_size, buckets_min, buckets_max):
+  """Expected number of batches, as minimized by the bucket fitting."""
+  num_batches = 0.
+  for min_length, max_length in zip(buckets_min, buckets_max):
+    num_examples = sum(counts[min_length:max_length])
+    if num_examples:
+      longest = max(n for n in range(min_length, max_length) if counts[n])
+      num_batches += num_examples / max(batch_size // longest, 1)
+  return num_batches
+
+
+class LengthBucketTest(unittest.TestCase):
+
+  def _write_records(self, filepath, lengths):
+    with tf.python_io.TFRecordWriter(filepath) as writer:
+      for input_length, target_length in lengths:
+        example = tf.train.Example(features=tf.train.Features(feature={
+            "inputs": tf.train.Feature(int64_list=tf.train.Int64List(
+                value=[1] * input_length)),
+            "targets": tf.train.Feature(int64_list=tf.train.Int64List(
+                value=[1] * target_length)),
+        }))
+        writer.write(example.SerializeToString())
+
+  def test_load_length_histogram(self):
+    data_dir = tempfile.mkdtemp()
+    self._write_records(os.path.join(data_dir, "train-1"), [(2, 3), (5, 1)])
+    self._write_records(os.path.join(data_dir, "train-2"), [(3, 3)])
+    file_pattern = os.path.join(data_dir, "*train*")
+    histogram_path = os.path.join(data_dir, dataset.LENGTH_HISTOGRAM_FILENAME)
+
+    counts = dataset.load_length_histogram(file_pattern, histogram_path)
+    self.assertEqual([0, 0, 0, 2, 0, 1], counts)
+    self.assertTrue(os.path.exists(histogram_path))
+    self.assertEqual(["train-1", "train-2"],
+                     sorted(os.path.basename(f) for f in tf.gfile.Glob(
+                         file_pattern)))
+
+    # The histogram is recomputed when the files change.
+    self._write_records(os.path.join(data_dir, "train-2"), [(3, 4), (1, 1)])
+    counts = dataset.load_length_histogram(file_pattern, histogram_path)
+    self.assertEqual([0, 1, 0, 1, 1, 1], counts)
+
+  def test_fitted_buckets_are_optimal(self):
+    rng = np.random.RandomState(0)
+    batch_size, max_length = 64, 12
+    for _ in range(20):
+      counts = rng.randint(0, 5, size=max_length + 1).tolist()
+      counts[0] = 0
+      for num_buckets in [1, 2, 3]:
+        buckets_min, buckets_max, bucket_batch_sizes = (
+            dataset.create_buckets_from_histogram(
+                counts, batch_size, max_length, num_buckets))
+        self.assertEqual(0, buckets_min[0])
+        self.assertEqual(max_length + 1, buckets_max[-1])
+        self.assertEqual(buckets_min[1:], buckets_max[:-1])
+        for x, bucket_batch_size in zip(buckets_max, bucket_batch_sizes):
+          self.assertLessEqual(bucket_batch_size * (x - 1), batch_size)
+
+        # Compare with every choice of num_buckets - 1 inner boundaries.
+        best = min(
+            _num_batches(counts, batch_size, [0] + list(cuts),
+                         list(cuts) + [max_length + 1])
+            for cuts in itertools.combinations(
+                range(1, max_length + 1), num_buckets - 1))
+        self.assertAlmostEqual(best, _num_batches(
+            counts, batch_size, buckets_min, buckets_max))
+
+  def test_fitted_buckets_cover_unseen_lengths(self):
+    counts = [0, 0, 5, 0, 5]
+    buckets_min, buckets_max, bucket_batch_sizes = (
+        dataset.create_buckets_from_histogram(counts, 16, 10, 2))
+    self.assertEqual([0, 3, 5], buckets_min)
+    self.assertEqual([3, 5, 11], buckets_max)
+    self.assertEqual([8, 4, 1], bucket_batch_sizes)
+
+  def test_get_bucket_statistics(self):
+    counts = [0, 2, 0, 2]
+    statistics = dataset.get_bucket_statistics(counts, [0], [4], [2])
+    self.assertEqual(1, len(statistics))
+    self.assertEqual(4, statistics[0]["num_examples"])
+    self.assertEqual(2, statistics[0]["num_batches"])
+    self.assertEqual(8, statistics[0]["num_tokens"])
+    self.assertEqual(12, statistics[0]["num_padded_tokens"])
+    self.assertAlmostEqual(1. / 3, statistics[0]["padding_ratio"])
+
+
+if __name__ == "__main__":
+  unittest.main()
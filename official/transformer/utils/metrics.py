@@ -213,15 +213,21 @@ def _get_ngrams_with_counter(segment, max_order):
   """
   ngram_counts = collections.Counter()
   for order in xrange(1, max_order + 1):
-    for i in xrange(0, len(segment) - order + 1):
-      ngram = tuple(segment[i:i + order])
-      ngram_counts[ngram] += 1
+    # Zipping shifted copies of the segment yields its n-grams as tuples, and
+    # Counter.update counts them without a Python level loop.
+    ngram_counts.update(zip(*[segment[i:] for i in xrange(order)]))
   return ngram_counts
 
 
-def compute_bleu(reference_corpus, translation_corpus, max_order=4,
-                 use_bp=True):
-  """Computes BLEU score of translated segments against one or more references.
+# Sufficient statistics of corpus BLEU. Statistics of disjoint parts of a corpus
+# can be summed with merge_bleu_statistics() to get those of the whole corpus.
+BleuStatistics = collections.namedtuple(
+    "BleuStatistics", ["matches_by_order", "possible_matches_by_order",
+                       "reference_length", "translation_length"])
+
+
+def compute_bleu_statistics(reference_corpus, translation_corpus, max_order=4):
+  """Computes the sufficient statistics of BLEU for translated segments.
 
   Args:
     reference_corpus: list of references for each translation. Each
@@ -229,19 +235,15 @@ def compute_bleu(reference_corpus, translation_corpus, max_order=4,
     translation_corpus: list of translations to score. Each translation
         should be tokenized into a list of tokens.
     max_order: Maximum n-gram order to use when computing BLEU score.
-    use_bp: boolean, whether to apply brevity penalty.
 
   Returns:
-    BLEU score.
+    BleuStatistics of the segments.
   """
   reference_length = 0
   translation_length = 0
-  bp = 1.0
-  geo_mean = 0
 
   matches_by_order = [0] * max_order
   possible_matches_by_order = [0] * max_order
-  precisions = []
 
   for (references, translations) in zip(reference_corpus, translation_corpus):
     reference_length += len(references)
@@ -249,15 +251,68 @@ def compute_bleu(reference_corpus, translation_corpus, max_order=4,
     ref_ngram_counts = _get_ngrams_with_counter(references, max_order)
     translation_ngram_counts = _get_ngrams_with_counter(translations, max_order)
 
-    overlap = dict((ngram,
-                    min(count, translation_ngram_counts[ngram]))
-                   for ngram, count in ref_ngram_counts.items())
+    for ngram, count in six.iteritems(ref_ngram_counts):
+      translation_count = translation_ngram_counts.get(ngram)
+      if translation_count:
+        matches_by_order[len(ngram) - 1] += min(count, translation_count)
+    # A segment of length n has max(n - order + 1, 0) n-grams of each order.
+    for i in xrange(0, max_order):
+      possible_matches_by_order[i] += max(len(translations) - i, 0)
 
-    for ngram in overlap:
-      matches_by_order[len(ngram) - 1] += overlap[ngram]
-    for ngram in translation_ngram_counts:
-      possible_matches_by_order[len(ngram) - 1] += translation_ngram_counts[
-          ngram]
+  return BleuStatistics(matches_by_order, possible_matches_by_order,
+                        reference_length, translation_length)
+
+
+def merge_bleu_statistics(statistics):
+  """Sums a list of BleuStatistics computed on disjoint parts of a corpus."""
+  matches_by_order = [sum(order) for order in
+                      zip(*[s.matches_by_order for s in statistics])]
+  possible_matches_by_order = [
+      sum(order) for order in
+      zip(*[s.possible_matches_by_order for s in statistics])]
+  return BleuStatistics(
+      matches_by_order, possible_matches_by_order,
+      sum(s.reference_length for s in statistics),
+      sum(s.translation_length for s in statistics))
+
+
+def compute_bleu(reference_corpus, translation_corpus, max_order=4,
+                 use_bp=True):
+  """Computes BLEU score of translated segments against one or more references.
+
+  Args:
+    reference_corpus: list of references for each translation. Each
+        reference should be tokenized into a list of tokens.
+    translation_corpus: list of translations to score. Each translation
+        should be tokenized into a list of tokens.
+    max_order: Maximum n-gram order to use when computing BLEU score.
+    use_bp: boolean, whether to apply brevity penalty.
+
+  Returns:
+    BLEU score.
+  """
+  return bleu_from_statistics(
+      compute_bleu_statistics(reference_corpus, translation_corpus, max_order),
+      use_bp=use_bp)
+
+
+def bleu_from_statistics(statistics, use_bp=True):
+  """Computes BLEU score from its sufficient statistics.
+
+  Args:
+    statistics: BleuStatistics of the corpus.
+    use_bp: boolean, whether to apply brevity penalty.
+
+  Returns:
+    BLEU score.
+  """
+  matches_by_order = statistics.matches_by_order
+  possible_matches_by_order = statistics.possible_matches_by_order
+  reference_length = statistics.reference_length
+  translation_length = statistics.translation_length
+  max_order = len(matches_by_order)
+  bp = 1.0
+  geo_mean = 0
 
   precisions = [0] * max_order
   smooth = 1.0
@@ -322,12 +377,107 @@ def _get_ngrams(n, text):
   return ngram_set
 
 
+def _get_ngram_keys(n, sentences, base):
+  """Encodes each n-gram in a batch of id sequences as a single integer.
+
+  Args:
+    n: which n-grams to calculate
+    sentences: int array with shape [batch_size, length]
+    base: int larger than all ids in the sentences.
+
+  Returns:
+    int64 array with shape [batch_size, length - n + 1]
+  """
+  num_ngrams = max(sentences.shape[1] - n + 1, 0)
+  sentences = sentences.astype(np.int64)
+  keys = np.zeros([sentences.shape[0], num_ngrams], np.int64)
+  for i in xrange(n):
+    keys = keys * base + sentences[:, i:i + num_ngrams]
+  return keys
+
+
+def _get_ngram_overlaps(n, eval_sentences, ref_sentences):
+  """Counts distinct and overlapping n-grams of a batch of id sequences.
+
+  The n-grams of all sentences are encoded as integers that also hold the
+  index of the sentence, so the whole batch is deduplicated and intersected
+  with a few numpy calls.
+
+  Args:
+    n: which n-grams to calculate
+    eval_sentences: int array with shape [batch_size, eval_length]
+    ref_sentences: int array with shape [batch_size, ref_length]
+
+  Returns:
+    Tuple of int arrays (distinct n-grams in each eval sentence, distinct
+    n-grams in each ref sentence, overlapping n-grams), or None if the ids
+    are negative or too large for the n-grams to fit in an int64.
+  """
+  batch_size = eval_sentences.shape[0]
+  ids = np.concatenate([eval_sentences.ravel(), ref_sentences.ravel()])
+  if ids.size and ids.min() < 0:
+    return None
+  base = int(ids.max()) + 1 if ids.size else 1
+  row_size = base ** n
+  if batch_size * row_size >= 2 ** 63:
+    return None
+
+  def get_unique_keys(sentences):
+    keys = _get_ngram_keys(n, sentences, base)
+    keys += np.arange(batch_size, dtype=np.int64)[:, np.newaxis] * row_size
+    return np.unique(keys)
+
+  def count_per_sentence(keys):
+    return np.bincount(keys // row_size, minlength=batch_size)
+
+  eval_keys = get_unique_keys(eval_sentences)
+  ref_keys = get_unique_keys(ref_sentences)
+  overlapping_keys = np.intersect1d(eval_keys, ref_keys, assume_unique=True)
+  return (count_per_sentence(eval_keys), count_per_sentence(ref_keys),
+          count_per_sentence(overlapping_keys))
+
+
+def _rouge_n_batch(eval_sentences, ref_sentences, n):
+  """Computes the ROUGE-N f1 scores of a batch of id sequences with numpy.
+
+  Args:
+    eval_sentences: Predicted sentences, array with shape [batch, length].
+    ref_sentences: Reference sentences, array with shape [batch, length].
+    n: Size of ngram.
+
+  Returns:
+    float64 array of f1 scores, or None if the sentences are not int arrays
+    that can be encoded.
+  """
+  eval_sentences = np.asarray(eval_sentences)
+  ref_sentences = np.asarray(ref_sentences)
+  if (eval_sentences.ndim != 2 or ref_sentences.ndim != 2 or
+      not np.issubdtype(eval_sentences.dtype, np.integer) or
+      not np.issubdtype(ref_sentences.dtype, np.integer)):
+    return None
+  batch_size = min(len(eval_sentences), len(ref_sentences))
+  counts = _get_ngram_overlaps(
+      n, eval_sentences[:batch_size], ref_sentences[:batch_size])
+  if counts is None:
+    return None
+  eval_counts, ref_counts, overlapping_counts = [
+      c.astype(np.float64) for c in counts]
+
+  # Same edge case handling as rouge_n.
+  precision = overlapping_counts / np.maximum(eval_counts, 1)
+  recall = overlapping_counts / np.maximum(ref_counts, 1)
+  return 2.0 * ((precision * recall) / (precision + recall + 1e-8))
+
+
 def rouge_n(eval_sentences, ref_sentences, n=2):
   """Computes ROUGE-N f1 score of two text collections of sentences.
 
   Source: https://www.microsoft.com/en-us/research/publication/
   rouge-a-package-for-automatic-evaluation-of-summaries/
 
+  Batches of int ids (e.g. the arrays passed in by rouge_2_fscore) are scored
+  with numpy. Other sentences are scored one at a time.
+
   Args:
     eval_sentences: Predicted sentences.
     ref_sentences: Sentences from the reference set
@@ -336,6 +486,10 @@ def rouge_n(eval_sentences, ref_sentences, n=2):
   Returns:
     f1 score for ROUGE-N
   """
+  f1_scores = _rouge_n_batch(eval_sentences, ref_sentences, n)
+  if f1_scores is not None:
+    return np.mean(f1_scores, dtype=np.float32)
+
   f1_scores = []
   for eval_sentence, ref_sentence in zip(eval_sentences, ref_sentences):
     eval_ngrams = _get_ngrams(n, eval_sentence)
@@ -418,7 +572,13 @@ def rouge_l_sentence_level(eval_sentences, ref_sentences):
 def _len_lcs(x, y):
   """Returns the length of the Longest Common Subsequence between two seqs.
 
-  Source: http://www.algorithmist.com/index.php/Longest_Common_Subsequence
+  Uses the bit-parallel algorithm from Hyyro, "Bit-Parallel LCS-length
+  Computation Revisited" (2004). Bit j of the vector v is cleared when the LCS
+  of the words read so far from the shorter sequence and the first j + 1 words
+  of the longer one is longer than for the first j words. Python integers are
+  used as bit vectors, so each word of the shorter sequence is processed with
+  a few operations on len(longer) / 64 machine words, instead of len(longer)
+  steps of the _lcs table.
 
   Args:
     x: sequence of words
@@ -427,16 +587,32 @@ def _len_lcs(x, y):
   Returns
     integer: Length of LCS between x and y
   """
-  table = _lcs(x, y)
-  n, m = len(x), len(y)
-  return table[n, m]
+  if isinstance(x, np.ndarray):
+    x = x.tolist()
+  if isinstance(y, np.ndarray):
+    y = y.tolist()
+  if len(x) > len(y):
+    x, y = y, x
+
+  # Bit j of match_masks[word] is set if y[j] == word.
+  match_masks = collections.defaultdict(int)
+  for j, word in enumerate(y):
+    match_masks[word] |= 1 << j
+
+  mask = (1 << len(y)) - 1
+  v = mask
+  for word in x:
+    u = v & match_masks.get(word, 0)
+    v = ((v + u) | (v - u)) & mask
+  return len(y) - bin(v).count("1")
 
 
 def _lcs(x, y):
   """Computes the length of the LCS between two seqs.
 
   The implementation below uses a DP programming algorithm and runs
-  in O(nm) time where n = len(x) and m = len(y).
+  in O(nm) time where n = len(x) and m = len(y). _len_lcs uses a faster
+  bit-parallel algorithm, this table is kept as a reference.
   Source: http://www.algorithmist.com/index.php/Longest_Common_Subsequence
 
   Args:
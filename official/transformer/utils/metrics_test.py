@@ -0,0 +1,89 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Test the ROUGE and LCS functions in metrics.py."""
+
+import unittest
+
+import numpy as np
+
+from official.transformer.utils import metrics
+
+
+def _random_sentences(rng, batch_size, length, vocab_size):
+  return rng.randint(0, vocab_size, size=[batch_size, length]).astype(np.int32)
+
+
+class RougeTest(unittest.TestCase):
+
+  def test_len_lcs_matches_table(self):
+    rng = np.random.RandomState(0)
+    for _ in range(200):
+      x = rng.randint(0, rng.randint(1, 6), size=rng.randint(0, 30)).tolist()
+      y = rng.randint(0, rng.randint(1, 6), size=rng.randint(0, 30)).tolist()
+      expected = metrics._lcs(x, y)[len(x), len(y)]
+      self.assertEqual(expected, metrics._len_lcs(x, y))
+      self.assertEqual(expected, metrics._len_lcs(y, x))
+
+  def test_len_lcs_long_sequences(self):
+    rng = np.random.RandomState(1)
+    x = _random_sentences(rng, 1, 300, 20)[0]
+    y = _random_sentences(rng, 1, 200, 20)[0]
+    self.assertEqual(metrics._lcs(x, y)[300, 200], metrics._len_lcs(x, y))
+    self.assertEqual(3, metrics._len_lcs("a b c d".split(), "a x c d".split()))
+
+  def test_rouge_n_batch_matches_sentences(self):
+    rng = np.random.RandomState(2)
+    for n in [1, 2, 3]:
+      for vocab_size in [2, 5, 1000]:
+        eval_sentences = _random_sentences(rng, 8, 20, vocab_size)
+        ref_sentences = _random_sentences(rng, 8, 15, vocab_size)
+        expected = metrics.rouge_n(
+            [s.tolist() for s in eval_sentences],
+            [s.tolist() for s in ref_sentences], n)
+        self.assertEqual(
+            expected, metrics.rouge_n(eval_sentences, ref_sentences, n))
+
+  def test_rouge_n_short_sentences(self):
+    eval_sentences = np.array([[1], [2]], np.int32)
+    ref_sentences = np.array([[1, 2, 3], [2, 3, 4]], np.int32)
+    self.assertEqual(0, metrics.rouge_n(eval_sentences, ref_sentences))
+    self.assertEqual(
+        metrics.rouge_n([[1], [2]], [[1, 2, 3], [2, 3, 4]], 1),
+        metrics.rouge_n(eval_sentences, ref_sentences, 1))
+
+  def test_rouge_n_large_ids(self):
+    # The n-grams don't fit in an int64, so the sentences are scored one by one.
+    eval_sentences = np.array([[2 ** 40, 1, 2 ** 40]], np.int64)
+    ref_sentences = np.array([[2 ** 40, 1, 3]], np.int64)
+    self.assertAlmostEqual(
+        0.5, metrics.rouge_n(eval_sentences, ref_sentences, n=2), places=6)
+
+  def test_rouge_l_sentence_level(self):
+    rng = np.random.RandomState(3)
+    eval_sentences = _random_sentences(rng, 4, 40, 10)
+    ref_sentences = _random_sentences(rng, 4, 30, 10)
+    f1_scores = []
+    for eval_sentence, ref_sentence in zip(eval_sentences, ref_sentences):
+      table = metrics._lcs(eval_sentence, ref_sentence)
+      f1_scores.append(metrics._f_lcs(
+          table[len(eval_sentence), len(ref_sentence)],
+          float(len(ref_sentence)), float(len(eval_sentence))))
+    self.assertEqual(
+        np.mean(f1_scores, dtype=np.float32),
+        metrics.rouge_l_sentence_level(eval_sentences, ref_sentences))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -19,6 +19,8 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import functools
+import multiprocessing
 import re
 import sys
 import unicodedata
@@ -45,6 +47,10 @@ _UNESCAPE_REGEX = re.compile(r"\\u|\\\\|\\([0-9]+);")
 
 _UNDEFINED_UNICODE = u"\u3013"
 
+# Key under which a _SubtokenTrie node stores the id of the subtoken ending at
+# that node. Characters are never None, so this can't collide with a child.
+_TRIE_ID_KEY = None
+
 # Set contains all letter and number characters.
 _ALPHANUMERIC_CHAR_SET = set(
     six.unichr(i) for i in xrange(sys.maxunicode)
@@ -57,6 +63,10 @@ _ALPHANUMERIC_CHAR_SET = set(
 _MIN_MIN_COUNT = 1     # min value to use when binary searching for min_count
 _MAX_MIN_COUNT = 1000  # max value to use when binary searching for min_count
 
+# Number of shards the token counts are split into when counting subtokens in
+# a process pool. Using more shards than workers balances the load.
+_NUM_SUBTOKEN_COUNT_SHARDS = 16
+
 
 class Subtokenizer(object):
   """Encodes and decodes strings to/from integer IDs."""
@@ -76,6 +86,10 @@ class Subtokenizer(object):
     for subtoken in self.subtoken_list:
       self.max_subtoken_length = max(self.max_subtoken_length, len(subtoken))
 
+    # Precompiled prefix tree used to find the longest matching subtoken
+    # without probing the dictionary with every candidate substring.
+    self._trie = _SubtokenTrie(self.subtoken_to_id_dict)
+
     # Create cache to speed up subtokenization
     self._cache_size = 2 ** 20
     self._cache = [(None, None)] * self._cache_size
@@ -83,7 +97,7 @@ class Subtokenizer(object):
   @staticmethod
   def init_from_files(
       vocab_file, files, target_vocab_size, threshold, min_count=None,
-      file_byte_limit=1e6, reserved_tokens=None):
+      file_byte_limit=1e6, reserved_tokens=None, num_workers=1):
     """Create subtoken vocabulary based on files, and save vocab to file.
 
     Args:
@@ -99,6 +113,8 @@ class Subtokenizer(object):
         will be drawn from the files.
       reserved_tokens: List of string tokens that are guaranteed to be at the
         beginning of the subtoken vocabulary list.
+      num_workers: Number of processes used to count tokens and subtokens. If
+        1, the vocabulary is generated in the calling process.
 
     Returns:
       Subtokenizer object
@@ -110,11 +126,17 @@ class Subtokenizer(object):
       tf.logging.info("Vocab file already exists (%s)" % vocab_file)
     else:
       tf.logging.info("Begin steps to create subtoken vocabulary...")
-      token_counts = _count_tokens(files, file_byte_limit)
-      alphabet = _generate_alphabet_dict(token_counts)
-      subtoken_list = _generate_subtokens_with_target_vocab_size(
-          token_counts, alphabet, target_vocab_size, threshold, min_count,
-          reserved_tokens)
+      pool = multiprocessing.Pool(num_workers) if num_workers > 1 else None
+      try:
+        token_counts = _count_tokens(files, file_byte_limit, pool=pool)
+        alphabet = _generate_alphabet_dict(token_counts)
+        subtoken_list = _generate_subtokens_with_target_vocab_size(
+            token_counts, alphabet, target_vocab_size, threshold, min_count,
+            reserved_tokens, pool=pool)
+      finally:
+        if pool is not None:
+          pool.close()
+          pool.join()
       tf.logging.info("Generated vocabulary with %d subtokens." %
                       len(subtoken_list))
       _save_vocab_file(vocab_file, subtoken_list)
@@ -130,6 +152,36 @@ class Subtokenizer(object):
       ret.append(EOS_ID)
     return ret
 
+  def encode_batch(self, raw_strings, add_eos=False):
+    """Encodes a list of strings into a flat array of int subtoken ids.
+
+    Args:
+      raw_strings: List of strings to encode.
+      add_eos: If true, append EOS_ID to the ids of every string.
+
+    Returns:
+      Tuple of (ids, offsets). ids is an int32 numpy array containing the
+      concatenated subtoken ids of all strings. offsets is an int64 numpy array
+      of length len(raw_strings) + 1, so that the ids of string i are
+      ids[offsets[i]:offsets[i + 1]].
+    """
+    ids = []
+    offsets = [0]
+    # Tokens repeat heavily within a batch, so a dict memoizes them without
+    # the collisions of the fixed size cache used by encode().
+    token_cache = {}
+    for raw_string in raw_strings:
+      for token in _split_string_to_tokens(_native_to_unicode(raw_string)):
+        token_ids = token_cache.get(token)
+        if token_ids is None:
+          token_ids = self._trie.split(_escape_token(token, self.alphabet))
+          token_cache[token] = token_ids
+        ids.extend(token_ids)
+      if add_eos:
+        ids.append(EOS_ID)
+      offsets.append(len(ids))
+    return np.array(ids, dtype=np.int32), np.array(offsets, dtype=np.int64)
+
   def _token_to_subtoken_ids(self, token):
     """Encode a single token into a list of subtoken ids."""
     cache_location = hash(token) % self._cache_size
@@ -137,10 +189,7 @@ class Subtokenizer(object):
     if cache_key == token:
       return cache_value
 
-    ret = _split_token_to_subtokens(
-        _escape_token(token, self.alphabet), self.subtoken_to_id_dict,
-        self.max_subtoken_length)
-    ret = [self.subtoken_to_id_dict[subtoken_id] for subtoken_id in ret]
+    ret = self._trie.split(_escape_token(token, self.alphabet))
 
     self._cache[cache_location] = (token, ret)
     return ret
@@ -177,6 +226,63 @@ class Subtokenizer(object):
     return ret
 
 
+class _SubtokenTrie(object):
+  """Prefix tree over the subtoken vocabulary.
+
+  Each node is a dict mapping the next character to a child node. Nodes that
+  terminate a subtoken additionally map _TRIE_ID_KEY to the subtoken's id.
+  Greedy longest-match splitting walks the tree once from each start position,
+  instead of slicing and looking up every candidate substring.
+  """
+
+  def __init__(self, subtoken_dict):
+    """Builds the tree from a dict mapping subtokens to ids."""
+    self._root = {}
+    for subtoken, subtoken_id in six.iteritems(subtoken_dict):
+      node = self._root
+      for c in subtoken:
+        node = node.setdefault(c, {})
+      node[_TRIE_ID_KEY] = subtoken_id
+
+  def split(self, token):
+    """Splits an escaped token into the ids of its longest-match subtokens.
+
+    Produces the same ids as looking up the results of
+    _split_token_to_subtokens() in the subtoken dict.
+
+    Args:
+      token: escaped unicode string.
+
+    Returns:
+      List of int subtoken ids.
+
+    Raises:
+      ValueError: if a character in the token is not in the vocabulary.
+    """
+    ret = []
+    root = self._root
+    start = 0
+    token_len = len(token)
+    while start < token_len:
+      node = root
+      match_id, match_end = None, start
+      pos = start
+      while pos < token_len:
+        node = node.get(token[pos])
+        if node is None:
+          break
+        pos += 1
+        subtoken_id = node.get(_TRIE_ID_KEY)
+        if subtoken_id is not None:
+          match_id, match_end = subtoken_id, pos
+      if match_id is None:
+        raise ValueError("Was unable to split token \"%s\" into subtokens." %
+                         token)
+      ret.append(match_id)
+      start = match_end
+    return ret
+
+
 def _save_vocab_file(vocab_file, subtoken_list):
   """Save subtokens to file."""
   with tf.gfile.Open(vocab_file, mode="w") as f:
@@ -322,7 +428,7 @@ def _unescape_token(token):
   return _UNESCAPE_REGEX.sub(match, token)
 
 
-def _count_tokens(files, file_byte_limit=1e6):
+def _count_tokens(files, file_byte_limit=1e6, pool=None):
   """Return token counts of words in the files.
 
   Samples file_byte_limit bytes from each file, and counts the words that appear
@@ -331,34 +437,52 @@ def _count_tokens(files, file_byte_limit=1e6):
   Args:
     files: List of filepaths
     file_byte_limit: Max number of bytes that will be read from each file.
+    pool: Optional multiprocessing.Pool. If given, each file is counted in a
+      separate worker and the counts are merged.
 
   Returns:
     Dictionary mapping tokens to the number of times they appear in the sampled
     lines from the files.
   """
-  token_counts = collections.defaultdict(int)
+  count_fn = functools.partial(
+      _count_tokens_in_file, file_byte_limit=file_byte_limit)
+  if pool is None:
+    return _merge_counts(count_fn(filepath) for filepath in files)
+  return _merge_counts(pool.imap_unordered(count_fn, files))
+
 
-  for filepath in files:
-    with tf.gfile.Open(filepath, mode="r") as reader:
-      file_byte_budget = file_byte_limit
-      counter = 0
-      lines_to_skip = int(reader.size() / (file_byte_budget * 2))
-      for line in reader:
-        if counter < lines_to_skip:
-          counter += 1
-        else:
-          if file_byte_budget < 0:
-            break
-          line = line.strip()
-          file_byte_budget -= len(line)
-          counter = 0
-
-          # Add words to token counts
-          for token in _split_string_to_tokens(_native_to_unicode(line)):
-            token_counts[token] += 1
+def _count_tokens_in_file(filepath, file_byte_limit=1e6):
+  """Return token counts of words sampled from a single file."""
+  token_counts = collections.defaultdict(int)
+  with tf.gfile.Open(filepath, mode="r") as reader:
+    file_byte_budget = file_byte_limit
+    counter = 0
+    lines_to_skip = int(reader.size() / (file_byte_budget * 2))
+    for line in reader:
+      if counter < lines_to_skip:
+        counter += 1
+      else:
+        if file_byte_budget < 0:
+          break
+        line = line.strip()
+        file_byte_budget -= len(line)
+        counter = 0
+
+        # Add words to token counts
+        for token in _split_string_to_tokens(_native_to_unicode(line)):
+          token_counts[token] += 1
   return token_counts
 
 
+def _merge_counts(counts_iterable):
+  """Sum an iterable of dicts mapping keys to int counts into a defaultdict."""
+  merged = collections.defaultdict(int)
+  for counts in counts_iterable:
+    for key, count in six.iteritems(counts):
+      merged[key] += count
+  return merged
+
+
 def _list_to_index_dict(lst):
   """Create dictionary mapping list items to their indices in the list."""
   return {item: n for n, item in enumerate(lst)}
@@ -388,7 +512,7 @@ def _split_token_to_subtokens(token, subtoken_dict, max_subtoken_length):
 
 def _generate_subtokens_with_target_vocab_size(
     token_counts, alphabet, target_size, threshold, min_count=None,
-    reserved_tokens=None):
+    reserved_tokens=None, pool=None):
   """Generate subtoken vocabulary close to the target size."""
   if reserved_tokens is None:
     reserved_tokens = RESERVED_TOKENS
@@ -397,7 +521,16 @@ def _generate_subtokens_with_target_vocab_size(
     tf.logging.info("Using min_count=%d to generate vocab with target size %d" %
                     (min_count, target_size))
     return _generate_subtokens(
-        token_counts, alphabet, min_count, reserved_tokens=reserved_tokens)
+        token_counts, alphabet, min_count, reserved_tokens=reserved_tokens,
+        pool=pool)
+
+  # The first iteration of _generate_subtokens splits tokens using only the
+  # alphabet, so its subtoken counts are the same for every min_count. Escape
+  # the tokens and count these subtokens once for the whole binary search.
+  escaped_token_counts = _escape_token_counts(token_counts, alphabet)
+  initial_subtoken_counts = _count_and_gen_escaped_subtokens(
+      escaped_token_counts, _initial_subtoken_dict(alphabet, reserved_tokens),
+      1, pool=pool)
 
   def bisect(min_val, max_val):
     """Recursive function to binary search for subtoken vocabulary."""
@@ -405,7 +538,9 @@ def _generate_subtokens_with_target_vocab_size(
     tf.logging.info("Binary search: trying min_count=%d (%d %d)" %
                     (cur_count, min_val, max_val))
     subtoken_list = _generate_subtokens(
-        token_counts, alphabet, cur_count, reserved_tokens=reserved_tokens)
+        token_counts, alphabet, cur_count, reserved_tokens=reserved_tokens,
+        pool=pool, escaped_token_counts=escaped_token_counts,
+        initial_subtoken_counts=initial_subtoken_counts)
 
     val = len(subtoken_list)
     tf.logging.info("Binary search: min_count=%d resulted in %d tokens" %
@@ -440,8 +575,22 @@ def _generate_alphabet_dict(iterable, reserved_tokens=None):
   return alphabet
 
 
+def _escape_token_counts(token_counts, alphabet):
+  """Return a dict mapping escaped tokens to their counts.
+
+  _escape_token() is reversible, so no two tokens share an escaped form.
+  """
+  return {_escape_token(token, alphabet): count
+          for token, count in six.iteritems(token_counts)}
+
+
+def _initial_subtoken_dict(alphabet, reserved_tokens):
+  """Return the subtoken dict used by the first iteration of subtoken search."""
+  return _list_to_index_dict(reserved_tokens + list(alphabet))
+
+
 def _count_and_gen_subtokens(
-    token_counts, alphabet, subtoken_dict, max_subtoken_length):
+    token_counts, alphabet, subtoken_dict, max_subtoken_length, pool=None):
   """Count number of times subtokens appear, and generate new subtokens.
 
   Args:
@@ -451,14 +600,40 @@ def _count_and_gen_subtokens(
       guarantees that all tokens can be split into subtokens.
     subtoken_dict: dict mapping subtokens to ids.
     max_subtoken_length: maximum length of subtoken in subtoken_dict.
+    pool: Optional multiprocessing.Pool used to count shards of the tokens in
+      parallel.
 
   Returns:
     A defaultdict mapping subtokens to the number of times they appear in the
     tokens. The dict may contain new subtokens.
   """
+  return _count_and_gen_escaped_subtokens(
+      _escape_token_counts(token_counts, alphabet), subtoken_dict,
+      max_subtoken_length, pool=pool)
+
+
+def _count_and_gen_escaped_subtokens(
+    escaped_token_counts, subtoken_dict, max_subtoken_length, pool=None):
+  """Same as _count_and_gen_subtokens(), for tokens that are already escaped."""
+  if pool is None:
+    return _count_and_gen_subtokens_in_shard(
+        six.iteritems(escaped_token_counts), subtoken_dict, max_subtoken_length)
+
+  # Split the tokens into more shards than workers to balance the load.
+  items = list(six.iteritems(escaped_token_counts))
+  shards = [items[i::_NUM_SUBTOKEN_COUNT_SHARDS]
+            for i in xrange(_NUM_SUBTOKEN_COUNT_SHARDS)]
+  count_fn = functools.partial(
+      _count_and_gen_subtokens_in_shard, subtoken_dict=subtoken_dict,
+      max_subtoken_length=max_subtoken_length)
+  return _merge_counts(pool.imap_unordered(count_fn, shards))
+
+
+def _count_and_gen_subtokens_in_shard(
+    token_count_pairs, subtoken_dict, max_subtoken_length):
+  """Count and generate subtokens from (escaped token, count) pairs."""
   subtoken_counts = collections.defaultdict(int)
-  for token, count in six.iteritems(token_counts):
-    token = _escape_token(token, alphabet)
+  for token, count in token_count_pairs:
     subtokens = _split_token_to_subtokens(
         token, subtoken_dict, max_subtoken_length)
 
@@ -568,7 +743,8 @@ def _gen_new_subtoken_list(
 
 def _generate_subtokens(
     token_counts, alphabet, min_count, num_iterations=4,
-    reserved_tokens=None):
+    reserved_tokens=None, pool=None, escaped_token_counts=None,
+    initial_subtoken_counts=None):
   """Create a list of subtokens in decreasing order of frequency.
 
   Args:
@@ -579,12 +755,20 @@ def _generate_subtokens(
     num_iterations: int number of iterations to generate new tokens.
     reserved_tokens: list of tokens that will be added to the beginning to the
       returned subtoken list.
+    pool: Optional multiprocessing.Pool used to count subtokens in parallel.
+    escaped_token_counts: Optional precomputed result of
+      _escape_token_counts(token_counts, alphabet).
+    initial_subtoken_counts: Optional precomputed subtoken counts of the first
+      iteration, which only depend on the tokens and the alphabet. This dict is
+      not modified.
 
   Returns:
     Sorted list of subtokens (most frequent first)
   """
   if reserved_tokens is None:
     reserved_tokens = RESERVED_TOKENS
+  if escaped_token_counts is None:
+    escaped_token_counts = _escape_token_counts(token_counts, alphabet)
 
   # Use alphabet set to create initial list of subtokens
   subtoken_list = reserved_tokens + list(alphabet)
@@ -599,9 +783,13 @@ def _generate_subtokens(
     subtoken_dict = _list_to_index_dict(subtoken_list)
 
     # Create dict mapping subtoken->count, with additional subtokens created
-    # from substrings taken from the tokens.
-    subtoken_counts = _count_and_gen_subtokens(
-        token_counts, alphabet, subtoken_dict, max_subtoken_length)
+    # from substrings taken from the tokens. _gen_new_subtoken_list() modifies
+    # the counts, so the cached first iteration counts are copied.
+    if i == 0 and initial_subtoken_counts is not None:
+      subtoken_counts = collections.defaultdict(int, initial_subtoken_counts)
+    else:
+      subtoken_counts = _count_and_gen_escaped_subtokens(
+          escaped_token_counts, subtoken_dict, max_subtoken_length, pool=pool)
 
     # Generate new list of subtokens sorted by subtoken count.
     subtoken_list, max_subtoken_length = _gen_new_subtoken_list(
@@ -0,0 +1,128 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmark Subtokenizer.encode_batch against the dictionary probing encoder.
+
+Example:
+  python tokenizer_benchmark.py --vocab_file=/tmp/translate_ende/vocab.ende.32768 \
+      --file=/tmp/translate_ende_raw/newstest2013.en
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+# pylint: disable=g-bad-import-order
+from absl import app as absl_app
+from absl import flags
+import tensorflow as tf
+# pylint: enable=g-bad-import-order
+
+from official.transformer.utils import tokenizer
+from official.utils.flags import core as flags_core
+
+
+def _encode_with_dict(subtokenizer, raw_string):
+  """Encodes a string by probing the subtoken dict with every substring."""
+  # pylint: disable=protected-access
+  ret = []
+  for token in tokenizer._split_string_to_tokens(
+      tokenizer._native_to_unicode(raw_string)):
+    subtokens = tokenizer._split_token_to_subtokens(
+        tokenizer._escape_token(token, subtokenizer.alphabet),
+        subtokenizer.subtoken_to_id_dict, subtokenizer.max_subtoken_length)
+    ret.extend(subtokenizer.subtoken_to_id_dict[s] for s in subtokens)
+  return ret
+
+
+def run_benchmark(subtokenizer, lines):
+  """Times both encoders on the lines and checks that the ids are identical.
+
+  Args:
+    subtokenizer: Subtokenizer object.
+    lines: List of strings to encode.
+
+  Returns:
+    Dictionary with the wall time of each encoder and the speedup.
+
+  Raises:
+    ValueError: if the encoders produce different ids.
+  """
+  start = time.time()
+  expected = [_encode_with_dict(subtokenizer, line) for line in lines]
+  dict_time = time.time() - start
+
+  start = time.time()
+  ids, offsets = subtokenizer.encode_batch(lines)
+  batch_time = time.time() - start
+
+  for i, expected_ids in enumerate(expected):
+    if ids[offsets[i]:offsets[i + 1]].tolist() != expected_ids:
+      raise ValueError("encode_batch produced different ids for line %d: %s" %
+                       (i, lines[i]))
+
+  return {
+      "num_lines": len(lines),
+      "num_subtokens": len(ids),
+      "dict_encode_sec": dict_time,
+      "encode_batch_sec": batch_time,
+      "speedup": dict_time / max(batch_time, 1e-9),
+  }
+
+
+def main(unused_argv):
+  subtokenizer = tokenizer.Subtokenizer(FLAGS.vocab_file)
+  with tf.gfile.Open(FLAGS.file) as f:
+    lines = [line.strip() for line in f]
+  if FLAGS.max_lines:
+    lines = lines[:FLAGS.max_lines]
+
+  results = run_benchmark(subtokenizer, lines)
+  tf.logging.info(
+      "Encoded %d lines into %d subtokens (ids identical)." %
+      (results["num_lines"], results["num_subtokens"]))
+  tf.logging.info("Dict probing encoder: %.3f sec (%.1f lines/sec)" %
+                  (results["dict_encode_sec"],
+                   results["num_lines"] / results["dict_encode_sec"]))
+  tf.logging.info("encode_batch (trie):  %.3f sec (%.1f lines/sec)" %
+                  (results["encode_batch_sec"],
+                   results["num_lines"] / results["encode_batch_sec"]))
+  tf.logging.info("Speedup: %.2fx" % results["speedup"])
+
+
+def define_tokenizer_benchmark_flags():
+  """Add flags for benchmarking the Subtokenizer."""
+  flags.DEFINE_string(
+      name="vocab_file", short_name="vf", default=None,
+      help=flags_core.help_wrap("Path to the subtoken vocabulary file."))
+  flags.mark_flag_as_required("vocab_file")
+
+  flags.DEFINE_string(
+      name="file", short_name="f", default=None,
+      help=flags_core.help_wrap("File containing one sentence per line."))
+  flags.mark_flag_as_required("file")
+
+  flags.DEFINE_integer(
+      name="max_lines", short_name="ml", default=0,
+      help=flags_core.help_wrap(
+          "If positive, only encode the first max_lines lines of the file."))
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  define_tokenizer_benchmark_flags()
+  FLAGS = flags.FLAGS
+  absl_app.run(main)
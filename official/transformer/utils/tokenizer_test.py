@@ -15,6 +15,7 @@
 """Test Subtokenizer and string helper methods."""
 
 import collections
+import multiprocessing
 import tempfile
 import unittest
 
@@ -40,6 +41,23 @@ class SubtokenizerTest(unittest.TestCase):
     encoded_list = subtokenizer.encode(s)
     self.assertEqual([1, 2, 0], encoded_list)
 
+  def test_encode_batch(self):
+    vocab_list = ["123_", "test", "ing_"]
+    subtokenizer = self._init_subtokenizer(vocab_list)
+    ids, offsets = subtokenizer.encode_batch(["testing 123", "123", ""])
+    self.assertEqual([1, 2, 0, 0], ids.tolist())
+    self.assertEqual([0, 3, 4, 4], offsets.tolist())
+
+  def test_encode_batch_matches_encode(self):
+    vocab_list = ["<pad>", "<EOS>", "123_", "test", "ing_", "t", "e", "s",
+                  "i", "n", "g", "_", "1", "2", "3", " ", "tes", "te"]
+    subtokenizer = self._init_subtokenizer(vocab_list)
+    strings = ["testing 123", "test test", "123 testing tests"]
+    ids, offsets = subtokenizer.encode_batch(strings, add_eos=True)
+    for i, s in enumerate(strings):
+      self.assertEqual(subtokenizer.encode(s, add_eos=True),
+                       ids[offsets[i]:offsets[i + 1]].tolist())
+
   def test_decode(self):
     vocab_list = ["123_", "test", "ing_"]
     subtokenizer = self._init_subtokenizer(vocab_list)
@@ -98,6 +116,18 @@ class StringHelperTest(unittest.TestCase):
         token, subtoken_dict, max_subtoken_length)
     self.assertEqual(["ab", "c"], subtokens)
 
+  def test_subtoken_trie_split(self):
+    subtoken_dict = {"a": 0, "b": 1, "c": 2, "ab": 3, "abcd": 4}
+    trie = tokenizer._SubtokenTrie(subtoken_dict)
+
+    for token in ["abc", "abcd", "abcab", "cba"]:
+      expected = [subtoken_dict[t] for t in tokenizer._split_token_to_subtokens(
+          token, subtoken_dict, 4)]
+      self.assertEqual(expected, trie.split(token))
+
+    with self.assertRaises(ValueError):
+      trie.split("abx")
+
   def test_generate_alphabet_dict(self):
     s = ["testing", "123"]
     reserved_tokens = ["???"]
@@ -128,6 +158,32 @@ class StringHelperTest(unittest.TestCase):
         {"a": 5, "b": 5, "c": 5, "_": 5, "ab": 5, "bc": 5, "c_": 5,
          "abc": 5, "bc_": 5, "abc_": 5}, subtoken_counts)
 
+  def test_count_and_gen_subtokens_with_pool(self):
+    token_counts = {"abc": 5, "bcd": 2, "ab": 1, "d": 7}
+    alphabet = set("abcd_")
+    subtoken_dict = {"a": 0, "b": 1, "c": 2, "d": 3, "_": 4, "ab": 5}
+    max_subtoken_length = 2
+
+    expected = tokenizer._count_and_gen_subtokens(
+        token_counts, alphabet, subtoken_dict, max_subtoken_length)
+    pool = multiprocessing.Pool(2)
+    try:
+      subtoken_counts = tokenizer._count_and_gen_subtokens(
+          token_counts, alphabet, subtoken_dict, max_subtoken_length,
+          pool=pool)
+    finally:
+      pool.close()
+      pool.join()
+
+    self.assertIsInstance(subtoken_counts, collections.defaultdict)
+    self.assertDictEqual(expected, subtoken_counts)
+
+  def test_merge_counts(self):
+    merged = tokenizer._merge_counts([{"a": 1, "b": 2}, {"b": 3, "c": 4}])
+    self.assertIsInstance(merged, collections.defaultdict)
+    self.assertDictEqual({"a": 1, "b": 5, "c": 4}, merged)
+    self.assertDictEqual({}, tokenizer._merge_counts([]))
+
   def test_filter_and_bucket_subtokens(self):
     subtoken_counts = collections.defaultdict(
         int, {"a": 2, "b": 4, "c": 1, "ab": 6, "ac": 3, "abbc": 5})
@@ -178,6 +234,30 @@ class StringHelperTest(unittest.TestCase):
     for c in alphabet:
       self.assertIn(c, vocab_list)
 
+  def test_generate_subtokens_with_initial_subtoken_counts(self):
+    token_counts = {"ab": 1, "bc": 3, "abc": 5, "abcabc": 4}
+    alphabet = set("abc_")
+    min_count = 3
+    reserved_tokens = ["reserved", "tokens"]
+
+    escaped_token_counts = tokenizer._escape_token_counts(
+        token_counts, alphabet)
+    initial_subtoken_counts = tokenizer._count_and_gen_escaped_subtokens(
+        escaped_token_counts,
+        tokenizer._initial_subtoken_dict(alphabet, reserved_tokens), 1)
+    initial_copy = dict(initial_subtoken_counts)
+
+    expected = tokenizer._generate_subtokens(
+        token_counts, alphabet, min_count, reserved_tokens=reserved_tokens)
+    vocab_list = tokenizer._generate_subtokens(
+        token_counts, alphabet, min_count, reserved_tokens=reserved_tokens,
+        escaped_token_counts=escaped_token_counts,
+        initial_subtoken_counts=initial_subtoken_counts)
+
+    self.assertEqual(expected, vocab_list)
+    # The cached counts are reused across calls, so they must not change.
+    self.assertDictEqual(initial_copy, initial_subtoken_counts)
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -12,11 +12,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ==============================================================================
-"""Evaluation of playing games between two neural nets."""
+"""Evaluation of playing games between two neural nets.
+
+play_match plays the games one at a time with two loaded DualNetRunners.
+play_match_parallel spreads the games over a pool of processes which each load
+the two models once, streams their results as they finish, writes their sgf
+files in a background thread, and stops the match as soon as a sequential
+probability ratio test (SPRT) decides the winner.
+"""
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import math
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import os
 import time
 
@@ -25,6 +35,88 @@ from gtp_wrapper import MCTSPlayer
 import sgf_wrapper
 
 
+def _make_players(params, black_net, white_net, verbosity):
+  black = MCTSPlayer(
+      params.board_size, black_net, verbosity=verbosity, two_player_mode=True,
+      num_parallel=params.simultaneous_leaves)
+  white = MCTSPlayer(
+      params.board_size, white_net, verbosity=verbosity, two_player_mode=True,
+      num_parallel=params.simultaneous_leaves)
+  return black, white
+
+
+def _play_game(black, white, readouts, verbosity):
+  """Plays a game between two players and returns the final player.
+
+  Args:
+    black: The MCTSPlayer to play as black.
+    white: The MCTSPlayer to play as white.
+    readouts: Number of readouts to perform for each step in each game.
+    verbosity: Verbosity to show evaluation process.
+
+  Returns:
+    The player which played the last move, with the result of the game.
+  """
+  num_move = 0  # The move number of the current game
+
+  black.initialize_game()
+  white.initialize_game()
+
+  while True:
+    start = time.time()
+    active = white if num_move % 2 else black
+    inactive = black if num_move % 2 else white
+
+    current_readouts = active.root.N
+    while active.root.N < current_readouts + readouts:
+      active.tree_search()
+
+    # print some stats on the search
+    if verbosity >= 3:
+      print(active.root.position)
+
+    # First, check the roots for hopeless games.
+    if active.should_resign():  # Force resign
+      active.set_result(-active.root.position.to_play, was_resign=True)
+      inactive.set_result(
+          active.root.position.to_play, was_resign=True)
+
+    if active.is_done():
+      return active
+
+    move = active.pick_move()
+    active.play_move(move)
+    inactive.play_move(move)
+
+    dur = time.time() - start
+    num_move += 1
+
+    if (verbosity > 1) or (verbosity == 1 and num_move % 10 == 9):
+      timeper = (dur / readouts) * 100.0
+      print(active.root.position)
+      print('{:d}: {:d} readouts, {:.3f} s/100. ({:.2f} sec)'.format(
+          num_move, readouts, timeper, dur))
+
+
+def _sgf_path(sgf_dir, black_name, white_name, game_index):
+  fname = '{:d}-{:s}-vs-{:s}-{:d}.sgf'.format(
+      int(time.time()), white_name, black_name, game_index)
+  return os.path.join(sgf_dir, fname)
+
+
+def _write_sgf(path, sgf):
+  with open(path, 'w') as f:
+    f.write(sgf)
+
+
+def _match_winner(params, black_win_counts, white_win_counts, games):
+  """Returns the winner of a match by the eval_win_rate margin."""
+  if (black_win_counts - white_win_counts) > params.eval_win_rate * games:
+    return go.BLACK_NAME
+  else:
+    return go.WHITE_NAME
+
+
 def play_match(params, black_net, white_net, games, readouts,
                sgf_dir, verbosity):
   """Plays matches between two neural nets.
@@ -44,12 +136,7 @@ def play_match(params, black_net, white_net, games, readouts,
     'B' is the winner is black_net, otherwise 'W'.
   """
   # For n games, we create lists of n black and n white players
-  black = MCTSPlayer(
-      params.board_size, black_net, verbosity=verbosity, two_player_mode=True,
-      num_parallel=params.simultaneous_leaves)
-  white = MCTSPlayer(
-      params.board_size, white_net, verbosity=verbosity, two_player_mode=True,
-      num_parallel=params.simultaneous_leaves)
+  black, white = _make_players(params, black_net, white_net, verbosity)
 
   black_name = os.path.basename(black_net.save_file)
   white_name = os.path.basename(white_net.save_file)
@@ -58,61 +145,224 @@ def play_match(params, black_net, white_net, games, readouts,
   white_win_counts = 0
 
   for i in range(games):
-    num_move = 0  # The move number of the current game
-
-    black.initialize_game()
-    white.initialize_game()
-
-    while True:
-      start = time.time()
-      active = white if num_move % 2 else black
-      inactive = black if num_move % 2 else white
-
-      current_readouts = active.root.N
-      while active.root.N < current_readouts + readouts:
-        active.tree_search()
-
-      # print some stats on the search
-      if verbosity >= 3:
-        print(active.root.position)
-
-      # First, check the roots for hopeless games.
-      if active.should_resign():  # Force resign
-        active.set_result(-active.root.position.to_play, was_resign=True)
-        inactive.set_result(
-            active.root.position.to_play, was_resign=True)
-
-      if active.is_done():
-        fname = '{:d}-{:s}-vs-{:s}-{:d}.sgf'.format(
-            int(time.time()), white_name, black_name, i)
-        with open(os.path.join(sgf_dir, fname), 'w') as f:
-          sgfstr = sgf_wrapper.make_sgf(
-              params.board_size, active.position.recent, active.result_string,
-              black_name=black_name, white_name=white_name)
-          f.write(sgfstr)
-        print('Finished game', i, active.result_string)
-        if active.result_string is not None:
-          if active.result_string[0] == 'B':
-            black_win_counts += 1
-          elif active.result_string[0] == 'W':
-            white_win_counts += 1
+    active = _play_game(black, white, readouts, verbosity)
+    _write_sgf(
+        _sgf_path(sgf_dir, black_name, white_name, i),
+        sgf_wrapper.make_sgf(
+            params.board_size, active.position.recent, active.result_string,
+            black_name=black_name, white_name=white_name))
+    print('Finished game', i, active.result_string)
+    if active.result_string is not None:
+      if active.result_string[0] == 'B':
+        black_win_counts += 1
+      elif active.result_string[0] == 'W':
+        white_win_counts += 1
 
-        break
+  return _match_winner(params, black_win_counts, white_win_counts, games)
 
-      move = active.pick_move()
-      active.play_move(move)
-      inactive.play_move(move)
 
-      dur = time.time() - start
-      num_move += 1
+class SPRT(object):
+  """A sequential probability ratio test of the win rate of black.
 
-      if (verbosity > 1) or (verbosity == 1 and num_move % 10 == 9):
-        timeper = (dur / readouts) * 100.0
-        print(active.root.position)
-        print('{:d}: {:d} readouts, {:.3f} s/100. ({:.2f} sec)'.format(
-            num_move, readouts, timeper, dur))
+  The test decides between the hypotheses that black wins with probability
+  p0 and with probability p1 > p0, with error rates alpha of wrongly accepting
+  p1 and beta of wrongly accepting p0.
 
-  if (black_win_counts - white_win_counts) > params.eval_win_rate * games:
-    return go.BLACK_NAME
-  else:
-    return go.WHITE_NAME
+  Attributes:
+    llr: The log likelihood ratio of p1 over p0 of the results so far.
+  """
+
+  def __init__(self, p0, p1, alpha, beta):
+    self.p0 = p0
+    self.p1 = p1
+    self.lower_bound = math.log(beta / (1 - alpha))
+    self.upper_bound = math.log((1 - beta) / alpha)
+    self.llr = 0.0
+
+  def update(self, black_won):
+    """Adds the result of a game.
+
+    Args:
+      black_won: Whether black won the game.
+
+    Returns:
+      True once p1 is accepted, False once p0 is accepted, None until then.
+    """
+    if black_won:
+      self.llr += math.log(self.p1 / self.p0)
+    else:
+      self.llr += math.log((1 - self.p1) / (1 - self.p0))
+    return self.decision()
+
+  def decision(self):
+    if self.llr >= self.upper_bound:
+      return True
+    if self.llr <= self.lower_bound:
+      return False
+    return None
+
+
+def match_sprt(params):
+  """Returns the SPRT of the eval_win_rate margin of play_match.
+
+  Black wins a match by that margin if it wins more than
+  (1 + eval_win_rate) / 2 of the games. The test decides whether black wins
+  eval_sprt_margin more or less often than that.
+
+  Args:
+    params: An object of hyperparameters.
+  """
+  threshold = (1 + params.eval_win_rate) / 2
+  return SPRT(max(threshold - params.eval_sprt_margin, 1e-3),
+              min(threshold + params.eval_sprt_margin, 1 - 1e-3),
+              params.eval_sprt_alpha, params.eval_sprt_beta)
+
+
+def _load_network(model_path, params):
+  import dualnet  # pylint: disable=g-import-not-at-top
+  return dualnet.DualNetRunner(model_path, params)
+
+
+# The players of the worker process of play_match_games.
+_worker_state = {}
+
+
+def _init_worker(params, black_model, white_model, readouts, verbosity,
+                 load_network):
+  try:
+    black_net = load_network(black_model, params)
+    white_net = load_network(white_model, params)
+  except Exception as e:  # pylint: disable=broad-except
+    # The pool would restart a failing worker forever, the error is raised
+    # by its games instead.
+    _worker_state['error'] = e
+    return
+  black, white = _make_players(params, black_net, white_net, verbosity)
+  _worker_state.update(
+      params=params, black=black, white=white, readouts=readouts,
+      verbosity=verbosity, black_name=os.path.basename(black_model),
+      white_name=os.path.basename(white_model))
+
+
+def _play_worker_game(game_index):
+  state = _worker_state
+  if 'error' in state:
+    raise state['error']
+  active = _play_game(state['black'], state['white'], state['readouts'],
+                      state['verbosity'])
+  sgf = sgf_wrapper.make_sgf(
+      state['params'].board_size, active.position.recent,
+      active.result_string, black_name=state['black_name'],
+      white_name=state['white_name'])
+  return game_index, active.result_string, sgf
+
+
+def play_match_games(params, black_model, white_model, games, readouts,
+                     verbosity, num_workers, load_network=_load_network):
+  """Plays games between two models in a pool of processes.
+
+  Each process loads the two models once and plays games until all the games
+  are played or the generator is closed, which terminates the processes.
+
+  Args:
+    params: An object of hyperparameters.
+    black_model: The path of the model to play as black.
+    white_model: The path of the model to play as white.
+    games: Number of games to play.
+    readouts: Number of readouts to perform for each step in each game.
+    verbosity: Verbosity to show evaluation process.
+    num_workers: The number of processes playing games.
+    load_network: A function of a model path and params, which returns the
+      network of the model. It must be picklable.
+
+  Yields:
+    The index of a game, its result string and its sgf, in the order the games
+    finish.
+  """
+  # TensorFlow is not fork-safe, so the workers are new processes.
+  context = multiprocessing.get_context('spawn')
+  pool = context.Pool(
+      num_workers, initializer=_init_worker,
+      initargs=(params, black_model, white_model, readouts, verbosity,
+                load_network))
+  try:
+    for result in pool.imap_unordered(_play_worker_game, range(games)):
+      yield result
+  finally:
+    pool.terminate()
+    pool.join()
+
+
+def play_match_parallel(params, black_model, white_model, games, readouts,
+                        sgf_dir, verbosity, num_workers,
+                        load_network=_load_network):
+  """Plays a match between two models in a pool of processes.
+
+  The match stops as soon as match_sprt decides the winner. Otherwise, the
+  winner is decided by the margin of play_match once all the games are played.
+
+  The games finish out of order, and the quick ones, like resignations, tend
+  to finish first. The SPRT is thus updated with the games in the order of
+  their index, once all the games before them finished, so that its decision
+  does not depend on the speed of the games.
+
+  Args:
+    params: An object of hyperparameters.
+    black_model: The path of the model to play as black.
+    white_model: The path of the model to play as white.
+    games: The maximum number of games to play.
+    readouts: Number of readouts to perform for each step in each game.
+    sgf_dir: Directory to write the sgf results.
+    verbosity: Verbosity to show evaluation process.
+    num_workers: The number of processes playing games.
+    load_network: A function of a model path and params, which returns the
+      network of the model. It must be picklable.
+
+  Returns:
+    'B' is the winner is black_model, otherwise 'W'.
+  """
+  black_name = os.path.basename(black_model)
+  white_name = os.path.basename(white_model)
+  sprt = match_sprt(params)
+  black_win_counts = 0
+  white_win_counts = 0
+  num_games = 0
+  # The results of the finished games which the SPRT did not see yet.
+  finished_results = {}
+  decision = None
+
+  sgf_writer = ThreadPool(1)
+  sgf_writes = []
+  results = play_match_games(params, black_model, white_model, games,
+                             readouts, verbosity, num_workers, load_network)
+  try:
+    for game_index, result_string, sgf in results:
+      sgf_writes.append(sgf_writer.apply_async(_write_sgf, (
+          _sgf_path(sgf_dir, black_name, white_name, game_index), sgf)))
+      print('Finished game', game_index, result_string)
+      finished_results[game_index] = result_string
+      while decision is None and num_games in finished_results:
+        result_string = finished_results.pop(num_games)
+        num_games += 1
+        if result_string is None:
+          continue
+        if result_string[0] == 'B':
+          black_win_counts += 1
+        elif result_string[0] == 'W':
+          white_win_counts += 1
+        decision = sprt.update(result_string[0] == 'B')
+      if decision is not None:
+        print('SPRT decided after {} games, LLR {:.2f}'.format(
+            num_games, sprt.llr))
+        break
+  finally:
+    results.close()
+    sgf_writer.close()
+    sgf_writer.join()
+  for sgf_write in sgf_writes:
+    # Raises the error of a failed write.
+    sgf_write.get()
+
+  if decision is not None:
+    return go.BLACK_NAME if decision else go.WHITE_NAME
+  return _match_winner(params, black_win_counts, white_win_counts, games)
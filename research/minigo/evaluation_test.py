@@ -0,0 +1,113 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for evaluation."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import functools
+import os
+import tempfile
+import unittest.mock
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+import evaluation
+import go
+import model_params
+from strategies_test import load_dummy_net
+import utils_test
+
+tf.logging.set_verbosity(tf.logging.ERROR)
+
+
+class TestSPRT(utils_test.MiniGoUnitTest):
+
+  def test_decides_for_p1(self):
+    sprt = evaluation.SPRT(p0=0.4, p1=0.6, alpha=0.05, beta=0.05)
+    decisions = [sprt.update(True) for _ in range(8)]
+    self.assertEqual([None] * 7 + [True], decisions)
+
+  def test_decides_for_p0(self):
+    sprt = evaluation.SPRT(p0=0.4, p1=0.6, alpha=0.05, beta=0.05)
+    self.assertIsNone(sprt.update(True))
+    decisions = [sprt.update(False) for _ in range(9)]
+    self.assertEqual([None] * 8 + [False], decisions)
+
+  def test_match_sprt(self):
+    params = model_params.DummyMiniGoParams()
+    sprt = evaluation.match_sprt(params)
+    # Black wins the match by the margin of 0.55 with a win rate of 0.775.
+    self.assertAlmostEqual(0.725, sprt.p0)
+    self.assertAlmostEqual(0.825, sprt.p1)
+
+
+class TestPlayMatchParallel(utils_test.MiniGoUnitTest):
+
+  def test_stops_once_decided(self):
+    params = model_params.DummyMiniGoParams()
+    sgf_dir = tempfile.mkdtemp()
+    winner = evaluation.play_match_parallel(
+        params, '/models/000001-black', '/models/000002-white', games=20,
+        readouts=4, sgf_dir=sgf_dir, verbosity=0, num_workers=2,
+        # Black always loses by the value of the nets, so it resigns at once.
+        load_network=functools.partial(load_dummy_net, fake_value=-1))
+    self.assertEqual(go.WHITE_NAME, winner)
+    # Each white win moves the log likelihood ratio by log(0.175 / 0.275),
+    # past the lower bound log(0.05 / 0.95) after 7 games. The sgfs of the
+    # later games which finished first are written as well.
+    sgf_files = os.listdir(sgf_dir)
+    self.assertLessEqual(7, len(sgf_files))
+    self.assertLess(len(sgf_files), 20)
+    for sgf_file in sgf_files:
+      self.assertIn('000002-white-vs-000001-black', sgf_file)
+      with open(os.path.join(sgf_dir, sgf_file)) as f:
+        self.assertIn('RE[W+R]', f.read())
+
+  def test_updates_sprt_in_game_order(self):
+    # The white wins of the games 1 to 7 finish before the black win of the
+    # game 0, and would decide the match by themselves.
+    finished_games = [(i, 'W+R', '') for i in range(1, 8)] + [(0, 'B+R', '')]
+    finished_games += [(i, 'B+R', '') for i in range(8, 20)]
+    num_finished = []
+
+    def play_match_games(*unused_args):
+      for num_games, result in enumerate(finished_games, 1):
+        num_finished.append(num_games)
+        yield result
+
+    with unittest.mock.patch.object(
+        evaluation, 'play_match_games', play_match_games):
+      winner = evaluation.play_match_parallel(
+          model_params.DummyMiniGoParams(), '/models/000001-black',
+          '/models/000002-white', games=20, readouts=4,
+          sgf_dir=tempfile.mkdtemp(), verbosity=0, num_workers=2)
+    # The black win of the game 0 is counted first, so the white wins of the
+    # games 1 to 7 decide the match only with the game 7, the 8th to finish.
+    self.assertEqual(go.WHITE_NAME, winner)
+    self.assertEqual(8, num_finished[-1])
+
+  def test_raises_errors_of_workers(self):
+    # open fails to load the models, since the params are not a file mode.
+    with self.assertRaises(TypeError):
+      evaluation.play_match_parallel(
+          model_params.DummyMiniGoParams(), '/models/000001-black',
+          '/models/000002-white', games=2, readouts=4,
+          sgf_dir=tempfile.mkdtemp(), verbosity=0, num_workers=1,
+          load_network=open)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,221 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Incrementally gathers selfplay games into training chunks.
+
+The chunks hold the examples of the games of the last gather_generation
+models. A manifest in the chunk directory records, for each selfplay file,
+how many of its records were gathered, and for each chunk, the model of its
+games. Each gather reads only the records added since the previous gather,
+shuffles them and appends them as new chunks, and deletes the chunks of the
+models which left the window. Its time thus depends on the number of new
+games, not on the age of the run.
+
+The examples of a model which do not fill a chunk are kept in a pending file
+of the pending/ subdirectory until more games of the model arrive. They are
+written as a chunk of their own once a newer model has games, since the
+selfplay of older models is then over.
+
+Each gather writes its pending files under new names, recorded in the
+manifest, and deletes the files which the manifest no longer records only
+once it is saved. A gather which crashes thus leaves the files of the
+previous manifest intact, and the next gather starts over from them.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import random
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+import preprocessing
+
+_TF_RECORD_SUFFIX = '.tfrecord.zz'
+MANIFEST_NAME = 'manifest.json'
+PENDING_DIR_NAME = 'pending'
+
+
+class Gatherer(object):
+  """Maintains the training chunks of a sliding window of models.
+
+  Attributes:
+    selfplay_dir: Where to look for games, a directory per model.
+    training_chunk_dir: Where to put the chunks and the manifest.
+    examples_per_chunk: The number of examples of a chunk.
+    gather_generation: The number of the most recent models in the window.
+    files: A dict from the selfplay files to their number of gathered records
+      and their size in bytes then, to skip the files which did not change.
+    chunks: A list of dicts with the name, the model and the number of
+      examples of the chunks, in the order they were written.
+    next_chunk: A dict from the models to the index of their next chunk.
+    pending: A dict from the models to the name of their pending file.
+    generation: The number of gathers, which names their pending files.
+  """
+
+  def __init__(self, selfplay_dir, training_chunk_dir, examples_per_chunk,
+               gather_generation):
+    self.selfplay_dir = selfplay_dir
+    self.training_chunk_dir = training_chunk_dir
+    self.examples_per_chunk = examples_per_chunk
+    self.gather_generation = gather_generation
+    self.manifest_path = os.path.join(training_chunk_dir, MANIFEST_NAME)
+    self.pending_dir = os.path.join(training_chunk_dir, PENDING_DIR_NAME)
+    self.files = {}
+    self.chunks = []
+    self.next_chunk = {}
+    self.pending = {}
+    self.generation = 0
+    self._load_manifest()
+
+  def _load_manifest(self):
+    try:
+      with tf.gfile.GFile(self.manifest_path, 'r') as f:
+        manifest = json.load(f)
+    except tf.errors.NotFoundError:
+      return
+    self.files = manifest['files']
+    self.chunks = manifest['chunks']
+    self.next_chunk = manifest['next_chunk']
+    self.pending = manifest['pending']
+    self.generation = manifest['generation']
+
+  def _save_manifest(self):
+    """Writes the manifest, atomically so that a crash cannot corrupt it."""
+    manifest = {
+        'files': self.files,
+        'chunks': self.chunks,
+        'next_chunk': self.next_chunk,
+        'pending': self.pending,
+        'generation': self.generation,
+    }
+    temp_path = self.manifest_path + '.tmp'
+    with tf.gfile.GFile(temp_path, 'w') as f:
+      json.dump(manifest, f, sort_keys=True)
+    tf.gfile.Rename(temp_path, self.manifest_path, overwrite=True)
+
+  def chunk_paths(self):
+    """Returns the paths of the chunks of the window, oldest first."""
+    return [os.path.join(self.training_chunk_dir, chunk['name'])
+            for chunk in self.chunks]
+
+  def _read_pending(self, model):
+    """Returns the pending examples of model, leaving its file in place."""
+    if model not in self.pending:
+      return []
+    return list(preprocessing.read_serialized_tf_examples(
+        os.path.join(self.pending_dir, self.pending[model])))
+
+  def _write_pending(self, model, examples):
+    name = '{}-{:06d}{}'.format(model, self.generation, _TF_RECORD_SUFFIX)
+    preprocessing.write_tf_examples(
+        os.path.join(self.pending_dir, name), examples, serialize=False)
+    self.pending[model] = name
+
+  def _remove_stale_pending(self):
+    """Deletes the pending files which the manifest does not record."""
+    names = set(self.pending.values())
+    for path in tf.gfile.Glob(
+        os.path.join(self.pending_dir, '*' + _TF_RECORD_SUFFIX)):
+      if os.path.basename(path) not in names:
+        tf.gfile.Remove(path)
+
+  def _write_chunk(self, model, examples):
+    index = self.next_chunk.get(model, 0)
+    self.next_chunk[model] = index + 1
+    name = '{}-{:06d}{}'.format(model, index, _TF_RECORD_SUFFIX)
+    preprocessing.write_tf_examples(
+        os.path.join(self.training_chunk_dir, name), examples,
+        serialize=False)
+    self.chunks.append(
+        {'name': name, 'model': model, 'num_examples': len(examples)})
+
+  def _read_new_records(self, record_file):
+    """Returns the records of record_file which were not gathered yet."""
+    offset, size = self.files.get(record_file, (0, -1))
+    new_size = tf.gfile.Stat(record_file).length
+    if new_size == size:
+      return []
+    try:
+      examples = list(preprocessing.read_serialized_tf_examples(
+          record_file, offset))
+    except tf.errors.DataLossError:
+      # The file is still being written, gather it next time.
+      return []
+    self.files[record_file] = (offset + len(examples), new_size)
+    return examples
+
+  def _expire(self, models):
+    """Deletes the chunks and forgets the files of models not in models."""
+    models = set(models)
+    expired_chunks = [c for c in self.chunks if c['model'] not in models]
+    for chunk in expired_chunks:
+      path = os.path.join(self.training_chunk_dir, chunk['name'])
+      if tf.gfile.Exists(path):
+        tf.gfile.Remove(path)
+    self.chunks = [c for c in self.chunks if c['model'] in models]
+    self.next_chunk = {
+        m: i for m, i in self.next_chunk.items() if m in models}
+    self.files = {
+        path: offset for path, offset in self.files.items()
+        if os.path.basename(os.path.dirname(path)) in models}
+    self.pending = {m: n for m, n in self.pending.items() if m in models}
+    return len(expired_chunks)
+
+  def gather(self):
+    """Gathers the new games of the window and drops the expired chunks.
+
+    Returns:
+      A dict with the number of new records, of new and of expired chunks.
+    """
+    for directory in (self.training_chunk_dir, self.pending_dir):
+      if not tf.gfile.Exists(directory):
+        tf.gfile.MakeDirs(directory)
+    sorted_model_dirs = sorted(tf.gfile.ListDirectory(self.selfplay_dir))
+    models = [model_dir.strip('/') for model_dir in
+              sorted_model_dirs[-self.gather_generation:]]
+    num_chunks = len(self.chunks)
+    num_records = 0
+    self.generation += 1
+    for model in models:
+      record_files = tf.gfile.Glob(
+          os.path.join(self.selfplay_dir, model, '*' + _TF_RECORD_SUFFIX))
+      new_examples = []
+      for record_file in sorted(record_files):
+        new_examples.extend(self._read_new_records(record_file))
+      num_records += len(new_examples)
+      # Only the newest model may get more games, the pending examples of the
+      # older models are flushed.
+      is_newest = model == models[-1]
+      if not new_examples and is_newest:
+        continue
+      examples = self._read_pending(model) + new_examples
+      self.pending.pop(model, None)
+      random.shuffle(examples)
+      while examples:
+        if is_newest and len(examples) < self.examples_per_chunk:
+          self._write_pending(model, examples)
+          break
+        self._write_chunk(model, examples[:self.examples_per_chunk])
+        examples = examples[self.examples_per_chunk:]
+    num_expired = self._expire(models)
+    self._save_manifest()
+    self._remove_stale_pending()
+    return {
+        'num_records': num_records,
+        'num_new_chunks': len(self.chunks) - num_chunks + num_expired,
+        'num_expired_chunks': num_expired,
+    }
@@ -0,0 +1,127 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for gatherer."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import tempfile
+import unittest.mock
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+import gatherer
+import preprocessing
+import utils_test
+
+tf.logging.set_verbosity(tf.logging.ERROR)
+
+
+class TestGatherer(utils_test.MiniGoUnitTest):
+
+  def setUp(self):
+    super(TestGatherer, self).setUp()
+    self.selfplay_dir = tempfile.mkdtemp()
+    self.chunk_dir = os.path.join(tempfile.mkdtemp(), 'training_chunks')
+    self.num_games = 0
+
+  def _write_game(self, model, num_examples):
+    """Writes a game of records named after the model and the game."""
+    model_dir = os.path.join(self.selfplay_dir, model)
+    if not os.path.isdir(model_dir):
+      os.makedirs(model_dir)
+    records = [
+        '{}/{}/{}'.format(model, self.num_games, i).encode()
+        for i in range(num_examples)]
+    preprocessing.write_tf_examples(
+        os.path.join(model_dir, '{}.tfrecord.zz'.format(self.num_games)),
+        records, serialize=False)
+    self.num_games += 1
+    return records
+
+  def _gatherer(self):
+    return gatherer.Gatherer(self.selfplay_dir, self.chunk_dir,
+                             examples_per_chunk=4, gather_generation=2)
+
+  def _chunk_records(self, g):
+    return [list(preprocessing.read_serialized_tf_examples(path))
+            for path in g.chunk_paths()]
+
+  def test_gather_only_new_games(self):
+    records = self._write_game('000000-bootstrap', 6)
+    stats = self._gatherer().gather()
+    self.assertEqual(6, stats['num_records'])
+    self.assertEqual(1, stats['num_new_chunks'])
+
+    # The manifest is reloaded, and only the new game is read.
+    records += self._write_game('000000-bootstrap', 3)
+    g = self._gatherer()
+    stats = g.gather()
+    self.assertEqual(3, stats['num_records'])
+    self.assertEqual(1, stats['num_new_chunks'])
+    self.assertEqual([4, 4], [len(c) for c in self._chunk_records(g)])
+    self.assertEqual(0, self._gatherer().gather()['num_records'])
+
+    # A newer model flushes the pending example of the older one.
+    new_records = self._write_game('000001-model', 5)
+    g = self._gatherer()
+    g.gather()
+    chunks = self._chunk_records(g)
+    self.assertEqual([4, 4, 1, 4], [len(c) for c in chunks])
+    self.assertCountEqual(records, sum(chunks[:3], []))
+    self.assertTrue(set(chunks[3]) < set(new_records))
+
+  def test_crash_before_manifest_keeps_pending_examples(self):
+    records = self._write_game('000000-bootstrap', 6)
+    self._gatherer().gather()
+    records += self._write_game('000000-bootstrap', 1)
+    g = self._gatherer()
+    with unittest.mock.patch.object(
+        g, '_save_manifest', side_effect=IOError('crash')):
+      with self.assertRaises(IOError):
+        g.gather()
+
+    # The gather starts over from the pending file of the previous manifest.
+    records += self._write_game('000001-model', 4)
+    g = self._gatherer()
+    g.gather()
+    chunks = self._chunk_records(g)
+    self.assertEqual([4, 3, 4], [len(c) for c in chunks])
+    self.assertCountEqual(records, sum(chunks, []))
+    self.assertEqual([], os.listdir(os.path.join(self.chunk_dir, 'pending')))
+
+  def test_window_drops_expired_chunks(self):
+    self._write_game('000000-bootstrap', 8)
+    self._write_game('000001-model', 4)
+    g = self._gatherer()
+    g.gather()
+    expired_paths = g.chunk_paths()[:2]
+    self.assertEqual(3, len(g.chunk_paths()))
+
+    new_records = self._write_game('000002-model', 4)
+    g = self._gatherer()
+    stats = g.gather()
+    self.assertEqual(4, stats['num_records'])
+    self.assertEqual(2, stats['num_expired_chunks'])
+    self.assertEqual(2, len(g.chunk_paths()))
+    self.assertCountEqual(new_records, self._chunk_records(g)[1])
+    for path in expired_paths:
+      self.assertFalse(os.path.exists(path))
+    self.assertTrue(all('000000-bootstrap' not in path for path in g.files))
+
+
+if __name__ == '__main__':
+  tf.test.main()
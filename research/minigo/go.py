@@ -48,8 +48,22 @@ def _check_bounds(board_size, c):
   return c[0] % board_size == c[0] and c[1] % board_size == c[1]
 
 
+# The neighbors and diagonals of the coordinates of each board size, which
+# are looked up by every move.
+_NEIGHBORS_DIAGONALS = {}
+
+# The Zobrist tables of each board size.
+_ZOBRIST_TABLES = {}
+
+
 def get_neighbors_diagonals(board_size):
   """Return coordinates of neighbors and diagonals for a go board."""
+  if board_size not in _NEIGHBORS_DIAGONALS:
+    _NEIGHBORS_DIAGONALS[board_size] = _make_neighbors_diagonals(board_size)
+  return _NEIGHBORS_DIAGONALS[board_size]
+
+
+def _make_neighbors_diagonals(board_size):
   all_coords = [(i, j) for i in range(board_size) for j in range(board_size)]
   def check_bounds(c):
     return _check_bounds(board_size, c)
@@ -63,6 +77,76 @@ def get_neighbors_diagonals(board_size):
   return neighbors, diagonals
 
 
+def get_zobrist_table(board_size):
+  """Returns the Zobrist keys of the stones of a go board.
+
+  The Zobrist hash of a board is the XOR of the keys of its stones, so that
+  placing or removing a stone updates the hash with a single XOR.
+
+  Args:
+    board_size: the go board size.
+
+  Returns:
+    An int64 numpy array of shape [2, board_size, board_size] with the keys of
+    the white (index 0) and black (index 1) stones of each coordinate.
+  """
+  if board_size not in _ZOBRIST_TABLES:
+    # A fixed seed, so that the hashes are the same in every process.
+    rng = np.random.RandomState(board_size)
+    _ZOBRIST_TABLES[board_size] = rng.randint(
+        1, np.iinfo(np.int64).max, size=[2, board_size, board_size],
+        dtype=np.int64)
+  return _ZOBRIST_TABLES[board_size]
+
+
+def zobrist_hash(board_size, board):
+  """Returns the Zobrist hash of a board, 0 for an empty board."""
+  table = get_zobrist_table(board_size)
+  keys = np.concatenate([table[0][board == WHITE], table[1][board == BLACK]])
+  return int(np.bitwise_xor.reduce(keys)) if keys.size else 0
+
+
+class BoardHashHistory(object):
+  """The Zobrist hashes of the boards of a game, for positional superko.
+
+  The positions of a game share the list of the hashes, and appending to the
+  history of the last position appends to the list in place. Only appending
+  to the history of an earlier position, when the game branches, e.g. in a
+  tree search, copies the hashes of its line of play.
+  """
+
+  def __init__(self, board_hashes=()):
+    self._hashes = []
+    # The index of the first occurrence of each hash of the list.
+    self._first_index = {}
+    for board_hash in board_hashes:
+      self._first_index.setdefault(board_hash, len(self._hashes))
+      self._hashes.append(board_hash)
+    self._length = len(self._hashes)
+
+  def __len__(self):
+    return self._length
+
+  def __iter__(self):
+    return iter(self._hashes[:self._length])
+
+  def __contains__(self, board_hash):
+    index = self._first_index.get(board_hash)
+    return index is not None and index < self._length
+
+  def appended(self, board_hash):
+    """Returns the history followed by board_hash, leaving this one as is."""
+    if self._length < len(self._hashes):
+      return BoardHashHistory(self._hashes[:self._length] + [board_hash])
+    self._first_index.setdefault(board_hash, self._length)
+    self._hashes.append(board_hash)
+    # A view of the same list, built without __init__ or copy.copy, which
+    # would cost more than the append.
+    history = BoardHashHistory.__new__(BoardHashHistory)
+    history.__dict__.update(self.__dict__, _length=self._length + 1)
+    return history
+
+
 class IllegalMove(Exception):
   pass
 
@@ -315,7 +399,8 @@ class Position(object):
 
   def __init__(self, board_size, board=None, n=0, komi=7.5, caps=(0, 0),
                lib_tracker=None, ko=None, recent=tuple(),
-               board_deltas=None, to_play=BLACK):
+               board_deltas=None, to_play=BLACK, board_hash=None,
+               board_hashes=None):
     """Initialize position class.
 
     Args:
@@ -331,6 +416,11 @@ class Position(object):
         made to the board at each move (played move and captures).
         Should satisfy next_pos.board - next_pos.board_deltas[0] == pos.board
       to_play: BLACK or WHITE
+      board_hash: the Zobrist hash of the board, computed from the board if
+        None.
+      board_hashes: a BoardHashHistory of the Zobrist hashes of all the boards
+        of the game so far, for positional superko. Only the current board if
+        None.
     """
     if not isinstance(recent, tuple):
       raise TypeError('Recent must be a tuple!')
@@ -349,13 +439,18 @@ class Position(object):
     self.to_play = to_play
     self.last_eight = None
     self.neighbors, _ = get_neighbors_diagonals(board_size)
+    self.board_hash = (board_hash if board_hash is not None else
+                       zobrist_hash(board_size, self.board))
+    self.board_hashes = (board_hashes if board_hashes is not None else
+                         BoardHashHistory([self.board_hash]))
 
   def __deepcopy__(self, memodict=None):
     new_board = np.copy(self.board)
     new_lib_tracker = copy.deepcopy(self.lib_tracker)
     return Position(
         self.board_size, new_board, self.n, self.komi, self.caps,
-        new_lib_tracker, self.ko, self.recent, self.board_deltas, self.to_play)
+        new_lib_tracker, self.ko, self.recent, self.board_deltas, self.to_play,
+        self.board_hash, self.board_hashes)
 
   def __str__(self):
     pretty_print_map = {
@@ -408,8 +503,31 @@ class Position(object):
     potential_libs -= set([move])
     return not potential_libs
 
+  def _board_hash_after(self, move, color):
+    """Returns the Zobrist hash of the board after color plays a stone."""
+    table = get_zobrist_table(self.board_size)
+    board_hash = self.board_hash ^ int(table[int(color == BLACK)][move])
+    captured_group_ids = set()
+    for n in self.neighbors[move]:
+      group_id = self.lib_tracker.group_index[n]
+      if group_id == MISSING_GROUP_ID or group_id in captured_group_ids:
+        continue
+      group = self.lib_tracker.groups[group_id]
+      if group.color != color and len(group.liberties) == 1:
+        captured_group_ids.add(group_id)
+        for s in group.stones:
+          board_hash ^= int(table[int(color != BLACK)][s])
+    return board_hash
+
+  def is_move_superko(self, move):
+    """Checks if a move repeats a previous board of the game."""
+    return self._board_hash_after(move, self.to_play) in self.board_hashes
+
   def is_move_legal(self, move):
-    """Checks that a move is on an empty space, not on ko, and not suicide."""
+    """Checks that a move is on an empty space, not on ko, and not suicide.
+
+    The move must not repeat a previous board either (positional superko).
+    """
     if move is None:
       return True
     if self.board[move] != EMPTY:
@@ -418,6 +536,8 @@ class Position(object):
       return False
     if self.is_move_suicidal(move):
       return False
+    if self.is_move_superko(move):
+      return False
 
     return True
 
@@ -447,6 +567,21 @@ class Position(object):
     if self.ko is not None:
       legal_moves[self.ko] = 0
 
+    # ...and so is repeating a previous board (positional superko). A move
+    # only changes the board by more than its own stone when it captures, so
+    # the hashes after the other moves are a single XOR.
+    to_play_keys = get_zobrist_table(self.board_size)[
+        int(self.to_play == BLACK)]
+    repeated = np.array(
+        [board_hash in self.board_hashes
+         for board_hash in (self.board_hash ^ to_play_keys).ravel().tolist()],
+        dtype=bool).reshape(to_play_keys.shape)
+    for group in self.lib_tracker.groups.values():
+      if group.color != self.to_play and len(group.liberties) == 1:
+        capture = next(iter(group.liberties))
+        repeated[capture] = self.is_move_superko(capture)
+    legal_moves[repeated] = 0
+
     # and pass is always legal
     return np.concatenate([legal_moves.ravel(), [1]])
 
@@ -476,7 +611,8 @@ class Position(object):
     In short:
     No suicides
     Chinese/area scoring
-    Positional superko (this is very crudely approximate at the moment.)
+    Positional superko, checked against the Zobrist hashes of all the
+    previous boards of the game.
 
     Args:
       c: the coordinate to play from.
@@ -509,6 +645,13 @@ class Position(object):
     captured_stones = pos.lib_tracker.add_stone(color, c)
     place_stones(pos.board, EMPTY, captured_stones)
 
+    table = get_zobrist_table(self.board_size)
+    board_hash = pos.board_hash ^ int(table[int(color == BLACK)][c])
+    for s in captured_stones:
+      board_hash ^= int(table[int(color != BLACK)][s])
+    pos.board_hash = board_hash
+    pos.board_hashes = pos.board_hashes.appended(board_hash)
+
     opp_color = -1 * color
 
     new_board_delta = np.zeros([self.board_size, self.board_size],
@@ -582,27 +582,95 @@ class TestPosition(utils_test.MiniGoUnitTest):
 
     self.assertEqualPositions(actual_position, expected_position)
 
-    # Check that retaking ko is illegal until two intervening moves
+    # Check that retaking ko is illegal until the board changed elsewhere
     with self.assertRaises(go.IllegalMove):
       actual_position.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'B9'))
+    # Passes do not change the board, so retaking would repeat the start
+    # board (positional superko).
     pass_twice = actual_position.pass_move().pass_move()
-    ko_delayed_retake = pass_twice.play_move(coords.from_kgs(
+    with self.assertRaises(go.IllegalMove):
+      pass_twice.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'B9'))
+    ko_threat_answered = actual_position.play_move(coords.from_kgs(
+        utils_test.BOARD_SIZE, 'J1')).play_move(coords.from_kgs(
+            utils_test.BOARD_SIZE, 'J2'))
+    ko_delayed_retake = ko_threat_answered.play_move(coords.from_kgs(
         utils_test.BOARD_SIZE, 'B9'))
+    expected_board = utils_test.load_board('''
+      .OX......
+      OX.......
+    ''' + EMPTY_ROW * 5 + '''
+      ........X
+      ........O
+    ''')
     expected_position = Position(
         utils_test.BOARD_SIZE,
-        board=start_board,
+        board=expected_board,
         n=4,
         komi=6.5,
         caps=(2, 3),
         ko=coords.from_kgs(utils_test.BOARD_SIZE, 'A9'),
         recent=(
             PlayerMove(BLACK, coords.from_kgs(utils_test.BOARD_SIZE, 'A9')),
-            PlayerMove(WHITE, None),
-            PlayerMove(BLACK, None),
+            PlayerMove(WHITE, coords.from_kgs(utils_test.BOARD_SIZE, 'J1')),
+            PlayerMove(BLACK, coords.from_kgs(utils_test.BOARD_SIZE, 'J2')),
             PlayerMove(WHITE, coords.from_kgs(utils_test.BOARD_SIZE, 'B9')),),
         to_play=BLACK)
     self.assertEqualPositions(ko_delayed_retake, expected_position)
 
+  def test_zobrist_hash(self):
+    position = Position(utils_test.BOARD_SIZE)
+    self.assertEqual(0, position.board_hash)
+    # White captures the black stone at A9 with B9.
+    for move in ['A9', 'A8', 'J1', 'B9']:
+      position = position.play_move(coords.from_kgs(
+          utils_test.BOARD_SIZE, move))
+      self.assertEqual(
+          go.zobrist_hash(utils_test.BOARD_SIZE, position.board),
+          position.board_hash)
+    self.assertEqual((0, 1), position.caps)
+    passed = position.pass_move()
+    self.assertEqual(position.board_hash, passed.board_hash)
+    self.assertEqual(position.board_hashes, passed.board_hashes)
+    self.assertEqual(5, len(position.board_hashes))
+    self.assertEqual(
+        position.board_hash,
+        Position(utils_test.BOARD_SIZE, board=position.board).board_hash)
+
+  def test_board_hashes_of_branches(self):
+    position = Position(utils_test.BOARD_SIZE).play_move(
+        coords.from_kgs(utils_test.BOARD_SIZE, 'E5'))
+    first = position.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'A1'))
+    second = position.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'J9'))
+    third = first.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'J9'))
+    self.assertEqual(2, len(position.board_hashes))
+    for branch in [first, second]:
+      self.assertEqual(3, len(branch.board_hashes))
+      self.assertCountEqual(
+          list(position.board_hashes) + [branch.board_hash],
+          branch.board_hashes)
+    self.assertNotIn(first.board_hash, second.board_hashes)
+    self.assertNotIn(second.board_hash, first.board_hashes)
+    self.assertNotIn(third.board_hash, position.board_hashes)
+    self.assertIn(first.board_hash, third.board_hashes)
+
+  def test_positional_superko(self):
+    start_board = utils_test.load_board('''
+      .OX......
+      OX.......
+    ''' + EMPTY_ROW * 7)
+    position = Position(utils_test.BOARD_SIZE, board=start_board)
+    b9 = coords.from_kgs(utils_test.BOARD_SIZE, 'B9')
+    # The passes clear the ko, but retaking repeats the start board.
+    position = position.play_move(coords.from_kgs(
+        utils_test.BOARD_SIZE, 'A9')).pass_move().pass_move()
+    self.assertIsNone(position.ko)
+    self.assertTrue(position.is_move_superko(b9))
+    self.assertFalse(position.is_move_legal(b9))
+    legal_moves = position.all_legal_moves()
+    self.assertEqual(0, legal_moves[coords.to_flat(utils_test.BOARD_SIZE, b9)])
+    self.assertEqual(
+        utils_test.BOARD_SIZE ** 2 - 5 + 1, np.count_nonzero(legal_moves))
+
   def test_is_game_over(self):
     root = go.Position(utils_test.BOARD_SIZE)
     self.assertFalse(root.is_game_over())
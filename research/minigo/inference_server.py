@@ -0,0 +1,203 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Batches the inference requests of concurrent games into one network run.
+
+Each tree search step of a game sends a few leaf positions to the network,
+far fewer than the batch size the network runs efficiently at. When many games
+are played concurrently, one per thread, an InferenceServer takes the place of
+their DualNetRunner: it queues their requests, and a server thread runs the
+network once on the positions of all the queued requests.
+
+A batch is run when it holds max_batch_size positions, when its first request
+waited for max_wait_secs, or when all the registered clients are waiting for a
+result, since no further request can arrive then.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import threading
+import time
+
+
+class _Request(object):
+  """The positions of a client and, once run, their policies and values."""
+
+  def __init__(self, positions):
+    self.positions = positions
+    self.enqueue_time = time.time()
+    self.done = threading.Event()
+    self.probabilities = None
+    self.values = None
+    self.error = None
+
+
+class InferenceServer(object):
+  """Runs a network on batches of the positions of concurrent clients.
+
+  The server has the run and run_many methods of a DualNetRunner, which
+  block until the result is available. It must be started before use, e.g.:
+
+    with InferenceServer(network, max_batch_size=64,
+                         max_wait_secs=0.01) as server:
+      # In each client thread:
+      with server.client():
+        probs, values = server.run_many(positions)
+  """
+
+  def __init__(self, network, max_batch_size, max_wait_secs):
+    """Initializes the server.
+
+    Args:
+      network: The DualNetRunner to run on the batches.
+      max_batch_size: The maximum number of positions in a batch. A request
+        with more positions is run in a batch of its own.
+      max_wait_secs: The maximum time the first request of a batch waits for
+        other requests.
+    """
+    self.network = network
+    self.max_batch_size = max_batch_size
+    self.max_wait_secs = max_wait_secs
+    self._condition = threading.Condition()
+    self._requests = []
+    self._num_clients = 0
+    self._closed = True
+    self._thread = None
+    self.num_batches = 0
+    self.num_requests = 0
+    self.num_positions = 0
+    self.queue_secs = 0.0
+
+  @property
+  def save_file(self):
+    return self.network.save_file
+
+  def start(self):
+    """Starts the server thread."""
+    self._closed = False
+    self._thread = threading.Thread(target=self._serve)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def stop(self):
+    """Runs the pending requests and stops the server thread."""
+    with self._condition:
+      self._closed = True
+      self._condition.notify_all()
+    self._thread.join()
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *unused_exc_info):
+    self.stop()
+
+  @contextlib.contextmanager
+  def client(self):
+    """Registers the calling thread as a client for the enclosed block."""
+    with self._condition:
+      self._num_clients += 1
+    try:
+      yield self
+    finally:
+      with self._condition:
+        self._num_clients -= 1
+        self._condition.notify_all()
+
+  def run(self, position):
+    """Computes the policy and value output for a given position."""
+    probs, values = self.run_many([position])
+    return probs[0], values[0]
+
+  def run_many(self, positions):
+    """Computes the policy and value outputs for given positions.
+
+    Args:
+      positions: A list of positions for go board status.
+
+    Returns:
+      probabilities, value: The policy and value outputs of the network.
+
+    Raises:
+      ValueError: If the server is not running.
+    """
+    request = _Request(positions)
+    with self._condition:
+      if self._closed:
+        raise ValueError('The inference server is not running.')
+      self._requests.append(request)
+      self._condition.notify_all()
+    request.done.wait()
+    if request.error is not None:
+      raise request.error
+    return request.probabilities, request.values
+
+  def stats(self):
+    """Returns the mean batch size and the mean queue latency in seconds."""
+    return (self.num_positions / max(self.num_batches, 1),
+            self.queue_secs / max(self.num_requests, 1))
+
+  def _next_batch(self):
+    """Waits for the requests of the next batch, None when stopped."""
+    with self._condition:
+      while not self._requests and not self._closed:
+        self._condition.wait()
+      if not self._requests:
+        return None
+      deadline = self._requests[0].enqueue_time + self.max_wait_secs
+      while (not self._closed and
+             sum(len(r.positions) for r in self._requests) <
+             self.max_batch_size and
+             len(self._requests) < self._num_clients):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          break
+        self._condition.wait(remaining)
+      batch = [self._requests.pop(0)]
+      num_positions = len(batch[0].positions)
+      while (self._requests and num_positions +
+             len(self._requests[0].positions) <= self.max_batch_size):
+        num_positions += len(self._requests[0].positions)
+        batch.append(self._requests.pop(0))
+      return batch
+
+  def _serve(self):
+    """Runs the network on batches of requests until the server stops."""
+    while True:
+      batch = self._next_batch()
+      if batch is None:
+        return
+      start = time.time()
+      positions = [p for request in batch for p in request.positions]
+      try:
+        probabilities, values = self.network.run_many(positions)
+      except Exception as e:  # pylint: disable=broad-except
+        for request in batch:
+          request.error = e
+          request.done.set()
+        continue
+      self.num_batches += 1
+      self.num_positions += len(positions)
+      offset = 0
+      for request in batch:
+        self.num_requests += 1
+        self.queue_secs += start - request.enqueue_time
+        size = len(request.positions)
+        request.probabilities = probabilities[offset:offset + size]
+        request.values = values[offset:offset + size]
+        offset += size
+        request.done.set()
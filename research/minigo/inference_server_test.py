@@ -0,0 +1,149 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for inference_server and selfplay_mcts.play_concurrently."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+from inference_server import InferenceServer
+import numpy as np
+import selfplay_mcts
+from strategies_test import DummyNet
+import utils_test
+
+tf.logging.set_verbosity(tf.logging.ERROR)
+
+
+class RecordingNet(object):
+  """Returns the positions as values and records the batch sizes."""
+
+  save_file = 'recording-net'
+
+  def __init__(self):
+    self.batch_sizes = []
+
+  def run_many(self, positions):
+    if not positions:
+      raise ValueError('No positions passed!')
+    self.batch_sizes.append(len(positions))
+    return np.zeros([len(positions), 2]), np.array(positions)
+
+
+class RecordingDummyNet(DummyNet):
+  """A DummyNet which records the batch sizes."""
+
+  save_file = 'dummy-net'
+
+  def __init__(self):
+    super(RecordingDummyNet, self).__init__()
+    self.batch_sizes = []
+
+  def run_many(self, positions):
+    self.batch_sizes.append(len(positions))
+    return super(RecordingDummyNet, self).run_many(positions)
+
+
+def _run_clients(server, positions_per_client):
+  """Runs a client per list of positions and returns their values."""
+  values = [None] * len(positions_per_client)
+  # Wait for all the clients to register, for a deterministic batching.
+  barrier = threading.Barrier(len(positions_per_client))
+
+  def _client(i):
+    with server.client():
+      barrier.wait()
+      values[i] = server.run_many(positions_per_client[i])[1].tolist()
+
+  threads = [threading.Thread(target=_client, args=(i,))
+             for i in range(len(positions_per_client))]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return values
+
+
+class TestInferenceServer(utils_test.MiniGoUnitTest):
+
+  def test_batches_requests_of_waiting_clients(self):
+    net = RecordingNet()
+    positions = [[0, 1], [2, 3], [4, 5], [6, 7]]
+    with InferenceServer(net, max_batch_size=100,
+                         max_wait_secs=60) as server:
+      self.assertEqual(positions, _run_clients(server, positions))
+    # All the clients were waiting, so the batch did not wait 60 seconds.
+    self.assertEqual([8], net.batch_sizes)
+    self.assertEqual(8.0, server.stats()[0])
+
+  def test_max_batch_size(self):
+    net = RecordingNet()
+    positions = [[0, 1, 2], [3, 4, 5], [6, 7, 8]]
+    with InferenceServer(net, max_batch_size=7, max_wait_secs=60) as server:
+      self.assertEqual(positions, _run_clients(server, positions))
+    self.assertEqual([6, 3], net.batch_sizes)
+
+  def test_max_wait(self):
+    net = RecordingNet()
+    with InferenceServer(net, max_batch_size=100,
+                         max_wait_secs=0.01) as server:
+      # A registered client which does not send requests.
+      with server.client():
+        probs, value = server.run(1)
+    self.assertEqual(1, value)
+    self.assertEqual([0, 0], probs.tolist())
+    self.assertEqual([1], net.batch_sizes)
+
+  def test_error_is_raised_in_client(self):
+    with InferenceServer(RecordingNet(), max_batch_size=100,
+                         max_wait_secs=0.01) as server:
+      with self.assertRaises(ValueError):
+        server.run_many([])
+      # The server keeps running.
+      self.assertEqual([3], server.run_many([3])[1].tolist())
+
+  def test_requires_running_server(self):
+    server = InferenceServer(RecordingNet(), max_batch_size=100,
+                             max_wait_secs=0.01)
+    with self.assertRaises(ValueError):
+      server.run_many([1])
+
+
+class TestPlayConcurrently(utils_test.MiniGoUnitTest):
+
+  def test_play_concurrently(self):
+    net = RecordingDummyNet()
+    finished_games = []
+
+    def _game_callback(game_index, player):
+      finished_games.append(game_index)
+      self.assertTrue(player.is_done())
+
+    stats = selfplay_mcts.play_concurrently(
+        utils_test.BOARD_SIZE, net, num_games=3, num_parallel_games=2,
+        readouts=4, resign_threshold=0.95, simultaneous_leaves=2,
+        max_batch_size=4, max_wait_secs=0.01, game_callback=_game_callback)
+    self.assertEqual([0, 1, 2], sorted(finished_games))
+    self.assertLessEqual(max(net.batch_sizes), 4)
+    self.assertGreater(max(net.batch_sizes), 2)
+    self.assertGreater(stats['games_per_hour'], 0)
+    self.assertGreater(stats['mean_batch_size'], 1)
+
+
+if __name__ == '__main__':
+  tf.test.main()
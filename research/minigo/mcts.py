@@ -27,6 +27,7 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import copy
 import math
 
 import coords
@@ -57,6 +58,51 @@ class DummyNode(object):
     self.child_W = collections.defaultdict(float)
 
 
+class TranspositionCache(object):
+  """A LRU cache of the network outputs of positions.
+
+  Different move orders often lead to the same position, so the same position
+  appears in several nodes of a search tree. The cache is keyed on the Zobrist
+  hash of the board and the color to play, so that the expansion of a node
+  reuses the policy and value of an earlier evaluation of its position instead
+  of running the network again. The move history seen by the network may
+  differ between the transposed positions; the first evaluation is reused for
+  all of them.
+  """
+
+  def __init__(self, max_size):
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+    self._entries = collections.OrderedDict()
+
+  def __len__(self):
+    return len(self._entries)
+
+  @property
+  def hit_rate(self):
+    return self.hits / max(self.hits + self.misses, 1)
+
+  def get(self, position):
+    """Returns the (move_probabilities, value) of a position, or None."""
+    key = (position.board_hash, position.to_play)
+    entry = self._entries.get(key)
+    if entry is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self._entries.move_to_end(key)
+    return entry
+
+  def put(self, position, move_probabilities, value):
+    """Adds the network outputs of a position, evicting the oldest entry."""
+    key = (position.board_hash, position.to_play)
+    self._entries[key] = (move_probabilities, value)
+    self._entries.move_to_end(key)
+    if len(self._entries) > self.max_size:
+      self._entries.popitem(last=False)
+
+
 class MCTSNode(object):
   """A node of a MCTS search tree.
 
@@ -223,6 +269,14 @@ class MCTSNode(object):
                            dtype=np.float32) * value
     self.backup_value(value, up_to=up_to)
 
+  def discard_siblings(self):
+    """Drops the subtrees of the other children of the parent node.
+
+    Called when the move to this node is played, so that the rest of the old
+    search tree can be freed.
+    """
+    del self.parent.children
+
   def backup_value(self, value, up_to):
     """Propagates a value estimation up to the root node.
 
@@ -316,3 +370,389 @@ class MCTSNode(object):
                 p_rel[key])
             for key in sort_order][:15]))
     return ''.join(output)
+
+
+class MCTSTree(object):
+  """A MCTS search tree which keeps its nodes in preallocated arrays.
+
+  Each MCTSNode allocates its own arrays of child statistics and keeps a copy
+  of its go.Position. An MCTSTree instead keeps the statistics of all of its
+  nodes in the rows of shared arrays (struct-of-arrays pools), which double in
+  size when they are full. It only keeps the positions of its root and of the
+  most recently used nodes; the position of another node is replayed from the
+  closest ancestor with a kept position. When a move is played, the nodes of
+  the subtrees of the other moves are released for reuse.
+
+  The nodes of the tree are accessed through MCTSTreeNodes, which have the
+  interface of MCTSNode. Rows of the statistic arrays returned by a node
+  (e.g. child_N) must not be kept across the creation of new nodes, since
+  growing the pools reallocates the arrays.
+  """
+  # pylint: disable=invalid-name
+
+  # The row of the parent of the first root, which holds its N and W.
+  _DUMMY = 0
+
+  def __init__(self, board_size, position, initial_capacity=1024,
+               position_cache_size=1024):
+    """Initializes a tree with a root node.
+
+    Args:
+      board_size: the go board size.
+      position: the go.Position of the root node.
+      initial_capacity: the number of nodes of the initial pools.
+      position_cache_size: the number of positions of recently used nodes
+        kept besides the position of the root.
+    """
+    self.board_size = board_size
+    self.num_moves = board_size * board_size + 1
+    self.position_cache_size = position_cache_size
+    capacity = max(initial_capacity, 2)
+    self.child_N = np.zeros([capacity, self.num_moves], dtype=np.float32)
+    self.child_W = np.zeros([capacity, self.num_moves], dtype=np.float32)
+    self.child_prior = np.zeros([capacity, self.num_moves], dtype=np.float32)
+    # 1000 for the illegal moves, which is exact in float16.
+    self.illegal_moves = np.zeros([capacity, self.num_moves],
+                                  dtype=np.float16)
+    self.parent = np.full([capacity], -1, dtype=np.int32)
+    self.fmove = np.zeros([capacity], dtype=np.int32)
+    self.first_child = np.full([capacity], -1, dtype=np.int32)
+    self.next_sibling = np.full([capacity], -1, dtype=np.int32)
+    self.to_play = np.zeros([capacity], dtype=np.int8)
+    self.move_number = np.zeros([capacity], dtype=np.int32)
+    self.passes = np.zeros([capacity], dtype=np.int8)  # consecutive passes
+    self.is_expanded = np.zeros([capacity], dtype=bool)
+    self.losses_applied = np.zeros([capacity], dtype=np.int32)
+    self.num_nodes = 1  # The dummy parent of the first root.
+    self._free_nodes = []
+    # Maps parent * num_moves + fmove to the index of the child node.
+    self._children = {}
+    # The priors of the nodes with noise, before the noise was injected.
+    self.original_priors = {}
+    self._positions = collections.OrderedDict()
+
+    self.root_index = self._new_node(self._DUMMY, 0)
+    self.to_play[self.root_index] = position.to_play
+    self.move_number[self.root_index] = position.n
+    passes = 0
+    for player_move in reversed(position.recent[-2:]):
+      if player_move.move is not None:
+        break
+      passes += 1
+    self.passes[self.root_index] = passes
+    self._root_position = position
+
+  @property
+  def capacity(self):
+    return len(self.parent)
+
+  @property
+  def root(self):
+    return MCTSTreeNode(self, self.root_index)
+
+  def _grow(self):
+    """Doubles the size of the pools."""
+    for name in ['child_N', 'child_W', 'child_prior', 'illegal_moves',
+                 'parent', 'fmove', 'first_child', 'next_sibling', 'to_play',
+                 'move_number', 'passes', 'is_expanded', 'losses_applied']:
+      pool = getattr(self, name)
+      grown = np.zeros((2 * len(pool),) + pool.shape[1:], dtype=pool.dtype)
+      grown[:len(pool)] = pool
+      setattr(self, name, grown)
+
+  def _new_node(self, parent, fmove):
+    """Returns the index of a new child node of parent."""
+    if self._free_nodes:
+      index = self._free_nodes.pop()
+    else:
+      if self.num_nodes == self.capacity:
+        self._grow()
+      index = self.num_nodes
+      self.num_nodes += 1
+    self.child_N[index] = 0
+    self.child_W[index] = 0
+    self.child_prior[index] = 0
+    self.illegal_moves[index] = 0
+    self.parent[index] = parent
+    self.fmove[index] = fmove
+    self.first_child[index] = -1
+    self.next_sibling[index] = self.first_child[parent]
+    self.first_child[parent] = index
+    self.to_play[index] = -self.to_play[parent]
+    self.move_number[index] = self.move_number[parent] + 1
+    self.passes[index] = (self.passes[parent] + 1
+                          if fmove == self.num_moves - 1 else 0)
+    self.is_expanded[index] = False
+    self.losses_applied[index] = 0
+    return index
+
+  def children_of(self, index):
+    """Returns the indices of the children of a node."""
+    children = []
+    child = self.first_child[index]
+    while child >= 0:
+      children.append(int(child))
+      child = self.next_sibling[child]
+    return children
+
+  def get_position(self, index):
+    """Returns the position of a node, replaying it if it is not kept."""
+    if index == self.root_index:
+      return self._root_position
+    if index in self._positions:
+      self._positions.move_to_end(index)
+      return self._positions[index]
+    fmoves = []
+    ancestor = index
+    while ancestor != self.root_index and ancestor not in self._positions:
+      if ancestor == self._DUMMY:
+        raise ValueError('Node {} is not in the subtree of the root.'.format(
+            index))
+      fmoves.append(int(self.fmove[ancestor]))
+      ancestor = self.parent[ancestor]
+    position = copy.deepcopy(self.get_position(ancestor))
+    for fmove in reversed(fmoves):
+      position.play_move(coords.from_flat(self.board_size, fmove),
+                         mutate=True)
+    self._positions[index] = position
+    if len(self._positions) > self.position_cache_size:
+      self._positions.popitem(last=False)
+    return position
+
+  def maybe_add_child(self, index, fcoord):
+    """Returns the index of the child for fcoord, adding it if needed."""
+    key = index * self.num_moves + fcoord
+    child = self._children.get(key)
+    if child is None:
+      child = self._children[key] = self._new_node(index, fcoord)
+    return child
+
+  def child_action_score(self, index):
+    child_N = self.child_N[index]
+    N = self.child_N[self.parent[index], self.fmove[index]]
+    return (self.child_W[index] / (1 + child_N) * self.to_play[index] +
+            c_PUCT * math.sqrt(1 + N) * self.child_prior[index] /
+            (1 + child_N) - self.illegal_moves[index])
+
+  def select_leaf(self, index):
+    """Selects a leaf of the subtree of a node, as MCTSNode.select_leaf."""
+    pass_move = self.num_moves - 1
+    current = index
+    while True:
+      # Adding a child may grow the pools, so they are not kept in locals.
+      self.child_N[self.parent[current], self.fmove[current]] += 1
+      if not self.is_expanded[current]:
+        return current
+      # HACK: if last move was a pass, always investigate double-pass first
+      # to avoid situations where we auto-lose by passing too early.
+      if self.passes[current] and self.child_N[current, pass_move] == 0:
+        current = self.maybe_add_child(current, pass_move)
+      else:
+        current = self.maybe_add_child(
+            current, int(np.argmax(self.child_action_score(current))))
+
+  def _path(self, index, up_to):
+    """Returns the indices of the nodes from a node up to the node up_to."""
+    path = [index]
+    while index != up_to and self.parent[index] != self._DUMMY:
+      index = self.parent[index]
+      path.append(index)
+    return path
+
+  def add_virtual_loss(self, index, up_to):
+    for node in self._path(index, up_to):
+      self.losses_applied[node] += 1
+      # This is a "win" for the current node; hence a loss for its parent node
+      # who will be deciding whether to investigate this node again.
+      self.child_W[self.parent[node], self.fmove[node]] += self.to_play[node]
+
+  def revert_virtual_loss(self, index, up_to):
+    for node in self._path(index, up_to):
+      self.losses_applied[node] -= 1
+      self.child_W[self.parent[node], self.fmove[node]] -= self.to_play[node]
+
+  def revert_visits(self, index, up_to):
+    for node in self._path(index, up_to):
+      self.child_N[self.parent[node], self.fmove[node]] -= 1
+
+  def backup_value(self, index, value, up_to):
+    for node in self._path(index, up_to):
+      self.child_W[self.parent[node], self.fmove[node]] += value
+
+  def incorporate_results(self, index, move_probabilities, value, up_to):
+    """Expands a node with the network outputs, as in MCTSNode."""
+    assert move_probabilities.shape == (self.num_moves,)
+    # A finished game should not be going through this code path.
+    assert self.passes[index] < 2
+    if self.is_expanded[index]:
+      self.revert_visits(index, up_to=up_to)
+      return
+    self.is_expanded[index] = True
+    self.child_prior[index] = move_probabilities
+    # The legal moves are only needed to select the children of expanded
+    # nodes.
+    self.illegal_moves[index] = 1000 * (
+        1 - self.get_position(index).all_legal_moves())
+    self.child_W[index] = value
+    self.backup_value(index, value, up_to=up_to)
+
+  def _release_subtree(self, index):
+    """Releases the nodes of the subtree of a node for reuse."""
+    stack = [index]
+    while stack:
+      node = stack.pop()
+      for child in self.children_of(node):
+        del self._children[node * self.num_moves + int(self.fmove[child])]
+        stack.append(child)
+      self._positions.pop(node, None)
+      self.original_priors.pop(node, None)
+      self._free_nodes.append(node)
+
+  def discard_siblings(self, index):
+    """Makes a node the root, releasing the subtrees of its siblings."""
+    position = self.get_position(index)
+    parent = int(self.parent[index])
+    for sibling in self.children_of(parent):
+      if sibling != index:
+        del self._children[parent * self.num_moves + int(self.fmove[sibling])]
+        self._release_subtree(sibling)
+    self.first_child[parent] = index
+    self.next_sibling[index] = -1
+    self._positions.pop(index, None)
+    self.root_index = index
+    self._root_position = position
+
+
+class MCTSTreeNode(MCTSNode):
+  """A node of a MCTSTree, with the interface of an MCTSNode.
+
+  The node is a view of a row of the arrays of the tree; several MCTSTreeNode
+  objects may view the same node, and compare equal.
+  """
+  # pylint: disable=invalid-name,super-init-not-called
+
+  def __init__(self, tree, index):
+    self.tree = tree
+    self.index = int(index)
+    self.board_size = tree.board_size
+
+  def __eq__(self, other):
+    return (isinstance(other, MCTSTreeNode) and self.tree is other.tree and
+            self.index == other.index)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((id(self.tree), self.index))
+
+  @property
+  def parent(self):
+    parent = self.tree.parent[self.index]
+    return MCTSTreeNode(self.tree, parent) if parent >= 0 else None
+
+  @property
+  def fmove(self):
+    return int(self.tree.fmove[self.index])
+
+  @property
+  def position(self):
+    return self.tree.get_position(self.index)
+
+  @property
+  def is_expanded(self):
+    return bool(self.tree.is_expanded[self.index])
+
+  @property
+  def losses_applied(self):
+    return int(self.tree.losses_applied[self.index])
+
+  @property
+  def illegal_moves(self):
+    return self.tree.illegal_moves[self.index]
+
+  @property
+  def child_N(self):
+    return self.tree.child_N[self.index]
+
+  @property
+  def child_W(self):
+    return self.tree.child_W[self.index]
+
+  @property
+  def child_prior(self):
+    return self.tree.child_prior[self.index]
+
+  @child_prior.setter
+  def child_prior(self, value):
+    if self.index not in self.tree.original_priors:
+      self.tree.original_priors[self.index] = np.copy(self.child_prior)
+    self.tree.child_prior[self.index] = value
+
+  @property
+  def original_prior(self):
+    return self.tree.original_priors.get(self.index, self.child_prior)
+
+  @property
+  def children(self):
+    return {int(self.tree.fmove[child]): MCTSTreeNode(self.tree, child)
+            for child in self.tree.children_of(self.index)}
+
+  @property
+  def N(self):
+    return self.tree.child_N[self.tree.parent[self.index],
+                             self.tree.fmove[self.index]]
+
+  @N.setter
+  def N(self, value):
+    self.tree.child_N[self.tree.parent[self.index],
+                      self.tree.fmove[self.index]] = value
+
+  @property
+  def W(self):
+    return self.tree.child_W[self.tree.parent[self.index],
+                             self.tree.fmove[self.index]]
+
+  @W.setter
+  def W(self, value):
+    self.tree.child_W[self.tree.parent[self.index],
+                      self.tree.fmove[self.index]] = value
+
+  @property
+  def child_action_score(self):
+    return self.tree.child_action_score(self.index)
+
+  @property
+  def Q_perspective(self):
+    return self.Q * self.tree.to_play[self.index]
+
+  def select_leaf(self):
+    return MCTSTreeNode(self.tree, self.tree.select_leaf(self.index))
+
+  def maybe_add_child(self, fcoord):
+    return MCTSTreeNode(self.tree,
+                        self.tree.maybe_add_child(self.index, int(fcoord)))
+
+  def add_virtual_loss(self, up_to):
+    self.tree.add_virtual_loss(self.index, up_to.index)
+
+  def revert_virtual_loss(self, up_to):
+    self.tree.revert_virtual_loss(self.index, up_to.index)
+
+  def revert_visits(self, up_to):
+    self.tree.revert_visits(self.index, up_to.index)
+
+  def incorporate_results(self, move_probabilities, value, up_to):
+    self.tree.incorporate_results(self.index, move_probabilities, value,
+                                  up_to.index)
+
+  def backup_value(self, value, up_to):
+    self.tree.backup_value(self.index, value, up_to.index)
+
+  def is_done(self):
+    max_depth = (self.board_size ** 2) * 1.4
+    return (self.tree.passes[self.index] >= 2 or
+            self.tree.move_number[self.index] >= max_depth)
+
+  def discard_siblings(self):
+    self.tree.discard_siblings(self.index)
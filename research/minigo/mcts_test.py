@@ -24,6 +24,8 @@ import tensorflow as tf  # pylint: disable=g-bad-import-order
 import coords
 import go
 from mcts import MCTSNode
+from mcts import MCTSTree
+from mcts import TranspositionCache
 import numpy as np
 import utils_test
 
@@ -218,5 +220,94 @@ class TestMctsNodes(utils_test.MiniGoUnitTest):
     self.assertIs(leaf1, leaf2)
 
 
+def _random_search(root, num_readouts, seed=0):
+  """Searches a tree with random network outputs, returns the leaves."""
+  rng = np.random.RandomState(seed)
+  leaves = []
+  for _ in range(num_readouts):
+    leaf = root.select_leaf()
+    leaves.append(leaf)
+    if leaf.is_done():
+      leaf.backup_value(1, up_to=root)
+      continue
+    probs = rng.dirichlet([0.3] * (utils_test.BOARD_SIZE ** 2 + 1))
+    leaf.incorporate_results(probs.astype(np.float32), rng.uniform(-1, 1),
+                             up_to=root)
+  return leaves
+
+
+class TestMCTSTree(utils_test.MiniGoUnitTest):
+
+  def test_search_matches_mcts_node(self):
+    node_root = MCTSNode(utils_test.BOARD_SIZE, TEST_POSITION)
+    tree_root = MCTSTree(utils_test.BOARD_SIZE, TEST_POSITION,
+                         initial_capacity=2, position_cache_size=4).root
+    node_leaves = _random_search(node_root, 200)
+    tree_leaves = _random_search(tree_root, 200)
+    self.assertEqual([leaf.fmove for leaf in node_leaves[1:]],
+                     [leaf.fmove for leaf in tree_leaves[1:]])
+    self.assertEqualNPArray(node_root.child_N, tree_root.child_N)
+    self.assertAllClose(node_root.child_W, tree_root.child_W)
+    self.assertEqual(node_root.N, tree_root.N)
+    self.assertEqual(sorted(node_root.children), sorted(tree_root.children))
+    # The positions are replayed from the root.
+    for node_leaf, tree_leaf in zip(node_leaves[-20:], tree_leaves[-20:]):
+      self.assertEqualPositions(node_leaf.position, tree_leaf.position)
+      self.assertEqual(node_leaf.is_done(), tree_leaf.is_done())
+
+  def test_discard_siblings_reuses_nodes(self):
+    tree = MCTSTree(utils_test.BOARD_SIZE, go.Position(utils_test.BOARD_SIZE))
+    root = tree.root
+    _random_search(root, 100)
+    num_nodes = tree.num_nodes
+    best_move = np.argmax(root.child_N)
+    new_root = root.maybe_add_child(best_move)
+    num_readouts = new_root.N
+    new_root.discard_siblings()
+    self.assertEqual(new_root, tree.root)
+    self.assertEqual([best_move], list(root.children))
+    self.assertEqual(num_readouts, tree.root.N)
+    self.assertEqual(
+        go.Position(utils_test.BOARD_SIZE).play_move(
+            coords.from_flat(utils_test.BOARD_SIZE, best_move)).board_hash,
+        tree.root.position.board_hash)
+    # The released nodes are reused before the pools grow.
+    _random_search(tree.root, 50)
+    self.assertEqual(num_nodes, tree.num_nodes)
+    self.assertNoPendingVirtualLosses(tree.root)
+
+
+class TestTranspositionCache(utils_test.MiniGoUnitTest):
+
+  def test_transposed_positions_hit(self):
+    cache = TranspositionCache(max_size=10)
+    empty = go.Position(utils_test.BOARD_SIZE)
+    a9, b9, c9 = [coords.from_kgs(utils_test.BOARD_SIZE, c)
+                  for c in ['A9', 'B9', 'C9']]
+    position = empty.play_move(a9).play_move(b9).play_move(c9)
+    transposed = empty.play_move(c9).play_move(b9).play_move(a9)
+    self.assertIsNone(cache.get(position))
+    cache.put(position, 'probs', 0.5)
+    self.assertEqual(('probs', 0.5), cache.get(transposed))
+    # The same board with the other color to play is another position.
+    self.assertIsNone(cache.get(transposed.pass_move()))
+    self.assertEqual((1, 2), (cache.hits, cache.misses))
+    self.assertAlmostEqual(1 / 3, cache.hit_rate)
+
+  def test_evicts_least_recently_used(self):
+    cache = TranspositionCache(max_size=2)
+    empty = go.Position(utils_test.BOARD_SIZE)
+    positions = [empty, empty.pass_move(),
+                 empty.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'A9'))]
+    cache.put(positions[0], 'probs0', 0)
+    cache.put(positions[1], 'probs1', 1)
+    cache.get(positions[0])
+    cache.put(positions[2], 'probs2', 2)
+    self.assertEqual(2, len(cache))
+    self.assertIsNone(cache.get(positions[1]))
+    self.assertEqual(('probs0', 0), cache.get(positions[0]))
+    self.assertEqual(('probs2', 2), cache.get(positions[2]))
+
+
 if __name__ == '__main__':
   tf.test.main()
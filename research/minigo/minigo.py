@@ -40,6 +40,7 @@ import tensorflow as tf  # pylint: disable=g-bad-import-order
 
 import dualnet
 import evaluation
+import gatherer
 import go
 import model_params
 import preprocessing
@@ -97,10 +98,23 @@ def selfplay(selfplay_dirs, selfplay_model, params):
     player = selfplay_mcts.play(
         params.board_size, selfplay_model, params.selfplay_readouts,
         params.selfplay_resign_threshold, params.simultaneous_leaves,
-        params.selfplay_verbose)
+        params.selfplay_verbose, params.selfplay_transposition_cache_size,
+        params.selfplay_array_tree)
 
   output_name = '{}-{}'.format(int(time.time()), socket.gethostname())
+  _write_selfplay_game(selfplay_dirs, player, output_name, params)
 
+
+def _write_selfplay_game(selfplay_dirs, player, output_name, params):
+  """Write the sgf files and the training examples of a selfplay game.
+
+  Args:
+    selfplay_dirs: A dict to specify the directories used in selfplay, see
+      selfplay.
+    player: The MCTSPlayer of the finished game.
+    output_name: The name of the output files, without extension.
+    params: A MiniGoParams instance of hyperparameters for the model.
+  """
   def _write_sgf_data(dir_sgf, use_comments):
     with tf.gfile.GFile(
         os.path.join(dir_sgf, '{}.sgf'.format(output_name)), 'w') as f:
@@ -124,7 +138,9 @@ def selfplay(selfplay_dirs, selfplay_model, params):
 
 
 def gather(selfplay_dir, training_chunk_dir, params):
-  """Gather selfplay data into large training chunk.
+  """Gather the new selfplay data into training chunks.
+
+  Only the games written since the previous gather are read, see gatherer.
 
   Args:
     selfplay_dir: Where to look for games. Set as 'base_dir/data/selfplay/'.
@@ -132,50 +148,14 @@ def gather(selfplay_dir, training_chunk_dir, params):
       'base_dir/data/training_chunks/'.
     params: A MiniGoParams instance of hyperparameters for the model.
   """
-  # Check the selfplay data from the most recent 50 models.
-  _ensure_dir_exists(training_chunk_dir)
-  sorted_model_dirs = sorted(tf.gfile.ListDirectory(selfplay_dir))
-  models = [model_dir.strip('/')
-            for model_dir in sorted_model_dirs[-params.gather_generation:]]
-
-  with utils.logged_timer('Finding existing tfrecords...'):
-    model_gamedata = {
-        model: tf.gfile.Glob(
-            os.path.join(selfplay_dir, model, '*'+_TF_RECORD_SUFFIX))
-        for model in models
-    }
-  print('Found {} models'.format(len(models)))
-  for model_name, record_files in sorted(model_gamedata.items()):
-    print('    {}: {} files'.format(model_name, len(record_files)))
-
-  meta_file = os.path.join(training_chunk_dir, 'meta.txt')
-  try:
-    with tf.gfile.GFile(meta_file, 'r') as f:
-      already_processed = set(f.read().split())
-  except tf.errors.NotFoundError:
-    already_processed = set()
-
-  num_already_processed = len(already_processed)
-
-  for model_name, record_files in sorted(model_gamedata.items()):
-    if set(record_files) <= already_processed:
-      continue
-    print('Gathering files from {}:'.format(model_name))
-    tf_examples = preprocessing.shuffle_tf_examples(
-        params.shuffle_buffer_size, params.examples_per_chunk, record_files)
-    # tqdm to make the loops show a smart progress meter
-    for i, example_batch in enumerate(tf_examples):
-      output_record = os.path.join(
-          training_chunk_dir,
-          ('{}-{}'+_TF_RECORD_SUFFIX).format(model_name, str(i)))
-      preprocessing.write_tf_examples(
-          output_record, example_batch, serialize=False)
-    already_processed.update(record_files)
-
-  print('Processed {} new files'.format(
-      len(already_processed) - num_already_processed))
-  with tf.gfile.GFile(meta_file, 'w') as f:
-    f.write('\n'.join(sorted(already_processed)))
+  # Keep the selfplay data of the most recent 50 models.
+  with utils.logged_timer('Gathering new games'):
+    stats = gatherer.Gatherer(
+        selfplay_dir, training_chunk_dir, params.examples_per_chunk,
+        params.gather_generation).gather()
+  print('Gathered {} new examples into {} new chunks, dropped {} expired '
+        'chunks'.format(stats['num_records'], stats['num_new_chunks'],
+                        stats['num_expired_chunks']))
 
 
 def train(trained_models_dir, estimator_model_dir, training_chunk_dir,
@@ -246,19 +226,20 @@ def validate(trained_models_dir, holdout_dir, estimator_model_dir, params):
     dualnet.validate(estimator_model_dir, tf_records, params)
 
 
-def evaluate(black_model_name, black_net, white_model_name, white_net,
+def evaluate(black_model_name, black_model, white_model_name, white_model,
              evaluate_dir, params):
   """Evaluate with two models.
 
-  With two DualNetRunners to play as black and white in a Go match. Two models
-  play several games, and the model that wins by a margin of 55% will be the
-  winner.
+  Two models play several games as black and white in a Go match, in
+  params.eval_num_workers processes which each load the two models. The model
+  that wins by a margin of 55% will be the winner, and the match stops early
+  once a sequential probability ratio test decides it.
 
   Args:
     black_model_name: The name of the model playing black.
-    black_net: The DualNetRunner model for black
+    black_model: The path of the model for black.
     white_model_name: The name of the model playing white.
-    white_net: The DualNetRunner model for white.
+    white_model: The path of the model for white.
     evaluate_dir: Where to write the evaluation results. Set as
       'base_dir/sgf/evaluate/'.
     params: A MiniGoParams instance of hyperparameters for the model.
@@ -269,10 +250,11 @@ def evaluate(black_model_name, black_net, white_model_name, white_net,
   Raises:
       ValueError: if neither `WHITE` or `BLACK` is returned.
   """
-  with utils.logged_timer('{} games'.format(params.eval_games)):
-    winner = evaluation.play_match(
-        params, black_net, white_net, params.eval_games,
-        params.eval_readouts, evaluate_dir, params.eval_verbose)
+  with utils.logged_timer('Up to {} games'.format(params.eval_games)):
+    winner = evaluation.play_match_parallel(
+        params, black_model, white_model, params.eval_games,
+        params.eval_readouts, evaluate_dir, params.eval_verbose,
+        params.eval_num_workers)
 
   if winner != go.WHITE_NAME and winner != go.BLACK_NAME:
     raise ValueError('Winner should be either White or Black!')
@@ -364,8 +346,30 @@ def run_selfplay(selfplay_model, selfplay_games, dirs, params):
       dirs.holdout_dir, dirs.sgf_dir, params)
 
   print('Self-play with model: {}'.format(selfplay_model))
-  for _ in range(selfplay_games):
-    selfplay(selfplay_dirs, network, params)
+  if params.selfplay_parallel_games <= 1:
+    for _ in range(selfplay_games):
+      selfplay(selfplay_dirs, network, params)
+    return
+
+  # Games finishing in the same second are told apart by their index.
+  run_name = '{}-{}'.format(int(time.time()), socket.gethostname())
+
+  def _write_game(game_index, player):
+    _write_selfplay_game(selfplay_dirs, player,
+                         '{}-{}'.format(run_name, game_index), params)
+
+  with utils.logged_timer('Playing {} games'.format(selfplay_games)):
+    stats = selfplay_mcts.play_concurrently(
+        params.board_size, network, selfplay_games,
+        params.selfplay_parallel_games, params.selfplay_readouts,
+        params.selfplay_resign_threshold, params.simultaneous_leaves,
+        params.selfplay_max_batch_size, params.selfplay_max_batch_wait,
+        _write_game, params.selfplay_verbose,
+        params.selfplay_transposition_cache_size, params.selfplay_array_tree)
+  print('{:.1f} games/hour, mean batch size {:.1f}, mean queue latency '
+        '{:.2f} ms, transposition cache hit rate {:.1%}'.format(
+            stats['games_per_hour'], stats['mean_batch_size'],
+            stats['mean_queue_secs'] * 1000, stats['cache_hit_rate']))
 
 
 def main(_):
@@ -434,12 +438,9 @@ def main(_):
       black_model = os.path.join(dirs.trained_models_dir, best_model_so_far)
       white_model = os.path.join(dirs.trained_models_dir, current_model)
       _ensure_dir_exists(dirs.evaluate_dir)
-      with utils.logged_timer('Loading weights'):
-        black_net = dualnet.DualNetRunner(black_model, params)
-        white_net = dualnet.DualNetRunner(white_model, params)
 
       best_model_so_far = evaluate(
-          best_model_so_far, black_net, current_model, white_net,
+          best_model_so_far, black_model, current_model, white_model,
           dirs.evaluate_dir, params)
       print('Winner of evaluation: {}!'.format(best_model_so_far))
     else:
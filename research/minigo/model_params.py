@@ -51,6 +51,21 @@ class MiniGoParams(object):
   # the number of simultaneous leaves in MCTS
   simultaneous_leaves = 8
 
+  # The number of selfplay games played concurrently. The leaves of all of
+  # them are evaluated together in batches of up to selfplay_max_batch_size
+  # positions, which wait at most selfplay_max_batch_wait seconds to fill up.
+  selfplay_parallel_games = 16
+  selfplay_max_batch_size = 128
+  selfplay_max_batch_wait = 0.01
+
+  # The number of network outputs of positions each selfplay game keeps to
+  # reuse for positions reached again by a different move order.
+  selfplay_transposition_cache_size = 10000
+
+  # Whether selfplay searches with a mcts.MCTSTree, which keeps the nodes in
+  # preallocated arrays, instead of a tree of mcts.MCTSNodes.
+  selfplay_array_tree = True
+
   # holdout data for validation
   holdout_pct = 0.05  # How many games to hold out for validation
   holdout_generation = 50  # How many recent generations/models for holdout data
@@ -69,6 +84,14 @@ class MiniGoParams(object):
   eval_readouts = 100  # How many readouts to make per move in evaluation
   eval_verbose = 1  # How verbose the players should be in evaluation
   eval_win_rate = 0.55  # Winner needs to win by a margin of 55%.
+  # The games are played by eval_num_workers processes, and the match stops
+  # once a sequential probability ratio test decides whether black wins
+  # eval_sprt_margin more or less often than the eval_win_rate margin needs,
+  # with error rates eval_sprt_alpha and eval_sprt_beta.
+  eval_num_workers = 8
+  eval_sprt_margin = 0.05
+  eval_sprt_alpha = 0.05
+  eval_sprt_beta = 0.05
 
 
 class DummyMiniGoParams(MiniGoParams):
@@ -81,6 +104,8 @@ class DummyMiniGoParams(MiniGoParams):
   max_games_per_generation = 2
   max_iters_per_pipeline = 1
   selfplay_readouts = 10
+  selfplay_parallel_games = 2
+  selfplay_max_batch_size = 16
 
   shuffle_buffer_size = 1000
 
@@ -88,6 +113,7 @@ class DummyMiniGoParams(MiniGoParams):
   eval_games = 10  # The number of games to play in evaluation
   eval_readouts = 10  # How many readouts to make per move in evaluation
   eval_verbose = 1  # How verbose the players should be in evaluation
+  eval_num_workers = 2
 
 
 class DummyValidationParams(DummyMiniGoParams, MiniGoParams):
@@ -18,6 +18,7 @@ from __future__ import division
 from __future__ import print_function
 
 import functools
+import itertools
 import random
 
 import tensorflow as tf  # pylint: disable=g-bad-import-order
@@ -80,6 +81,20 @@ def write_tf_examples(filename, tf_examples, serialize=True):
 
 
 # Read tf.Example from files
+def read_serialized_tf_examples(filename, start=0):
+  """Reads the serialized tf.Examples of a file written by write_tf_examples.
+
+  Args:
+    filename: The tf.record file to read.
+    start: The number of records to skip at the start of the file.
+
+  Returns:
+    An iterator of bytes, the serialized tf.Examples.
+  """
+  records = tf.python_io.tf_record_iterator(filename, options=TF_RECORD_CONFIG)
+  return itertools.islice(records, start, None)
+
+
 def _batch_parse_tf_example(board_size, batch_size, example_batch):
   """Parse tf examples.
 
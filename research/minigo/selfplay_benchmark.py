@@ -0,0 +1,215 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmarks the go rules and the tree search of selfplay.
+
+Reports:
+  * the moves/sec of go.Position.play_move in games of random legal moves,
+  * the readouts/sec and the peak RSS of deep tree searches with a tree of
+    mcts.MCTSNodes and with a mcts.MCTSTree, with random network outputs so
+    that only the tree search is timed. Each search runs in a new process.
+  * the moves/sec and games/hour of selfplay, and the hit rate of the
+    transposition cache of the tree search, without and with the cache.
+
+Example usage:
+    python selfplay_benchmark.py --board_size=9 --readouts=100 --games=4
+
+Without --model_path, selfplay uses a network with random weights.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import random
+import resource
+import sys
+import time
+
+import coords
+import go
+import numpy as np
+
+
+def random_game_moves_per_sec(board_size, num_games):
+  """Returns the moves/sec of play_move in games of random legal moves."""
+  num_moves = 0
+  elapsed = 0.0
+  for _ in range(num_games):
+    position = go.Position(board_size)
+    while not position.is_game_over() and position.n < board_size ** 2 * 2:
+      legal_moves = np.flatnonzero(position.all_legal_moves())
+      move = coords.from_flat(board_size, random.choice(legal_moves))
+      start = time.time()
+      position = position.play_move(move)
+      elapsed += time.time() - start
+      num_moves += 1
+  return num_moves / elapsed
+
+
+class RandomNetwork(object):
+  """Returns random policies and values, at almost no cost."""
+
+  save_file = 'random'
+
+  def __init__(self, board_size, seed=0):
+    self.board_size = board_size
+    self.rng = np.random.RandomState(seed)
+
+  def run(self, position):
+    probs, values = self.run_many([position])
+    return probs[0], values[0]
+
+  def run_many(self, positions):
+    probs = self.rng.dirichlet([0.03] * (self.board_size ** 2 + 1),
+                               size=len(positions))
+    values = self.rng.uniform(-1, 1, size=len(positions))
+    return probs.astype(np.float32), values.astype(np.float32)
+
+
+def _peak_rss_mb():
+  # ru_maxrss is in kilobytes on Linux.
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _search(board_size, readouts, num_moves, array_tree, results):
+  """Searches num_moves moves and puts the readouts/sec and RSS in results."""
+  import strategies  # pylint: disable=g-import-not-at-top
+  random.seed(0)
+  np.random.seed(0)
+  start_rss = _peak_rss_mb()
+  player = strategies.MCTSPlayerMixin(
+      board_size, RandomNetwork(board_size), simulations_per_move=readouts,
+      array_tree=array_tree)
+  player.initialize_game()
+  first_node = player.root.select_leaf()
+  first_node.incorporate_results(
+      *player.network.run(first_node.position), up_to=first_node)
+  num_readouts = 0
+  start = time.time()
+  for _ in range(num_moves):
+    current_readouts = player.root.N
+    while player.root.N < current_readouts + readouts:
+      player.tree_search()
+    num_readouts += player.root.N - current_readouts
+    player.play_move(player.pick_move())
+  results.put((num_readouts / (time.time() - start), _peak_rss_mb(),
+               _peak_rss_mb() - start_rss))
+
+
+def tree_search_stats(board_size, readouts, num_moves, array_tree):
+  """Returns the readouts/sec and the peak RSS in MB of a tree search.
+
+  Args:
+    board_size: the go board size.
+    readouts: the number of readouts of each move.
+    num_moves: the number of moves to search and play.
+    array_tree: whether to search with a MCTSTree instead of MCTSNodes.
+
+  Returns:
+    The readouts/sec, the peak RSS of the process of the search and the
+    increase of the peak RSS during the search.
+  """
+  results = multiprocessing.Queue()
+  process = multiprocessing.Process(
+      target=_search,
+      args=(board_size, readouts, num_moves, array_tree, results))
+  process.start()
+  stats = results.get()
+  process.join()
+  return stats
+
+
+def selfplay_stats(board_size, network, num_games, readouts,
+                   transposition_cache_size):
+  """Plays selfplay games and returns their speed and cache hit rate."""
+  import selfplay_mcts  # pylint: disable=g-import-not-at-top
+  num_moves = 0
+  hits = lookups = 0
+  start = time.time()
+  for _ in range(num_games):
+    player = selfplay_mcts.play(
+        board_size, network, readouts, resign_threshold=0.95,
+        simultaneous_leaves=8,
+        transposition_cache_size=transposition_cache_size)
+    num_moves += player.root.position.n
+    if player.transposition_cache is not None:
+      hits += player.transposition_cache.hits
+      lookups += (player.transposition_cache.hits +
+                  player.transposition_cache.misses)
+  elapsed = time.time() - start
+  return {
+      'moves_per_sec': num_moves / elapsed,
+      'games_per_hour': num_games * 3600.0 / elapsed,
+      'cache_hit_rate': hits / max(lookups, 1),
+  }
+
+
+def main(argv):
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--board_size', type=int, default=9)
+  parser.add_argument('--random_games', type=int, default=20,
+                      help='Number of games of random moves.')
+  parser.add_argument('--games', type=int, default=4,
+                      help='Number of selfplay games of each benchmark.')
+  parser.add_argument('--readouts', type=int, default=100)
+  parser.add_argument('--transposition_cache_size', type=int, default=10000)
+  parser.add_argument('--tree_board_size', type=int, default=19)
+  parser.add_argument('--tree_readouts', type=int, default=1600,
+                      help='Number of readouts of each move of the searches.')
+  parser.add_argument('--tree_moves', type=int, default=5,
+                      help='Number of moves of the searches.')
+  parser.add_argument('--model_path', default=None,
+                      help='Path of the model, random weights if not set.')
+  flags = parser.parse_args(argv[1:])
+
+  random.seed(0)
+  np.random.seed(0)
+  print('play_move: {:.0f} moves/sec'.format(
+      random_game_moves_per_sec(flags.board_size, flags.random_games)))
+  for array_tree in (False, True):
+    readouts_per_sec, peak_rss, rss_increase = tree_search_stats(
+        flags.tree_board_size, flags.tree_readouts, flags.tree_moves,
+        array_tree)
+    print('{} search: {:.0f} readouts/sec, peak RSS {:.0f} MB (+{:.0f} MB '
+          'during the search)'.format(
+              'MCTSTree' if array_tree else 'MCTSNode', readouts_per_sec,
+              peak_rss, rss_increase))
+
+  import dualnet  # pylint: disable=g-import-not-at-top
+  import model_params  # pylint: disable=g-import-not-at-top
+  import utils  # pylint: disable=g-import-not-at-top
+  # The network of the board size, as in minigo.py.
+  params = model_params.MiniGoParams()
+  k = utils.round_power_of_two(flags.board_size ** 2 / 3)
+  params.num_filters = k
+  params.fc_width = 2 * k
+  params.num_shared_layers = flags.board_size
+  params.board_size = flags.board_size
+  network = dualnet.DualNetRunner(flags.model_path, params)
+  network.save_file = flags.model_path or 'random'
+  for cache_size in (0, flags.transposition_cache_size):
+    random.seed(0)
+    np.random.seed(0)
+    stats = selfplay_stats(flags.board_size, network, flags.games,
+                           flags.readouts, cache_size)
+    print('selfplay, cache size {}: {:.1f} moves/sec, {:.1f} games/hour, '
+          'cache hit rate {:.1%}'.format(
+              cache_size, stats['moves_per_sec'], stats['games_per_hour'],
+              stats['cache_hit_rate']))
+
+
+if __name__ == '__main__':
+  main(sys.argv)
@@ -19,14 +19,16 @@ from __future__ import print_function
 
 import random
 import sys
+import threading
 import time
 
 import coords
 from gtp_wrapper import MCTSPlayer
+from inference_server import InferenceServer
 
 
 def play(board_size, network, readouts, resign_threshold, simultaneous_leaves,
-         verbosity=0):
+         verbosity=0, transposition_cache_size=0, array_tree=False):
   """Plays out a self-play match.
 
   Args:
@@ -36,6 +38,9 @@ def play(board_size, network, readouts, resign_threshold, simultaneous_leaves,
     resign_threshold: the threshold to resign at in the match
     simultaneous_leaves: the number of simultaneous leaves in MCTS
     verbosity: the verbosity of the self-play match
+    transposition_cache_size: the number of network outputs of positions kept
+      for reuse by the tree search, no cache if 0
+    array_tree: whether to search with an MCTSTree instead of MCTSNodes
 
   Returns:
     the final position
@@ -44,7 +49,9 @@ def play(board_size, network, readouts, resign_threshold, simultaneous_leaves,
       where n is the number of moves in the game.
   """
   player = MCTSPlayer(board_size, network, resign_threshold=resign_threshold,
-                      verbosity=verbosity, num_parallel=simultaneous_leaves)
+                      verbosity=verbosity, num_parallel=simultaneous_leaves,
+                      transposition_cache_size=transposition_cache_size,
+                      array_tree=array_tree)
   # Disable resign in 5% of games
   if random.random() < 0.05:
     player.resign_threshold = -1.0
@@ -94,3 +101,82 @@ def play(board_size, network, readouts, resign_threshold, simultaneous_leaves,
           player.root.position.score(), file=sys.stderr)
 
   return player
+
+
+def play_concurrently(board_size, network, num_games, num_parallel_games,
+                      readouts, resign_threshold, simultaneous_leaves,
+                      max_batch_size, max_wait_secs, game_callback,
+                      verbosity=0, transposition_cache_size=0,
+                      array_tree=False):
+  """Plays self-play matches concurrently, batching their network runs.
+
+  Each of the num_parallel_games threads plays one game after the other. The
+  leaf evaluations of all the games go through a single InferenceServer, so
+  that the network runs on batches of the positions of many games.
+
+  Args:
+    board_size: the go board size
+    network: the DualNet model
+    num_games: the number of games to play
+    num_parallel_games: the number of games played at the same time
+    readouts: the number of readouts in MCTS
+    resign_threshold: the threshold to resign at in the match
+    simultaneous_leaves: the number of simultaneous leaves in MCTS
+    max_batch_size: the maximum number of positions in a batch of inference
+    max_wait_secs: the maximum time a position waits for a batch to fill up
+    game_callback: a function called from the thread of a game with the index
+      of the game and the player of the finished game
+    verbosity: the verbosity of the self-play matches
+    transposition_cache_size: the number of network outputs of positions kept
+      for reuse by the tree search of each game, no cache if 0
+    array_tree: whether to search with an MCTSTree instead of MCTSNodes
+
+  Returns:
+    A dict with the number of games per hour ('games_per_hour'), the mean
+    number of positions in a batch of inference ('mean_batch_size'), the
+    mean time in seconds a request waited for its batch to run
+    ('mean_queue_secs') and the hit rate of the transposition caches
+    ('cache_hit_rate').
+  """
+  game_indices = iter(range(num_games))
+  lock = threading.Lock()
+  errors = []
+  cache_lookups = [0, 0]  # hits, misses
+
+  def _play_games(server):
+    with server.client():
+      while True:
+        with lock:
+          game_index = next(game_indices, None)
+        if game_index is None or errors:
+          return
+        try:
+          player = play(board_size, server, readouts, resign_threshold,
+                        simultaneous_leaves, verbosity,
+                        transposition_cache_size, array_tree)
+          game_callback(game_index, player)
+          if player.transposition_cache is not None:
+            with lock:
+              cache_lookups[0] += player.transposition_cache.hits
+              cache_lookups[1] += player.transposition_cache.misses
+        except Exception as e:  # pylint: disable=broad-except
+          errors.append(e)
+          return
+
+  start = time.time()
+  with InferenceServer(network, max_batch_size, max_wait_secs) as server:
+    threads = [threading.Thread(target=_play_games, args=(server,))
+               for _ in range(min(num_parallel_games, num_games))]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+  if errors:
+    raise errors[0]
+  mean_batch_size, mean_queue_secs = server.stats()
+  return {
+      'games_per_hour': num_games * 3600.0 / max(time.time() - start, 1e-9),
+      'mean_batch_size': mean_batch_size,
+      'mean_queue_secs': mean_queue_secs,
+      'cache_hit_rate': cache_lookups[0] / max(sum(cache_lookups), 1),
+  }
@@ -25,6 +25,8 @@ import time
 import coords
 import go
 from mcts import MCTSNode
+from mcts import MCTSTree
+from mcts import TranspositionCache
 import numpy as np
 import sgf_wrapper
 
@@ -74,7 +76,8 @@ class MCTSPlayerMixin(object):
   # before playing. Otherwise, it uses 'seconds_per_move' of wall time'
   def __init__(self, board_size, network, seconds_per_move=5,
                simulations_per_move=0, resign_threshold=-0.90,
-               verbosity=0, two_player_mode=False, num_parallel=8):
+               verbosity=0, two_player_mode=False, num_parallel=8,
+               transposition_cache_size=0, array_tree=False):
     self.board_size = board_size
     self.network = network
     self.seconds_per_move = seconds_per_move
@@ -93,11 +96,20 @@ class MCTSPlayerMixin(object):
     self.result = 0
     self.result_string = None
     self.resign_threshold = -abs(resign_threshold)
+    # Reuses the network outputs of positions reached by several move orders.
+    self.transposition_cache = (
+        TranspositionCache(transposition_cache_size)
+        if transposition_cache_size > 0 else None)
+    # Searches with an MCTSTree instead of a tree of MCTSNodes.
+    self.array_tree = array_tree
 
   def initialize_game(self, position=None):
     if position is None:
       position = go.Position(self.board_size)
-    self.root = MCTSNode(self.board_size, position)
+    if self.array_tree:
+      self.root = MCTSTree(self.board_size, position).root
+    else:
+      self.root = MCTSNode(self.board_size, position)
     self.result = 0
     self.result_string = None
     self.comments = []
@@ -147,7 +159,7 @@ class MCTSPlayerMixin(object):
     self.comments.append(self.root.describe())
     self.root = self.root.maybe_add_child(coords.to_flat(self.board_size, c))
     self.position = self.root.position  # for showboard
-    del self.root.parent.children
+    self.root.discard_siblings()
     return True  # GTP requires positive result.
 
   def pick_move(self):
@@ -184,12 +196,27 @@ class MCTSPlayerMixin(object):
       leaf.add_virtual_loss(up_to=self.root)
       leaves.append(leaf)
     if leaves:
-      move_probs, values = self.network.run_many(
+      move_probs, values = self._run_network(
           [leaf.position for leaf in leaves])
       for leaf, move_prob, value in zip(leaves, move_probs, values):
         leaf.revert_virtual_loss(up_to=self.root)
         leaf.incorporate_results(move_prob, value, up_to=self.root)
 
+  def _run_network(self, positions):
+    """Runs the network on the positions missing from the cache."""
+    if self.transposition_cache is None:
+      return self.network.run_many(positions)
+    outputs = [self.transposition_cache.get(p) for p in positions]
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if missing:
+      move_probs, values = self.network.run_many(
+          [positions[i] for i in missing])
+      for i, move_prob, value in zip(missing, move_probs, values):
+        # Copied so that the cache does not keep the whole batch alive.
+        outputs[i] = (np.copy(move_prob), value)
+        self.transposition_cache.put(positions[i], *outputs[i])
+    return [output[0] for output in outputs], [output[1] for output in outputs]
+
   def show_path_to_root(self, node):
     max_depth = (self.board_size ** 2) * 1.4  # 505 moves for 19x19, 113 for 9x9
     pos = node.position
@@ -88,6 +88,14 @@ class DummyNet():
         self.fake_value] * len(positions)
 
 
+def load_dummy_net(model_path, params, fake_value=0):
+  """Returns a DummyNet in place of a model, like evaluation loads models."""
+  del params  # Unused
+  net = DummyNet(fake_value=fake_value)
+  net.save_file = model_path
+  return net
+
+
 def initialize_basic_player():
   player = MCTSPlayerMixin(utils_test.BOARD_SIZE, DummyNet())
   player.initialize_game()
@@ -219,6 +227,44 @@ class TestMCTSPlayerMixin(utils_test.MiniGoUnitTest):
     # no virtual losses should be pending
     self.assertNoPendingVirtualLosses(player.root)
 
+  def test_tree_search_with_transposition_cache(self):
+    probs = np.array(
+        [.001] * (utils_test.BOARD_SIZE * utils_test.BOARD_SIZE + 1))
+    probs[20:24] = 0.2  # a few moves, played in many orders.
+    net = DummyNet(fake_priors=probs)
+    evaluated = []
+    run_many = net.run_many
+    net.run_many = lambda positions: (evaluated.extend(positions),
+                                      run_many(positions))[1]
+    player = MCTSPlayerMixin(utils_test.BOARD_SIZE, net,
+                             transposition_cache_size=1000)
+    player.initialize_game()
+    for _ in range(50):
+      player.tree_search(num_parallel=4)
+    cache = player.transposition_cache
+    self.assertGreater(cache.hits, 0)
+    self.assertEqual(cache.misses, len(evaluated))
+    self.assertEqual(len(set((p.board_hash, p.to_play) for p in evaluated)),
+                     len(cache))
+    self.assertNoPendingVirtualLosses(player.root)
+
+  def test_parallel_tree_search_with_array_tree(self):
+    player = initialize_almost_done_player()
+    player.array_tree = True
+    player.initialize_game(SEND_TWO_RETURN_ONE)
+    player.tree_search(num_parallel=1)
+    for _ in range(5):
+      player.tree_search(num_parallel=4)
+    # Search should converge on D9 as only winning move.
+    flattened = coords.to_flat(utils_test.BOARD_SIZE, coords.from_kgs(
+        utils_test.BOARD_SIZE, 'D9'))
+    self.assertEqual(flattened, np.argmax(player.root.child_N))
+    self.assertGreater(player.root.children[flattened].Q, 0)
+    self.assertNoPendingVirtualLosses(player.root)
+    player.play_move(coords.from_flat(utils_test.BOARD_SIZE, flattened))
+    self.assertEqual(flattened, player.root.fmove)
+    self.assertEqual(SEND_TWO_RETURN_ONE.n + 1, player.position.n)
+
   def test_ridiculously_parallel_tree_search(self):
     player = initialize_almost_done_player()
     # Test that an almost complete game
@@ -21,6 +21,10 @@ described in:
 Wei Liu, Dragomir Anguelov, Dumitru Erhan, Christian Szegedy, Scott Reed,
 Cheng-Yang Fu, Alexander C. Berg
 (see Section 2.2: Choosing scales and aspect ratios for default boxes)
+
+When the feature map shapes and the image shape are static, as for the fixed
+size inputs of SSD, the anchors are computed once with numpy for each of these
+shapes, cached, and added to the graph as constants.
 """
 
 import numpy as np
@@ -29,6 +33,7 @@ import tensorflow as tf
 
 from object_detection.anchor_generators import grid_anchor_generator
 from object_detection.core import anchor_generator
+from object_detection.core import box_list
 from object_detection.core import box_list_ops
 
 
@@ -112,6 +117,7 @@ class MultipleGridAnchorGenerator(anchor_generator.AnchorGenerator):
       scales, aspect_ratios = zip(*box_spec)
       self._scales.append(scales)
       self._aspect_ratios.append(aspect_ratios)
+    self._anchor_cache = {}
 
     for arg, arg_name in zip([self._anchor_strides, self._anchor_offsets],
                              ['anchor_strides', 'anchor_offsets']):
@@ -182,6 +188,19 @@ class MultipleGridAnchorGenerator(anchor_generator.AnchorGenerator):
                 for list_item in feature_map_shape_list]):
       raise ValueError('feature_map_shape_list must be a list of pairs.')
 
+    static_anchors = self._static_anchors(feature_map_shape_list, im_height,
+                                          im_width)
+    if static_anchors is not None:
+      anchor_grid_list = []
+      for feature_map_index, anchors in enumerate(static_anchors):
+        tiled_anchors = box_list.BoxList(tf.constant(anchors))
+        tiled_anchors.add_field(
+            'feature_map_index',
+            tf.constant(feature_map_index, dtype=tf.float32,
+                        shape=[anchors.shape[0]]))
+        anchor_grid_list.append(tiled_anchors)
+      return anchor_grid_list
+
     im_height = tf.to_float(im_height)
     im_width = tf.to_float(im_width)
 
@@ -242,6 +261,130 @@ class MultipleGridAnchorGenerator(anchor_generator.AnchorGenerator):
 
     return anchor_grid_list
 
+  def _static_anchors(self, feature_map_shape_list, im_height, im_width):
+    """Returns the cached anchors of static shapes, computing them if needed.
+
+    Computes the same anchors as _generate, with numpy float32 operations in
+    the same order.
+
+    Args:
+      feature_map_shape_list: list of pairs of convnet layer resolutions in the
+        format [(height_0, width_0), (height_1, width_1), ...].
+      im_height: the height of the image to generate the grid for.
+      im_width: the width of the image to generate the grid for.
+
+    Returns:
+      A list of float32 numpy arrays of shape [num_anchors_i, 4] with the
+      anchors of each feature map, or None if a shape, the base anchor size or
+      the clip window is not known statically.
+    """
+    sizes = [size for pair in feature_map_shape_list for size in pair]
+    if not all(isinstance(size, int) for size in sizes + [im_height, im_width]):
+      return None
+    key = (tuple(feature_map_shape_list), im_height, im_width)
+    if key in self._anchor_cache:
+      return self._anchor_cache[key]
+    base_anchor_size = _static_value(self._base_anchor_size)
+    clip_window = None
+    if self._clip_window is not None:
+      clip_window = _static_value(self._clip_window)
+      if clip_window is None:
+        return None
+    if base_anchor_size is None:
+      return None
+
+    im_height = np.float32(im_height)
+    im_width = np.float32(im_width)
+    if not self._anchor_strides:
+      anchor_strides = [(np.float32(1.0) / np.float32(pair[0]),
+                         np.float32(1.0) / np.float32(pair[1]))
+                        for pair in feature_map_shape_list]
+    else:
+      anchor_strides = [(np.float32(stride[0]) / im_height,
+                         np.float32(stride[1]) / im_width)
+                        for stride in self._anchor_strides]
+    if not self._anchor_offsets:
+      anchor_offsets = [(np.float32(0.5) * stride[0],
+                         np.float32(0.5) * stride[1])
+                        for stride in anchor_strides]
+    else:
+      anchor_offsets = [(np.float32(offset[0]) / im_height,
+                         np.float32(offset[1]) / im_width)
+                        for offset in self._anchor_offsets]
+    min_im_shape = np.minimum(im_height, im_width)
+    base_anchor_size = [min_im_shape / im_height * base_anchor_size[0],
+                        min_im_shape / im_width * base_anchor_size[1]]
+
+    anchors_list = []
+    for grid_size, scales, aspect_ratios, stride, offset in zip(
+        feature_map_shape_list, self._scales, self._aspect_ratios,
+        anchor_strides, anchor_offsets):
+      anchors = _tile_anchors(grid_size[0], grid_size[1], scales,
+                              aspect_ratios, base_anchor_size, stride, offset)
+      if clip_window is not None:
+        anchors = np.maximum(
+            np.minimum(anchors, np.tile(clip_window[2:], 2)),
+            np.tile(clip_window[:2], 2))
+      anchors_list.append(anchors)
+    self._anchor_cache[key] = anchors_list
+    return anchors_list
+
+
+def _static_value(value):
+  """Returns the value of a constant tensor or list as a float32 array.
+
+  Args:
+    value: a tensor, or a list or numpy array.
+
+  Returns:
+    A float32 numpy array, or None if the value of the tensor is not known
+    statically.
+  """
+  if isinstance(value, tf.Tensor):
+    value = tf.contrib.util.constant_value(value)
+    if value is None:
+      return None
+  return np.asarray(value, dtype=np.float32)
+
+
+def _tile_anchors(grid_height, grid_width, scales, aspect_ratios,
+                  base_anchor_size, anchor_stride, anchor_offset):
+  """Numpy version of grid_anchor_generator.tile_anchors.
+
+  Args:
+    grid_height: size of the grid in the y direction.
+    grid_width: size of the grid in the x direction.
+    scales: a list of the scales of the boxes in the basis set.
+    aspect_ratios: a list of the aspect ratios of the boxes in the basis set.
+    base_anchor_size: base anchor size as [height, width] float32 scalars.
+    anchor_stride: difference in centers between base anchors for adjacent grid
+      positions, as float32 scalars.
+    anchor_offset: center of the upper left anchor, as float32 scalars.
+
+  Returns:
+    A float32 numpy array of shape [grid_height * grid_width * num_boxes, 4]
+    with the anchors in the order of tile_anchors.
+  """
+  scales = np.asarray(scales, dtype=np.float32)
+  ratio_sqrts = np.sqrt(np.asarray(aspect_ratios, dtype=np.float32))
+  heights = scales / ratio_sqrts * base_anchor_size[0]
+  widths = scales * ratio_sqrts * base_anchor_size[1]
+
+  y_centers = (np.arange(grid_height, dtype=np.float32) * anchor_stride[0] +
+               anchor_offset[0])
+  x_centers = (np.arange(grid_width, dtype=np.float32) * anchor_stride[1] +
+               anchor_offset[1])
+  grid_shape = [grid_height, grid_width, scales.size]
+  bbox_centers = np.stack([
+      np.broadcast_to(y_centers[:, np.newaxis, np.newaxis], grid_shape),
+      np.broadcast_to(x_centers[np.newaxis, :, np.newaxis], grid_shape)
+  ], axis=3).reshape([-1, 2])
+  bbox_sizes = np.stack([np.broadcast_to(heights, grid_shape),
+                         np.broadcast_to(widths, grid_shape)],
+                        axis=3).reshape([-1, 2])
+  return np.concatenate([bbox_centers - np.float32(.5) * bbox_sizes,
+                         bbox_centers + np.float32(.5) * bbox_sizes], axis=1)
+
 
 def create_ssd_anchors(num_layers=6,
                        min_scale=0.2,
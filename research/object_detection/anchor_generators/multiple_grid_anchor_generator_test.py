@@ -284,6 +284,44 @@ class CreateSSDAnchorsTest(test_case.TestCase):
     anchor_corners_out = np.concatenate(self.execute(graph_fn2, []), axis=0)
     self.assertEquals(anchor_corners_out.shape, (11640, 4))
 
+  def test_static_anchors_equal_dynamic_anchors(self):
+    feature_map_shape_list = [(19, 19), (10, 10), (5, 5), (3, 3), (2, 2),
+                              (1, 1)]
+
+    def graph_fn(*feature_map_sizes):
+      anchor_generator = ag.create_ssd_anchors(
+          anchor_strides=[(16, 16), (32, 32), (64, 64), (128, 128),
+                          (256, 256), (512, 512)],
+          anchor_offsets=[(8, 8), (16, 16), (32, 32), (64, 64), (128, 128),
+                          (256, 256)])
+      static_anchors_list = anchor_generator.generate(
+          feature_map_shape_list=feature_map_shape_list, im_height=300,
+          im_width=500)
+      dynamic_anchors_list = anchor_generator.generate(
+          feature_map_shape_list=list(zip(feature_map_sizes[::2],
+                                          feature_map_sizes[1::2])),
+          im_height=300, im_width=500)
+      return ([anchors.get() for anchors in static_anchors_list] +
+              [anchors.get() for anchors in dynamic_anchors_list])
+
+    feature_map_sizes = [np.array(size, dtype=np.int32)
+                         for shape in feature_map_shape_list for size in shape]
+    anchor_corners_out = self.execute_cpu(graph_fn, feature_map_sizes)
+    for static_anchors, dynamic_anchors in zip(anchor_corners_out[:6],
+                                               anchor_corners_out[6:]):
+      self.assertAllClose(static_anchors, dynamic_anchors)
+
+  def test_static_anchors_are_cached_constants(self):
+    anchor_generator = ag.create_ssd_anchors(num_layers=2)
+    with tf.Graph().as_default():
+      anchors_list = anchor_generator.generate(
+          feature_map_shape_list=[(4, 4), (2, 2)])
+      self.assertEqual('Const', anchors_list[0].get().op.inputs[0].op.type)
+    with tf.Graph().as_default():
+      anchor_generator.generate(feature_map_shape_list=[(4, 4), (2, 2)])
+      anchor_generator.generate(feature_map_shape_list=[(4, 4), (1, 1)])
+    self.assertEqual(2, len(anchor_generator._anchor_cache))
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -219,6 +219,11 @@ class Matcher(object):
     """
     self._use_matmul_gather = use_matmul_gather
 
+  @property
+  def use_matmul_gather(self):
+    """Whether the constructed match objects use matmul based gather."""
+    return self._use_matmul_gather
+
   def match(self, similarity_matrix, scope=None, **params):
     """Computes matches among row and column indices and returns the result.
 
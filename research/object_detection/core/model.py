@@ -238,7 +238,8 @@ class DetectionModel(object):
                           groundtruth_masks_list=None,
                           groundtruth_keypoints_list=None,
                           groundtruth_weights_list=None,
-                          groundtruth_is_crowd_list=None):
+                          groundtruth_is_crowd_list=None,
+                          groundtruth_anchor_matches_list=None):
     """Provide groundtruth tensors.
 
     Args:
@@ -263,6 +264,10 @@ class DetectionModel(object):
         [num_boxes] containing weights for groundtruth boxes.
       groundtruth_is_crowd_list: A list of 1-D tf.bool tensors of shape
         [num_boxes] containing is_crowd annotations
+      groundtruth_anchor_matches_list: A list of 1-D tf.int32 tensors of shape
+        [num_anchors] containing precomputed match results of the anchors of
+        the model, which are used instead of matching the anchors to the
+        groundtruth boxes.
     """
     self._groundtruth_lists[fields.BoxListFields.boxes] = groundtruth_boxes_list
     self._groundtruth_lists[
@@ -279,6 +284,9 @@ class DetectionModel(object):
     if groundtruth_is_crowd_list:
       self._groundtruth_lists[
           fields.BoxListFields.is_crowd] = groundtruth_is_crowd_list
+    if groundtruth_anchor_matches_list:
+      self._groundtruth_lists[
+          fields.BoxListFields.anchor_matches] = groundtruth_anchor_matches_list
 
   @abstractmethod
   def restore_map(self, fine_tune_checkpoint_type='detection'):
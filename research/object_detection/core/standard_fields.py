@@ -64,6 +64,8 @@ class InputDataFields(object):
     verified_labels: list of human-verified image-level labels (note, that a
       label can be verified both as positive and negative).
     multiclass_scores: the label score per class for each box.
+    groundtruth_anchor_matches: precomputed index of the groundtruth box
+      matched to each anchor, -1 for unmatched and -2 for ignored anchors.
   """
   image = 'image'
   original_image = 'original_image'
@@ -91,6 +93,7 @@ class InputDataFields(object):
   true_image_shape = 'true_image_shape'
   verified_labels = 'verified_labels'
   multiclass_scores = 'multiclass_scores'
+  groundtruth_anchor_matches = 'groundtruth_anchor_matches'
 
 
 class DetectionResultFields(object):
@@ -133,6 +136,7 @@ class BoxListFields(object):
     keypoints: keypoints per bounding box.
     keypoint_heatmaps: keypoint heatmaps per bounding box.
     is_crowd: is_crowd annotation per bounding box.
+    anchor_matches: precomputed match results of the anchors.
   """
   boxes = 'boxes'
   classes = 'classes'
@@ -144,6 +148,7 @@ class BoxListFields(object):
   keypoints = 'keypoints'
   keypoint_heatmaps = 'keypoint_heatmaps'
   is_crowd = 'is_crowd'
+  anchor_matches = 'anchor_matches'
 
 
 class TfExampleFields(object):
@@ -186,6 +191,8 @@ class TfExampleFields(object):
     detection_bbox_ymax: ymax coordinates of a detection box.
     detection_bbox_xmax: xmax coordinates of a detection box.
     detection_score: detection score for the class label and box.
+    anchor_matches: precomputed index of the groundtruth box matched to each
+      anchor of a model, e.g. [-1, 0, -2, 1].
   """
   image_encoded = 'image/encoded'
   image_format = 'image/format'  # format is reserved keyword
@@ -219,3 +226,4 @@ class TfExampleFields(object):
   detection_bbox_ymax = 'image/detection/bbox/ymax'
   detection_bbox_xmax = 'image/detection/bbox/xmax'
   detection_score = 'image/detection/score'
+  anchor_matches = 'image/anchor_matches'
@@ -91,7 +91,7 @@ class TargetAssigner(object):
     return self._box_coder
 
   def assign(self, anchors, groundtruth_boxes, groundtruth_labels=None,
-             groundtruth_weights=None, **params):
+             groundtruth_weights=None, match_results=None, **params):
     """Assign classification and regression targets to each anchor.
 
     For a given set of anchors and groundtruth detections, match anchors
@@ -113,6 +113,10 @@ class TargetAssigner(object):
       groundtruth_weights: a float tensor of shape [M] indicating the weight to
         assign to all anchors match to a particular groundtruth box. The weights
         must be in [0., 1.]. If None, all weights are set to 1.
+      match_results: (optional) an int32 tensor of shape [N] with precomputed
+        match results of the anchors, as encoded by matcher.Match. If given,
+        the similarity of the anchors and the groundtruth boxes is not
+        computed and the matcher is not run.
       **params: Additional keyword arguments for specific implementations of
               the Matcher.
 
@@ -155,11 +159,18 @@ class TargetAssigner(object):
       if not num_gt_boxes:
         num_gt_boxes = groundtruth_boxes.num_boxes()
       groundtruth_weights = tf.ones([num_gt_boxes], dtype=tf.float32)
-    with tf.control_dependencies(
-        [unmatched_shape_assert, labels_and_box_shapes_assert]):
-      match_quality_matrix = self._similarity_calc.compare(groundtruth_boxes,
-                                                           anchors)
-      match = self._matcher.match(match_quality_matrix, **params)
+    shape_asserts = [unmatched_shape_assert, labels_and_box_shapes_assert]
+    if match_results is not None:
+      shape_asserts.append(shape_utils.assert_shape_equal(
+          shape_utils.combined_static_and_dynamic_shape(match_results),
+          shape_utils.combined_static_and_dynamic_shape(anchors.get())[:1]))
+    with tf.control_dependencies(shape_asserts):
+      if match_results is None:
+        match_quality_matrix = self._similarity_calc.compare(groundtruth_boxes,
+                                                             anchors)
+        match = self._matcher.match(match_quality_matrix, **params)
+      else:
+        match = mat.Match(match_results, self._matcher.use_matmul_gather)
       reg_targets = self._create_regression_targets(anchors,
                                                     groundtruth_boxes,
                                                     match)
@@ -390,7 +401,8 @@ def batch_assign_targets(target_assigner,
                          anchors_batch,
                          gt_box_batch,
                          gt_class_targets_batch,
-                         gt_weights_batch=None):
+                         gt_weights_batch=None,
+                         gt_match_results_batch=None):
   """Batched assignment of classification and regression targets.
 
   Args:
@@ -405,6 +417,9 @@ def batch_assign_targets(target_assigner,
       gt_box_batch.
     gt_weights_batch: A list of 1-D tf.float32 tensors of shape
       [num_boxes] containing weights for groundtruth boxes.
+    gt_match_results_batch: A list of 1-D tf.int32 tensors of shape
+      [num_anchors] containing precomputed match results of the anchors, which
+      are used instead of matching the anchors to the groundtruth boxes.
 
   Returns:
     batch_cls_targets: a tensor with shape [batch_size, num_anchors,
@@ -440,11 +455,15 @@ def batch_assign_targets(target_assigner,
   match_list = []
   if gt_weights_batch is None:
     gt_weights_batch = [None] * len(gt_class_targets_batch)
-  for anchors, gt_boxes, gt_class_targets, gt_weights in zip(
-      anchors_batch, gt_box_batch, gt_class_targets_batch, gt_weights_batch):
+  if gt_match_results_batch is None:
+    gt_match_results_batch = [None] * len(gt_class_targets_batch)
+  for anchors, gt_boxes, gt_class_targets, gt_weights, gt_match_results in zip(
+      anchors_batch, gt_box_batch, gt_class_targets_batch, gt_weights_batch,
+      gt_match_results_batch):
     (cls_targets, cls_weights, reg_targets,
      reg_weights, match) = target_assigner.assign(
-         anchors, gt_boxes, gt_class_targets, gt_weights)
+         anchors, gt_boxes, gt_class_targets, gt_weights,
+         match_results=gt_match_results)
     cls_targets_list.append(cls_targets)
     cls_weights_list.append(cls_weights)
     reg_targets_list.append(reg_targets)
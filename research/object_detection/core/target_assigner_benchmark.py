@@ -0,0 +1,163 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+r"""Benchmark of the target assignment of an SSD.
+
+Reports the examples/sec of the target assignment of batches of random
+groundtruth boxes to the anchors of an SSD with a 300x300 input:
+  * in-graph anchors: the feature map sizes are fed at each step, so that the
+    anchors are generated by the graph at each step, as when their shapes are
+    not known statically.
+  * cached anchors: the anchors are cached numpy constants of the graph.
+  * precomputed matches: cached anchors and match results fed with the
+    groundtruth, as loaded from TFRecords written by
+    dataset_tools/add_anchor_matches_to_tf_record.py.
+
+Example usage:
+    python object_detection/core/target_assigner_benchmark.py \
+        --batch_size=32 --num_boxes=20
+"""
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from object_detection.anchor_generators import multiple_grid_anchor_generator
+from object_detection.box_coders import faster_rcnn_box_coder
+from object_detection.core import box_list
+from object_detection.core import box_list_ops
+from object_detection.core import region_similarity_calculator
+from object_detection.core import target_assigner
+from object_detection.matchers import argmax_matcher
+
+flags = tf.app.flags
+flags.DEFINE_integer('batch_size', 32, 'Number of examples in a batch.')
+flags.DEFINE_integer('num_boxes', 20, 'Number of groundtruth boxes of each '
+                     'example.')
+flags.DEFINE_integer('num_classes', 90, 'Number of classes.')
+flags.DEFINE_integer('num_steps', 50, 'Number of timed batches.')
+FLAGS = flags.FLAGS
+
+_FEATURE_MAP_SHAPES = [(19, 19), (10, 10), (5, 5), (3, 3), (2, 2), (1, 1)]
+
+
+def random_groundtruth(batch_size, num_boxes, num_classes, seed=0):
+  """Returns random normalized boxes and one-hot classes with background."""
+  rng = np.random.RandomState(seed)
+  corners = rng.uniform(size=[batch_size, num_boxes, 2, 2])
+  boxes = np.concatenate([corners.min(axis=2), corners.max(axis=2)], axis=2)
+  classes = np.eye(num_classes + 1)[
+      rng.randint(1, num_classes + 1, size=[batch_size, num_boxes])]
+  return boxes.astype(np.float32), classes.astype(np.float32)
+
+
+def _build_assignment(boxes, classes, feature_map_shapes, match_results=None):
+  """Builds the batch target assignment of the groundtruth to SSD anchors."""
+  anchor_generator = multiple_grid_anchor_generator.create_ssd_anchors()
+  anchors = box_list_ops.concatenate(anchor_generator.generate(
+      feature_map_shapes, im_height=300, im_width=300))
+  assigner = target_assigner.TargetAssigner(
+      region_similarity_calculator.IouSimilarity(),
+      argmax_matcher.ArgMaxMatcher(matched_threshold=0.5,
+                                   unmatched_threshold=0.5),
+      faster_rcnn_box_coder.FasterRcnnBoxCoder(),
+      unmatched_cls_target=tf.constant([1.] + [0.] * (classes.shape[2] - 1)))
+  if match_results is not None:
+    match_results = tf.unstack(match_results)
+  (cls_targets, cls_weights, reg_targets, reg_weights,
+   match_list) = target_assigner.batch_assign_targets(
+       assigner, anchors,
+       [box_list.BoxList(gt_boxes) for gt_boxes in tf.unstack(boxes)],
+       tf.unstack(classes), gt_match_results_batch=match_results)
+  return ([cls_targets, cls_weights, reg_targets, reg_weights],
+          tf.stack([match.match_results for match in match_list]))
+
+
+def time_steps(sess, fetches, feed_dict, num_steps):
+  """Returns the result of the last step and the seconds per step."""
+  result = sess.run(fetches, feed_dict)
+  start = time.time()
+  for _ in range(num_steps):
+    result = sess.run(fetches, feed_dict)
+  return result, (time.time() - start) / num_steps
+
+
+def run_benchmark(batch_size, num_boxes, num_classes, num_steps):
+  """Measures the target assignment with and without cached computations.
+
+  Args:
+    batch_size: number of examples in a batch.
+    num_boxes: number of groundtruth boxes of each example.
+    num_classes: number of classes.
+    num_steps: number of timed batches.
+
+  Returns:
+    A dictionary mapping the name of each benchmark to its examples/sec.
+
+  Raises:
+    ValueError: if the targets of the benchmarks do not match.
+  """
+  boxes, classes = random_groundtruth(batch_size, num_boxes, num_classes)
+  results = {}
+  with tf.Graph().as_default():
+    boxes_placeholder = tf.placeholder(tf.float32, boxes.shape)
+    classes_placeholder = tf.placeholder(tf.float32, classes.shape)
+    feed_dict = {boxes_placeholder: boxes, classes_placeholder: classes}
+    shape_placeholders = []
+    for shape in _FEATURE_MAP_SHAPES:
+      shape_placeholder = (tf.placeholder(tf.int32, []),
+                           tf.placeholder(tf.int32, []))
+      feed_dict.update(zip(shape_placeholder, shape))
+      shape_placeholders.append(shape_placeholder)
+    match_results_placeholder = tf.placeholder(
+        tf.int32, [batch_size, None])
+
+    in_graph_targets, _ = _build_assignment(
+        boxes_placeholder, classes_placeholder, shape_placeholders)
+    cached_targets, match_results = _build_assignment(
+        boxes_placeholder, classes_placeholder, _FEATURE_MAP_SHAPES)
+    precomputed_targets, _ = _build_assignment(
+        boxes_placeholder, classes_placeholder, _FEATURE_MAP_SHAPES,
+        match_results_placeholder)
+
+    with tf.Session() as sess:
+      expected, secs = time_steps(sess, in_graph_targets, feed_dict, num_steps)
+      results['in-graph anchors'] = batch_size / secs
+      (targets, match_results_out), secs = time_steps(
+          sess, [cached_targets, match_results], feed_dict, num_steps)
+      results['cached anchors'] = batch_size / secs
+      feed_dict[match_results_placeholder] = match_results_out
+      precomputed, secs = time_steps(sess, precomputed_targets, feed_dict,
+                                     num_steps)
+      results['precomputed matches'] = batch_size / secs
+  for name, result in [('cached anchors', targets),
+                       ('precomputed matches', precomputed)]:
+    if not all(np.allclose(x, y, atol=1e-5)
+               for x, y in zip(expected, result)):
+      raise ValueError('The targets of %s do not match.' % name)
+  return results
+
+
+def main(_):
+  results = run_benchmark(FLAGS.batch_size, FLAGS.num_boxes,
+                          FLAGS.num_classes, FLAGS.num_steps)
+  tf.logging.info('Batches of %d examples with %d boxes', FLAGS.batch_size,
+                  FLAGS.num_boxes)
+  for name in ['in-graph anchors', 'cached anchors', 'precomputed matches']:
+    tf.logging.info('%-20s %9.1f examples/sec', name, results[name])
+
+
+if __name__ == '__main__':
+  tf.logging.set_verbosity(tf.logging.INFO)
+  tf.app.run()
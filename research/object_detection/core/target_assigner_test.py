@@ -69,6 +69,44 @@ class TargetAssignerTest(test_case.TestCase):
     self.assertEquals(reg_targets_out.dtype, np.float32)
     self.assertEquals(reg_weights_out.dtype, np.float32)
 
+  def test_assign_agnostic_with_precomputed_match_results(self):
+    def graph_fn(anchor_means, groundtruth_box_corners, match_results):
+      similarity_calc = region_similarity_calculator.IouSimilarity()
+      # The matcher would not match any anchor, it is not run.
+      matcher = argmax_matcher.ArgMaxMatcher(matched_threshold=0.99,
+                                             unmatched_threshold=0.99)
+      box_coder = mean_stddev_box_coder.MeanStddevBoxCoder(stddev=0.1)
+      target_assigner = targetassigner.TargetAssigner(
+          similarity_calc, matcher, box_coder, unmatched_cls_target=None)
+      anchors_boxlist = box_list.BoxList(anchor_means)
+      groundtruth_boxlist = box_list.BoxList(groundtruth_box_corners)
+      result = target_assigner.assign(anchors_boxlist, groundtruth_boxlist,
+                                      match_results=match_results)
+      (cls_targets, cls_weights, reg_targets, reg_weights, _) = result
+      return (cls_targets, cls_weights, reg_targets, reg_weights)
+
+    anchor_means = np.array([[0.0, 0.0, 0.5, 0.5],
+                             [0.5, 0.5, 1.0, 0.8],
+                             [0, 0.5, .5, 1.0]], dtype=np.float32)
+    groundtruth_box_corners = np.array([[0.0, 0.0, 0.5, 0.5],
+                                        [0.5, 0.5, 0.9, 0.9]],
+                                       dtype=np.float32)
+    match_results = np.array([0, 1, -2], dtype=np.int32)
+    exp_cls_targets = [[1], [1], [0]]
+    exp_cls_weights = [1, 1, 0]
+    exp_reg_targets = [[0, 0, 0, 0],
+                       [0, 0, -1, 1],
+                       [0, 0, 0, 0]]
+    exp_reg_weights = [1, 1, 0]
+
+    (cls_targets_out,
+     cls_weights_out, reg_targets_out, reg_weights_out) = self.execute(
+         graph_fn, [anchor_means, groundtruth_box_corners, match_results])
+    self.assertAllClose(cls_targets_out, exp_cls_targets)
+    self.assertAllClose(cls_weights_out, exp_cls_weights)
+    self.assertAllClose(reg_targets_out, exp_reg_targets)
+    self.assertAllClose(reg_weights_out, exp_reg_weights)
+
   def test_assign_class_agnostic_with_ignored_matches(self):
     # Note: test is very similar to above. The third box matched with an IOU
     # of 0.35, which is between the matched and unmatched threshold. This means
@@ -112,7 +112,8 @@ class TfExampleDecoder(data_decoder.DataDecoder):
                label_map_proto_file=None,
                use_display_name=False,
                dct_method='',
-               num_keypoints=0):
+               num_keypoints=0,
+               load_anchor_matches=False):
     """Constructor sets keys_to_features and items_to_handlers.
 
     Args:
@@ -133,6 +134,8 @@ class TfExampleDecoder(data_decoder.DataDecoder):
         are ['INTEGER_FAST', 'INTEGER_ACCURATE']. The hint may be ignored, for
         example, the jpeg library does not have that specific option.
       num_keypoints: the number of keypoints per object.
+      load_anchor_matches: whether or not to load the match results of the
+        anchors, precomputed by dataset_tools/add_anchor_matches_to_tf_record.
 
     Raises:
       ValueError: If `instance_mask_type` option is not one of
@@ -221,6 +224,12 @@ class TfExampleDecoder(data_decoder.DataDecoder):
           slim_example_decoder.ItemHandlerCallback(
               ['image/object/keypoint/y', 'image/object/keypoint/x'],
               self._reshape_keypoints))
+    if load_anchor_matches:
+      self.keys_to_features['image/anchor_matches'] = (
+          tf.VarLenFeature(tf.int64))
+      self.items_to_handlers[
+          fields.InputDataFields.groundtruth_anchor_matches] = (
+              slim_example_decoder.Tensor('image/anchor_matches'))
     if load_instance_masks:
       if instance_mask_type in (input_reader_pb2.DEFAULT,
                                 input_reader_pb2.NUMERICAL_MASKS):
@@ -303,6 +312,9 @@ class TfExampleDecoder(data_decoder.DataDecoder):
         the keypoints are ordered (y, x).
       fields.InputDataFields.groundtruth_instance_masks - 3D float32 tensor of
         shape [None, None, None] containing instance masks.
+      fields.InputDataFields.groundtruth_anchor_matches - 1D int32 tensor of
+        shape [num_anchors] containing the precomputed match results of the
+        anchors.
     """
     serialized_example = tf.reshape(tf_example_string_tensor, shape=[])
     decoder = slim_example_decoder.TFExampleDecoder(self.keys_to_features,
@@ -313,6 +325,10 @@ class TfExampleDecoder(data_decoder.DataDecoder):
     is_crowd = fields.InputDataFields.groundtruth_is_crowd
     tensor_dict[is_crowd] = tf.cast(tensor_dict[is_crowd], dtype=tf.bool)
     tensor_dict[fields.InputDataFields.image].set_shape([None, None, 3])
+    anchor_matches = fields.InputDataFields.groundtruth_anchor_matches
+    if anchor_matches in tensor_dict:
+      tensor_dict[anchor_matches] = tf.cast(tensor_dict[anchor_matches],
+                                            dtype=tf.int32)
     tensor_dict[fields.InputDataFields.num_groundtruth_boxes] = tf.shape(
         tensor_dict[fields.InputDataFields.groundtruth_boxes])[0]
 
@@ -637,6 +637,31 @@ class TfExampleDecoderTest(tf.test.TestCase):
         object_weights,
         tensor_dict[fields.InputDataFields.groundtruth_weights])
 
+  def testDecodeAnchorMatches(self):
+    image_tensor = np.random.randint(256, size=(4, 5, 3)).astype(np.uint8)
+    encoded_jpeg = self._EncodeImage(image_tensor)
+    anchor_matches = [-1, 0, -2, 1]
+    example = tf.train.Example(features=tf.train.Features(
+        feature={
+            'image/encoded': self._BytesFeature(encoded_jpeg),
+            'image/format': self._BytesFeature('jpeg'),
+            'image/anchor_matches': self._Int64Feature(anchor_matches),
+        })).SerializeToString()
+
+    example_decoder = tf_example_decoder.TfExampleDecoder(
+        load_anchor_matches=True)
+    tensor_dict = example_decoder.decode(tf.convert_to_tensor(example))
+
+    self.assertEqual(
+        tf.int32,
+        tensor_dict[fields.InputDataFields.groundtruth_anchor_matches].dtype)
+    with self.test_session() as sess:
+      tensor_dict = sess.run(tensor_dict)
+
+    self.assertAllEqual(
+        anchor_matches,
+        tensor_dict[fields.InputDataFields.groundtruth_anchor_matches])
+
   def testDecodeInstanceSegmentation(self):
     num_instances = 4
     image_height = 5
@@ -0,0 +1,162 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+r"""Adds the precomputed match results of the anchors of an SSD to TFRecords.
+
+Example usage:
+    python object_detection/dataset_tools/add_anchor_matches_to_tf_record.py \
+        --pipeline_config_path=/path/to/ssd_mobilenet_v1.config \
+        --input_tfrecord_paths=/path/to/train.record \
+        --output_tfrecord_path=/path/to/train_with_matches.record
+
+The anchors of an SSD with a fixed_shape_resizer do not depend on the image,
+so the match of the anchors to the groundtruth boxes of an example only
+depends on the example. This tool computes it once, with the similarity
+calculator and the matcher of the model config, and copies each example to
+the output with an additional 'image/anchor_matches' feature. Training with
+`load_anchor_matches: true` in the train input reader then skips the
+similarity computation and the matching of the target assignment.
+
+The groundtruth boxes are not changed by the training input pipeline unless it
+uses data augmentation, so the precomputed matches can not be used together
+with data augmentation options. The match results must be recomputed when the
+anchor generator, the matcher, the similarity calculator or the image size of
+the model config change.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from object_detection.builders import matcher_builder
+from object_detection.builders import model_builder
+from object_detection.builders import region_similarity_calculator_builder
+from object_detection.core import box_list
+from object_detection.core import standard_fields as fields
+from object_detection.data_decoders import tf_example_decoder
+from object_detection.utils import config_util
+
+flags = tf.app.flags
+flags.DEFINE_string('pipeline_config_path', None,
+                    'Path to the pipeline config of the SSD model.')
+flags.DEFINE_string('input_tfrecord_paths', None,
+                    'A comma separated list of paths to input TFRecords.')
+flags.DEFINE_string('output_tfrecord_path', None,
+                    'Path to the output TFRecord.')
+FLAGS = flags.FLAGS
+
+
+def build_anchors(model_config):
+  """Builds the anchors of a fixed size SSD model.
+
+  Args:
+    model_config: A model_pb2.DetectionModel.
+
+  Returns:
+    A BoxList with the anchors of the model, in normalized coordinates.
+
+  Raises:
+    ValueError: If the model is not an SSD or if its input size is not fixed.
+  """
+  if model_config.WhichOneof('model') != 'ssd':
+    raise ValueError('Anchor matches can only be precomputed for SSD models.')
+  height, width = config_util.get_spatial_image_size(
+      config_util.get_image_resizer_config(model_config))
+  if height < 0 or width < 0:
+    raise ValueError('Anchor matches can only be precomputed for models with '
+                     'a fixed input size.')
+  model = model_builder.build(model_config, is_training=True)
+  preprocessed_images, true_image_shapes = model.preprocess(
+      tf.zeros([1, height, width, 3]))
+  prediction_dict = model.predict(preprocessed_images, true_image_shapes)
+  return box_list.BoxList(prediction_dict['anchors'])
+
+
+def build_anchor_matches(model_config, serialized_example):
+  """Builds the match results of the anchors of a model for a TF example.
+
+  Args:
+    model_config: A model_pb2.DetectionModel of a fixed size SSD model.
+    serialized_example: A string tensor holding a serialized TF example.
+
+  Returns:
+    An int32 tensor of shape [num_anchors] with the match results of the
+    anchors, as encoded by matcher.Match.
+  """
+  anchors = build_anchors(model_config)
+  tensor_dict = tf_example_decoder.TfExampleDecoder().decode(
+      serialized_example)
+  groundtruth_boxes = box_list.BoxList(
+      tensor_dict[fields.InputDataFields.groundtruth_boxes])
+  similarity_calc = region_similarity_calculator_builder.build(
+      model_config.ssd.similarity_calculator)
+  matcher = matcher_builder.build(model_config.ssd.matcher)
+  match_quality_matrix = similarity_calc.compare(groundtruth_boxes, anchors)
+  return matcher.match(match_quality_matrix).match_results
+
+
+def add_anchor_matches(model_config, input_tfrecord_paths,
+                       output_tfrecord_path):
+  """Copies TF examples to a TFRecord, adding the match results of anchors.
+
+  Args:
+    model_config: A model_pb2.DetectionModel of a fixed size SSD model.
+    input_tfrecord_paths: A list of paths to input TFRecords.
+    output_tfrecord_path: The path to the output TFRecord.
+
+  Returns:
+    The number of written examples.
+  """
+  num_examples = 0
+  with tf.Graph().as_default():
+    serialized_example = tf.placeholder(tf.string, shape=[])
+    anchor_matches = build_anchor_matches(model_config, serialized_example)
+    with tf.Session() as sess, tf.python_io.TFRecordWriter(
+        output_tfrecord_path) as writer:
+      for input_tfrecord_path in input_tfrecord_paths:
+        for record in tf.python_io.tf_record_iterator(input_tfrecord_path):
+          tf_example = tf.train.Example()
+          tf_example.ParseFromString(record)
+          tf_example.features.feature[
+              fields.TfExampleFields.anchor_matches].int64_list.value[:] = (
+                  sess.run(anchor_matches,
+                           feed_dict={serialized_example: record}))
+          writer.write(tf_example.SerializeToString())
+          num_examples += 1
+          if num_examples % 1000 == 0:
+            tf.logging.info('Processed %d examples.', num_examples)
+  return num_examples
+
+
+def main(_):
+  tf.logging.set_verbosity(tf.logging.INFO)
+  required_flags = ['pipeline_config_path', 'input_tfrecord_paths',
+                    'output_tfrecord_path']
+  for flag_name in required_flags:
+    if not getattr(FLAGS, flag_name):
+      raise ValueError('Flag --{} is required'.format(flag_name))
+
+  configs = config_util.get_configs_from_pipeline_file(
+      FLAGS.pipeline_config_path)
+  input_tfrecord_paths = [
+      v for v in FLAGS.input_tfrecord_paths.split(',') if v]
+  num_examples = add_anchor_matches(configs['model'], input_tfrecord_paths,
+                                    FLAGS.output_tfrecord_path)
+  tf.logging.info('Wrote %d examples to %s', num_examples,
+                  FLAGS.output_tfrecord_path)
+
+
+if __name__ == '__main__':
+  tf.app.run()
@@ -0,0 +1,147 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for add_anchor_matches_to_tf_record.py."""
+
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from google.protobuf import text_format
+from object_detection.dataset_tools import add_anchor_matches_to_tf_record
+from object_detection.protos import model_pb2
+from object_detection.utils import dataset_util
+from object_detection.utils import np_box_ops
+
+_MODEL_CONFIG = """
+  ssd {
+    num_classes: 2
+    feature_extractor {
+      type: 'ssd_mobilenet_v1'
+      conv_hyperparams {
+        regularizer {
+          l2_regularizer {
+          }
+        }
+        initializer {
+          truncated_normal_initializer {
+          }
+        }
+      }
+    }
+    box_coder {
+      faster_rcnn_box_coder {
+      }
+    }
+    matcher {
+      argmax_matcher {
+      }
+    }
+    similarity_calculator {
+      iou_similarity {
+      }
+    }
+    anchor_generator {
+      ssd_anchor_generator {
+        aspect_ratios: 1.0
+      }
+    }
+    image_resizer {
+      fixed_shape_resizer {
+        height: 64
+        width: 64
+      }
+    }
+    box_predictor {
+      convolutional_box_predictor {
+        conv_hyperparams {
+          regularizer {
+            l2_regularizer {
+            }
+          }
+          initializer {
+            truncated_normal_initializer {
+            }
+          }
+        }
+      }
+    }
+    loss {
+      classification_loss {
+        weighted_softmax {
+        }
+      }
+      localization_loss {
+        weighted_smooth_l1 {
+        }
+      }
+    }
+  }"""
+
+
+class AddAnchorMatchesToTfRecordTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.model_config = model_pb2.DetectionModel()
+    text_format.Merge(_MODEL_CONFIG, self.model_config)
+
+  def test_anchor_matches_of_examples(self):
+    groundtruth_boxes = np.array([[0., 0., .5, .5], [.3, .4, 1., .9]],
+                                 dtype=np.float32)
+    input_path = os.path.join(self.get_temp_dir(), 'input.record')
+    output_path = os.path.join(self.get_temp_dir(), 'output.record')
+    with tf.python_io.TFRecordWriter(input_path) as writer:
+      for boxes in (groundtruth_boxes, groundtruth_boxes[:0]):
+        writer.write(tf.train.Example(features=tf.train.Features(feature={
+            'image/object/bbox/ymin': dataset_util.float_list_feature(
+                boxes[:, 0].tolist()),
+            'image/object/bbox/xmin': dataset_util.float_list_feature(
+                boxes[:, 1].tolist()),
+            'image/object/bbox/ymax': dataset_util.float_list_feature(
+                boxes[:, 2].tolist()),
+            'image/object/bbox/xmax': dataset_util.float_list_feature(
+                boxes[:, 3].tolist()),
+        })).SerializeToString())
+
+    self.assertEqual(2, add_anchor_matches_to_tf_record.add_anchor_matches(
+        self.model_config, [input_path], output_path))
+
+    with tf.Graph().as_default():
+      anchors = add_anchor_matches_to_tf_record.build_anchors(
+          self.model_config)
+      with self.test_session() as sess:
+        anchors = sess.run(anchors.get())
+    iou = np_box_ops.iou(groundtruth_boxes, anchors)
+    expected_matches = np.where(iou.max(axis=0) >= 0.5, iou.argmax(axis=0), -1)
+
+    anchor_matches = []
+    for record in tf.python_io.tf_record_iterator(output_path):
+      example = tf.train.Example()
+      example.ParseFromString(record)
+      anchor_matches.append(
+          example.features.feature['image/anchor_matches'].int64_list.value)
+    self.assertAllEqual(expected_matches, anchor_matches[0])
+    self.assertAllEqual([-1] * len(anchors), anchor_matches[1])
+    self.assertIn(0, anchor_matches[0])
+    self.assertIn(1, anchor_matches[0])
+
+  def test_raises_error_on_model_with_dynamic_input_size(self):
+    self.model_config.ssd.image_resizer.keep_aspect_ratio_resizer.SetInParent()
+    with self.assertRaises(ValueError):
+      add_anchor_matches_to_tf_record.build_anchors(self.model_config)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -24,11 +24,17 @@ Example usage:
       --val_annotations_file="${VAL_ANNOTATIONS_FILE}" \
       --testdev_annotations_file="${TESTDEV_ANNOTATIONS_FILE}" \
       --output_dir="${OUTPUT_DIR}"
+
+With --num_shards, each output TFRecord is written as that many shards by
+--num_workers processes. With --resume, shards that already exist are skipped,
+so that an interrupted conversion can be resumed by running it again with the
+same flags, if its inputs did not change.
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import hashlib
 import io
 import json
@@ -39,6 +45,7 @@ import PIL.Image
 from pycocotools import mask
 import tensorflow as tf
 
+from object_detection.dataset_tools import tf_record_creation_util
 from object_detection.utils import dataset_util
 from object_detection.utils import label_map_util
 
@@ -60,6 +67,17 @@ tf.flags.DEFINE_string('val_annotations_file', '',
 tf.flags.DEFINE_string('testdev_annotations_file', '',
                        'Test-dev annotations JSON file.')
 tf.flags.DEFINE_string('output_dir', '/tmp/', 'Output data directory.')
+tf.flags.DEFINE_integer('num_shards', 1,
+                        'Number of shards of each output TFRecord. With more '
+                        'than one, the shard index and the number of shards '
+                        'are appended to the output paths.')
+tf.flags.DEFINE_integer('num_workers', 1,
+                        'Number of processes writing the shards.')
+tf.flags.DEFINE_boolean('resume', False,
+                        'Whether to resume an interrupted conversion by '
+                        'skipping the output shards that already exist. It '
+                        'fails if the inputs, the options or the number of '
+                        'shards changed.')
 
 FLAGS = flags.FLAGS
 
@@ -187,8 +205,18 @@ def create_tf_example(image,
   return key, example, num_annotations_skipped
 
 
+def _create_tf_example_from_item(image_dir, category_index, include_masks,
+                                 item):
+  """Converts an (image, annotations_list) item, see create_tf_example."""
+  image, annotations_list = item
+  _, tf_example, num_annotations_skipped = create_tf_example(
+      image, annotations_list, image_dir, category_index, include_masks)
+  return tf_example, {'num_annotations_skipped': num_annotations_skipped}
+
+
 def _create_tf_record_from_coco_annotations(
-    annotations_file, image_dir, output_path, include_masks):
+    annotations_file, image_dir, output_path, include_masks, num_shards=1,
+    num_workers=1, resume=False):
   """Loads COCO annotation json files and converts to tf.Record format.
 
   Args:
@@ -197,6 +225,11 @@ def _create_tf_record_from_coco_annotations(
     output_path: Path to output tf.Record file.
     include_masks: Whether to include instance segmentations masks
       (PNG encoded) in the result. default: False.
+    num_shards: Number of shards of the output. With more than one, the shard
+      index and the number of shards are appended to output_path.
+    num_workers: Number of processes writing the shards.
+    resume: Whether to skip the shards that already exist, see
+      tf_record_creation_util.write_sharded_tfrecords.
   """
   with tf.gfile.GFile(annotations_file, 'r') as fid:
     groundtruth_data = json.load(fid)
@@ -222,20 +255,22 @@ def _create_tf_record_from_coco_annotations(
     tf.logging.info('%d images are missing annotations.',
                     missing_annotation_count)
 
-    tf.logging.info('writing to output path: %s', output_path)
-    writer = tf.python_io.TFRecordWriter(output_path)
-    total_num_annotations_skipped = 0
-    for idx, image in enumerate(images):
-      if idx % 100 == 0:
-        tf.logging.info('On image %d of %d', idx, len(images))
-      annotations_list = annotations_index[image['id']]
-      _, tf_example, num_annotations_skipped = create_tf_example(
-          image, annotations_list, image_dir, category_index, include_masks)
-      total_num_annotations_skipped += num_annotations_skipped
-      writer.write(tf_example.SerializeToString())
-    writer.close()
+    tf.logging.info('writing %d images to output path: %s', len(images),
+                    output_path)
+    if num_shards == 1:
+      output_paths = [output_path]
+    else:
+      output_paths = tf_record_creation_util.sharded_output_paths(
+          output_path, num_shards)
+    counts = tf_record_creation_util.write_sharded_tfrecords(
+        [(image, annotations_index[image['id']]) for image in images],
+        functools.partial(_create_tf_example_from_item, image_dir,
+                          category_index, include_masks),
+        output_paths, num_workers=num_workers, resume=resume,
+        input_paths=[annotations_file, image_dir],
+        config={'include_masks': include_masks})
     tf.logging.info('Finished writing, skipped %d annotations.',
-                    total_num_annotations_skipped)
+                    counts['num_annotations_skipped'])
 
 
 def main(_):
@@ -256,17 +291,26 @@ def main(_):
       FLAGS.train_annotations_file,
       FLAGS.train_image_dir,
       train_output_path,
-      FLAGS.include_masks)
+      FLAGS.include_masks,
+      FLAGS.num_shards,
+      FLAGS.num_workers,
+      FLAGS.resume)
   _create_tf_record_from_coco_annotations(
       FLAGS.val_annotations_file,
       FLAGS.val_image_dir,
       val_output_path,
-      FLAGS.include_masks)
+      FLAGS.include_masks,
+      FLAGS.num_shards,
+      FLAGS.num_workers,
+      FLAGS.resume)
   _create_tf_record_from_coco_annotations(
       FLAGS.testdev_annotations_file,
       FLAGS.test_image_dir,
       testdev_output_path,
-      FLAGS.include_masks)
+      FLAGS.include_masks,
+      FLAGS.num_shards,
+      FLAGS.num_workers,
+      FLAGS.resume)
 
 
 if __name__ == '__main__':
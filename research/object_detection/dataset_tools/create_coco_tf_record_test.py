@@ -15,6 +15,7 @@
 """Test for create_coco_tf_record.py."""
 
 import io
+import json
 import os
 
 import numpy as np
@@ -183,6 +184,50 @@ class CreateCocoTFRecordTest(tf.test.TestCase):
                          [0, 0, 0, 0, 0, 0, 0, 1], [0, 0, 0, 0, 0, 0, 1, 1],
                          [0, 0, 0, 0, 0, 1, 1, 1], [0, 0, 0, 0, 1, 1, 1, 1]])
 
+  def test_create_sharded_tf_record_from_coco_annotations(self):
+    tmp_dir = self.get_temp_dir()
+    images = []
+    annotations = []
+    for image_id in range(5):
+      image_file_name = 'tmp_image_%d.jpg' % image_id
+      image = PIL.Image.fromarray(
+          np.random.randint(0, 256, size=(32, 32, 3), dtype=np.uint8), 'RGB')
+      image.save(os.path.join(tmp_dir, image_file_name))
+      images.append({
+          'file_name': image_file_name,
+          'height': 32,
+          'width': 32,
+          'id': image_id,
+      })
+      annotations.append({
+          'area': .5,
+          'iscrowd': 0,
+          'image_id': image_id,
+          'bbox': [8, 8, 16, 16],
+          'category_id': 1,
+          'id': 1000 + image_id,
+      })
+    annotations_file = os.path.join(tmp_dir, 'annotations.json')
+    with tf.gfile.GFile(annotations_file, 'w') as f:
+      json.dump({'images': images, 'annotations': annotations,
+                 'categories': [{'id': 1, 'name': 'dog'}]}, f)
+
+    output_path = os.path.join(tmp_dir, 'coco.record')
+    create_coco_tf_record._create_tf_record_from_coco_annotations(
+        annotations_file, tmp_dir, output_path, include_masks=False,
+        num_shards=2, num_workers=2)
+
+    source_ids = []
+    for shard_path in [output_path + '-00000-of-00002',
+                       output_path + '-00001-of-00002']:
+      source_ids.append([])
+      for string_record in tf.python_io.tf_record_iterator(shard_path):
+        example = tf.train.Example()
+        example.ParseFromString(string_record)
+        source_ids[-1].append(
+            example.features.feature['image/source_id'].bytes_list.value[0])
+    self.assertEqual([[b'0', b'2', b'4'], [b'1', b'3']], source_ids)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -33,13 +33,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import os
 
-import contextlib2
 import pandas as pd
 import tensorflow as tf
 
 from object_detection.dataset_tools import oid_tfrecord_creation
+from object_detection.dataset_tools import tf_record_creation_util
 from object_detection.utils import label_map_util
 
 tf.flags.DEFINE_string('input_annotations_csv', None,
@@ -53,10 +54,30 @@ tf.flags.DEFINE_string(
     'Path to the output TFRecord. The shard index and the number of shards '
     'will be appended for each output shard.')
 tf.flags.DEFINE_integer('num_shards', 100, 'Number of TFRecord shards')
+tf.flags.DEFINE_integer('num_workers', 1,
+                        'Number of processes writing the shards.')
+tf.flags.DEFINE_boolean('resume', False,
+                        'Whether to resume an interrupted conversion by '
+                        'skipping the output shards that already exist. It '
+                        'fails if the inputs, the options or the number of '
+                        'shards changed.')
 
 FLAGS = tf.flags.FLAGS
 
 
+def _create_tf_example(images_directory, label_map, image_data):
+  """Converts the annotations of an image, grouped by ImageID."""
+  image_id, image_annotations = image_data
+  # In OID image file names are formed by appending ".jpg" to the image ID.
+  image_path = os.path.join(images_directory, image_id + '.jpg')
+  with tf.gfile.Open(image_path, 'rb') as image_file:
+    encoded_image = image_file.read()
+
+  tf_example = oid_tfrecord_creation.tf_example_from_annotations_data_frame(
+      image_annotations, label_map, encoded_image)
+  return tf_example, {}
+
+
 def main(_):
   tf.logging.set_verbosity(tf.logging.INFO)
 
@@ -78,26 +99,18 @@ def main(_):
 
   tf.logging.log(tf.logging.INFO, 'Found %d images...', len(all_image_ids))
 
-  with contextlib2.ExitStack() as tf_record_close_stack:
-    output_tfrecords = oid_tfrecord_creation.open_sharded_output_tfrecords(
-        tf_record_close_stack, FLAGS.output_tf_record_path_prefix,
-        FLAGS.num_shards)
-
-    for counter, image_data in enumerate(all_annotations.groupby('ImageID')):
-      tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 1000,
-                             counter)
-
-      image_id, image_annotations = image_data
-      # In OID image file names are formed by appending ".jpg" to the image ID.
-      image_path = os.path.join(FLAGS.input_images_directory, image_id + '.jpg')
-      with tf.gfile.Open(image_path) as image_file:
-        encoded_image = image_file.read()
-
-      tf_example = oid_tfrecord_creation.tf_example_from_annotations_data_frame(
-          image_annotations, label_map, encoded_image)
-      if tf_example:
-        shard_idx = int(image_id, 16) % FLAGS.num_shards
-        output_tfrecords[shard_idx].write(tf_example.SerializeToString())
+  tf_record_creation_util.write_sharded_tfrecords(
+      all_annotations.groupby('ImageID'),
+      functools.partial(_create_tf_example, FLAGS.input_images_directory,
+                        label_map),
+      tf_record_creation_util.sharded_output_paths(
+          FLAGS.output_tf_record_path_prefix, FLAGS.num_shards),
+      num_workers=FLAGS.num_workers,
+      resume=FLAGS.resume,
+      input_paths=[FLAGS.input_annotations_csv, FLAGS.input_images_directory,
+                   FLAGS.input_label_map],
+      shard_index_fn=lambda image_data: (
+          int(image_data[0], 16) % FLAGS.num_shards))
 
 
 if __name__ == '__main__':
@@ -20,11 +20,17 @@ Example usage:
         --data_dir=/home/user/VOCdevkit \
         --year=VOC2012 \
         --output_path=/home/user/pascal.record
+
+With --num_shards, the output TFRecord is written as that many shards by
+--num_workers processes. With --resume, shards that already exist are skipped,
+so that an interrupted conversion can be resumed by running it again with the
+same flags, if its inputs did not change.
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import hashlib
 import io
 import logging
@@ -34,6 +40,7 @@ from lxml import etree
 import PIL.Image
 import tensorflow as tf
 
+from object_detection.dataset_tools import tf_record_creation_util
 from object_detection.utils import dataset_util
 from object_detection.utils import label_map_util
 
@@ -50,6 +57,15 @@ flags.DEFINE_string('label_map_path', 'data/pascal_label_map.pbtxt',
                     'Path to label map proto')
 flags.DEFINE_boolean('ignore_difficult_instances', False, 'Whether to ignore '
                      'difficult instances')
+flags.DEFINE_integer('num_shards', 1, 'Number of shards of the output '
+                     'TFRecord. With more than one, the shard index and the '
+                     'number of shards are appended to the output path.')
+flags.DEFINE_integer('num_workers', 1, 'Number of processes writing the '
+                     'shards.')
+flags.DEFINE_boolean('resume', False, 'Whether to resume an interrupted '
+                     'conversion by skipping the output shards that already '
+                     'exist. It fails if the inputs, the options or the '
+                     'number of shards changed.')
 FLAGS = flags.FLAGS
 
 SETS = ['train', 'val', 'trainval', 'test']
@@ -144,6 +160,19 @@ def dict_to_tf_example(data,
   return example
 
 
+def _create_tf_example_from_annotation(dataset_directory, label_map_dict,
+                                       ignore_difficult_instances, path):
+  """Converts the XML annotation at path, see dict_to_tf_example."""
+  with tf.gfile.GFile(path, 'r') as fid:
+    xml_str = fid.read()
+  xml = etree.fromstring(xml_str)
+  data = dataset_util.recursive_parse_xml_to_dict(xml)['annotation']
+
+  tf_example = dict_to_tf_example(data, dataset_directory, label_map_dict,
+                                  ignore_difficult_instances)
+  return tf_example, {}
+
+
 def main(_):
   if FLAGS.set not in SETS:
     raise ValueError('set must be in : {}'.format(SETS))
@@ -155,30 +184,34 @@ def main(_):
   if FLAGS.year != 'merged':
     years = [FLAGS.year]
 
-  writer = tf.python_io.TFRecordWriter(FLAGS.output_path)
-
   label_map_dict = label_map_util.get_label_map_dict(FLAGS.label_map_path)
 
+  annotation_paths = []
+  input_paths = [FLAGS.label_map_path]
   for year in years:
     logging.info('Reading from PASCAL %s dataset.', year)
     examples_path = os.path.join(data_dir, year, 'ImageSets', 'Main',
                                  'aeroplane_' + FLAGS.set + '.txt')
     annotations_dir = os.path.join(data_dir, year, FLAGS.annotations_dir)
     examples_list = dataset_util.read_examples_list(examples_path)
-    for idx, example in enumerate(examples_list):
-      if idx % 100 == 0:
-        logging.info('On image %d of %d', idx, len(examples_list))
-      path = os.path.join(annotations_dir, example + '.xml')
-      with tf.gfile.GFile(path, 'r') as fid:
-        xml_str = fid.read()
-      xml = etree.fromstring(xml_str)
-      data = dataset_util.recursive_parse_xml_to_dict(xml)['annotation']
-
-      tf_example = dict_to_tf_example(data, FLAGS.data_dir, label_map_dict,
-                                      FLAGS.ignore_difficult_instances)
-      writer.write(tf_example.SerializeToString())
-
-  writer.close()
+    input_paths.extend([examples_path, annotations_dir])
+    annotation_paths.extend(os.path.join(annotations_dir, example + '.xml')
+                            for example in examples_list)
+
+  logging.info('Writing %d images to %s', len(annotation_paths),
+               FLAGS.output_path)
+  if FLAGS.num_shards == 1:
+    output_paths = [FLAGS.output_path]
+  else:
+    output_paths = tf_record_creation_util.sharded_output_paths(
+        FLAGS.output_path, FLAGS.num_shards)
+  tf_record_creation_util.write_sharded_tfrecords(
+      annotation_paths,
+      functools.partial(_create_tf_example_from_annotation, FLAGS.data_dir,
+                        label_map_dict, FLAGS.ignore_difficult_instances),
+      output_paths, num_workers=FLAGS.num_workers, resume=FLAGS.resume,
+      input_paths=input_paths,
+      config={'ignore_difficult_instances': FLAGS.ignore_difficult_instances})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,212 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+r"""Utilities for writing TFRecords of TF examples in parallel shards.
+
+Each item of a dataset is assigned to a shard, deterministically, and the
+shards are written by a pool of processes, so that reading the images and
+encoding the examples scale with the number of cores. A shard is written to a
+temporary file which is renamed when the shard is complete, so an existing
+shard is always complete.
+
+By default, all the shards are written, overwriting existing ones. With
+resume=True, a conversion that was interrupted can be resumed: the shards that
+already exist are skipped. Since the assignment of the items to the shards
+depends on the items and on the number of shards, a manifest of the
+conversion is written next to the first shard before the shards. It records
+the output paths, the number of items of each shard, the paths, sizes and
+modification times of the input files, and a configuration given by the
+caller. A conversion is only resumed if its manifest matches the one of the
+previous run.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import multiprocessing
+
+import tensorflow as tf
+
+_TEMP_SUFFIX = '.tmp'
+_MANIFEST_SUFFIX = '.manifest.json'
+
+
+def sharded_output_paths(base_path, num_shards):
+  """Returns the paths of the shards of a TFRecord.
+
+  Args:
+    base_path: The base path for all shards.
+    num_shards: The number of shards.
+
+  Returns:
+    A list of num_shards paths, in which the shard index and the number of
+    shards are appended to base_path.
+  """
+  return ['{}-{:05d}-of-{:05d}'.format(base_path, idx, num_shards)
+          for idx in range(num_shards)]
+
+
+def _write_shard(args):
+  """Writes the examples of the items of a shard, see write_sharded_tfrecords.
+
+  Args:
+    args: A tuple of the create_example_fn, the list of the items of the shard
+      and the output path of the shard.
+
+  Returns:
+    A collections.Counter with the number of written examples
+    ('num_examples'), of skipped items ('num_skipped_items') and the counts
+    returned by create_example_fn.
+  """
+  create_example_fn, items, output_path = args
+  temp_path = output_path + _TEMP_SUFFIX
+  counts = collections.Counter()
+  with tf.python_io.TFRecordWriter(temp_path) as writer:
+    for tf_example, item_counts in (create_example_fn(item) for item in items):
+      counts.update(item_counts)
+      if tf_example is None:
+        counts['num_skipped_items'] += 1
+        continue
+      writer.write(tf_example.SerializeToString())
+      counts['num_examples'] += 1
+  tf.gfile.Rename(temp_path, output_path, overwrite=True)
+  tf.logging.info('Wrote %d examples to %s', counts['num_examples'],
+                  output_path)
+  return counts
+
+
+def manifest_path(output_paths):
+  """Returns the path of the manifest of a conversion to output_paths."""
+  return output_paths[0] + _MANIFEST_SUFFIX
+
+
+def _file_stats(path):
+  stat = tf.gfile.Stat(path)
+  return {'path': path, 'size': stat.length, 'mtime_nsec': stat.mtime_nsec}
+
+
+def _read_manifest(path):
+  try:
+    with tf.gfile.GFile(path, 'r') as f:
+      return json.load(f)
+  except tf.errors.NotFoundError:
+    return None
+
+
+def _write_manifest(path, manifest):
+  temp_path = path + _TEMP_SUFFIX
+  with tf.gfile.GFile(temp_path, 'w') as f:
+    json.dump(manifest, f, sort_keys=True)
+  tf.gfile.Rename(temp_path, path, overwrite=True)
+
+
+def write_sharded_tfrecords(items, create_example_fn, output_paths,
+                            num_workers=1, shard_index_fn=None, resume=False,
+                            input_paths=(), config=None):
+  """Converts items to TF examples and writes them to TFRecord shards.
+
+  With resume=True, the shards that already exist are not written again, so
+  that an interrupted conversion can be resumed by running it again with the
+  same arguments. Otherwise, all the shards are written.
+
+  Args:
+    items: An iterable of the items of the dataset, e.g. the annotations of an
+      image.
+    create_example_fn: A function called with an item, which returns a tuple
+      of the tf.train.Example of the item, or None to skip the item, and of a
+      dictionary of counts to add up over the items, e.g. of skipped
+      annotations. It must be picklable when num_workers > 1, e.g. a module
+      level function or a functools.partial of one.
+    output_paths: The list of the paths of the shards, e.g. the result of
+      sharded_output_paths.
+    num_workers: The number of processes writing the shards. With 1, the
+      shards are written by this process.
+    shard_index_fn: A function called with an item, which returns the index of
+      the shard of the item. By default, the items are assigned to the shards
+      in a round-robin fashion.
+    resume: Whether to skip the shards that already exist. The conversion is
+      resumed only if the manifest of the previous run matches this one, and
+      all the shards are written if there is no manifest.
+    input_paths: The paths of the input files and directories of the
+      conversion, whose sizes and modification times are recorded in the
+      manifest.
+    config: A JSON serializable dict of the options of the conversion which
+      change the examples, recorded in the manifest.
+
+  Returns:
+    A collections.Counter with the number of written examples
+    ('num_examples'), of skipped items ('num_skipped_items'), of skipped
+    complete shards ('num_skipped_shards') and the counts returned by
+    create_example_fn, of the shards written by this call.
+
+  Raises:
+    ValueError: If resume is True and the manifest of the previous run does not
+      match this conversion.
+  """
+  num_shards = len(output_paths)
+  shard_items = [[] for _ in range(num_shards)]
+  for idx, item in enumerate(items):
+    if shard_index_fn is None:
+      shard_idx = idx % num_shards
+    else:
+      shard_idx = shard_index_fn(item)
+    shard_items[shard_idx].append(item)
+
+  manifest = {
+      'output_paths': list(output_paths),
+      'num_items_per_shard': [
+          len(items_of_shard) for items_of_shard in shard_items],
+      'inputs': [_file_stats(path) for path in input_paths],
+      'config': config or {},
+  }
+  path = manifest_path(output_paths)
+  if resume:
+    previous_manifest = _read_manifest(path)
+    if previous_manifest is None:
+      tf.logging.info('No manifest at %s, writing all the shards.', path)
+      resume = False
+    elif previous_manifest != manifest:
+      raise ValueError(
+          'Cannot resume the conversion to {}: its inputs, options or number '
+          'of shards changed since the previous run, see {}. Run it without '
+          'resuming to write all the shards.'.format(output_paths[0], path))
+  if not resume:
+    # The shards of a previous run must not be resumed with this manifest.
+    for output_path in output_paths:
+      if tf.gfile.Exists(output_path):
+        tf.gfile.Remove(output_path)
+  _write_manifest(path, manifest)
+
+  tasks = []
+  for output_path, items_of_shard in zip(output_paths, shard_items):
+    if resume and tf.gfile.Exists(output_path):
+      tf.logging.info('Skipping complete shard %s', output_path)
+      continue
+    tasks.append((create_example_fn, items_of_shard, output_path))
+  counts = collections.Counter(num_skipped_shards=num_shards - len(tasks))
+
+  num_workers = min(num_workers, len(tasks))
+  if num_workers > 1:
+    pool = multiprocessing.Pool(num_workers)
+    try:
+      for shard_counts in pool.imap_unordered(_write_shard, tasks):
+        counts.update(shard_counts)
+    finally:
+      pool.terminate()
+  else:
+    for task in tasks:
+      counts.update(_write_shard(task))
+  return counts
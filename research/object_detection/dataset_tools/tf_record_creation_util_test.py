@@ -0,0 +1,144 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_record_creation_util.py."""
+
+import os
+import tempfile
+
+import tensorflow as tf
+
+from object_detection.dataset_tools import tf_record_creation_util
+from object_detection.utils import dataset_util
+
+
+def _create_example(value):
+  """Creates an example of the odd values and counts the even ones."""
+  if value % 2 == 0:
+    return None, {'num_even': 1}
+  return tf.train.Example(features=tf.train.Features(feature={
+      'value': dataset_util.int64_feature(value)})), {}
+
+
+class WriteShardedTfrecordsTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.output_paths = tf_record_creation_util.sharded_output_paths(
+        os.path.join(tempfile.mkdtemp(dir=self.get_temp_dir()), 'values'), 3)
+
+  def _read_values(self, path):
+    values = []
+    for string_record in tf.python_io.tf_record_iterator(path):
+      example = tf.train.Example()
+      example.ParseFromString(string_record)
+      values.append(example.features.feature['value'].int64_list.value[0])
+    return values
+
+  def test_sharded_output_paths(self):
+    self.assertEqual(['out-00000-of-00002', 'out-00001-of-00002'],
+                     tf_record_creation_util.sharded_output_paths('out', 2))
+
+  def test_round_robin_shards(self):
+    counts = tf_record_creation_util.write_sharded_tfrecords(
+        range(12), _create_example, self.output_paths)
+    self.assertEqual(6, counts['num_examples'])
+    self.assertEqual(6, counts['num_skipped_items'])
+    self.assertEqual(6, counts['num_even'])
+    self.assertEqual(0, counts['num_skipped_shards'])
+    self.assertEqual([[3, 9], [1, 7], [5, 11]],
+                     [self._read_values(path) for path in self.output_paths])
+    self.assertFalse(tf.gfile.Glob(self.output_paths[0] + '*.tmp'))
+
+  def test_shard_index_fn(self):
+    tf_record_creation_util.write_sharded_tfrecords(
+        range(12), _create_example, self.output_paths,
+        shard_index_fn=lambda value: value // 4)
+    self.assertEqual([[1, 3], [5, 7], [9, 11]],
+                     [self._read_values(path) for path in self.output_paths])
+
+  def test_parallel_shards_match_serial(self):
+    counts = tf_record_creation_util.write_sharded_tfrecords(
+        range(100), _create_example, self.output_paths, num_workers=3)
+    self.assertEqual(50, counts['num_examples'])
+    parallel_values = [self._read_values(path) for path in self.output_paths]
+    for path in self.output_paths:
+      tf.gfile.Remove(path)
+    tf_record_creation_util.write_sharded_tfrecords(
+        range(100), _create_example, self.output_paths)
+    self.assertEqual(parallel_values,
+                     [self._read_values(path) for path in self.output_paths])
+
+  def test_skips_complete_shards(self):
+    tf_record_creation_util.write_sharded_tfrecords(
+        range(12), _create_example, self.output_paths)
+    tf.gfile.Remove(self.output_paths[1])
+    # An interrupted shard does not count as complete.
+    with tf.gfile.Open(self.output_paths[1] + '.tmp', 'w') as f:
+      f.write('partial')
+    with tf.gfile.Open(self.output_paths[2], 'w') as f:
+      f.write('')
+    counts = tf_record_creation_util.write_sharded_tfrecords(
+        range(12), _create_example, self.output_paths, num_workers=2,
+        resume=True)
+    self.assertEqual(2, counts['num_skipped_shards'])
+    self.assertEqual(2, counts['num_examples'])
+    self.assertEqual([[3, 9], [1, 7], []],
+                     [self._read_values(path) for path in self.output_paths])
+
+  def test_overwrites_shards_without_resume(self):
+    with tf.gfile.Open(self.output_paths[0], 'w') as f:
+      f.write('')
+    counts = tf_record_creation_util.write_sharded_tfrecords(
+        range(12), _create_example, self.output_paths)
+    self.assertEqual(0, counts['num_skipped_shards'])
+    self.assertEqual([3, 9], self._read_values(self.output_paths[0]))
+
+  def test_resume_without_manifest_writes_all_shards(self):
+    with tf.gfile.Open(self.output_paths[0], 'w') as f:
+      f.write('')
+    counts = tf_record_creation_util.write_sharded_tfrecords(
+        range(12), _create_example, self.output_paths, resume=True)
+    self.assertEqual(0, counts['num_skipped_shards'])
+    self.assertEqual([3, 9], self._read_values(self.output_paths[0]))
+
+  def test_resume_fails_if_conversion_changed(self):
+    input_path = os.path.join(self.get_temp_dir(), 'annotations.txt')
+    with tf.gfile.Open(input_path, 'w') as f:
+      f.write('annotations')
+    tf_record_creation_util.write_sharded_tfrecords(
+        range(12), _create_example, self.output_paths,
+        input_paths=[input_path], config={'option': 1})
+
+    with self.assertRaises(ValueError):
+      tf_record_creation_util.write_sharded_tfrecords(
+          range(13), _create_example, self.output_paths, resume=True,
+          input_paths=[input_path], config={'option': 1})
+    with self.assertRaises(ValueError):
+      tf_record_creation_util.write_sharded_tfrecords(
+          range(12), _create_example, self.output_paths, resume=True,
+          input_paths=[input_path], config={'option': 2})
+    with self.assertRaises(ValueError):
+      tf_record_creation_util.write_sharded_tfrecords(
+          range(12), _create_example, self.output_paths[:2], resume=True,
+          input_paths=[input_path], config={'option': 1})
+    with tf.gfile.Open(input_path, 'w') as f:
+      f.write('new annotations')
+    with self.assertRaises(ValueError):
+      tf_record_creation_util.write_sharded_tfrecords(
+          range(12), _create_example, self.output_paths, resume=True,
+          input_paths=[input_path], config={'option': 1})
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -582,7 +582,9 @@ def get_eval_metric_ops_for_evaluators(evaluation_metrics,
 
   Args:
     evaluation_metrics: List of evaluation metric names. Current options are
-      'coco_detection_metrics' and 'coco_mask_metrics'.
+      'coco_detection_metrics' and 'coco_mask_metrics', and their versions
+      'fast_coco_detection_metrics' and 'fast_coco_mask_metrics', which compute
+      the same metrics on numpy arrays.
     categories: A list of dicts, each of which has the following keys -
         'id': (required) an integer id uniquely identifying this category.
         'name': (required) string representing category name e.g., 'cat', 'dog'.
@@ -597,7 +599,7 @@ def get_eval_metric_ops_for_evaluators(evaluation_metrics,
 
   Raises:
     ValueError: If any of the metrics in `evaluation_metric` is not
-    'coco_detection_metrics' or 'coco_mask_metrics'.
+    'coco_detection_metrics', 'coco_mask_metrics' or their fast versions.
   """
   evaluation_metrics = list(set(evaluation_metrics))
 
@@ -605,8 +607,12 @@ def get_eval_metric_ops_for_evaluators(evaluation_metrics,
   detection_fields = fields.DetectionResultFields
   eval_metric_ops = {}
   for metric in evaluation_metrics:
-    if metric == 'coco_detection_metrics':
-      coco_evaluator = coco_evaluation.CocoDetectionEvaluator(
+    if metric in ('coco_detection_metrics', 'fast_coco_detection_metrics'):
+      if metric == 'coco_detection_metrics':
+        evaluator_class = coco_evaluation.CocoDetectionEvaluator
+      else:
+        evaluator_class = coco_evaluation.FastCocoDetectionEvaluator
+      coco_evaluator = evaluator_class(
           categories, include_metrics_per_category=include_metrics_per_category)
       eval_metric_ops.update(
           coco_evaluator.get_estimator_eval_metric_ops(
@@ -619,8 +625,12 @@ def get_eval_metric_ops_for_evaluators(evaluation_metrics,
               detection_classes=eval_dict[detection_fields.detection_classes],
               groundtruth_is_crowd=eval_dict.get(
                   input_data_fields.groundtruth_is_crowd)))
-    elif metric == 'coco_mask_metrics':
-      coco_mask_evaluator = coco_evaluation.CocoMaskEvaluator(
+    elif metric in ('coco_mask_metrics', 'fast_coco_mask_metrics'):
+      if metric == 'coco_mask_metrics':
+        evaluator_class = coco_evaluation.CocoMaskEvaluator
+      else:
+        evaluator_class = coco_evaluation.FastCocoMaskEvaluator
+      coco_mask_evaluator = evaluator_class(
           categories, include_metrics_per_category=include_metrics_per_category)
       eval_metric_ops.update(
           coco_mask_evaluator.get_estimator_eval_metric_ops(
@@ -637,7 +647,9 @@ def get_eval_metric_ops_for_evaluators(evaluation_metrics,
                   input_data_fields.groundtruth_is_crowd),))
     else:
       raise ValueError('The only evaluation metrics supported are '
-                       '"coco_detection_metrics" and "coco_mask_metrics". '
+                       '"coco_detection_metrics", "coco_mask_metrics", '
+                       '"fast_coco_detection_metrics" and '
+                       '"fast_coco_mask_metrics". '
                        'Found {} in the evaluation metrics'.format(metric))
 
   return eval_metric_ops
@@ -45,6 +45,10 @@ EVAL_METRICS_CLASS_DICT = {
         coco_evaluation.CocoDetectionEvaluator,
     'coco_mask_metrics':
         coco_evaluation.CocoMaskEvaluator,
+    'fast_coco_detection_metrics':
+        coco_evaluation.FastCocoDetectionEvaluator,
+    'fast_coco_mask_metrics':
+        coco_evaluation.FastCocoMaskEvaluator,
 }
 
 EVAL_DEFAULT_METRIC = 'pascal_voc_detection_metrics'
@@ -15,6 +15,9 @@
 """Utility functions for detection inference."""
 from __future__ import division
 
+import threading
+
+from six.moves import queue
 import tensorflow as tf
 
 from object_detection.core import standard_fields
@@ -50,6 +53,124 @@ def build_input(tfrecord_paths):
   return serialized_example_tensor, image_tensor
 
 
+def _decode_example(serialized_example):
+  """Returns the serialized example and its decoded image."""
+  features = tf.parse_single_example(
+      serialized_example,
+      features={
+          standard_fields.TfExampleFields.image_encoded:
+              tf.FixedLenFeature([], tf.string),
+      })
+  encoded_image = features[standard_fields.TfExampleFields.image_encoded]
+  image = tf.image.decode_image(encoded_image, channels=3)
+  image.set_shape([None, None, 3])
+  return serialized_example, image
+
+
+def build_batched_input(tfrecord_paths, batch_size, num_parallel_calls=1,
+                        max_pending_images=None):
+  """Builds the graph's input with batches of images of the same size.
+
+  The images are decoded in parallel, and grouped by size into batches of up to
+  batch_size images, so that the inference graph can run on a batch without
+  resizing or padding its images. Images of different sizes are therefore
+  not in the order of the input TFRecords, while images of the same size are.
+
+  The images are grouped within consecutive blocks of max_pending_images
+  images, and the incomplete batches of a block are emitted at its end. So at
+  most max_pending_images decoded images wait for a batch, twice that counting
+  the block being read, even if most sizes never fill a batch, as in Open
+  Images. A larger block gives fuller batches.
+
+  Args:
+    tfrecord_paths: List of paths to the input TFRecords
+    batch_size: The maximum number of images per batch.
+    num_parallel_calls: The number of examples decoded in parallel.
+    max_pending_images: The number of images of a block, at least batch_size.
+      By default, 8 * batch_size.
+
+  Returns:
+    serialized_examples_tensor: The serialized examples of the next batch.
+        String tensor, shape=[batch]
+    images_tensor: The decoded images of the examples. Uint8 tensor,
+        shape=[batch, None, None, 3]
+
+  Raises:
+    ValueError: If max_pending_images < batch_size.
+  """
+  if max_pending_images is None:
+    max_pending_images = 8 * batch_size
+  if max_pending_images < batch_size:
+    raise ValueError('max_pending_images must be at least batch_size.')
+  dataset = tf.data.TFRecordDataset(tfrecord_paths)
+  dataset = dataset.map(_decode_example, num_parallel_calls=num_parallel_calls)
+
+  def image_size_key(unused_serialized_example, image):
+    shape = tf.to_int64(tf.shape(image))
+    return shape[0] * (2**32) + shape[1]
+
+  def group_block_by_size(serialized_examples, images):
+    return tf.data.Dataset.zip((serialized_examples, images)).apply(
+        tf.contrib.data.group_by_window(
+            key_func=image_size_key,
+            reduce_func=lambda unused_key, window: window.batch(batch_size),
+            window_size=batch_size))
+
+  dataset = dataset.window(max_pending_images).flat_map(group_block_by_size)
+  dataset = dataset.prefetch(2)
+  return dataset.make_one_shot_iterator().get_next()
+
+
+def _import_inference_graph(image_tensor, inference_graph_path):
+  """Imports the inference graph on the input images.
+
+  Args:
+    image_tensor: The input images. uint8 tensor, shape=[batch, None, None, 3]
+    inference_graph_path: Path to the inference graph with embedded weights
+
+  Returns:
+    The graph's num_detections, detection_boxes, detection_scores and
+    detection_classes tensors, with a first dimension of size batch.
+  """
+  with tf.gfile.Open(inference_graph_path, 'rb') as graph_def_file:
+    graph_content = graph_def_file.read()
+  graph_def = tf.GraphDef()
+  graph_def.MergeFromString(graph_content)
+
+  tf.import_graph_def(
+      graph_def, name='', input_map={'image_tensor': image_tensor})
+
+  g = tf.get_default_graph()
+  return [g.get_tensor_by_name(name + ':0') for name in [
+      'num_detections', 'detection_boxes', 'detection_scores',
+      'detection_classes']]
+
+
+def build_batched_inference_graph(images_tensor, inference_graph_path):
+  """Loads the inference graph and connects it to a batch of input images.
+
+  Args:
+    images_tensor: The input images. uint8 tensor,
+        shape=[batch, None, None, 3]
+    inference_graph_path: Path to the inference graph with embedded weights
+
+  Returns:
+    num_detections_tensor: The number of detections of each image. Int32
+        tensor, shape=[batch]
+    detected_boxes_tensor: Detected boxes. Float tensor,
+        shape=[batch, max_detections, 4]
+    detected_scores_tensor: Detected scores. Float tensor,
+        shape=[batch, max_detections]
+    detected_labels_tensor: Detected labels. Int64 tensor,
+        shape=[batch, max_detections]
+  """
+  (num_detections_tensor, detected_boxes_tensor, detected_scores_tensor,
+   detected_labels_tensor) = _import_inference_graph(images_tensor,
+                                                     inference_graph_path)
+  return (tf.cast(num_detections_tensor, tf.int32), detected_boxes_tensor,
+          detected_scores_tensor, tf.cast(detected_labels_tensor, tf.int64))
+
+
 def build_inference_graph(image_tensor, inference_graph_path):
   """Loads the inference graph and connects it to the input image.
 
@@ -65,30 +186,20 @@ def build_inference_graph(image_tensor, inference_graph_path):
     detected_labels_tensor: Detected labels. Int64 tensor,
         shape=[num_detections]
   """
-  with tf.gfile.Open(inference_graph_path, 'r') as graph_def_file:
-    graph_content = graph_def_file.read()
-  graph_def = tf.GraphDef()
-  graph_def.MergeFromString(graph_content)
+  (num_detections_tensor, detected_boxes_tensor, detected_scores_tensor,
+   detected_labels_tensor) = _import_inference_graph(image_tensor,
+                                                     inference_graph_path)
 
-  tf.import_graph_def(
-      graph_def, name='', input_map={'image_tensor': image_tensor})
-
-  g = tf.get_default_graph()
-
-  num_detections_tensor = tf.squeeze(
-      g.get_tensor_by_name('num_detections:0'), 0)
+  num_detections_tensor = tf.squeeze(num_detections_tensor, 0)
   num_detections_tensor = tf.cast(num_detections_tensor, tf.int32)
 
-  detected_boxes_tensor = tf.squeeze(
-      g.get_tensor_by_name('detection_boxes:0'), 0)
+  detected_boxes_tensor = tf.squeeze(detected_boxes_tensor, 0)
   detected_boxes_tensor = detected_boxes_tensor[:num_detections_tensor]
 
-  detected_scores_tensor = tf.squeeze(
-      g.get_tensor_by_name('detection_scores:0'), 0)
+  detected_scores_tensor = tf.squeeze(detected_scores_tensor, 0)
   detected_scores_tensor = detected_scores_tensor[:num_detections_tensor]
 
-  detected_labels_tensor = tf.squeeze(
-      g.get_tensor_by_name('detection_classes:0'), 0)
+  detected_labels_tensor = tf.squeeze(detected_labels_tensor, 0)
   detected_labels_tensor = tf.cast(detected_labels_tensor, tf.int64)
   detected_labels_tensor = detected_labels_tensor[:num_detections_tensor]
 
@@ -112,12 +223,34 @@ def infer_detections_and_add_to_example(
   Returns:
     The de-serialized TF example augmented with the inferred detections.
   """
-  tf_example = tf.train.Example()
   (serialized_example, detected_boxes, detected_scores,
    detected_classes) = tf.get_default_session().run([
        serialized_example_tensor, detected_boxes_tensor, detected_scores_tensor,
        detected_labels_tensor
    ])
+  return add_detections_to_example(serialized_example, detected_boxes,
+                                   detected_scores, detected_classes,
+                                   discard_image_pixels)
+
+
+def add_detections_to_example(serialized_example, detected_boxes,
+                              detected_scores, detected_classes,
+                              discard_image_pixels):
+  """Adds detections to a serialized example.
+
+  Args:
+    serialized_example: Serialized TF example.
+    detected_boxes: Detected boxes. Float numpy array,
+        shape=[num_detections, 4]
+    detected_scores: Detected scores. Float numpy array,
+        shape=[num_detections]
+    detected_classes: Detected labels. Int64 numpy array,
+        shape=[num_detections]
+    discard_image_pixels: If true, discards the image from the result
+  Returns:
+    The de-serialized TF example augmented with the detections.
+  """
+  tf_example = tf.train.Example()
   detected_boxes = detected_boxes.T
 
   tf_example.ParseFromString(serialized_example)
@@ -139,3 +272,92 @@ def infer_detections_and_add_to_example(
     del feature[standard_fields.TfExampleFields.image_encoded]
 
   return tf_example
+
+
+class AsyncDetectionWriter(object):
+  """Adds detections to examples and writes them in a background thread.
+
+  Example usage:
+    writer = AsyncDetectionWriter(tf_record_writer, discard_image_pixels)
+    for ...:
+      writer.add_batch(*sess.run([serialized_examples_tensor, ...]))
+    writer.close()
+  """
+
+  def __init__(self, tf_record_writer, discard_image_pixels,
+               max_queued_batches=8):
+    """Starts the writer thread.
+
+    Args:
+      tf_record_writer: A tf.python_io.TFRecordWriter for the output examples.
+      discard_image_pixels: If true, discards the images from the output.
+      max_queued_batches: The maximum number of batches waiting to be written.
+        add_batch blocks while the queue is full.
+    """
+    self._tf_record_writer = tf_record_writer
+    self._discard_image_pixels = discard_image_pixels
+    self._queue = queue.Queue(maxsize=max_queued_batches)
+    self._error = None
+    self._thread = threading.Thread(target=self._write_batches)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def _write_batches(self):
+    """Writes the queued batches, until None or the first error."""
+    while True:
+      batch = self._queue.get()
+      if batch is None:
+        return
+      try:
+        (serialized_examples, num_detections, detected_boxes, detected_scores,
+         detected_classes) = batch
+        for i, serialized_example in enumerate(serialized_examples):
+          num = num_detections[i]
+          tf_example = add_detections_to_example(
+              serialized_example, detected_boxes[i, :num],
+              detected_scores[i, :num], detected_classes[i, :num],
+              self._discard_image_pixels)
+          self._tf_record_writer.write(tf_example.SerializeToString())
+      except Exception as e:  # pylint: disable=broad-except
+        self._error = e
+        return
+
+  def _put(self, item):
+    """Queues item, unless the writer thread stopped on an error."""
+    while self._thread.is_alive():
+      try:
+        self._queue.put(item, timeout=0.1)
+        return
+      except queue.Full:
+        pass
+
+  def add_batch(self, serialized_examples, num_detections, detected_boxes,
+                detected_scores, detected_classes):
+    """Queues a batch of examples and their detections to be written.
+
+    Args:
+      serialized_examples: Serialized TF examples. String numpy array,
+          shape=[batch]
+      num_detections: Int numpy array, shape=[batch]
+      detected_boxes: Float numpy array, shape=[batch, max_detections, 4]
+      detected_scores: Float numpy array, shape=[batch, max_detections]
+      detected_classes: Int64 numpy array, shape=[batch, max_detections]
+
+    Raises:
+      The error raised by a previous batch in the writer thread, if any.
+    """
+    if self._error is not None:
+      raise self._error
+    self._put((serialized_examples, num_detections, detected_boxes,
+               detected_scores, detected_classes))
+
+  def close(self):
+    """Waits for the queued batches to be written.
+
+    Raises:
+      The error raised by a batch in the writer thread, if any.
+    """
+    self._put(None)
+    self._thread.join()
+    if self._error is not None:
+      raise self._error
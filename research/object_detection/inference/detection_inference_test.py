@@ -14,8 +14,8 @@
 # ==============================================================================
 r"""Tests for detection_inference.py."""
 
+import io
 import os
-import StringIO
 
 import numpy as np
 from PIL import Image
@@ -30,20 +30,25 @@ def get_mock_tfrecord_path():
   return os.path.join(tf.test.get_temp_dir(), 'mock.tfrec')
 
 
-def create_mock_tfrecord():
-  pil_image = Image.fromarray(np.array([[[123, 0, 0]]], dtype=np.uint8), 'RGB')
-  image_output_stream = StringIO.StringIO()
+def create_mock_example(image, test_field=(1, 2, 3, 4)):
+  pil_image = Image.fromarray(image, 'RGB')
+  image_output_stream = io.BytesIO()
   pil_image.save(image_output_stream, format='png')
   encoded_image = image_output_stream.getvalue()
 
   feature_map = {
       'test_field':
-          dataset_util.float_list_feature([1, 2, 3, 4]),
+          dataset_util.float_list_feature(list(test_field)),
       standard_fields.TfExampleFields.image_encoded:
           dataset_util.bytes_feature(encoded_image),
   }
 
-  tf_example = tf.train.Example(features=tf.train.Features(feature=feature_map))
+  return tf.train.Example(features=tf.train.Features(feature=feature_map))
+
+
+def create_mock_tfrecord():
+  tf_example = create_mock_example(
+      np.array([[[123, 0, 0]]], dtype=np.uint8))
   with tf.python_io.TFRecordWriter(get_mock_tfrecord_path()) as writer:
     writer.write(tf_example.SerializeToString())
 
@@ -72,6 +77,30 @@ def create_mock_graph():
     fl.write(graph_def.SerializeToString())
 
 
+def create_mock_batched_graph():
+  g = tf.Graph()
+  with g.as_default():
+    in_image_tensor = tf.placeholder(
+        tf.uint8, shape=[None, None, None, 3], name='image_tensor')
+    batch_size = tf.shape(in_image_tensor)[0]
+    tf.identity(tf.fill([batch_size], 2.0), name='num_detections')
+    tf.tile(
+        tf.constant(
+            [[[0, 0.8, 0.7, 1], [0.1, 0.2, 0.8, 0.9], [0.2, 0.3, 0.4, 0.5]]]),
+        [batch_size, 1, 1], name='detection_boxes')
+    tf.tile(tf.constant([[0.1, 0.2, 0.3]]), [batch_size, 1],
+            name='detection_scores')
+    tf.identity(
+        tf.constant([[1.0, 2.0, 3.0]]) * tf.reduce_sum(
+            tf.cast(in_image_tensor, dtype=tf.float32), axis=[1, 2, 3],
+            keepdims=True)[:, :, 0, 0],
+        name='detection_classes')
+    graph_def = g.as_graph_def()
+
+  with tf.gfile.Open(get_mock_graph_path(), 'w') as fl:
+    fl.write(graph_def.SerializeToString())
+
+
 class InferDetectionsTests(tf.test.TestCase):
 
   def test_simple(self):
@@ -171,6 +200,115 @@ class InferDetectionsTests(tf.test.TestCase):
             value { float_list { value: [1.0, 2.0, 3.0, 4.0] } } } }
     """, tf_example)
 
+  def test_batched(self):
+    create_mock_batched_graph()
+    # Two batches of images of the same size, the first one with two images.
+    image_sizes = [(1, 1), (2, 1), (1, 1)]
+    with tf.python_io.TFRecordWriter(get_mock_tfrecord_path()) as writer:
+      for i, (height, width) in enumerate(image_sizes):
+        image = np.zeros([height, width, 3], dtype=np.uint8)
+        image[0, 0, 0] = 10 * (i + 1)
+        writer.write(create_mock_example(image, [i]).SerializeToString())
+
+    serialized_examples_tensor, images_tensor = (
+        detection_inference.build_batched_input(
+            [get_mock_tfrecord_path()], batch_size=2, num_parallel_calls=2))
+    detection_tensors = detection_inference.build_batched_inference_graph(
+        images_tensor, get_mock_graph_path())
+    fetches = [serialized_examples_tensor] + list(detection_tensors)
+
+    output_path = os.path.join(tf.test.get_temp_dir(), 'output.tfrec')
+    batch_sizes = []
+    with self.test_session(use_gpu=False) as sess:
+      with tf.python_io.TFRecordWriter(output_path) as tf_record_writer:
+        writer = detection_inference.AsyncDetectionWriter(
+            tf_record_writer, discard_image_pixels=True)
+        while True:
+          try:
+            batch = sess.run(fetches)
+          except tf.errors.OutOfRangeError:
+            break
+          batch_sizes.append(len(batch[0]))
+          writer.add_batch(*batch)
+        writer.close()
+    self.assertEqual([2, 1], batch_sizes)
+
+    tf_examples = []
+    for serialized_example in tf.python_io.tf_record_iterator(output_path):
+      tf_examples.append(tf.train.Example.FromString(serialized_example))
+    self.assertEqual(3, len(tf_examples))
+    for tf_example, index in zip(tf_examples, [0, 2, 1]):
+      feature = tf_example.features.feature
+      self.assertEqual([index], feature['test_field'].float_list.value)
+      self.assertEqual(
+          [10 * (index + 1), 20 * (index + 1)],
+          feature['image/detection/label'].int64_list.value)
+      self.assertAllClose(
+          [0.1, 0.2], feature['image/detection/score'].float_list.value)
+      self.assertAllClose(
+          [0.8, 0.2], feature['image/detection/bbox/xmin'].float_list.value)
+      self.assertNotIn(standard_fields.TfExampleFields.image_encoded, feature)
+
+  def test_async_writer_stops_on_first_error(self):
+
+    class FailingWriter(object):
+
+      def __init__(self):
+        self.num_writes = 0
+
+      def write(self, unused_record):
+        self.num_writes += 1
+        raise IOError('Disk full.')
+
+    serialized_example = create_mock_example(
+        np.zeros([1, 1, 3], dtype=np.uint8)).SerializeToString()
+    batch = (np.array([serialized_example]), np.array([1]),
+             np.zeros([1, 1, 4]), np.zeros([1, 1]),
+             np.zeros([1, 1], dtype=np.int64))
+    tf_record_writer = FailingWriter()
+    writer = detection_inference.AsyncDetectionWriter(
+        tf_record_writer, discard_image_pixels=True, max_queued_batches=1)
+    # The queue fills up once the writer thread stopped.
+    with self.assertRaises(IOError):
+      for _ in range(10):
+        writer.add_batch(*batch)
+    writer._thread.join(10)
+    self.assertFalse(writer._thread.is_alive())
+    with self.assertRaises(IOError):
+      writer.close()
+    self.assertEqual(1, tf_record_writer.num_writes)
+
+  def test_batched_input_flushes_blocks(self):
+    # Without a bound, the images of size (1, 1) and of size (2, 1) would
+    # wait for the end of the input to fill their batches of 3 images.
+    image_sizes = [(1, 1), (2, 1), (1, 1), (2, 1), (1, 1)]
+    with tf.python_io.TFRecordWriter(get_mock_tfrecord_path()) as writer:
+      for i, (height, width) in enumerate(image_sizes):
+        image = np.zeros([height, width, 3], dtype=np.uint8)
+        writer.write(create_mock_example(image, [i]).SerializeToString())
+
+    serialized_examples_tensor, _ = detection_inference.build_batched_input(
+        [get_mock_tfrecord_path()], batch_size=3, max_pending_images=3)
+    batches = []
+    with self.test_session(use_gpu=False) as sess:
+      while True:
+        try:
+          serialized_examples = sess.run(serialized_examples_tensor)
+        except tf.errors.OutOfRangeError:
+          break
+        batches.append([
+            int(tf.train.Example.FromString(serialized_example).features
+                .feature['test_field'].float_list.value[0])
+            for serialized_example in serialized_examples])
+    # The incomplete batches of a block are emitted in any order.
+    self.assertCountEqual([[0, 2], [1]], batches[:2])
+    self.assertCountEqual([[3], [4]], batches[2:])
+
+  def test_batched_input_checks_max_pending_images(self):
+    with self.assertRaises(ValueError):
+      detection_inference.build_batched_input(
+          [get_mock_tfrecord_path()], batch_size=4, max_pending_images=2)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -32,9 +32,20 @@ The script can also discard the image pixels in the output. This greatly
 reduces the output size and can potentially accelerate reading data in
 subsequent processing steps that don't require the images (e.g. computing
 metrics).
+
+The images are decoded in parallel and batched by size (see --batch_size), the
+inference graph runs on whole batches, and the output examples are written by
+a background thread. With --batch_size > 1, the examples are not in the input
+order when the images have different sizes. The images are batched by size
+within blocks of --max_pending_images images, which bounds the number of
+decoded images held in memory. With --benchmark, no output is
+written, and the throughput and the latency of the batches are reported
+instead.
 """
 
-import itertools
+import time
+
+import numpy as np
 import tensorflow as tf
 from object_detection.inference import detection_inference
 
@@ -49,47 +60,107 @@ tf.flags.DEFINE_boolean('discard_image_pixels', False,
                         ' significantly reduces the output size and is useful'
                         ' if the subsequent tools don\'t need access to the'
                         ' images (e.g. when computing evaluation measures).')
+tf.flags.DEFINE_integer('batch_size', 1, 'Maximum number of images of the '
+                        'same size in a batch of inference.')
+tf.flags.DEFINE_integer('max_pending_images', None, 'Number of images of the '
+                        'blocks within which the images are batched by size, '
+                        'and at most held in memory waiting for a batch. By '
+                        'default, 8 * batch_size.')
+tf.flags.DEFINE_integer('num_parallel_calls', 4, 'Number of images decoded in '
+                        'parallel.')
+tf.flags.DEFINE_integer('intra_op_parallelism_threads', 0, 'Number of threads '
+                        'of each op, 0 to let TensorFlow choose.')
+tf.flags.DEFINE_integer('inter_op_parallelism_threads', 0, 'Number of ops run '
+                        'in parallel, 0 to let TensorFlow choose.')
+tf.flags.DEFINE_boolean('benchmark', False, 'Reports the images/sec and the '
+                        'latency percentiles of the batches instead of writing '
+                        'the output.')
 
 FLAGS = tf.flags.FLAGS
 
 
+def _run_inference(sess, input_tfrecord_paths):
+  """Runs inference on batches of images, and writes or benchmarks them.
+
+  Args:
+    sess: The session of the default graph.
+    input_tfrecord_paths: List of paths to the input TFRecords.
+  """
+  serialized_examples_tensor, images_tensor = (
+      detection_inference.build_batched_input(
+          input_tfrecord_paths, FLAGS.batch_size, FLAGS.num_parallel_calls,
+          FLAGS.max_pending_images))
+  tf.logging.info('Reading graph and building model...')
+  detection_tensors = detection_inference.build_batched_inference_graph(
+      images_tensor, FLAGS.inference_graph)
+  fetches = [serialized_examples_tensor] + list(detection_tensors)
+
+  writer = None
+  if not FLAGS.benchmark:
+    tf.logging.info('Running inference and writing output to {}'.format(
+        FLAGS.output_tfrecord_path))
+    tf_record_writer = tf.python_io.TFRecordWriter(FLAGS.output_tfrecord_path)
+    writer = detection_inference.AsyncDetectionWriter(
+        tf_record_writer, FLAGS.discard_image_pixels)
+
+  num_images = 0
+  batch_secs = []
+  start = time.time()
+  inference_failed = True
+  try:
+    while True:
+      batch_start = time.time()
+      try:
+        batch = sess.run(fetches)
+      except tf.errors.OutOfRangeError:
+        break
+      batch_secs.append(time.time() - batch_start)
+      num_images += len(batch[0])
+      tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 10,
+                             num_images)
+      if writer:
+        writer.add_batch(*batch)
+    inference_failed = False
+  finally:
+    if writer:
+      try:
+        writer.close()
+      except Exception as e:  # pylint: disable=broad-except
+        if not inference_failed:
+          raise
+        # The error of the inference loop propagates instead.
+        tf.logging.error('Failed to write the detections: %s', e)
+      finally:
+        tf_record_writer.close()
+  secs = time.time() - start
+  tf.logging.info('Finished processing %d images in %d batches', num_images,
+                  len(batch_secs))
+
+  if FLAGS.benchmark and batch_secs:
+    tf.logging.info('%.1f images/sec, batch latency p50 %.1f ms, '
+                    'p99 %.1f ms', num_images / secs,
+                    1000 * np.percentile(batch_secs, 50),
+                    1000 * np.percentile(batch_secs, 99))
+
+
 def main(_):
   tf.logging.set_verbosity(tf.logging.INFO)
 
-  required_flags = ['input_tfrecord_paths', 'output_tfrecord_path',
-                    'inference_graph']
+  required_flags = ['input_tfrecord_paths', 'inference_graph']
+  if not FLAGS.benchmark:
+    required_flags.append('output_tfrecord_path')
   for flag_name in required_flags:
     if not getattr(FLAGS, flag_name):
       raise ValueError('Flag --{} is required'.format(flag_name))
 
-  with tf.Session() as sess:
+  session_config = tf.ConfigProto(
+      intra_op_parallelism_threads=FLAGS.intra_op_parallelism_threads,
+      inter_op_parallelism_threads=FLAGS.inter_op_parallelism_threads)
+  with tf.Session(config=session_config) as sess:
     input_tfrecord_paths = [
         v for v in FLAGS.input_tfrecord_paths.split(',') if v]
     tf.logging.info('Reading input from %d files', len(input_tfrecord_paths))
-    serialized_example_tensor, image_tensor = detection_inference.build_input(
-        input_tfrecord_paths)
-    tf.logging.info('Reading graph and building model...')
-    (detected_boxes_tensor, detected_scores_tensor,
-     detected_labels_tensor) = detection_inference.build_inference_graph(
-         image_tensor, FLAGS.inference_graph)
-
-    tf.logging.info('Running inference and writing output to {}'.format(
-        FLAGS.output_tfrecord_path))
-    sess.run(tf.local_variables_initializer())
-    tf.train.start_queue_runners()
-    with tf.python_io.TFRecordWriter(
-        FLAGS.output_tfrecord_path) as tf_record_writer:
-      try:
-        for counter in itertools.count():
-          tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 10,
-                                 counter)
-          tf_example = detection_inference.infer_detections_and_add_to_example(
-              serialized_example_tensor, detected_boxes_tensor,
-              detected_scores_tensor, detected_labels_tensor,
-              FLAGS.discard_image_pixels)
-          tf_record_writer.write(tf_example.SerializeToString())
-      except tf.errors.OutOfRangeError:
-        tf.logging.info('Finished processing records')
+    _run_inference(sess, input_tfrecord_paths)
 
 
 if __name__ == '__main__':
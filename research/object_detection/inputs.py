@@ -174,7 +174,8 @@ def _get_labels_dict(input_dict):
       fields.InputDataFields.groundtruth_instance_masks,
       fields.InputDataFields.groundtruth_area,
       fields.InputDataFields.groundtruth_is_crowd,
-      fields.InputDataFields.groundtruth_difficult
+      fields.InputDataFields.groundtruth_difficult,
+      fields.InputDataFields.groundtruth_anchor_matches
   ]
 
   for key in optional_label_keys:
@@ -252,10 +253,16 @@ def create_train_input_fn(train_config, train_input_config,
         labels[fields.InputDataFields.groundtruth_keypoints] is a
           [batch_size, num_boxes, num_keypoints, 2] float32 tensor containing
           keypoints for each box.
+        labels[fields.InputDataFields.groundtruth_anchor_matches] is a
+          [batch_size, num_anchors] int32 tensor containing the precomputed
+          match results of the anchors.
 
     Raises:
       TypeError: if the `train_config`, `train_input_config` or `model_config`
         are not of the correct type.
+      ValueError: if precomputed anchor matches are loaded together with data
+        augmentation or merge_multiple_label_boxes, which would change the
+        groundtruth boxes.
     """
     if not isinstance(train_config, train_pb2.TrainConfig):
       raise TypeError('For training mode, the `train_config` must be a '
@@ -266,6 +273,11 @@ def create_train_input_fn(train_config, train_input_config,
     if not isinstance(model_config, model_pb2.DetectionModel):
       raise TypeError('The `model_config` must be a '
                       'model_pb2.DetectionModel.')
+    if (train_input_config.load_anchor_matches and
+        (train_config.data_augmentation_options or
+         train_config.merge_multiple_label_boxes)):
+      raise ValueError('Precomputed anchor matches can not be used with data '
+                       'augmentation or merge_multiple_label_boxes.')
 
     data_augmentation_options = [
         preprocessor_builder.build(step)
@@ -256,6 +256,31 @@ class InputsTest(tf.test.TestCase):
     with self.assertRaises(TypeError):
       train_input_fn()
 
+  def test_error_with_anchor_matches_and_data_augmentation(self):
+    """Tests that a ValueError is raised when augmenting anchor matches."""
+    configs = _get_configs_for_model('ssd_inception_v2_pets')
+    configs['train_input_config'].load_anchor_matches = True
+    self.assertTrue(configs['train_config'].data_augmentation_options)
+    train_input_fn = inputs.create_train_input_fn(
+        train_config=configs['train_config'],
+        train_input_config=configs['train_input_config'],
+        model_config=configs['model'])
+    with self.assertRaises(ValueError):
+      train_input_fn()
+
+  def test_error_with_anchor_matches_and_merged_boxes(self):
+    """Tests that a ValueError is raised when merging anchor matched boxes."""
+    configs = _get_configs_for_model('ssd_inception_v2_pets')
+    configs['train_input_config'].load_anchor_matches = True
+    del configs['train_config'].data_augmentation_options[:]
+    configs['train_config'].merge_multiple_label_boxes = True
+    train_input_fn = inputs.create_train_input_fn(
+        train_config=configs['train_config'],
+        train_input_config=configs['train_input_config'],
+        model_config=configs['model'])
+    with self.assertRaises(ValueError):
+      train_input_fn()
+
   def test_error_with_bad_eval_config(self):
     """Tests that a TypeError is raised with improper eval config."""
     configs = _get_configs_for_model('ssd_inception_v2_pets')
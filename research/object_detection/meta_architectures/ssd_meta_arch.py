@@ -544,11 +544,15 @@ class SSDMetaArch(model.DetectionModel):
       weights = None
       if self.groundtruth_has_field(fields.BoxListFields.weights):
         weights = self.groundtruth_lists(fields.BoxListFields.weights)
+      anchor_matches = None
+      if self.groundtruth_has_field(fields.BoxListFields.anchor_matches):
+        anchor_matches = self.groundtruth_lists(
+            fields.BoxListFields.anchor_matches)
       (batch_cls_targets, batch_cls_weights, batch_reg_targets,
        batch_reg_weights, match_list) = self._assign_targets(
            self.groundtruth_lists(fields.BoxListFields.boxes),
            self.groundtruth_lists(fields.BoxListFields.classes),
-           keypoints, weights)
+           keypoints, weights, anchor_matches)
       if self._add_summaries:
         self._summarize_target_assignment(
             self.groundtruth_lists(fields.BoxListFields.boxes), match_list)
@@ -656,7 +660,8 @@ class SSDMetaArch(model.DetectionModel):
 
   def _assign_targets(self, groundtruth_boxes_list, groundtruth_classes_list,
                       groundtruth_keypoints_list=None,
-                      groundtruth_weights_list=None):
+                      groundtruth_weights_list=None,
+                      groundtruth_anchor_matches_list=None):
     """Assign groundtruth targets.
 
     Adds a background class to each one-hot encoding of groundtruth classes
@@ -675,6 +680,9 @@ class SSDMetaArch(model.DetectionModel):
         [num_boxes, num_keypoints, 2]
       groundtruth_weights_list: A list of 1-D tf.float32 tensors of shape
         [num_boxes] containing weights for groundtruth boxes.
+      groundtruth_anchor_matches_list: (optional) a list of 1-D tf.int32
+        tensors of shape [num_anchors] containing precomputed match results of
+        the anchors, which are used instead of running the matcher.
 
     Returns:
       batch_cls_targets: a tensor with shape [batch_size, num_anchors,
@@ -705,7 +713,8 @@ class SSDMetaArch(model.DetectionModel):
         boxlist.add_field(fields.BoxListFields.keypoints, keypoints)
     return target_assigner.batch_assign_targets(
         self._target_assigner, self.anchors, groundtruth_boxlists,
-        groundtruth_classes_with_background_list, groundtruth_weights_list)
+        groundtruth_classes_with_background_list, groundtruth_weights_list,
+        groundtruth_anchor_matches_list)
 
   def _summarize_target_assignment(self, groundtruth_boxes_list, match_list):
     """Creates tensorflow summaries for the input boxes and anchors.
@@ -18,6 +18,7 @@ import tensorflow as tf
 
 from object_detection.core import standard_fields
 from object_detection.metrics import coco_tools
+from object_detection.metrics import np_coco_evaluation
 from object_detection.utils import object_detection_evaluation
 
 
@@ -536,7 +537,7 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
         'annotations': self._groundtruth_list,
         'images': [{'id': image_id, 'height': shape[1], 'width': shape[2]}
                    for image_id, shape in self._image_id_to_mask_shape_map.
-                   iteritems()],
+                   items()],
         'categories': self._categories
     }
     coco_wrapped_groundtruth = coco_tools.COCOWrapper(
@@ -550,7 +551,7 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
         include_metrics_per_category=self._include_metrics_per_category)
     mask_metrics.update(mask_per_category_ap)
     mask_metrics = {'DetectionMasks_'+ key: value
-                    for key, value in mask_metrics.iteritems()}
+                    for key, value in mask_metrics.items()}
     return mask_metrics
 
   def get_estimator_eval_metric_ops(self, image_id, groundtruth_boxes,
@@ -656,3 +657,293 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
         eval_metric_ops[metric_name] = (tf.py_func(
             value_func_factory(metric_name), [], np.float32), update_op)
     return eval_metric_ops
+
+
+def _metrics_from_evaluation(evaluation, categories,
+                             include_metrics_per_category,
+                             all_metrics_per_category):
+  """Computes the metrics of a np_coco_evaluation.CocoEvaluation.
+
+  Args:
+    evaluation: a np_coco_evaluation.CocoEvaluation.
+    categories: the list of category dicts of the evaluator.
+    include_metrics_per_category: If True, include metrics for each category.
+    all_metrics_per_category: Whether to include all the summary metrics for
+      each category.
+
+  Returns:
+    A dictionary of the metrics, with the keys of
+    coco_tools.COCOEvalWrapper.ComputeMetrics.
+  """
+  stats, category_stats = evaluation.evaluate()
+  if include_metrics_per_category:
+    category_names = [category['name'] for category in
+                      sorted(categories, key=lambda category: category['id'])]
+    metrics, per_category_ap = coco_tools.MetricsFromStats(
+        stats, category_stats, category_names, all_metrics_per_category)
+  else:
+    metrics, per_category_ap = coco_tools.MetricsFromStats(stats)
+  metrics.update(per_category_ap)
+  return metrics
+
+
+class FastCocoDetectionEvaluator(CocoDetectionEvaluator):
+  """Class to evaluate COCO detection metrics on numpy arrays.
+
+  Computes the same metrics as CocoDetectionEvaluator, without converting the
+  boxes to COCO annotation dicts: the detections of each image are matched to
+  its groundtruth when they are added, see np_coco_evaluation. The metrics of
+  each category do not require a pycocotools version with category stats.
+  """
+
+  def __init__(self,
+               categories,
+               include_metrics_per_category=False,
+               all_metrics_per_category=False):
+    """Constructor.
+
+    Args:
+      categories: A list of dicts, each of which has the following keys -
+        'id': (required) an integer id uniquely identifying this category.
+        'name': (required) string representing category name e.g., 'cat', 'dog'.
+      include_metrics_per_category: If True, include metrics for each category.
+      all_metrics_per_category: Whether to include all the summary metrics for
+        each category in per_category_ap.
+    """
+    super(FastCocoDetectionEvaluator, self).__init__(
+        categories, include_metrics_per_category, all_metrics_per_category)
+    self._evaluation = np_coco_evaluation.CocoEvaluation(self._category_id_set)
+
+  def clear(self):
+    """Clears the state to prepare for a fresh evaluation."""
+    super(FastCocoDetectionEvaluator, self).clear()
+    self._evaluation = np_coco_evaluation.CocoEvaluation(self._category_id_set)
+
+  def add_single_ground_truth_image_info(self,
+                                         image_id,
+                                         groundtruth_dict):
+    """Adds groundtruth for a single image to be used for evaluation.
+
+    See CocoDetectionEvaluator.add_single_ground_truth_image_info.
+
+    Args:
+      image_id: A unique string/integer identifier for the image.
+      groundtruth_dict: A dictionary of the groundtruth boxes, classes and
+        optional is_crowd flags of the image.
+    """
+    if image_id in self._image_ids:
+      tf.logging.warning('Ignoring ground truth with image id %s since it was '
+                         'previously added', image_id)
+      return
+
+    groundtruth_is_crowd = groundtruth_dict.get(
+        standard_fields.InputDataFields.groundtruth_is_crowd)
+    # Drop groundtruth_is_crowd if empty tensor.
+    if groundtruth_is_crowd is not None and not groundtruth_is_crowd.shape[0]:
+      groundtruth_is_crowd = None
+
+    self._evaluation.add_groundtruth(
+        image_id,
+        groundtruth_boxes=groundtruth_dict[
+            standard_fields.InputDataFields.groundtruth_boxes],
+        groundtruth_classes=groundtruth_dict[
+            standard_fields.InputDataFields.groundtruth_classes],
+        groundtruth_is_crowd=groundtruth_is_crowd)
+    self._image_ids[image_id] = False
+
+  def add_single_detected_image_info(self,
+                                     image_id,
+                                     detections_dict):
+    """Adds detections for a single image to be used for evaluation.
+
+    See CocoDetectionEvaluator.add_single_detected_image_info.
+
+    Args:
+      image_id: A unique string/integer identifier for the image.
+      detections_dict: A dictionary of the detection boxes, scores and classes
+        of the image.
+
+    Raises:
+      ValueError: If groundtruth for the image_id is not available.
+    """
+    if image_id not in self._image_ids:
+      raise ValueError('Missing groundtruth for image id: {}'.format(image_id))
+
+    if self._image_ids[image_id]:
+      tf.logging.warning('Ignoring detection with image id %s since it was '
+                         'previously added', image_id)
+      return
+
+    self._evaluation.add_detections(
+        image_id,
+        detection_scores=detections_dict[
+            standard_fields.DetectionResultFields.detection_scores],
+        detection_classes=detections_dict[
+            standard_fields.DetectionResultFields.detection_classes],
+        detection_boxes=detections_dict[
+            standard_fields.DetectionResultFields.detection_boxes])
+    self._image_ids[image_id] = True
+
+  def merge(self, other):
+    """Merges the images of another FastCocoDetectionEvaluator.
+
+    Args:
+      other: A FastCocoDetectionEvaluator with the same categories, whose
+        images were not added to this evaluator.
+
+    Raises:
+      ValueError: If the evaluators share images.
+    """
+    if set(self._image_ids) & set(other._image_ids):
+      raise ValueError('Cannot merge evaluators of the same images.')
+    self._image_ids.update(other._image_ids)
+    self._evaluation.merge(other._evaluation)
+
+  def evaluate(self):
+    """Evaluates the detection boxes and returns a dictionary of coco metrics.
+
+    Returns:
+      The same dictionary as CocoDetectionEvaluator.evaluate.
+    """
+    metrics = _metrics_from_evaluation(
+        self._evaluation, self._categories, self._include_metrics_per_category,
+        self._all_metrics_per_category)
+    return {'DetectionBoxes_' + key: value
+            for key, value in metrics.items()}
+
+
+class FastCocoMaskEvaluator(CocoMaskEvaluator):
+  """Class to evaluate COCO mask metrics on numpy arrays.
+
+  Computes the same metrics as CocoMaskEvaluator, without run-length encoding
+  the masks or converting them to COCO annotation dicts: the detection masks
+  of each image are matched to its groundtruth masks when they are added, and
+  the masks are not kept, see np_coco_evaluation.
+  """
+
+  def __init__(self, categories, include_metrics_per_category=False):
+    """Constructor.
+
+    Args:
+      categories: A list of dicts, each of which has the following keys -
+        'id': (required) an integer id uniquely identifying this category.
+        'name': (required) string representing category name e.g., 'cat', 'dog'.
+      include_metrics_per_category: If True, include metrics for each category.
+    """
+    super(FastCocoMaskEvaluator, self).__init__(categories,
+                                                include_metrics_per_category)
+    self._evaluation = np_coco_evaluation.CocoEvaluation(
+        self._category_id_set, iou_type='segm')
+
+  def clear(self):
+    """Clears the state to prepare for a fresh evaluation."""
+    super(FastCocoMaskEvaluator, self).clear()
+    self._evaluation = np_coco_evaluation.CocoEvaluation(
+        self._category_id_set, iou_type='segm')
+
+  def add_single_ground_truth_image_info(self,
+                                         image_id,
+                                         groundtruth_dict):
+    """Adds groundtruth for a single image to be used for evaluation.
+
+    See CocoMaskEvaluator.add_single_ground_truth_image_info.
+
+    Args:
+      image_id: A unique string/integer identifier for the image.
+      groundtruth_dict: A dictionary of the groundtruth boxes, classes and
+        instance masks of the image.
+    """
+    if image_id in self._image_id_to_mask_shape_map:
+      tf.logging.warning('Ignoring ground truth with image id %s since it was '
+                         'previously added', image_id)
+      return
+
+    groundtruth_instance_masks = groundtruth_dict[
+        standard_fields.InputDataFields.groundtruth_instance_masks]
+    _check_mask_type_and_value(standard_fields.InputDataFields.
+                               groundtruth_instance_masks,
+                               groundtruth_instance_masks)
+    self._evaluation.add_groundtruth(
+        image_id,
+        groundtruth_boxes=groundtruth_dict[
+            standard_fields.InputDataFields.groundtruth_boxes],
+        groundtruth_classes=groundtruth_dict[
+            standard_fields.InputDataFields.groundtruth_classes],
+        groundtruth_masks=groundtruth_instance_masks)
+    self._image_id_to_mask_shape_map[image_id] = (
+        groundtruth_instance_masks.shape)
+
+  def add_single_detected_image_info(self,
+                                     image_id,
+                                     detections_dict):
+    """Adds detections for a single image to be used for evaluation.
+
+    See CocoMaskEvaluator.add_single_detected_image_info.
+
+    Args:
+      image_id: A unique string/integer identifier for the image.
+      detections_dict: A dictionary of the detection scores, classes and masks
+        of the image.
+
+    Raises:
+      ValueError: If groundtruth for the image_id is not available or if
+        spatial shapes of groundtruth_instance_masks and detection_masks are
+        incompatible.
+    """
+    if image_id not in self._image_id_to_mask_shape_map:
+      raise ValueError('Missing groundtruth for image id: {}'.format(image_id))
+
+    if image_id in self._image_ids_with_detections:
+      tf.logging.warning('Ignoring detection with image id %s since it was '
+                         'previously added', image_id)
+      return
+
+    groundtruth_masks_shape = self._image_id_to_mask_shape_map[image_id]
+    detection_masks = detections_dict[standard_fields.DetectionResultFields.
+                                      detection_masks]
+    if groundtruth_masks_shape[1:] != detection_masks.shape[1:]:
+      raise ValueError('Spatial shape of groundtruth masks and detection masks '
+                       'are incompatible: {} vs {}'.format(
+                           groundtruth_masks_shape,
+                           detection_masks.shape))
+    _check_mask_type_and_value(standard_fields.DetectionResultFields.
+                               detection_masks,
+                               detection_masks)
+    self._evaluation.add_detections(
+        image_id,
+        detection_scores=detections_dict[
+            standard_fields.DetectionResultFields.detection_scores],
+        detection_classes=detections_dict[
+            standard_fields.DetectionResultFields.detection_classes],
+        detection_masks=detection_masks)
+    self._image_ids_with_detections.update([image_id])
+
+  def merge(self, other):
+    """Merges the images of another FastCocoMaskEvaluator.
+
+    Args:
+      other: A FastCocoMaskEvaluator with the same categories, whose images
+        were not added to this evaluator.
+
+    Raises:
+      ValueError: If the evaluators share images.
+    """
+    other_image_ids = other._image_id_to_mask_shape_map
+    if set(self._image_id_to_mask_shape_map) & set(other_image_ids):
+      raise ValueError('Cannot merge evaluators of the same images.')
+    self._image_id_to_mask_shape_map.update(other_image_ids)
+    self._image_ids_with_detections.update(
+        other._image_ids_with_detections)
+    self._evaluation.merge(other._evaluation)
+
+  def evaluate(self):
+    """Evaluates the detection masks and returns a dictionary of coco metrics.
+
+    Returns:
+      The same dictionary as CocoMaskEvaluator.evaluate.
+    """
+    metrics = _metrics_from_evaluation(
+        self._evaluation, self._categories, self._include_metrics_per_category,
+        all_metrics_per_category=False)
+    return {'DetectionMasks_' + key: value
+            for key, value in metrics.items()}
@@ -723,5 +723,168 @@ class CocoMaskEvaluationPyFuncTest(tf.test.TestCase):
     self.assertFalse(coco_evaluator._image_id_to_mask_shape_map)
     self.assertFalse(coco_evaluator._detection_masks_list)
 
+
+def _random_image_data(rng, image_size, num_classes, with_masks):
+  """Returns groundtruth and detection dicts of random boxes of an image."""
+  num_groundtruth = rng.randint(0, 8)
+  corners = rng.uniform(0, image_size * .7, size=[num_groundtruth, 2])
+  sizes = rng.uniform(1, image_size * .4, size=[num_groundtruth, 2])
+  groundtruth_boxes = np.concatenate([corners, corners + sizes],
+                                     axis=1).astype(np.float32)
+  groundtruth_classes = rng.randint(1, num_classes + 2, size=num_groundtruth)
+  num_detections = rng.randint(0, 120)
+  if num_groundtruth:
+    matched = rng.randint(0, num_groundtruth, size=num_detections)
+    detection_boxes = groundtruth_boxes[matched] + rng.normal(
+        0, image_size / 40., size=[num_detections, 4]).astype(np.float32)
+    detection_classes = np.where(
+        rng.uniform(size=num_detections) < .8, groundtruth_classes[matched],
+        rng.randint(1, num_classes + 2, size=num_detections))
+  else:
+    corners = rng.uniform(0, image_size * .7, size=[num_detections, 2])
+    detection_boxes = np.concatenate([corners, corners + 10], axis=1)
+    detection_classes = rng.randint(1, num_classes + 2, size=num_detections)
+  detection_boxes = detection_boxes.astype(np.float32)
+  detection_boxes[:, 2:] = np.maximum(detection_boxes[:, 2:],
+                                      detection_boxes[:, :2] + .5)
+  # Rounded scores, to test the order of the detections with the same score.
+  detection_scores = np.round(rng.uniform(size=num_detections) * 10) / 10
+  groundtruth_dict = {
+      standard_fields.InputDataFields.groundtruth_boxes: groundtruth_boxes,
+      standard_fields.InputDataFields.groundtruth_classes: groundtruth_classes,
+  }
+  detections_dict = {
+      standard_fields.DetectionResultFields.detection_boxes: detection_boxes,
+      standard_fields.DetectionResultFields.detection_scores:
+          detection_scores.astype(np.float32),
+      standard_fields.DetectionResultFields.detection_classes:
+          detection_classes,
+  }
+  if with_masks:
+    for boxes, dictionary, key in [
+        (groundtruth_boxes, groundtruth_dict,
+         standard_fields.InputDataFields.groundtruth_instance_masks),
+        (detection_boxes, detections_dict,
+         standard_fields.DetectionResultFields.detection_masks)]:
+      masks = np.zeros([len(boxes), image_size, image_size], dtype=np.uint8)
+      for mask, box in zip(masks, np.clip(boxes, 0, image_size).astype(int)):
+        mask[box[0]:box[2] + 1, box[1]:box[3] + 1] = 1
+        mask[box[0]:box[2] + 1:3, box[1]:box[3] + 1:2] = 0
+      dictionary[key] = masks
+  else:
+    groundtruth_dict[standard_fields.InputDataFields.groundtruth_is_crowd] = (
+        rng.uniform(size=num_groundtruth) < .15)
+  return groundtruth_dict, detections_dict
+
+
+class FastCocoEvaluationTest(tf.test.TestCase):
+
+  def _assertSameMetrics(self, evaluator, fast_evaluator, image_size,
+                         with_masks):
+    rng = np.random.RandomState(0)
+    for image_index in range(30):
+      groundtruth_dict, detections_dict = _random_image_data(
+          rng, image_size, num_classes=3, with_masks=with_masks)
+      for coco_evaluator in [evaluator, fast_evaluator]:
+        coco_evaluator.add_single_ground_truth_image_info(
+            image_id=image_index, groundtruth_dict=groundtruth_dict)
+        # The groundtruth of images without detections is missed.
+        if image_index % 10 != 3:
+          coco_evaluator.add_single_detected_image_info(
+              image_id=image_index, detections_dict=detections_dict)
+    metrics = evaluator.evaluate()
+    self.assertGreater(max(metrics.values()), 0)
+    self.assertEqual(metrics, fast_evaluator.evaluate())
+
+  def testSameBoxMetricsAsCocoDetectionEvaluator(self):
+    category_list = [{'id': 1, 'name': 'person'},
+                     {'id': 2, 'name': 'cat'},
+                     {'id': 3, 'name': 'dog'}]
+    self._assertSameMetrics(
+        coco_evaluation.CocoDetectionEvaluator(category_list),
+        coco_evaluation.FastCocoDetectionEvaluator(category_list),
+        image_size=600, with_masks=False)
+
+  def testSameMaskMetricsAsCocoMaskEvaluator(self):
+    category_list = [{'id': 1, 'name': 'person'},
+                     {'id': 2, 'name': 'cat'},
+                     {'id': 3, 'name': 'dog'}]
+    self._assertSameMetrics(
+        coco_evaluation.CocoMaskEvaluator(category_list),
+        coco_evaluation.FastCocoMaskEvaluator(category_list),
+        image_size=64, with_masks=True)
+
+  def testMetricsPerCategory(self):
+    category_list = [{'id': 2, 'name': 'cat'}, {'id': 1, 'name': 'person'}]
+    coco_evaluator = coco_evaluation.FastCocoDetectionEvaluator(
+        category_list, include_metrics_per_category=True,
+        all_metrics_per_category=True)
+    coco_evaluator.add_single_ground_truth_image_info(
+        image_id='image1',
+        groundtruth_dict={
+            standard_fields.InputDataFields.groundtruth_boxes:
+            np.array([[100., 100., 200., 200.], [10., 10., 50., 50.]]),
+            standard_fields.InputDataFields.groundtruth_classes:
+            np.array([1, 2])
+        })
+    coco_evaluator.add_single_detected_image_info(
+        image_id='image1',
+        detections_dict={
+            standard_fields.DetectionResultFields.detection_boxes:
+            np.array([[100., 100., 200., 200.], [60., 60., 90., 90.]]),
+            standard_fields.DetectionResultFields.detection_scores:
+            np.array([.8, .9]),
+            standard_fields.DetectionResultFields.detection_classes:
+            np.array([1, 2])
+        })
+    metrics = coco_evaluator.evaluate()
+    self.assertAlmostEqual(metrics['DetectionBoxes_Precision/mAP'], 0.5)
+    self.assertAlmostEqual(
+        metrics['DetectionBoxes_PerformanceByCategory/mAP/person'], 1.0)
+    self.assertAlmostEqual(
+        metrics['DetectionBoxes_PerformanceByCategory/mAP/cat'], 0.0)
+    self.assertAlmostEqual(
+        metrics['DetectionBoxes_Precision mAP (large) ByCategory/person'], 1.0)
+    self.assertAlmostEqual(
+        metrics['DetectionBoxes_Precision mAP (large) ByCategory/cat'], -1.0)
+
+  def testMerge(self):
+    category_list = [{'id': 1, 'name': 'person'},
+                     {'id': 2, 'name': 'cat'},
+                     {'id': 3, 'name': 'dog'}]
+    coco_evaluator = coco_evaluation.FastCocoDetectionEvaluator(category_list)
+    shard_evaluators = [
+        coco_evaluation.FastCocoDetectionEvaluator(category_list)
+        for _ in range(2)]
+    rng = np.random.RandomState(0)
+    for image_index in range(20):
+      groundtruth_dict, detections_dict = _random_image_data(
+          rng, 600, num_classes=3, with_masks=False)
+      for evaluator in [coco_evaluator, shard_evaluators[image_index % 2]]:
+        evaluator.add_single_ground_truth_image_info(
+            image_id=image_index, groundtruth_dict=groundtruth_dict)
+        evaluator.add_single_detected_image_info(
+            image_id=image_index, detections_dict=detections_dict)
+    shard_evaluators[0].merge(shard_evaluators[1])
+    self.assertEqual(coco_evaluator.evaluate(), shard_evaluators[0].evaluate())
+    with self.assertRaises(ValueError):
+      shard_evaluators[0].merge(coco_evaluator)
+
+  def testClear(self):
+    category_list = [{'id': 1, 'name': 'person'}]
+    coco_evaluator = coco_evaluation.FastCocoMaskEvaluator(category_list)
+    groundtruth_dict, detections_dict = _random_image_data(
+        np.random.RandomState(0), 64, num_classes=1, with_masks=True)
+    coco_evaluator.add_single_ground_truth_image_info(
+        image_id='image1', groundtruth_dict=groundtruth_dict)
+    coco_evaluator.add_single_detected_image_info(
+        image_id='image1', detections_dict=detections_dict)
+    coco_evaluator.clear()
+    self.assertFalse(coco_evaluator._image_id_to_mask_shape_map)
+    self.assertFalse(coco_evaluator._image_ids_with_detections)
+    self.assertEqual(
+        -1, coco_evaluator.evaluate()['DetectionMasks_Precision/mAP'])
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -237,59 +237,82 @@ class COCOEvalWrapper(cocoeval.COCOeval):
     self.accumulate()
     self.summarize()
 
-    summary_metrics = OrderedDict([
-        ('Precision/mAP', self.stats[0]),
-        ('Precision/mAP@.50IOU', self.stats[1]),
-        ('Precision/mAP@.75IOU', self.stats[2]),
-        ('Precision/mAP (small)', self.stats[3]),
-        ('Precision/mAP (medium)', self.stats[4]),
-        ('Precision/mAP (large)', self.stats[5]),
-        ('Recall/AR@1', self.stats[6]),
-        ('Recall/AR@10', self.stats[7]),
-        ('Recall/AR@100', self.stats[8]),
-        ('Recall/AR@100 (small)', self.stats[9]),
-        ('Recall/AR@100 (medium)', self.stats[10]),
-        ('Recall/AR@100 (large)', self.stats[11])
-    ])
     if not include_metrics_per_category:
-      return summary_metrics, {}
+      return MetricsFromStats(self.stats)
     if not hasattr(self, 'category_stats'):
       raise ValueError('Category stats do not exist')
-    per_category_ap = OrderedDict([])
     if self.GetAgnosticMode():
-      return summary_metrics, per_category_ap
-    for category_index, category_id in enumerate(self.GetCategoryIdList()):
-      category = self.GetCategory(category_id)['name']
-      # Kept for backward compatilbility
-      per_category_ap['PerformanceByCategory/mAP/{}'.format(
-          category)] = self.category_stats[0][category_index]
-      if all_metrics_per_category:
-        per_category_ap['Precision mAP ByCategory/{}'.format(
-            category)] = self.category_stats[0][category_index]
-        per_category_ap['Precision mAP@.50IOU ByCategory/{}'.format(
-            category)] = self.category_stats[1][category_index]
-        per_category_ap['Precision mAP@.75IOU ByCategory/{}'.format(
-            category)] = self.category_stats[2][category_index]
-        per_category_ap['Precision mAP (small) ByCategory/{}'.format(
-            category)] = self.category_stats[3][category_index]
-        per_category_ap['Precision mAP (medium) ByCategory/{}'.format(
-            category)] = self.category_stats[4][category_index]
-        per_category_ap['Precision mAP (large) ByCategory/{}'.format(
-            category)] = self.category_stats[5][category_index]
-        per_category_ap['Recall AR@1 ByCategory/{}'.format(
-            category)] = self.category_stats[6][category_index]
-        per_category_ap['Recall AR@10 ByCategory/{}'.format(
-            category)] = self.category_stats[7][category_index]
-        per_category_ap['Recall AR@100 ByCategory/{}'.format(
-            category)] = self.category_stats[8][category_index]
-        per_category_ap['Recall AR@100 (small) ByCategory/{}'.format(
-            category)] = self.category_stats[9][category_index]
-        per_category_ap['Recall AR@100 (medium) ByCategory/{}'.format(
-            category)] = self.category_stats[10][category_index]
-        per_category_ap['Recall AR@100 (large) ByCategory/{}'.format(
-            category)] = self.category_stats[11][category_index]
+      return MetricsFromStats(self.stats)
+    category_names = [self.GetCategory(category_id)['name']
+                      for category_id in self.GetCategoryIdList()]
+    return MetricsFromStats(self.stats, self.category_stats, category_names,
+                            all_metrics_per_category)
 
+
+def MetricsFromStats(stats, category_stats=None, category_names=None,
+                     all_metrics_per_category=False):
+  """Names the summary metrics computed by COCOeval.summarize.
+
+  Args:
+    stats: the 12 summary metrics, in the order of COCOeval.stats.
+    category_stats: optional array of shape [12, num_categories] with the
+      summary metrics of each category.
+    category_names: the names of the categories of category_stats.
+    all_metrics_per_category: If true, include all the summary metrics for
+      each category in per_category_ap.
+
+  Returns:
+    summary_metrics and per_category_ap, see COCOEvalWrapper.ComputeMetrics.
+    per_category_ap is empty if category_stats is None.
+  """
+  summary_metrics = OrderedDict([
+      ('Precision/mAP', stats[0]),
+      ('Precision/mAP@.50IOU', stats[1]),
+      ('Precision/mAP@.75IOU', stats[2]),
+      ('Precision/mAP (small)', stats[3]),
+      ('Precision/mAP (medium)', stats[4]),
+      ('Precision/mAP (large)', stats[5]),
+      ('Recall/AR@1', stats[6]),
+      ('Recall/AR@10', stats[7]),
+      ('Recall/AR@100', stats[8]),
+      ('Recall/AR@100 (small)', stats[9]),
+      ('Recall/AR@100 (medium)', stats[10]),
+      ('Recall/AR@100 (large)', stats[11])
+  ])
+  per_category_ap = OrderedDict([])
+  if category_stats is None:
     return summary_metrics, per_category_ap
+  for category_index, category in enumerate(category_names):
+    # Kept for backward compatilbility
+    per_category_ap['PerformanceByCategory/mAP/{}'.format(
+        category)] = category_stats[0][category_index]
+    if all_metrics_per_category:
+      per_category_ap['Precision mAP ByCategory/{}'.format(
+          category)] = category_stats[0][category_index]
+      per_category_ap['Precision mAP@.50IOU ByCategory/{}'.format(
+          category)] = category_stats[1][category_index]
+      per_category_ap['Precision mAP@.75IOU ByCategory/{}'.format(
+          category)] = category_stats[2][category_index]
+      per_category_ap['Precision mAP (small) ByCategory/{}'.format(
+          category)] = category_stats[3][category_index]
+      per_category_ap['Precision mAP (medium) ByCategory/{}'.format(
+          category)] = category_stats[4][category_index]
+      per_category_ap['Precision mAP (large) ByCategory/{}'.format(
+          category)] = category_stats[5][category_index]
+      per_category_ap['Recall AR@1 ByCategory/{}'.format(
+          category)] = category_stats[6][category_index]
+      per_category_ap['Recall AR@10 ByCategory/{}'.format(
+          category)] = category_stats[7][category_index]
+      per_category_ap['Recall AR@100 ByCategory/{}'.format(
+          category)] = category_stats[8][category_index]
+      per_category_ap['Recall AR@100 (small) ByCategory/{}'.format(
+          category)] = category_stats[9][category_index]
+      per_category_ap['Recall AR@100 (medium) ByCategory/{}'.format(
+          category)] = category_stats[10][category_index]
+      per_category_ap['Recall AR@100 (large) ByCategory/{}'.format(
+          category)] = category_stats[11][category_index]
+
+  return summary_metrics, per_category_ap
 
 
 def _ConvertBoxToCOCOFormat(box):
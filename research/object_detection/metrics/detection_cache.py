@@ -0,0 +1,263 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Columnar cache of the groundtruth and detections of images.
+
+The groundtruth and the detections stored in TFRecord files of tf.Examples,
+see tf_example_parser.TfExampleDetectionAndGTParser, are parsed once and
+written as flat .npy arrays to a cache directory:
+  image_ids: the source ids of the images.
+  groundtruth_boxes: float32 array of shape [num_groundtruth, 4], in the
+    [ymin, xmin, ymax, xmax] format.
+  groundtruth_classes: int32 array of shape [num_groundtruth].
+  groundtruth_difficult, groundtruth_group_of: bool arrays of shape
+    [num_groundtruth], False when the examples do not have the field.
+  groundtruth_offsets: int64 array of shape [num_images + 1]. The groundtruth
+    of image i is at indices groundtruth_offsets[i]:groundtruth_offsets[i + 1]
+    of the groundtruth arrays.
+  detection_boxes, detection_scores, detection_classes and detection_offsets:
+    the same for the detections.
+A metadata.json file, written last, marks the cache as complete. It records
+the version of the cache format and the paths, sizes and modification times of
+the input files, so that a cache of other files or of another format is
+rebuilt, see cache_matches. The cache does not depend on the evaluation, so it
+is reused with any evaluator.
+
+The arrays are memory mapped when the cache is read, so the groundtruth and
+detections of an image are sliced from them without parsing any proto, e.g. to
+evaluate the same detections with other evaluators or IOU thresholds.
+"""
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from object_detection.core import standard_fields as fields
+from object_detection.metrics import tf_example_parser
+
+METADATA_FILENAME = 'metadata.json'
+# The version of the arrays of the cache, to increment when they change.
+CACHE_VERSION = 1
+
+# The arrays of each image, with the dtype and the shape of an element.
+_GROUNDTRUTH_ARRAYS = [
+    (fields.InputDataFields.groundtruth_boxes, np.float32, [4]),
+    (fields.InputDataFields.groundtruth_classes, np.int32, []),
+    (fields.InputDataFields.groundtruth_difficult, np.bool_, []),
+    (fields.InputDataFields.groundtruth_group_of, np.bool_, []),
+]
+_DETECTION_ARRAYS = [
+    (fields.DetectionResultFields.detection_boxes, np.float32, [4]),
+    (fields.DetectionResultFields.detection_scores, np.float32, []),
+    (fields.DetectionResultFields.detection_classes, np.int32, []),
+]
+_GROUNDTRUTH_OFFSETS = 'groundtruth_offsets'
+_DETECTION_OFFSETS = 'detection_offsets'
+_IMAGE_IDS = 'image_ids'
+
+
+def _array_path(cache_dir, name):
+  return os.path.join(cache_dir, name + '.npy')
+
+
+def _input_stats(input_paths):
+  """Returns the paths, sizes and modification times of the input files."""
+  stats = []
+  for input_path in input_paths:
+    stat = tf.gfile.Stat(input_path)
+    stats.append({'path': input_path, 'size': stat.length,
+                  'mtime_nsec': stat.mtime_nsec})
+  return stats
+
+
+def cache_exists(cache_dir):
+  """Returns whether a complete cache was written to cache_dir."""
+  return tf.gfile.Exists(os.path.join(cache_dir, METADATA_FILENAME))
+
+
+def cache_matches(cache_dir, input_paths):
+  """Returns whether cache_dir holds a complete cache of the input files.
+
+  Args:
+    cache_dir: The directory of the cache.
+    input_paths: A list of paths of TFRecord files of tf.Examples.
+
+  Returns:
+    True if the cache is complete, of CACHE_VERSION, and was written from
+    files with the same paths, sizes and modification times as input_paths.
+  """
+  if not cache_exists(cache_dir):
+    return False
+  with tf.gfile.Open(os.path.join(cache_dir, METADATA_FILENAME), 'r') as f:
+    metadata = json.load(f)
+  return (metadata.get('version') == CACHE_VERSION and
+          metadata.get('inputs') == _input_stats(input_paths))
+
+
+def write_cache(input_paths, cache_dir):
+  """Parses TFRecord files of groundtruth and detections into a cache.
+
+  A cache already in cache_dir is overwritten.
+
+  Args:
+    input_paths: A list of paths of TFRecord files of tf.Examples, see
+      tf_example_parser.TfExampleDetectionAndGTParser.
+    cache_dir: The directory of the cache.
+
+  Returns:
+    Dictionary with the metadata of the cache, with the number of images
+    ('num_images') and of skipped examples without groundtruth or detections
+    ('num_skipped_examples'), the version of the cache ('version') and the
+    stats of the input files ('inputs').
+
+  Raises:
+    ValueError: If a field of an example does not have a value per box.
+  """
+  # The stats are taken first, so that files modified while they are read
+  # do not match the cache.
+  inputs = _input_stats(input_paths)
+  data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
+  image_ids = []
+  arrays = {name: [] for name, _, _ in _GROUNDTRUTH_ARRAYS + _DETECTION_ARRAYS}
+  num_skipped_examples = 0
+  for input_path in input_paths:
+    tf.logging.info('Caching file: {0}'.format(input_path))
+    for string_record in tf.python_io.tf_record_iterator(path=input_path):
+      example = tf.train.Example()
+      example.ParseFromString(string_record)
+      decoded_dict = data_parser.parse(example)
+      if not decoded_dict:
+        num_skipped_examples += 1
+        continue
+      image_id = decoded_dict[fields.DetectionResultFields.key]
+      image_ids.append(image_id)
+      for array_specs, size_name in [
+          (_GROUNDTRUTH_ARRAYS, fields.InputDataFields.groundtruth_classes),
+          (_DETECTION_ARRAYS, fields.DetectionResultFields.detection_classes)]:
+        size = len(decoded_dict[size_name])
+        for name, dtype, shape in array_specs:
+          value = decoded_dict[name]
+          if value is None:
+            value = np.zeros([size] + shape, dtype=dtype)
+          elif len(value) != size:
+            raise ValueError(
+                'Field {} of image {} in {} has {} values for {} boxes.'.format(
+                    name, image_id, input_path, len(value), size))
+          arrays[name].append(np.reshape(value, [size] + shape).astype(dtype))
+
+  tf.gfile.MakeDirs(cache_dir)
+  metadata_path = os.path.join(cache_dir, METADATA_FILENAME)
+  # The old cache is incomplete as soon as its arrays are overwritten.
+  if tf.gfile.Exists(metadata_path):
+    tf.gfile.Remove(metadata_path)
+  np.save(_array_path(cache_dir, _IMAGE_IDS), np.array(image_ids))
+  for array_specs, size_name, offsets_name in [
+      (_GROUNDTRUTH_ARRAYS, fields.InputDataFields.groundtruth_classes,
+       _GROUNDTRUTH_OFFSETS),
+      (_DETECTION_ARRAYS, fields.DetectionResultFields.detection_classes,
+       _DETECTION_OFFSETS)]:
+    offsets = np.cumsum([0] + [len(value) for value in arrays[size_name]])
+    np.save(_array_path(cache_dir, offsets_name), offsets.astype(np.int64))
+    for name, dtype, shape in array_specs:
+      np.save(_array_path(cache_dir, name),
+              np.concatenate(arrays[name]) if arrays[name] else
+              np.zeros([0] + shape, dtype=dtype))
+
+  metadata = {
+      'num_images': len(image_ids),
+      'num_skipped_examples': num_skipped_examples,
+      'version': CACHE_VERSION,
+      'inputs': inputs,
+  }
+  with tf.gfile.Open(metadata_path, 'w') as f:
+    json.dump(metadata, f)
+  tf.logging.info('Wrote the groundtruth and detections of %d images to %s',
+                  len(image_ids), cache_dir)
+  return metadata
+
+
+class DetectionCache(object):
+  """Reads the groundtruth and detections of images from a cache."""
+
+  def __init__(self, cache_dir):
+    """Memory maps the arrays of a cache.
+
+    Args:
+      cache_dir: The directory of a cache written by write_cache.
+
+    Raises:
+      ValueError: If the cache is not complete.
+    """
+    if not cache_exists(cache_dir):
+      raise ValueError('No detection cache in {}.'.format(cache_dir))
+    self._arrays = {}
+    for name in ([_IMAGE_IDS, _GROUNDTRUTH_OFFSETS, _DETECTION_OFFSETS] +
+                 [name for name, _, _ in
+                  _GROUNDTRUTH_ARRAYS + _DETECTION_ARRAYS]):
+      self._arrays[name] = np.load(_array_path(cache_dir, name),
+                                   mmap_mode='r')
+
+  def __len__(self):
+    return len(self._arrays[_IMAGE_IDS])
+
+  def _get_dict(self, index, array_specs, offsets_name):
+    offsets = self._arrays[offsets_name]
+    start, end = offsets[index], offsets[index + 1]
+    image_dict = {}
+    for name, dtype, _ in array_specs:
+      value = np.array(self._arrays[name][start:end])
+      # The parser returns the float values of the examples as float64.
+      if dtype == np.float32:
+        value = value.astype(np.float64)
+      image_dict[name] = value
+    return image_dict
+
+  def get_image_info(self, index):
+    """Returns the groundtruth and the detections of an image.
+
+    Args:
+      index: The index of the image in the cache.
+
+    Returns:
+      A tuple of the image id, the groundtruth_dict and the detections_dict of
+      the image, which are arguments of
+      DetectionEvaluator.add_single_ground_truth_image_info and
+      DetectionEvaluator.add_single_detected_image_info.
+    """
+    return (self._arrays[_IMAGE_IDS][index].item(),
+            self._get_dict(index, _GROUNDTRUTH_ARRAYS, _GROUNDTRUTH_OFFSETS),
+            self._get_dict(index, _DETECTION_ARRAYS, _DETECTION_OFFSETS))
+
+  def image_infos(self, start=0, end=None):
+    """Yields the result of get_image_info for a range of images."""
+    for index in range(start, len(self) if end is None else end):
+      yield self.get_image_info(index)
+
+  def add_to_evaluators(self, evaluators, start=0, end=None):
+    """Adds the groundtruth and the detections of images to evaluators.
+
+    Args:
+      evaluators: A list of DetectionEvaluators, e.g.
+        object_detection_evaluation.ObjectDetectionEvaluator or
+        coco_evaluation.CocoDetectionEvaluator.
+      start: The index of the first image to add.
+      end: The index after the last image to add, by default all the images.
+    """
+    for image_id, groundtruth_dict, detections_dict in self.image_infos(
+        start, end):
+      for evaluator in evaluators:
+        evaluator.add_single_ground_truth_image_info(image_id,
+                                                     groundtruth_dict)
+        evaluator.add_single_detected_image_info(image_id, detections_dict)
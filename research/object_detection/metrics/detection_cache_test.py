@@ -0,0 +1,204 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for object_detection.metrics.detection_cache."""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+
+from object_detection.core import standard_fields as fields
+from object_detection.metrics import coco_evaluation
+from object_detection.metrics import detection_cache
+from object_detection.metrics import tf_example_parser
+from object_detection.utils import object_detection_evaluation
+
+
+class DetectionCacheTest(tf.test.TestCase):
+
+  def _float_feature(self, value):
+    return tf.train.Feature(float_list=tf.train.FloatList(value=value))
+
+  def _int64_feature(self, value):
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=value))
+
+  def _example(self, rng, source_id, num_objects, num_detections,
+               with_difficult):
+    object_boxes = rng.uniform(0, 50, size=[num_objects, 4])
+    object_boxes[:, 2:] += 50
+    detection_boxes = np.concatenate(
+        [object_boxes + rng.normal(0, 5, size=[num_objects, 4]),
+         rng.uniform(0, 100, size=[num_detections, 4])])
+    features = {
+        fields.TfExampleFields.source_id: tf.train.Feature(
+            bytes_list=tf.train.BytesList(value=[source_id.encode('utf8')])),
+        fields.TfExampleFields.object_class_label:
+            self._int64_feature(rng.randint(1, 3, size=num_objects)),
+        fields.TfExampleFields.detection_class_label:
+            self._int64_feature(rng.randint(1, 3, size=len(detection_boxes))),
+        fields.TfExampleFields.detection_score:
+            self._float_feature(rng.uniform(size=len(detection_boxes))),
+    }
+    if with_difficult:
+      features[fields.TfExampleFields.object_difficult] = (
+          self._int64_feature(rng.randint(0, 2, size=num_objects)))
+    for i, coordinate in enumerate(['ymin', 'xmin', 'ymax', 'xmax']):
+      features[getattr(fields.TfExampleFields, 'object_bbox_' + coordinate)] = (
+          self._float_feature(object_boxes[:, i]))
+      features[getattr(fields.TfExampleFields,
+                       'detection_bbox_' + coordinate)] = (
+                           self._float_feature(detection_boxes[:, i]))
+    return tf.train.Example(features=tf.train.Features(feature=features))
+
+  def setUp(self):
+    rng = np.random.RandomState(0)
+    self.examples = [
+        self._example(rng, 'image%d' % i, rng.randint(1, 4), rng.randint(0, 4),
+                      with_difficult=i % 2)
+        for i in range(20)]
+    self.examples.append(tf.train.Example())
+    temp_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    self.input_paths = []
+    for i in range(2):
+      path = os.path.join(temp_dir, 'detections-%d' % i)
+      with tf.python_io.TFRecordWriter(path) as writer:
+        for example in self.examples[i::2]:
+          writer.write(example.SerializeToString())
+      self.input_paths.append(path)
+    self.cache_dir = os.path.join(temp_dir, 'cache')
+
+  def test_write_cache(self):
+    self.assertFalse(detection_cache.cache_exists(self.cache_dir))
+    metadata = detection_cache.write_cache(self.input_paths, self.cache_dir)
+    self.assertEqual(20, metadata['num_images'])
+    self.assertEqual(1, metadata['num_skipped_examples'])
+    self.assertTrue(detection_cache.cache_exists(self.cache_dir))
+    self.assertEqual(20, len(detection_cache.DetectionCache(self.cache_dir)))
+
+  def test_get_image_info(self):
+    detection_cache.write_cache(self.input_paths, self.cache_dir)
+    cache = detection_cache.DetectionCache(self.cache_dir)
+    data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
+    examples = self.examples[0:-1:2] + self.examples[1::2]
+    for index, example in enumerate(examples):
+      decoded_dict = data_parser.parse(example)
+      image_id, groundtruth_dict, detections_dict = cache.get_image_info(index)
+      self.assertEqual(decoded_dict[fields.DetectionResultFields.key],
+                       image_id)
+      for key, value in list(groundtruth_dict.items()) + list(
+          detections_dict.items()):
+        if decoded_dict[key] is None:
+          self.assertFalse(np.any(value))
+        else:
+          self.assertAllEqual(decoded_dict[key], value)
+      self.assertEqual(np.float64,
+                       detections_dict[
+                           fields.DetectionResultFields.detection_boxes].dtype)
+
+  def test_add_to_evaluators(self):
+    detection_cache.write_cache(self.input_paths, self.cache_dir)
+    categories = [{'id': 1, 'name': 'cat'}, {'id': 2, 'name': 'dog'}]
+    cached_evaluators = [
+        object_detection_evaluation.PascalDetectionEvaluator(categories),
+        coco_evaluation.CocoDetectionEvaluator(categories)]
+    detection_cache.DetectionCache(self.cache_dir).add_to_evaluators(
+        cached_evaluators)
+
+    evaluators = [
+        object_detection_evaluation.PascalDetectionEvaluator(categories),
+        coco_evaluation.CocoDetectionEvaluator(categories)]
+    data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
+    for example in self.examples[0:-1:2] + self.examples[1::2]:
+      # Missing optional fields are parsed as None, which the evaluators only
+      # support by omitting the field.
+      decoded_dict = {key: value for key, value
+                      in data_parser.parse(example).items()
+                      if value is not None}
+      image_id = decoded_dict[fields.DetectionResultFields.key]
+      for evaluator in evaluators:
+        evaluator.add_single_ground_truth_image_info(image_id, decoded_dict)
+        evaluator.add_single_detected_image_info(image_id, decoded_dict)
+
+    for evaluator, cached_evaluator in zip(evaluators, cached_evaluators):
+      self.assertEqual(evaluator.evaluate(), cached_evaluator.evaluate())
+
+  def test_cache_matches(self):
+    self.assertFalse(detection_cache.cache_matches(
+        self.cache_dir, self.input_paths))
+    detection_cache.write_cache(self.input_paths, self.cache_dir)
+    self.assertTrue(detection_cache.cache_matches(
+        self.cache_dir, self.input_paths))
+    self.assertFalse(detection_cache.cache_matches(
+        self.cache_dir, self.input_paths[:1]))
+
+    # The input file changes, and the rebuilt cache has its examples.
+    with tf.python_io.TFRecordWriter(self.input_paths[0]) as writer:
+      writer.write(self.examples[0].SerializeToString())
+    self.assertFalse(detection_cache.cache_matches(
+        self.cache_dir, self.input_paths))
+    metadata = detection_cache.write_cache(self.input_paths, self.cache_dir)
+    self.assertEqual(11, metadata['num_images'])
+    self.assertEqual(11, len(detection_cache.DetectionCache(self.cache_dir)))
+    self.assertTrue(detection_cache.cache_matches(
+        self.cache_dir, self.input_paths))
+
+  def test_cache_is_reused_with_other_iou_thresholds(self):
+    detection_cache.write_cache(self.input_paths, self.cache_dir)
+    cache = detection_cache.DetectionCache(self.cache_dir)
+    categories = [{'id': 1, 'name': 'cat'}, {'id': 2, 'name': 'dog'}]
+    maps = []
+    for matching_iou_threshold in [0.5, 0.9]:
+      self.assertTrue(detection_cache.cache_matches(
+          self.cache_dir, self.input_paths))
+      evaluator = object_detection_evaluation.PascalDetectionEvaluator(
+          categories, matching_iou_threshold=matching_iou_threshold)
+      cache.add_to_evaluators([evaluator])
+      maps.append(evaluator.evaluate()[
+          'PascalBoxes_Precision/mAP@{}IOU'.format(matching_iou_threshold)])
+    self.assertGreater(maps[0], maps[1])
+
+  def test_cache_of_another_version_does_not_match(self):
+    detection_cache.write_cache(self.input_paths, self.cache_dir)
+    metadata_path = os.path.join(self.cache_dir,
+                                 detection_cache.METADATA_FILENAME)
+    with tf.gfile.Open(metadata_path) as f:
+      metadata = json.load(f)
+    metadata['version'] = detection_cache.CACHE_VERSION - 1
+    with tf.gfile.Open(metadata_path, 'w') as f:
+      json.dump(metadata, f)
+    self.assertFalse(detection_cache.cache_matches(
+        self.cache_dir, self.input_paths))
+
+  def test_value_error_on_field_without_value_per_box(self):
+    example = self._example(np.random.RandomState(0), 'image', 3, 2,
+                            with_difficult=False)
+    example.features.feature[
+        fields.TfExampleFields.object_difficult].int64_list.value.extend(
+            [0, 1])
+    with tf.python_io.TFRecordWriter(self.input_paths[0]) as writer:
+      writer.write(example.SerializeToString())
+    with self.assertRaises(ValueError):
+      detection_cache.write_cache(self.input_paths, self.cache_dir)
+    self.assertFalse(detection_cache.cache_exists(self.cache_dir))
+
+  def test_value_error_on_missing_cache(self):
+    with self.assertRaises(ValueError):
+      detection_cache.DetectionCache(self.cache_dir)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,495 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""COCO detection metrics computed on numpy arrays.
+
+Computes the 12 summary metrics of pycocotools' COCOeval, see
+coco_tools.COCOEvalWrapper, for boxes or instance masks, without converting the
+groundtruth and the detections to COCO annotation dicts.
+
+The detections of an image are matched to its groundtruth when they are added,
+for all the area ranges and IOU thresholds at once, and only the results of the
+matching are kept, so the boxes and masks of an image are released once its
+detections are added. The matching replicates COCOeval.evaluateImg, including
+crowd and ignored groundtruth, and the accumulation of the matches of each
+category replicates COCOeval.accumulate, so that the metrics are the same as
+the ones computed by pycocotools.
+"""
+import collections
+
+import numpy as np
+
+from object_detection.utils import np_mask_ops
+
+# The parameters of pycocotools.cocoeval.Params for detections.
+IOU_THRESHOLDS = np.linspace(.5, 0.95, int(np.round((0.95 - .5) / .05)) + 1,
+                             endpoint=True)
+RECALL_THRESHOLDS = np.linspace(.0, 1.00, int(np.round((1.00 - .0) / .01)) + 1,
+                                endpoint=True)
+MAX_DETECTIONS = [1, 10, 100]
+AREA_RANGES = np.array([[0 ** 2, 1e5 ** 2], [0 ** 2, 32 ** 2],
+                        [32 ** 2, 96 ** 2], [96 ** 2, 1e5 ** 2]])
+_AREA_INDEX = {'all': 0, 'small': 1, 'medium': 2, 'large': 3}
+
+# The results of the matching of the detections of an image.
+#   groundtruth_classes: int array of shape [num_groundtruth].
+#   groundtruth_ignored: bool array of shape [num_area_ranges,
+#     num_groundtruth], whether the groundtruth is crowd or out of the area
+#     range.
+#   detection_classes: int array of shape [num_detections].
+#   detection_scores: float64 array of shape [num_detections].
+#   detection_ranks: int array of shape [num_detections], the rank of the score
+#     of each detection among the detections of its category.
+#   detection_matched: bool array of shape [num_area_ranges,
+#     num_iou_thresholds, num_detections], whether the detection is matched.
+#   detection_ignored: bool array of the same shape, whether the detection is
+#     matched to an ignored groundtruth or is unmatched and out of the area
+#     range.
+_ImageResult = collections.namedtuple('_ImageResult', [
+    'groundtruth_classes', 'groundtruth_ignored', 'detection_classes',
+    'detection_scores', 'detection_ranks', 'detection_matched',
+    'detection_ignored'])
+
+# The groundtruth of an image waiting for its detections. regions are the boxes
+# in the COCO [x, y, width, height] format, or the packed masks.
+_Groundtruth = collections.namedtuple('_Groundtruth', [
+    'classes', 'regions', 'is_crowd', 'ignored'])
+
+
+def _coco_boxes(boxes):
+  """Converts [ymin, xmin, ymax, xmax] boxes to float64 [x, y, w, h] boxes.
+
+  The widths and heights are computed in the dtype of boxes, like
+  coco_tools.ExportSingleImageDetectionBoxesToCoco does.
+
+  Args:
+    boxes: a numpy array of shape [N, 4].
+
+  Returns:
+    a float64 numpy array of shape [N, 4].
+  """
+  return np.stack([boxes[:, 1], boxes[:, 0], boxes[:, 3] - boxes[:, 1],
+                   boxes[:, 2] - boxes[:, 0]], axis=1).astype(np.float64)
+
+
+def _box_iou(detection_boxes, groundtruth_boxes, is_crowd):
+  """Computes the IOU of boxes in the COCO format like pycocotools.
+
+  Args:
+    detection_boxes: a float64 numpy array of shape [D, 4].
+    groundtruth_boxes: a float64 numpy array of shape [G, 4].
+    is_crowd: a bool numpy array of shape [G]. The IOU with a crowd
+      groundtruth box is the intersection over the area of the detection.
+
+  Returns:
+    a float64 numpy array of shape [D, G].
+  """
+  dx, dy, dw, dh = [c[:, np.newaxis] for c in detection_boxes.T]
+  gx, gy, gw, gh = [c[np.newaxis, :] for c in groundtruth_boxes.T]
+  widths = np.minimum(dw + dx, gw + gx) - np.maximum(dx, gx)
+  heights = np.minimum(dh + dy, gh + gy) - np.maximum(dy, gy)
+  intersections = widths * heights
+  detection_areas = dw * dh
+  unions = np.where(is_crowd, detection_areas,
+                    detection_areas + gw * gh - intersections)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    ious = intersections / unions
+  return np.where((widths > 0) & (heights > 0), ious, 0.0)
+
+
+def _packed_mask_iou(detection_masks, groundtruth_masks, detection_areas,
+                     groundtruth_areas, is_crowd):
+  """Computes the IOU of bit-packed masks like pycocotools.
+
+  Args:
+    detection_masks: packed masks of the detections, see
+      np_mask_ops.pack_masks.
+    groundtruth_masks: packed masks of the groundtruth.
+    detection_areas: float64 numpy array of shape [D].
+    groundtruth_areas: float64 numpy array of shape [G].
+    is_crowd: a bool numpy array of shape [G]. The IOU with a crowd
+      groundtruth mask is the intersection over the area of the detection.
+
+  Returns:
+    a float64 numpy array of shape [D, G].
+  """
+  intersections = np_mask_ops.packed_intersection(
+      detection_masks, groundtruth_masks).astype(np.float64)
+  unions = np.where(
+      is_crowd, detection_areas[:, np.newaxis],
+      detection_areas[:, np.newaxis] + groundtruth_areas - intersections)
+  return intersections / np.maximum(unions, 1.0)
+
+
+def _out_of_area_ranges(areas):
+  """Returns a bool array of shape [num_area_ranges, N] for areas [N]."""
+  return ((areas < AREA_RANGES[:, 0:1]) | (areas > AREA_RANGES[:, 1:2]))
+
+
+def _match_detections(ious, groundtruth_ignored, groundtruth_is_crowd):
+  """Matches the sorted detections of a category to its groundtruth.
+
+  Replicates the greedy matching of COCOeval.evaluateImg for all the area
+  ranges and IOU thresholds at once: each detection, by decreasing score, is
+  matched to the groundtruth with the highest IOU which is not matched yet,
+  unless it is crowd, preferring groundtruth which is not ignored.
+
+  Args:
+    ious: float64 numpy array of shape [D, G].
+    groundtruth_ignored: bool numpy array of shape [num_area_ranges, G].
+    groundtruth_is_crowd: bool numpy array of shape [G].
+
+  Returns:
+    matched: bool numpy array of shape [num_area_ranges, num_iou_thresholds,
+      D], whether each detection is matched.
+    matched_ignored: bool numpy array of the same shape, whether each
+      detection is matched to an ignored groundtruth.
+  """
+  num_detections, num_groundtruth = ious.shape
+  shape = [len(AREA_RANGES), len(IOU_THRESHOLDS)]
+  matched = np.zeros(shape + [num_detections], dtype=bool)
+  matched_ignored = np.zeros(shape + [num_detections], dtype=bool)
+  if not num_detections or not num_groundtruth:
+    return matched, matched_ignored
+
+  thresholds = np.minimum(IOU_THRESHOLDS, 1 - 1e-10)[:, np.newaxis]
+  ignored = groundtruth_ignored[:, np.newaxis, :]
+  available = np.ones(shape + [num_groundtruth], dtype=bool)
+  # Detections below the lowest IOU threshold with all the groundtruth are
+  # never matched.
+  for d in np.flatnonzero(np.any(ious >= thresholds[0], axis=1)):
+    candidates = available & (ious[d] >= thresholds)
+    regular_candidates = candidates & ~ignored
+    candidates = np.where(
+        np.any(regular_candidates, axis=2, keepdims=True),
+        regular_candidates, candidates)
+    is_matched = np.any(candidates, axis=2)
+    # The last groundtruth with the highest IOU.
+    best = num_groundtruth - 1 - np.argmax(
+        np.where(candidates, ious[d], -1.0)[:, :, ::-1], axis=2)
+    area_indices, threshold_indices = np.nonzero(is_matched)
+    best = best[area_indices, threshold_indices]
+    available[area_indices, threshold_indices, best] = (
+        groundtruth_is_crowd[best])
+    matched[area_indices, threshold_indices, d] = True
+    matched_ignored[area_indices, threshold_indices, d] = (
+        groundtruth_ignored[area_indices, best])
+  return matched, matched_ignored
+
+
+def _accumulate(image_results, category_ids):
+  """Computes the precision and recall arrays of COCOeval.accumulate.
+
+  Args:
+    image_results: the list of the _ImageResult of all the images, sorted by
+      image id.
+    category_ids: the sorted list of the category ids.
+
+  Returns:
+    precision: float64 numpy array of shape [num_iou_thresholds,
+      num_recall_thresholds, num_categories, num_area_ranges,
+      num_max_detections], -1 for absent categories.
+    recall: float64 numpy array of shape [num_iou_thresholds, num_categories,
+      num_area_ranges, num_max_detections], -1 for absent categories.
+  """
+  num_thresholds = len(IOU_THRESHOLDS)
+  precision = -np.ones([num_thresholds, len(RECALL_THRESHOLDS),
+                        len(category_ids), len(AREA_RANGES),
+                        len(MAX_DETECTIONS)])
+  recall = -np.ones([num_thresholds, len(category_ids), len(AREA_RANGES),
+                     len(MAX_DETECTIONS)])
+  if not image_results:
+    return precision, recall
+
+  def concatenate(field, axis=0):
+    return np.concatenate([getattr(result, field) for result in image_results],
+                          axis=axis)
+
+  groundtruth_classes = concatenate('groundtruth_classes')
+  groundtruth_ignored = concatenate('groundtruth_ignored', axis=1)
+  # A stable sort by category keeps the order of the images and, within an
+  # image, the order of the scores.
+  order = np.argsort(concatenate('detection_classes'), kind='mergesort')
+  detection_classes = concatenate('detection_classes')[order]
+  detection_scores = concatenate('detection_scores')[order]
+  detection_ranks = concatenate('detection_ranks')[order]
+  true_positives = (concatenate('detection_matched', axis=2) &
+                    ~concatenate('detection_ignored', axis=2))[:, :, order]
+  false_positives = (~concatenate('detection_matched', axis=2) &
+                     ~concatenate('detection_ignored', axis=2))[:, :, order]
+  starts = np.searchsorted(detection_classes, category_ids, side='left')
+  ends = np.searchsorted(detection_classes, category_ids, side='right')
+
+  for k, category_id in enumerate(category_ids):
+    num_positives = np.sum(
+        ~groundtruth_ignored[:, groundtruth_classes == category_id], axis=1)
+    category_slice = slice(starts[k], ends[k])
+    for m, max_detections in enumerate(MAX_DETECTIONS):
+      selected = np.flatnonzero(
+          detection_ranks[category_slice] < max_detections) + starts[k]
+      selected = selected[np.argsort(-detection_scores[selected],
+                                     kind='mergesort')]
+      num_detections = len(selected)
+      for a in range(len(AREA_RANGES)):
+        if num_positives[a] == 0:
+          continue
+        tp_sum = np.cumsum(true_positives[a][:, selected],
+                           axis=1).astype(float)
+        fp_sum = np.cumsum(false_positives[a][:, selected],
+                           axis=1).astype(float)
+        recalls = tp_sum / num_positives[a]
+        precisions = tp_sum / (fp_sum + tp_sum + np.spacing(1))
+        if num_detections:
+          recall[:, k, a, m] = recalls[:, -1]
+        else:
+          recall[:, k, a, m] = 0
+        # Makes the precision monotonically decreasing.
+        precisions = np.maximum.accumulate(precisions[:, ::-1], axis=1)[:, ::-1]
+        for t in range(num_thresholds):
+          indices = np.searchsorted(recalls[t], RECALL_THRESHOLDS, side='left')
+          interpolated = np.zeros(len(RECALL_THRESHOLDS))
+          valid = indices < num_detections
+          interpolated[valid] = precisions[t, indices[valid]]
+          precision[t, :, k, a, m] = interpolated
+  return precision, recall
+
+
+def _summarize(precision, recall):
+  """Returns the 12 summary metrics of COCOeval.summarize.
+
+  Args:
+    precision: the precision array returned by _accumulate.
+    recall: the recall array returned by _accumulate.
+
+  Returns:
+    A float64 numpy array of shape [12], in the order of COCOeval.stats.
+  """
+  def mean(values):
+    values = values[values > -1]
+    return np.mean(values) if len(values) else -1
+
+  def average_precision(iou_threshold=None, area='all', max_detections=100):
+    values = precision
+    if iou_threshold is not None:
+      values = values[np.where(iou_threshold == IOU_THRESHOLDS)[0]]
+    return mean(values[:, :, :, _AREA_INDEX[area],
+                       MAX_DETECTIONS.index(max_detections)])
+
+  def average_recall(area='all', max_detections=100):
+    return mean(recall[:, :, _AREA_INDEX[area],
+                       MAX_DETECTIONS.index(max_detections)])
+
+  return np.array([
+      average_precision(),
+      average_precision(iou_threshold=.5),
+      average_precision(iou_threshold=.75),
+      average_precision(area='small'),
+      average_precision(area='medium'),
+      average_precision(area='large'),
+      average_recall(max_detections=1),
+      average_recall(max_detections=10),
+      average_recall(),
+      average_recall(area='small'),
+      average_recall(area='medium'),
+      average_recall(area='large'),
+  ], dtype=np.float64)
+
+
+class CocoEvaluation(object):
+  """Computes the COCO metrics of boxes or masks from numpy arrays.
+
+  The groundtruth of an image must be added before its detections. The
+  groundtruth of the images without detections is counted as missed.
+  """
+
+  def __init__(self, category_ids, iou_type='bbox'):
+    """Constructor.
+
+    Args:
+      category_ids: the ids of the categories to evaluate. The groundtruth and
+        detections of other classes are dropped.
+      iou_type: 'bbox' to evaluate boxes, or 'segm' to evaluate instance
+        masks.
+
+    Raises:
+      ValueError: if iou_type is not supported.
+    """
+    if iou_type not in ('bbox', 'segm'):
+      raise ValueError('Unsupported iou_type: {}'.format(iou_type))
+    self._category_ids = sorted(category_ids)
+    self._iou_type = iou_type
+    self._groundtruth = {}
+    self._image_results = {}
+
+  def _empty_result(self, groundtruth_classes, groundtruth_ignored):
+    shape = [len(AREA_RANGES), len(IOU_THRESHOLDS), 0]
+    return _ImageResult(
+        groundtruth_classes=groundtruth_classes,
+        groundtruth_ignored=groundtruth_ignored,
+        detection_classes=np.zeros([0], dtype=groundtruth_classes.dtype),
+        detection_scores=np.zeros([0], dtype=np.float64),
+        detection_ranks=np.zeros([0], dtype=np.int64),
+        detection_matched=np.zeros(shape, dtype=bool),
+        detection_ignored=np.zeros(shape, dtype=bool))
+
+  def has_image(self, image_id):
+    """Returns whether the groundtruth of the image was added."""
+    return image_id in self._image_results
+
+  def add_groundtruth(self, image_id, groundtruth_boxes, groundtruth_classes,
+                      groundtruth_is_crowd=None, groundtruth_masks=None):
+    """Adds the groundtruth of an image.
+
+    Like coco_tools.ExportSingleImageGroundtruthToCoco, the area of the
+    groundtruth, which is compared to the area ranges, is the area of its box.
+
+    Args:
+      image_id: a unique image identifier.
+      groundtruth_boxes: numpy array of shape [num_boxes, 4] of boxes in the
+        [ymin, xmin, ymax, xmax] format in absolute image coordinates.
+      groundtruth_classes: int numpy array of shape [num_boxes].
+      groundtruth_is_crowd: optional numpy array of shape [num_boxes], whether
+        each groundtruth is crowd.
+      groundtruth_masks: uint8 numpy array of shape [num_boxes, height, width]
+        with values in {0, 1}, required when evaluating masks.
+    """
+    keep = np.isin(groundtruth_classes, self._category_ids)
+    boxes = groundtruth_boxes[keep]
+    classes = groundtruth_classes[keep]
+    if groundtruth_is_crowd is None:
+      is_crowd = np.zeros(len(classes), dtype=bool)
+    else:
+      is_crowd = groundtruth_is_crowd[keep].astype(bool)
+    areas = ((boxes[:, 2] - boxes[:, 0]) *
+             (boxes[:, 3] - boxes[:, 1])).astype(np.float64)
+    ignored = is_crowd | _out_of_area_ranges(areas)
+    if self._iou_type == 'bbox':
+      regions = _coco_boxes(boxes)
+    else:
+      regions = np_mask_ops.pack_masks(groundtruth_masks[keep])
+    self._groundtruth[image_id] = _Groundtruth(
+        classes=classes, regions=regions, is_crowd=is_crowd, ignored=ignored)
+    self._image_results[image_id] = self._empty_result(classes, ignored)
+
+  def add_detections(self, image_id, detection_scores, detection_classes,
+                     detection_boxes=None, detection_masks=None):
+    """Matches the detections of an image to its groundtruth.
+
+    Args:
+      image_id: a unique image identifier, whose groundtruth was added.
+      detection_scores: float numpy array of shape [num_detections].
+      detection_classes: int numpy array of shape [num_detections].
+      detection_boxes: numpy array of shape [num_detections, 4] of boxes in the
+        [ymin, xmin, ymax, xmax] format, required when evaluating boxes.
+      detection_masks: uint8 numpy array of shape [num_detections, height,
+        width] with values in {0, 1}, required when evaluating masks.
+
+    Raises:
+      ValueError: if the groundtruth of the image was not added, or if its
+        detections were already added.
+    """
+    if image_id not in self._groundtruth:
+      raise ValueError('Missing groundtruth or detections already added for '
+                       'image id: {}'.format(image_id))
+    groundtruth = self._groundtruth.pop(image_id)
+    keep = np.isin(detection_classes, self._category_ids)
+    classes = detection_classes[keep]
+    scores = detection_scores[keep].astype(np.float64)
+    if self._iou_type == 'bbox':
+      regions = _coco_boxes(detection_boxes[keep])
+      areas = regions[:, 2] * regions[:, 3]
+    else:
+      regions = np_mask_ops.pack_masks(detection_masks[keep])
+      areas = np_mask_ops.packed_area(regions).astype(np.float64)
+      groundtruth_areas = np_mask_ops.packed_area(
+          groundtruth.regions).astype(np.float64)
+
+    results = collections.defaultdict(list)
+    for category_id in np.unique(np.concatenate([classes,
+                                                 groundtruth.classes])):
+      detection_indices = np.flatnonzero(classes == category_id)
+      detection_indices = detection_indices[
+          np.argsort(-scores[detection_indices], kind='mergesort')]
+      detection_indices = detection_indices[:MAX_DETECTIONS[-1]]
+      groundtruth_indices = np.flatnonzero(groundtruth.classes == category_id)
+      is_crowd = groundtruth.is_crowd[groundtruth_indices]
+      if self._iou_type == 'bbox':
+        ious = _box_iou(regions[detection_indices],
+                        groundtruth.regions[groundtruth_indices], is_crowd)
+      else:
+        ious = _packed_mask_iou(
+            regions[detection_indices],
+            groundtruth.regions[groundtruth_indices],
+            areas[detection_indices], groundtruth_areas[groundtruth_indices],
+            is_crowd)
+      matched, matched_ignored = _match_detections(
+          ious, groundtruth.ignored[:, groundtruth_indices], is_crowd)
+      out_of_area_ranges = _out_of_area_ranges(areas[detection_indices])
+      results['classes'].append(classes[detection_indices])
+      results['scores'].append(scores[detection_indices])
+      results['ranks'].append(np.arange(len(detection_indices)))
+      results['matched'].append(matched)
+      results['ignored'].append(
+          matched_ignored |
+          (~matched & out_of_area_ranges[:, np.newaxis, :]))
+
+    if not results:
+      return
+    self._image_results[image_id] = _ImageResult(
+        groundtruth_classes=groundtruth.classes,
+        groundtruth_ignored=groundtruth.ignored,
+        detection_classes=np.concatenate(results['classes']),
+        detection_scores=np.concatenate(results['scores']),
+        detection_ranks=np.concatenate(results['ranks']),
+        detection_matched=np.concatenate(results['matched'], axis=2),
+        detection_ignored=np.concatenate(results['ignored'], axis=2))
+
+  def merge(self, other):
+    """Merges the images of another CocoEvaluation into this one.
+
+    Args:
+      other: a CocoEvaluation with the same categories and iou_type, and
+        images disjoint from the images of this one.
+
+    Raises:
+      ValueError: if the evaluations are not compatible or share images.
+    """
+    if (self._category_ids != other._category_ids or
+        self._iou_type != other._iou_type):
+      raise ValueError('Cannot merge evaluations of different categories or '
+                       'IOU types.')
+    if set(self._image_results) & set(other._image_results):
+      raise ValueError('Cannot merge evaluations of the same images.')
+    self._groundtruth.update(other._groundtruth)
+    self._image_results.update(other._image_results)
+
+  def evaluate(self):
+    """Computes the COCO summary metrics.
+
+    Returns:
+      stats: float64 numpy array of shape [12] with the summary metrics, in
+        the order of COCOeval.stats.
+      category_stats: float64 numpy array of shape [12, num_categories] with
+        the summary metrics of each category, in the order of the sorted
+        category ids.
+    """
+    image_results = [self._image_results[image_id]
+                     for image_id in sorted(self._image_results)]
+    precision, recall = _accumulate(image_results, self._category_ids)
+    stats = _summarize(precision, recall)
+    category_stats = np.zeros([len(stats), len(self._category_ids)])
+    for k in range(len(self._category_ids)):
+      category_stats[:, k] = _summarize(precision[:, :, k:k + 1],
+                                        recall[:, k:k + 1])
+    return stats, category_stats
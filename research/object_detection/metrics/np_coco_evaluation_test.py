@@ -0,0 +1,97 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for object_detection.metrics.np_coco_evaluation."""
+
+import numpy as np
+from pycocotools import mask
+import tensorflow as tf
+
+from object_detection.metrics import np_coco_evaluation
+
+
+class BoxIouTest(tf.test.TestCase):
+
+  def test_same_iou_as_pycocotools(self):
+    rng = np.random.RandomState(0)
+    detection_boxes = rng.uniform(0, 100, size=[20, 4])
+    groundtruth_boxes = rng.uniform(0, 100, size=[10, 4])
+    is_crowd = rng.randint(0, 2, size=10)
+    expected = mask.iou(detection_boxes.tolist(), groundtruth_boxes.tolist(),
+                        is_crowd.tolist())
+    self.assertAllEqual(expected, np_coco_evaluation._box_iou(
+        detection_boxes, groundtruth_boxes, is_crowd.astype(bool)))
+
+
+class MatchDetectionsTest(tf.test.TestCase):
+
+  def test_prefers_groundtruth_which_is_not_ignored(self):
+    ious = np.array([[.92, .62]])
+    groundtruth_ignored = np.tile([[True, False]], [4, 1])
+    matched, matched_ignored = np_coco_evaluation._match_detections(
+        ious, groundtruth_ignored, np.array([False, False]))
+    # Matched to the second groundtruth up to the IOU threshold 0.6, then to
+    # the first, ignored, groundtruth up to the IOU threshold 0.9.
+    self.assertAllEqual([True] * 9 + [False], matched[0, :, 0])
+    self.assertAllEqual([False] * 3 + [True] * 6 + [False],
+                        matched_ignored[0, :, 0])
+
+  def test_crowd_groundtruth_is_matched_many_times(self):
+    ious = np.array([[.8, .7], [.8, .6], [.8, .6]])
+    groundtruth_ignored = np.tile([[True, False]], [4, 1])
+    matched, matched_ignored = np_coco_evaluation._match_detections(
+        ious, groundtruth_ignored, np.array([True, False]))
+    # At the IOU threshold 0.5, the first detection matches the groundtruth
+    # which is not ignored, the others the crowd groundtruth.
+    self.assertAllEqual([True, True, True], matched[0, 0])
+    self.assertAllEqual([False, True, True], matched_ignored[0, 0])
+
+  def test_groundtruth_is_matched_once(self):
+    ious = np.array([[.8], [.9]])
+    matched, _ = np_coco_evaluation._match_detections(
+        ious, np.zeros([4, 1], dtype=bool), np.array([False]))
+    self.assertAllEqual([True, False], matched[0, 0])
+
+
+class CocoEvaluationTest(tf.test.TestCase):
+
+  def test_perfect_detections(self):
+    evaluation = np_coco_evaluation.CocoEvaluation([1, 2])
+    boxes = np.array([[10., 10., 20., 20.], [10., 10., 100., 100.]])
+    evaluation.add_groundtruth('image1', boxes, np.array([1, 2]))
+    evaluation.add_detections('image1', np.array([.5, .7]), np.array([1, 2]),
+                              detection_boxes=boxes)
+    stats, category_stats = evaluation.evaluate()
+    self.assertAllClose([1., 1., 1., 1., 1., -1., 1., 1., 1., 1., 1., -1.],
+                        stats)
+    self.assertAllClose([1., -1.], category_stats[3])
+
+  def test_empty_evaluation(self):
+    stats, category_stats = np_coco_evaluation.CocoEvaluation([1]).evaluate()
+    self.assertAllEqual([-1.] * 12, stats)
+    self.assertAllEqual([[-1.]] * 12, category_stats)
+
+  def test_detections_without_groundtruth(self):
+    evaluation = np_coco_evaluation.CocoEvaluation([1])
+    with self.assertRaises(ValueError):
+      evaluation.add_detections('image1', np.array([.5]), np.array([1]),
+                                detection_boxes=np.zeros([1, 4]))
+
+  def test_unsupported_iou_type(self):
+    with self.assertRaises(ValueError):
+      np_coco_evaluation.CocoEvaluation([1], iou_type='keypoints')
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -25,22 +25,38 @@ Currently two set of metrics are supported:
 - open_images_detection_metrics: Open Image V2 metric
 All other field of object_detection.protos.EvalConfig are ignored.
 
+All the metrics sets are evaluated in one pass over the data. With
+--num_workers > 1, the input files are read and parsed in parallel by a pool
+of processes, and the evaluations of the files are merged, which requires
+metrics sets whose evaluators support merging (i.e. not the COCO metrics).
+
+With --detection_cache_dir, the groundtruth and detections are parsed once
+into a columnar cache in that directory (see detection_cache.py), and later
+evaluations, e.g. with other metrics sets or IOU thresholds, read the cache
+instead of the input files. The cache is rebuilt when the input files change.
+
 Example usage:
     ./compute_metrics \
         --eval_dir=path/to/eval_dir \
         --eval_config_path=path/to/evaluation/configuration/file \
-        --input_config_path=path/to/input/configuration/file
+        --input_config_path=path/to/input/configuration/file \
+        --num_workers=16
 """
+import collections
 import csv
+import multiprocessing
 import os
 import re
+import time
 import tensorflow as tf
 
 from object_detection import evaluator
 from object_detection.core import standard_fields
+from object_detection.metrics import detection_cache
 from object_detection.metrics import tf_example_parser
 from object_detection.utils import config_util
 from object_detection.utils import label_map_util
+from object_detection.utils import object_detection_evaluation
 
 flags = tf.app.flags
 tf.logging.set_verbosity(tf.logging.INFO)
@@ -50,6 +66,11 @@ flags.DEFINE_string('eval_config_path', None,
                     'Path to an eval_pb2.EvalConfig config file.')
 flags.DEFINE_string('input_config_path', None,
                     'Path to an eval_pb2.InputConfig config file.')
+flags.DEFINE_integer('num_workers', 1, 'Number of processes reading and '
+                     'evaluating the input files in parallel.')
+flags.DEFINE_string('detection_cache_dir', None, 'Directory of a cache of the '
+                    'parsed input files, which is written if it does not '
+                    'exist or does not match the input files.')
 
 FLAGS = flags.FLAGS
 
@@ -73,7 +94,129 @@ def _generate_filenames(filenames):
   return result
 
 
-def read_data_and_evaluate(input_config, eval_config):
+# The stages of the evaluation which are timed.
+_STAGES = ['cache', 'read', 'parse', 'evaluate', 'merge', 'metrics']
+
+
+def _read_and_evaluate_files(input_paths, eval_config, categories,
+                             object_detection_evaluators=None):
+  """Adds the images of input files to evaluators.
+
+  Args:
+    input_paths: A list of paths of TFRecord files of tf.train.Examples with
+      the groundtruth and the detections of images.
+    eval_config: evaluation config proto of type
+      object_detection.protos.EvalConfig.
+    categories: A list of category dictionaries.
+    object_detection_evaluators: Optional list of evaluators to add the images
+      to. By default the evaluators of eval_config are created.
+
+  Returns:
+    A tuple of the list of evaluators and a collections.Counter with the
+    number of processed and skipped images, and the seconds spent in each
+    stage.
+  """
+  if object_detection_evaluators is None:
+    object_detection_evaluators = evaluator.get_evaluators(
+        eval_config, categories)
+  stats = collections.Counter()
+  data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
+  for input_path in input_paths:
+    tf.logging.info('Processing file: {0}'.format(input_path))
+    record_iterator = tf.python_io.tf_record_iterator(path=input_path)
+
+    while True:
+      start = time.time()
+      string_record = next(record_iterator, None)
+      stats['read_secs'] += time.time() - start
+      if string_record is None:
+        break
+      tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 1000,
+                             stats['processed_images'])
+      stats['processed_images'] += 1
+
+      start = time.time()
+      example = tf.train.Example()
+      example.ParseFromString(string_record)
+      decoded_dict = data_parser.parse(example)
+      stats['parse_secs'] += time.time() - start
+
+      if decoded_dict:
+        start = time.time()
+        image_id = decoded_dict[standard_fields.DetectionResultFields.key]
+        for object_detection_evaluator in object_detection_evaluators:
+          object_detection_evaluator.add_single_ground_truth_image_info(
+              image_id, decoded_dict)
+          object_detection_evaluator.add_single_detected_image_info(
+              image_id, decoded_dict)
+        stats['evaluate_secs'] += time.time() - start
+      else:
+        stats['skipped_images'] += 1
+        tf.logging.info('Skipped images: {0}'.format(stats['skipped_images']))
+  return object_detection_evaluators, stats
+
+
+def _evaluate_cached_images(cache_dir, start, end, eval_config, categories,
+                            object_detection_evaluators=None):
+  """Adds a range of the images of a detection cache to evaluators.
+
+  Args:
+    cache_dir: The directory of a detection cache.
+    start: The index of the first image to add.
+    end: The index after the last image to add.
+    eval_config: evaluation config proto of type
+      object_detection.protos.EvalConfig.
+    categories: A list of category dictionaries.
+    object_detection_evaluators: Optional list of evaluators to add the images
+      to. By default the evaluators of eval_config are created.
+
+  Returns:
+    A tuple of the list of evaluators and a collections.Counter with the
+    number of processed images, and the seconds spent in each stage.
+  """
+  if object_detection_evaluators is None:
+    object_detection_evaluators = evaluator.get_evaluators(
+        eval_config, categories)
+  stats = collections.Counter()
+  cache = detection_cache.DetectionCache(cache_dir)
+  for index in range(start, end):
+    start_time = time.time()
+    image_id, groundtruth_dict, detections_dict = cache.get_image_info(index)
+    stats['read_secs'] += time.time() - start_time
+    stats['processed_images'] += 1
+
+    start_time = time.time()
+    for object_detection_evaluator in object_detection_evaluators:
+      object_detection_evaluator.add_single_ground_truth_image_info(
+          image_id, groundtruth_dict)
+      object_detection_evaluator.add_single_detected_image_info(
+          image_id, detections_dict)
+    stats['evaluate_secs'] += time.time() - start_time
+  return object_detection_evaluators, stats
+
+
+def _run_task(function_and_args):
+  """Returns function(*args), in a worker."""
+  function, args = function_and_args
+  return function(*args)
+
+
+def _log_stats(stats, num_workers):
+  """Logs the throughput and the time spent in each stage."""
+  tf.logging.info(
+      'Evaluated %d images (%d skipped) in %.1f sec with %d workers: '
+      '%.1f images/sec', stats['processed_images'], stats['skipped_images'],
+      stats['total_secs'], num_workers,
+      stats['processed_images'] / max(stats['total_secs'], 1e-9))
+  for stage in _STAGES:
+    tf.logging.info('  %-8s %8.1f sec', stage, stats[stage + '_secs'])
+  if num_workers > 1:
+    tf.logging.info('The read, parse and evaluate times are summed over the '
+                    'workers.')
+
+
+def read_data_and_evaluate(input_config, eval_config, num_workers=1,
+                           detection_cache_dir=None):
   """Reads pre-computed object detections and groundtruth from tf_record.
 
   Args:
@@ -81,15 +224,22 @@ def read_data_and_evaluate(input_config, eval_config):
       object_detection.protos.InputReader.
     eval_config: evaluation config proto of type
       object_detection.protos.EvalConfig.
+    num_workers: The number of processes reading and evaluating the input
+      files in parallel. If 1, the files are read in this process.
+    detection_cache_dir: Optional directory of a detection cache of the input
+      files, which is read instead of the input files. It is written first if
+      it does not exist, or if it was written from other input files.
 
   Returns:
-    Evaluated detections metrics.
+    Evaluated detections metrics of all the metrics sets of eval_config.
 
   Raises:
-    ValueError: if input_reader type is not supported or metric type is unknown.
+    ValueError: if input_reader type is not supported or metric type is
+      unknown, or if num_workers > 1 and an evaluator does not support merging.
   """
   if input_config.WhichOneof('input_reader') == 'tf_record_input_reader':
-    input_paths = input_config.tf_record_input_reader.input_path
+    input_paths = _generate_filenames(
+        input_config.tf_record_input_reader.input_path)
 
     label_map = label_map_util.load_labelmap(input_config.label_map_path)
     max_num_classes = max([item.id for item in label_map.item])
@@ -98,38 +248,59 @@ def read_data_and_evaluate(input_config, eval_config):
 
     object_detection_evaluators = evaluator.get_evaluators(
         eval_config, categories)
-    # Support a single evaluator
-    object_detection_evaluator = object_detection_evaluators[0]
-
-    skipped_images = 0
-    processed_images = 0
-    for input_path in _generate_filenames(input_paths):
-      tf.logging.info('Processing file: {0}'.format(input_path))
-
-      record_iterator = tf.python_io.tf_record_iterator(path=input_path)
-      data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
-
-      for string_record in record_iterator:
-        tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 1000,
-                               processed_images)
-        processed_images += 1
-
-        example = tf.train.Example()
-        example.ParseFromString(string_record)
-        decoded_dict = data_parser.parse(example)
-
-        if decoded_dict:
-          object_detection_evaluator.add_single_ground_truth_image_info(
-              decoded_dict[standard_fields.DetectionResultFields.key],
-              decoded_dict)
-          object_detection_evaluator.add_single_detected_image_info(
-              decoded_dict[standard_fields.DetectionResultFields.key],
-              decoded_dict)
-        else:
-          skipped_images += 1
-          tf.logging.info('Skipped images: {0}'.format(skipped_images))
-
-    return object_detection_evaluator.evaluate()
+    if num_workers > 1:
+      for object_detection_evaluator in object_detection_evaluators:
+        if (type(object_detection_evaluator).merge ==
+            object_detection_evaluation.DetectionEvaluator.merge):
+          raise ValueError('{} does not support parallel evaluation.'.format(
+              type(object_detection_evaluator).__name__))
+
+    start = time.time()
+    stats = collections.Counter()
+    if detection_cache_dir:
+      if not detection_cache.cache_matches(detection_cache_dir, input_paths):
+        metadata = detection_cache.write_cache(input_paths,
+                                               detection_cache_dir)
+        stats['skipped_images'] = metadata['num_skipped_examples']
+        stats['cache_secs'] = time.time() - start
+      num_images = len(detection_cache.DetectionCache(detection_cache_dir))
+      num_tasks = max(min(4 * num_workers, num_images), 1)
+      bounds = [num_images * i // num_tasks for i in range(num_tasks + 1)]
+      tasks = [(_evaluate_cached_images, (detection_cache_dir, task_start,
+                                          task_end, eval_config, categories))
+               for task_start, task_end in zip(bounds[:-1], bounds[1:])]
+    else:
+      tasks = [(_read_and_evaluate_files, ([input_path], eval_config,
+                                           categories))
+               for input_path in input_paths]
+
+    if num_workers == 1:
+      for function, args in tasks:
+        _, task_stats = function(*args + (object_detection_evaluators,))
+        stats.update(task_stats)
+    else:
+      pool = multiprocessing.Pool(num_workers)
+      try:
+        # The evaluations are merged in the order of the tasks, so the
+        # metrics are the same as when reading the images in order.
+        for task_evaluators, task_stats in pool.imap(_run_task, tasks):
+          merge_start = time.time()
+          for object_detection_evaluator, task_evaluator in zip(
+              object_detection_evaluators, task_evaluators):
+            object_detection_evaluator.merge(task_evaluator)
+          stats['merge_secs'] += time.time() - merge_start
+          stats.update(task_stats)
+      finally:
+        pool.terminate()
+
+    metrics_start = time.time()
+    metrics = {}
+    for object_detection_evaluator in object_detection_evaluators:
+      metrics.update(object_detection_evaluator.evaluate())
+    stats['metrics_secs'] = time.time() - metrics_start
+    stats['total_secs'] = time.time() - start
+    _log_stats(stats, num_workers)
+    return metrics
 
   raise ValueError('Unsupported input_reader_config.')
 
@@ -163,7 +334,8 @@ def main(argv):
   eval_config = configs['eval_config']
   input_config = configs['eval_input_config']
 
-  metrics = read_data_and_evaluate(input_config, eval_config)
+  metrics = read_data_and_evaluate(input_config, eval_config,
+                                   FLAGS.num_workers, FLAGS.detection_cache_dir)
 
   # Save metrics
   write_metrics(metrics, FLAGS.eval_dir)
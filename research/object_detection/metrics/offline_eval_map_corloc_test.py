@@ -14,9 +14,22 @@
 # ==============================================================================
 """Tests for utilities in offline_eval_map_corloc binary."""
 
+import os
+
+import numpy as np
+import six
 import tensorflow as tf
 
+from object_detection.core import standard_fields as fields
+from object_detection.metrics import detection_cache
 from object_detection.metrics import offline_eval_map_corloc as offline_eval
+from object_detection.protos import eval_pb2
+from object_detection.protos import input_reader_pb2
+
+if six.PY2:
+  import mock  # pylint: disable=g-import-not-at-top
+else:
+  from unittest import mock  # pylint: disable=g-import-not-at-top
 
 
 class OfflineEvalMapCorlocTest(tf.test.TestCase):
@@ -53,6 +66,98 @@ class OfflineEvalMapCorlocTest(tf.test.TestCase):
         '/path/to/-00001-of-00003.record', '/path/to/-00002-of-00003.record'
     ])
 
+  def _float_feature(self, value):
+    return tf.train.Feature(float_list=tf.train.FloatList(value=value))
+
+  def _int64_feature(self, value):
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=value))
+
+  def _random_example(self, rng, source_id):
+    num_objects = rng.randint(1, 4)
+    object_boxes = rng.uniform(0, 0.5, size=[num_objects, 4])
+    object_boxes[:, 2:] += 0.5
+    detection_boxes = np.concatenate(
+        [object_boxes + rng.normal(0, 0.05, size=[num_objects, 4]),
+         rng.uniform(0, 1, size=[2, 4])])
+    features = {
+        fields.TfExampleFields.source_id: tf.train.Feature(
+            bytes_list=tf.train.BytesList(value=[source_id.encode('utf8')])),
+        fields.TfExampleFields.object_class_label:
+            self._int64_feature(rng.randint(1, 3, size=num_objects)),
+        fields.TfExampleFields.object_difficult:
+            self._int64_feature(rng.randint(0, 2, size=num_objects)),
+        fields.TfExampleFields.object_group_of:
+            self._int64_feature(rng.randint(0, 2, size=num_objects)),
+        fields.TfExampleFields.detection_class_label:
+            self._int64_feature(rng.randint(1, 3, size=len(detection_boxes))),
+        fields.TfExampleFields.detection_score:
+            self._float_feature(np.round(
+                rng.uniform(size=len(detection_boxes)), 1)),
+    }
+    for i, coordinate in enumerate(['ymin', 'xmin', 'ymax', 'xmax']):
+      features[getattr(fields.TfExampleFields, 'object_bbox_' + coordinate)] = (
+          self._float_feature(object_boxes[:, i]))
+      features[getattr(fields.TfExampleFields,
+                       'detection_bbox_' + coordinate)] = (
+                           self._float_feature(detection_boxes[:, i]))
+    return tf.train.Example(features=tf.train.Features(feature=features))
+
+  def _write_input_config(self, num_files, num_examples_per_file):
+    rng = np.random.RandomState(0)
+    input_path = os.path.join(self.get_temp_dir(), 'detections@%d' % num_files)
+    for i, path in enumerate(offline_eval._generate_filenames([input_path])):
+      with tf.python_io.TFRecordWriter(path) as writer:
+        for j in range(num_examples_per_file):
+          writer.write(self._random_example(
+              rng, 'image%d_%d' % (i, j)).SerializeToString())
+    label_map_path = os.path.join(self.get_temp_dir(), 'label_map.pbtxt')
+    with tf.gfile.Open(label_map_path, 'w') as f:
+      f.write("item { name: 'cat' id: 1 } item { name: 'dog' id: 2 }")
+    input_config = input_reader_pb2.InputReader(label_map_path=label_map_path)
+    input_config.tf_record_input_reader.input_path.append(input_path)
+    return input_config
+
+  def test_readDataAndEvaluate(self):
+    input_config = self._write_input_config(3, 10)
+    eval_config = eval_pb2.EvalConfig(metrics_set=[
+        'pascal_voc_detection_metrics', 'open_images_detection_metrics'])
+    metrics = offline_eval.read_data_and_evaluate(input_config, eval_config)
+    self.assertIn('PascalBoxes_Precision/mAP@0.5IOU', metrics)
+    self.assertIn('OpenImagesV2_Precision/mAP@0.5IOU', metrics)
+    parallel_metrics = offline_eval.read_data_and_evaluate(
+        input_config, eval_config, num_workers=2)
+    self.assertEqual(metrics, parallel_metrics)
+
+  def test_readDataAndEvaluateWithCache(self):
+    input_config = self._write_input_config(3, 10)
+    eval_config = eval_pb2.EvalConfig(metrics_set=[
+        'pascal_voc_detection_metrics', 'open_images_detection_metrics'])
+    metrics = offline_eval.read_data_and_evaluate(input_config, eval_config)
+    cache_dir = os.path.join(self.get_temp_dir(), 'cache')
+    # The first evaluation writes the cache, the next ones read it.
+    for num_workers in [1, 1, 2]:
+      self.assertEqual(metrics, offline_eval.read_data_and_evaluate(
+          input_config, eval_config, num_workers, cache_dir))
+
+  def test_readDataAndEvaluateReusesCacheWithOtherEvalConfig(self):
+    input_config = self._write_input_config(2, 5)
+    cache_dir = os.path.join(self.get_temp_dir(), 'cache')
+    with mock.patch.object(detection_cache, 'write_cache',
+                           wraps=detection_cache.write_cache) as write_cache:
+      for metrics_set in ['pascal_voc_detection_metrics',
+                          'open_images_detection_metrics']:
+        offline_eval.read_data_and_evaluate(
+            input_config, eval_pb2.EvalConfig(metrics_set=[metrics_set]),
+            detection_cache_dir=cache_dir)
+    self.assertEqual(1, write_cache.call_count)
+
+  def test_readDataAndEvaluateInParallelWithoutMerge(self):
+    input_config = self._write_input_config(1, 1)
+    eval_config = eval_pb2.EvalConfig(metrics_set=['coco_detection_metrics'])
+    with self.assertRaises(ValueError):
+      offline_eval.read_data_and_evaluate(
+          input_config, eval_config, num_workers=2)
+
 
 if __name__ == '__main__':
   tf.test.main()
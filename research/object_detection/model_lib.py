@@ -231,6 +231,10 @@ def create_model_fn(detection_model_fn, configs, hparams, use_tpu=False):
         gt_keypoints_list = labels[fields.InputDataFields.groundtruth_keypoints]
       if fields.InputDataFields.groundtruth_is_crowd in labels:
         gt_is_crowd_list = labels[fields.InputDataFields.groundtruth_is_crowd]
+      gt_anchor_matches_list = None
+      if fields.InputDataFields.groundtruth_anchor_matches in labels:
+        gt_anchor_matches_list = labels[
+            fields.InputDataFields.groundtruth_anchor_matches]
       detection_model.provide_groundtruth(
           groundtruth_boxes_list=gt_boxes_list,
           groundtruth_classes_list=gt_classes_list,
@@ -238,7 +242,8 @@ def create_model_fn(detection_model_fn, configs, hparams, use_tpu=False):
           groundtruth_keypoints_list=gt_keypoints_list,
           groundtruth_weights_list=labels[
               fields.InputDataFields.groundtruth_weights],
-          groundtruth_is_crowd_list=gt_is_crowd_list)
+          groundtruth_is_crowd_list=gt_is_crowd_list,
+          groundtruth_anchor_matches_list=gt_anchor_matches_list)
 
     preprocessed_images = features[fields.InputDataFields.image]
     prediction_dict = detection_model.predict(
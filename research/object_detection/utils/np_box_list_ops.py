@@ -19,12 +19,19 @@ Example box operations that are supported:
   * Areas: compute bounding box areas
   * IOU: pairwise intersection-over-union scores
 """
+import collections
+
 import numpy as np
 
 from object_detection.utils import np_box_list
 from object_detection.utils import np_box_ops
 
 
+# The number of boxes that are compared with each other at once by the tiled
+# non maximum suppression.
+_NMS_TILE_SIZE = 512
+
+
 class SortOrder(object):
   """Enum class for sort order.
 
@@ -264,28 +271,10 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
     ValueError: if iou_thresh is not in [0, 1] or if input boxlist does not have
       a valid scores field.
   """
-  if not 0 <= iou_thresh <= 1.0:
-    raise ValueError('thresh must be between 0 and 1')
-  if not isinstance(boxlist, np_box_list.BoxList):
-    raise ValueError('boxlist must be a BoxList')
-  if not boxlist.has_field('scores'):
-    raise ValueError('input boxlist must have \'scores\' field')
-  scores = boxlist.get_field('scores')
-  if len(scores.shape) == 1:
-    scores = np.reshape(scores, [-1, 1])
-  elif len(scores.shape) == 2:
-    if scores.shape[1] is None:
-      raise ValueError('scores field must have statically defined second '
-                       'dimension')
-  else:
-    raise ValueError('scores field must be of rank 1 or 2')
-  num_boxes = boxlist.num_boxes()
+  scores = _get_multi_class_scores(boxlist, iou_thresh)
   num_scores = scores.shape[0]
   num_classes = scores.shape[1]
 
-  if num_boxes != num_scores:
-    raise ValueError('Incorrect scores field length: actual vs expected.')
-
   selected_boxes_list = []
   for class_idx in range(num_classes):
     boxlist_and_class_scores = np_box_list.BoxList(boxlist.get())
@@ -305,6 +294,299 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
   return sorted_boxes
 
 
+def fast_non_max_suppression(boxlist,
+                             max_output_size=10000,
+                             iou_threshold=1.0,
+                             score_threshold=-10.0,
+                             soft_nms_sigma=0.0,
+                             tile_size=_NMS_TILE_SIZE):
+  """Non maximum suppression, vectorized over tiles of boxes.
+
+  Selects the same boxes as non_max_suppression, but compares each tile of
+  tile_size boxes with all the selected boxes at once, so that the IOU of a
+  box is only computed against the boxes that were selected before it or that
+  are in the same tile.
+
+  If soft_nms_sigma > 0, Soft-NMS (Bodla et al,
+  https://arxiv.org/abs/1704.04503) is applied instead: the scores of the boxes
+  that overlap a selected box are multiplied by
+  exp(-0.5 * iou^2 / soft_nms_sigma), and the boxes are selected
+  by decreasing updated score. Boxes with an IOU above iou_threshold are still
+  removed, as are the boxes whose updated score is not above score_threshold.
+
+  Args:
+    boxlist: BoxList holding N boxes.  Must contain a 'scores' field
+      representing detection scores. All scores belong to the same class.
+    max_output_size: maximum number of retained boxes
+    iou_threshold: intersection over union threshold.
+    score_threshold: minimum score threshold. Remove the boxes with scores
+                     less than this value.
+    soft_nms_sigma: If positive, the sigma of the Soft-NMS score decay.
+    tile_size: the number of boxes in each tile.
+
+  Returns:
+    a BoxList holding M boxes where M <= max_output_size. With Soft-NMS, its
+    'scores' field holds the updated scores.
+  Raises:
+    ValueError: if 'scores' field does not exist
+    ValueError: if threshold is not in [0, 1]
+    ValueError: if max_output_size < 0
+  """
+  if not boxlist.has_field('scores'):
+    raise ValueError('Field scores does not exist')
+  if iou_threshold < 0. or iou_threshold > 1.0:
+    raise ValueError('IOU threshold must be in [0, 1]')
+  if max_output_size < 0:
+    raise ValueError('max_output_size must be bigger than 0.')
+
+  boxlist = filter_scores_greater_than(boxlist, score_threshold)
+  if boxlist.num_boxes() == 0:
+    return boxlist
+  boxlist = sort_by_field(boxlist, 'scores')
+
+  classes = np.zeros(boxlist.num_boxes(), dtype=np.int64)
+  if soft_nms_sigma > 0:
+    selected_indices, selected_scores = _soft_non_max_suppression(
+        boxlist.get(), boxlist.get_field('scores'), classes, max_output_size,
+        iou_threshold, score_threshold, soft_nms_sigma)
+    fields = [f for f in boxlist.get_extra_fields() if f != 'scores']
+    selected_boxlist = gather(boxlist, selected_indices, fields)
+    selected_boxlist.add_field('scores', selected_scores)
+    return selected_boxlist
+
+  return gather(boxlist, _tiled_non_max_suppression(
+      boxlist.get(), classes, max_output_size, iou_threshold, tile_size))
+
+
+def fast_multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
+                                         max_output_size, soft_nms_sigma=0.0,
+                                         tile_size=_NMS_TILE_SIZE):
+  """Multi-class non maximum suppression of all the classes in a single pass.
+
+  Selects the same boxes as multi_class_non_max_suppression. Instead of
+  running a non maximum suppression per class, every (box, class) pair with a
+  score above score_thresh is a candidate, and the candidates of all the
+  classes are suppressed together by fast_non_max_suppression, where boxes of
+  different classes never suppress each other. This is the same as offsetting
+  the boxes of each class so that they don't overlap, without changing the
+  coordinates that the IOU is computed from.
+
+  Args:
+    boxlist: BoxList holding N boxes.  Must contain a 'scores' field
+      representing detection scores, of shape [N] or [N, num_classes].
+    score_thresh: scalar threshold for score (low scoring boxes are removed).
+    iou_thresh: scalar threshold for IOU (boxes that that high IOU overlap
+      with previously selected boxes are removed).
+    max_output_size: maximum number of retained boxes per class.
+    soft_nms_sigma: If positive, the sigma of the Soft-NMS score decay, see
+      fast_non_max_suppression.
+    tile_size: the number of candidates in each tile.
+
+  Returns:
+    a BoxList holding M boxes with a rank-1 scores field representing
+      corresponding scores for each box with scores sorted in decreasing order
+      and a rank-1 classes field representing a class label for each box.
+  Raises:
+    ValueError: if iou_thresh is not in [0, 1] or if input boxlist does not have
+      a valid scores field.
+  """
+  scores = _get_multi_class_scores(boxlist, iou_thresh)
+  box_indices, classes = np.nonzero(scores > score_thresh)
+  candidate_scores = scores[box_indices, classes]
+  # Boxes of different classes don't interact, so the candidates are grouped
+  # by class, which lets each tile skip the selected boxes of other classes.
+  # Within a class, the candidates are sorted like sort_by_field sorts the
+  # filtered boxes of the class in multi_class_non_max_suppression, so that
+  # tied scores are ordered the same way.
+  order = np.lexsort((box_indices, classes))
+  class_starts = np.flatnonzero(np.diff(classes[order])) + 1
+  order = np.concatenate([
+      class_order[np.argsort(candidate_scores[class_order])[::-1]]
+      for class_order in np.split(order, class_starts)])
+  box_indices = box_indices[order]
+  classes = classes[order]
+  candidate_scores = candidate_scores[order]
+  boxes = boxlist.get()[box_indices]
+
+  if soft_nms_sigma > 0:
+    selected, candidate_scores = _soft_non_max_suppression(
+        boxes, candidate_scores, classes, max_output_size, iou_thresh,
+        score_thresh, soft_nms_sigma)
+  else:
+    selected = _tiled_non_max_suppression(
+        boxes, classes, max_output_size, iou_thresh, tile_size)
+    candidate_scores = candidate_scores[selected]
+  # Order the selected boxes by class like multi_class_non_max_suppression,
+  # so that the final sort breaks ties the same way. Soft-NMS selects them by
+  # decreasing updated score.
+  class_order = np.argsort(classes[selected], kind='mergesort')
+  selected = selected[class_order]
+
+  selected_boxes = np_box_list.BoxList(boxes[selected])
+  selected_boxes.add_field('scores', candidate_scores[class_order])
+  selected_boxes.add_field(
+      'classes', classes[selected].astype(scores.dtype))
+  return sort_by_field(selected_boxes, 'scores')
+
+
+def _get_multi_class_scores(boxlist, iou_thresh):
+  """Checks the arguments of multi-class NMS, and returns the 2-D scores."""
+  if not 0 <= iou_thresh <= 1.0:
+    raise ValueError('thresh must be between 0 and 1')
+  if not isinstance(boxlist, np_box_list.BoxList):
+    raise ValueError('boxlist must be a BoxList')
+  if not boxlist.has_field('scores'):
+    raise ValueError('input boxlist must have \'scores\' field')
+  scores = boxlist.get_field('scores')
+  if len(scores.shape) == 1:
+    scores = np.reshape(scores, [-1, 1])
+  elif len(scores.shape) == 2:
+    if scores.shape[1] is None:
+      raise ValueError('scores field must have statically defined second '
+                       'dimension')
+  else:
+    raise ValueError('scores field must be of rank 1 or 2')
+
+  if boxlist.num_boxes() != scores.shape[0]:
+    raise ValueError('Incorrect scores field length: actual vs expected.')
+  return scores
+
+
+def _tiled_non_max_suppression(boxes, classes, max_output_size, iou_threshold,
+                               tile_size):
+  """Greedy non maximum suppression of boxes sorted by class and score.
+
+  The boxes are processed in tiles. The boxes of a tile that overlap a box
+  selected in a previous tile are removed with one IOU computation, and the
+  remaining boxes of the tile are selected greedily using the suppression
+  mask of their pairwise IOUs.
+
+  Args:
+    boxes: a numpy array with shape [N, 4], sorted by increasing class, then
+      by decreasing score.
+    classes: a numpy integer array with shape [N], in increasing order. Boxes
+      of different classes don't suppress each other.
+    max_output_size: maximum number of selected boxes per class.
+    iou_threshold: boxes with an IOU above this threshold with a selected box
+      of the same class are removed.
+    tile_size: the number of boxes in each tile.
+
+  Returns:
+    a numpy int64 array with the increasing indices of the selected boxes.
+  """
+  num_boxes = boxes.shape[0]
+  _, classes = np.unique(classes, return_inverse=True)
+  classes = classes.reshape([-1])
+  class_counts = np.zeros(np.max(classes, initial=-1) + 1, dtype=np.int64)
+
+  # Without suppression, the first boxes of each class are selected.
+  if iou_threshold >= 1.0:
+    order = np.argsort(classes, kind='mergesort')
+    sorted_classes = classes[order]
+    rank = np.empty(num_boxes, dtype=np.int64)
+    rank[order] = np.arange(num_boxes) - np.searchsorted(
+        sorted_classes, sorted_classes)
+    return np.flatnonzero(rank < max_output_size)
+
+  selected_indices = []
+  selected_boxes = boxes[:0]
+  selected_classes = classes[:0]
+  for start in range(0, num_boxes, tile_size):
+    tile_boxes = boxes[start:start + tile_size]
+    tile_classes = classes[start:start + tile_size]
+
+    keep = class_counts[tile_classes] < max_output_size
+    # Only the selected boxes of the classes of the tile can suppress it.
+    first = np.searchsorted(selected_classes, tile_classes[0], side='left')
+    last = np.searchsorted(selected_classes, tile_classes[-1], side='right')
+    if last > first and np.any(keep):
+      # Like non_max_suppression, a NaN IOU of zero area boxes suppresses.
+      overlaps = np.logical_not(np_box_ops.iou(
+          tile_boxes, selected_boxes[first:last]) <= iou_threshold)
+      overlaps &= tile_classes[:, np.newaxis] == selected_classes[first:last]
+      keep &= np.logical_not(np.any(overlaps, axis=1))
+    candidates = np.flatnonzero(keep)
+    if not candidates.size:
+      continue
+
+    candidate_boxes = tile_boxes[candidates]
+    candidate_classes = tile_classes[candidates]
+    suppress = np.triu(np.logical_not(
+        np_box_ops.iou(candidate_boxes, candidate_boxes) <= iou_threshold), 1)
+    suppress &= candidate_classes[:, np.newaxis] == candidate_classes
+    is_valid = np.ones(candidates.size, dtype=bool)
+    tile_selected = []
+    for i in range(candidates.size):
+      if is_valid[i] and class_counts[candidate_classes[i]] < max_output_size:
+        class_counts[candidate_classes[i]] += 1
+        tile_selected.append(i)
+        is_valid &= np.logical_not(suppress[i])
+
+    if tile_selected:
+      selected_indices.append(start + candidates[tile_selected])
+      selected_boxes = np.concatenate(
+          [selected_boxes, candidate_boxes[tile_selected]])
+      selected_classes = np.concatenate(
+          [selected_classes, candidate_classes[tile_selected]])
+      if np.all(class_counts >= max_output_size):
+        break
+
+  if not selected_indices:
+    return np.zeros([0], dtype=np.int64)
+  return np.concatenate(selected_indices).astype(np.int64)
+
+
+def _soft_non_max_suppression(boxes, scores, classes, max_output_size,
+                              iou_threshold, score_threshold, soft_nms_sigma):
+  """Soft-NMS with a gaussian score decay, see fast_non_max_suppression.
+
+  Args:
+    boxes: a numpy array with shape [N, 4].
+    scores: a numpy array with shape [N].
+    classes: a numpy integer array with shape [N]. Boxes of different classes
+      don't decay each other's scores.
+    max_output_size: maximum number of selected boxes per class.
+    iou_threshold: boxes with an IOU above this threshold with a selected box
+      of the same class are removed.
+    score_threshold: boxes whose score is not above this threshold are
+      removed.
+    soft_nms_sigma: the sigma of the score decay.
+
+  Returns:
+    selected_indices: a numpy int64 array with the indices of the selected
+      boxes, in the order they were selected.
+    selected_scores: a numpy array with the updated scores of the selected
+      boxes.
+  """
+  scores = np.array(scores, copy=True)
+  if max_output_size == 0:
+    return np.zeros([0], dtype=np.int64), scores[:0]
+  is_valid = scores > score_threshold
+  class_counts = collections.defaultdict(int)
+  selected_indices = []
+  selected_scores = []
+  while np.any(is_valid):
+    i = np.argmax(np.where(is_valid, scores, -np.inf))
+    is_valid[i] = False
+    selected_indices.append(i)
+    selected_scores.append(scores[i])
+
+    same_class = is_valid & (classes == classes[i])
+    class_counts[classes[i]] += 1
+    if class_counts[classes[i]] >= max_output_size:
+      is_valid[same_class] = False
+      continue
+    indices = np.flatnonzero(same_class)
+    ious = np_box_ops.iou(boxes[i:i + 1], boxes[indices])[0]
+    ious = np.nan_to_num(ious)
+    scores[indices] *= np.exp(-0.5 * np.square(ious) / soft_nms_sigma)
+    is_valid[indices] = np.logical_and(ious <= iou_threshold,
+                                       scores[indices] > score_threshold)
+
+  return (np.array(selected_indices, dtype=np.int64),
+          np.array(selected_scores, dtype=scores.dtype))
+
+
 def scale(boxlist, y_scale, x_scale):
   """Scale box coordinates in x and y dimensions.
 
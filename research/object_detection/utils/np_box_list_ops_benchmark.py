@@ -0,0 +1,151 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+r"""Benchmark of the fast non maximum suppression of np_box_list_ops.
+
+Times non_max_suppression and multi_class_non_max_suppression against their
+fast versions on clustered random boxes, and checks that they select the same
+boxes.
+
+Example usage:
+    python object_detection/utils/np_box_list_ops_benchmark.py \
+        --num_boxes=20000 --num_classes=10
+"""
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from object_detection.utils import np_box_list
+from object_detection.utils import np_box_list_ops
+
+flags = tf.app.flags
+flags.DEFINE_integer('num_boxes', 10000, 'Number of boxes per image.')
+flags.DEFINE_integer('num_classes', 10, 'Number of classes for the '
+                     'multi-class non maximum suppression.')
+flags.DEFINE_float('iou_threshold', 0.5, 'IOU threshold.')
+flags.DEFINE_float('score_threshold', 0.05, 'Score threshold.')
+flags.DEFINE_integer('max_output_size', 100, 'Maximum number of selected '
+                     'boxes (per class).')
+flags.DEFINE_float('soft_nms_sigma', 0.5, 'Sigma of the timed Soft-NMS.')
+flags.DEFINE_integer('num_runs', 3, 'Number of timed runs of each function.')
+FLAGS = flags.FLAGS
+
+
+def random_boxlist(num_boxes, num_classes=None, seed=0):
+  """Returns a BoxList of clustered random boxes with random scores.
+
+  Args:
+    num_boxes: number of boxes.
+    num_classes: if not None, the scores have the shape
+      [num_boxes, num_classes] instead of [num_boxes].
+    seed: random seed.
+
+  Returns:
+    a BoxList with a 'scores' field.
+  """
+  rng = np.random.RandomState(seed)
+  centers = rng.uniform(0, 1000, size=[max(num_boxes // 20, 1), 2])
+  centers = centers[rng.randint(0, len(centers), size=num_boxes)]
+  centers += rng.normal(0, 5, size=[num_boxes, 2])
+  sizes = rng.uniform(10, 50, size=[num_boxes, 2])
+  boxlist = np_box_list.BoxList(
+      np.hstack([centers - sizes / 2, centers + sizes / 2]))
+  if num_classes is None:
+    scores_shape = [num_boxes]
+  else:
+    scores_shape = [num_boxes, num_classes]
+  boxlist.add_field('scores', rng.uniform(size=scores_shape))
+  return boxlist
+
+
+def time_function(function, num_runs):
+  """Returns the result of function() and its average time in seconds."""
+  result = function()
+  start = time.time()
+  for _ in range(num_runs):
+    function()
+  return result, (time.time() - start) / num_runs
+
+
+def run_benchmark(num_boxes, num_classes, iou_threshold, score_threshold,
+                  max_output_size, soft_nms_sigma, num_runs):
+  """Times the non maximum suppression functions.
+
+  Args:
+    num_boxes: number of boxes.
+    num_classes: number of classes of the multi-class benchmark.
+    iou_threshold: IOU threshold.
+    score_threshold: score threshold.
+    max_output_size: maximum number of selected boxes (per class).
+    soft_nms_sigma: sigma of the Soft-NMS benchmark.
+    num_runs: number of timed runs of each function.
+
+  Returns:
+    A dictionary mapping the name of each benchmark to its time in seconds.
+
+  Raises:
+    ValueError: if a fast function does not select the same boxes as the
+      function it replaces.
+  """
+  boxlist = random_boxlist(num_boxes)
+  multi_class_boxlist = random_boxlist(num_boxes, num_classes)
+  benchmarks = [
+      ('non_max_suppression', lambda: np_box_list_ops.non_max_suppression(
+          boxlist, max_output_size, iou_threshold, score_threshold)),
+      ('fast_non_max_suppression',
+       lambda: np_box_list_ops.fast_non_max_suppression(
+           boxlist, max_output_size, iou_threshold, score_threshold)),
+      ('multi_class_non_max_suppression',
+       lambda: np_box_list_ops.multi_class_non_max_suppression(
+           multi_class_boxlist, score_threshold, iou_threshold,
+           max_output_size)),
+      ('fast_multi_class_non_max_suppression',
+       lambda: np_box_list_ops.fast_multi_class_non_max_suppression(
+           multi_class_boxlist, score_threshold, iou_threshold,
+           max_output_size)),
+      ('fast_non_max_suppression (soft)',
+       lambda: np_box_list_ops.fast_non_max_suppression(
+           boxlist, max_output_size, iou_threshold, score_threshold,
+           soft_nms_sigma=soft_nms_sigma)),
+  ]
+  results = {}
+  times = {}
+  for name, function in benchmarks:
+    results[name], times[name] = time_function(function, num_runs)
+
+  for name in ['non_max_suppression', 'multi_class_non_max_suppression']:
+    expected, actual = results[name], results['fast_' + name]
+    if not (np.array_equal(expected.get(), actual.get()) and
+            np.array_equal(expected.get_field('scores'),
+                           actual.get_field('scores'))):
+      raise ValueError('fast_%s selected different boxes.' % name)
+  return times
+
+
+def main(_):
+  times = run_benchmark(FLAGS.num_boxes, FLAGS.num_classes,
+                        FLAGS.iou_threshold, FLAGS.score_threshold,
+                        FLAGS.max_output_size, FLAGS.soft_nms_sigma,
+                        FLAGS.num_runs)
+  for name in sorted(times):
+    tf.logging.info('%-40s %8.1f ms', name, 1000 * times[name])
+  for name in ['non_max_suppression', 'multi_class_non_max_suppression']:
+    tf.logging.info('Speedup of fast_%s: %.1fx', name,
+                    times[name] / max(times['fast_' + name], 1e-9))
+
+
+if __name__ == '__main__':
+  tf.logging.set_verbosity(tf.logging.INFO)
+  tf.app.run()
@@ -15,6 +15,8 @@
 
 """Tests for object_detection.utils.np_box_list_ops."""
 
+import itertools
+
 import numpy as np
 import tensorflow as tf
 
@@ -410,5 +412,148 @@ class NonMaximumSuppressionTest(tf.test.TestCase):
     self.assertAllClose(boxes, expected_boxes)
 
 
+def _random_boxlist(num_boxes, num_classes=None, seed=0, degenerate=False):
+  """Returns a BoxList of clustered random boxes with random scores.
+
+  Args:
+    num_boxes: the number of boxes.
+    num_classes: the number of columns of the scores, or None for a vector.
+    seed: the seed of the random boxes.
+    degenerate: whether a third of the heights and widths are zero, so that
+      the IOU of two zero area boxes is NaN.
+  """
+  rng = np.random.RandomState(seed)
+  centers = rng.uniform(0, 100, size=[max(num_boxes // 10, 1), 2])
+  centers = centers[rng.randint(0, len(centers), size=num_boxes)]
+  centers += rng.normal(0, 2, size=[num_boxes, 2])
+  sizes = rng.uniform(5, 20, size=[num_boxes, 2])
+  if degenerate:
+    sizes[rng.uniform(size=sizes.shape) < 1. / 3] = 0
+  boxlist = np_box_list.BoxList(
+      np.hstack([centers - sizes / 2, centers + sizes / 2]))
+  scores_shape = [num_boxes] if num_classes is None else [num_boxes,
+                                                          num_classes]
+  boxlist.add_field('scores', rng.uniform(size=scores_shape))
+  return boxlist
+
+
+class FastNonMaximumSuppressionTest(tf.test.TestCase):
+
+  def test_fast_nms_matches_nms(self):
+    for seed, degenerate in itertools.product(range(3), [False, True]):
+      boxlist = _random_boxlist(300, seed=seed, degenerate=degenerate)
+      boxlist.add_field('labels', np.arange(300))
+      for iou_threshold in [0.0, 0.3, 0.7, 1.0]:
+        for max_output_size in [1, 20, 1000]:
+          expected = np_box_list_ops.non_max_suppression(
+              boxlist, max_output_size, iou_threshold, score_threshold=0.2)
+          for tile_size in [7, 512]:
+            nms_boxlist = np_box_list_ops.fast_non_max_suppression(
+                boxlist, max_output_size, iou_threshold, score_threshold=0.2,
+                tile_size=tile_size)
+            self.assertAllEqual(expected.get(), nms_boxlist.get())
+            self.assertAllEqual(expected.get_field('labels'),
+                                nms_boxlist.get_field('labels'))
+
+  def test_fast_nms_with_identical_boxes(self):
+    boxlist = np_box_list.BoxList(np.array(10 * [[0, 0, 1, 1]], dtype=float))
+    boxlist.add_field('scores', np.array(10 * [0.8]))
+    nms_boxlist = np_box_list_ops.fast_non_max_suppression(boxlist, 3, .5)
+    self.assertAllClose(nms_boxlist.get(), np.array([[0, 0, 1, 1]]))
+
+  def test_fast_multi_class_nms_matches_multi_class_nms(self):
+    for seed, degenerate in itertools.product(range(3), [False, True]):
+      boxlist = _random_boxlist(200, num_classes=4, seed=seed,
+                                degenerate=degenerate)
+      for iou_thresh in [0.0, 0.5, 1.0]:
+        for max_output_size in [1, 10, 1000]:
+          expected = np_box_list_ops.multi_class_non_max_suppression(
+              boxlist, 0.3, iou_thresh, max_output_size)
+          for tile_size in [16, 512]:
+            nms_boxlist = np_box_list_ops.fast_multi_class_non_max_suppression(
+                boxlist, 0.3, iou_thresh, max_output_size, tile_size=tile_size)
+            self.assertAllEqual(expected.get(), nms_boxlist.get())
+            self.assertAllEqual(expected.get_field('scores'),
+                                nms_boxlist.get_field('scores'))
+            self.assertAllEqual(expected.get_field('classes'),
+                                nms_boxlist.get_field('classes'))
+
+  def test_fast_multi_class_nms_with_tied_scores(self):
+    boxlist = np_box_list.BoxList(np.array(
+        [[0, 0, 1, 1], [0, 0, 1, 1.2], [5, 5, 6, 6]], dtype=float))
+    boxlist.add_field('scores', np.array([[.5], [.5], [.9]]))
+    nms_boxlist = np_box_list_ops.fast_multi_class_non_max_suppression(
+        boxlist, 0.1, 0.5, 10)
+    # Like sort_by_field, the later of two boxes with tied scores comes first.
+    self.assertAllEqual(nms_boxlist.get(),
+                        np.array([[5, 5, 6, 6], [0, 0, 1, 1.2]]))
+
+    for seed in range(10):
+      random_boxlist = _random_boxlist(100, num_classes=3, seed=seed)
+      boxlist = np_box_list.BoxList(random_boxlist.get())
+      boxlist.add_field(
+          'scores', np.round(random_boxlist.get_field('scores'), 1))
+      for iou_thresh in [0.3, 0.7]:
+        expected = np_box_list_ops.multi_class_non_max_suppression(
+            boxlist, 0.2, iou_thresh, 10)
+        nms_boxlist = np_box_list_ops.fast_multi_class_non_max_suppression(
+            boxlist, 0.2, iou_thresh, 10, tile_size=16)
+        self.assertAllEqual(expected.get(), nms_boxlist.get())
+        self.assertAllEqual(expected.get_field('classes'),
+                            nms_boxlist.get_field('classes'))
+
+  def test_fast_multi_class_nms_with_rank_1_scores(self):
+    boxlist = _random_boxlist(100)
+    expected = np_box_list_ops.multi_class_non_max_suppression(
+        boxlist, 0.1, 0.5, 20)
+    nms_boxlist = np_box_list_ops.fast_multi_class_non_max_suppression(
+        boxlist, 0.1, 0.5, 20)
+    self.assertAllEqual(expected.get(), nms_boxlist.get())
+    self.assertAllEqual(expected.get_field('classes'),
+                        nms_boxlist.get_field('classes'))
+
+  def test_soft_nms(self):
+    boxlist = np_box_list.BoxList(np.array(
+        [[0, 0, 10, 10], [0, 5, 10, 15], [0, 1, 10, 11], [0, 50, 10, 60]],
+        dtype=float))
+    boxlist.add_field('scores', np.array([0.9, 0.8, 0.7, 0.6]))
+    nms_boxlist = np_box_list_ops.fast_non_max_suppression(
+        boxlist, iou_threshold=0.8, score_threshold=0.3, soft_nms_sigma=0.5)
+
+    # The third box is removed by the IOU threshold, and the score of the
+    # second box decays with its IOU of 1/3 with the first box.
+    self.assertAllClose(nms_boxlist.get(), np.array(
+        [[0, 0, 10, 10], [0, 5, 10, 15], [0, 50, 10, 60]]))
+    self.assertAllClose(nms_boxlist.get_field('scores'), np.array(
+        [0.9, 0.8 * np.exp(-1. / 9), 0.6]))
+
+  def test_soft_nms_removes_decayed_boxes(self):
+    boxlist = np_box_list.BoxList(np.array(
+        [[0, 0, 10, 10], [0, 1, 10, 11], [0, 50, 10, 60]], dtype=float))
+    boxlist.add_field('scores', np.array([0.9, 0.8, 0.5]))
+    nms_boxlist = np_box_list_ops.fast_non_max_suppression(
+        boxlist, iou_threshold=1.0, score_threshold=0.3, soft_nms_sigma=0.1)
+    self.assertAllClose(nms_boxlist.get(), np.array(
+        [[0, 0, 10, 10], [0, 50, 10, 60]]))
+
+  def test_soft_nms_with_zero_max_output_size(self):
+    boxlist = _random_boxlist(10)
+    nms_boxlist = np_box_list_ops.fast_non_max_suppression(
+        boxlist, max_output_size=0, iou_threshold=0.5, soft_nms_sigma=0.5)
+    self.assertEqual(0, nms_boxlist.num_boxes())
+
+  def test_multi_class_soft_nms(self):
+    boxlist = np_box_list.BoxList(np.array(
+        [[0, 0, 10, 10], [0, 5, 10, 15]], dtype=float))
+    boxlist.add_field('scores', np.array([[0.9, 0.1], [0.8, 0.7]]))
+    nms_boxlist = np_box_list_ops.fast_multi_class_non_max_suppression(
+        boxlist, 0.3, 0.8, 10, soft_nms_sigma=0.5)
+    # Only the score of the box of the same class decays.
+    self.assertAllClose(nms_boxlist.get_field('scores'),
+                        np.array([0.9, 0.8 * np.exp(-1. / 9), 0.7]))
+    self.assertAllClose(nms_boxlist.get_field('classes'),
+                        np.array([0, 0, 1]))
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -18,11 +18,22 @@
 Example mask operations that are supported:
   * Areas: compute mask areas
   * IOU: pairwise intersection-over-union scores
+
+Masks can also be stored bit-packed, as uint8 arrays of shape
+[N, ceil(height * width / 8)] holding 8 pixels per byte, see pack_masks.
 """
 import numpy as np
 
 EPSILON = 1e-7
 
+# The maximum number of mask pixels that are converted to float32 at once when
+# computing intersections, i.e. 4MB. Small chunks stay in the CPU caches.
+_MAX_CHUNK_PIXELS = 1 << 20
+
+# The number of ones in the binary representation of each byte.
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)],
+                           dtype=np.uint8)
+
 
 def area(masks):
   """Computes area of masks.
@@ -59,13 +70,106 @@ def intersection(masks1, masks2):
   """
   if masks1.dtype != np.uint8 or masks2.dtype != np.uint8:
     raise ValueError('masks1 and masks2 should be of type np.uint8')
-  n = masks1.shape[0]
-  m = masks2.shape[0]
-  answer = np.zeros([n, m], dtype=np.float32)
-  for i in np.arange(n):
-    for j in np.arange(m):
-      answer[i, j] = np.sum(np.minimum(masks1[i], masks2[j]), dtype=np.float32)
-  return answer
+  return _intersection_of_rows(
+      _flatten_masks(masks1), _flatten_masks(masks2),
+      lambda columns: columns, pixels_per_column=1)
+
+
+def pack_masks(masks):
+  """Packs the pixels of masks into bits.
+
+  Args:
+    masks: a numpy array with shape [N, height, width] holding N masks. Masks
+      values are of type np.uint8 and values are in {0,1}.
+
+  Returns:
+    a uint8 numpy array with shape [N, ceil(height * width / 8)].
+
+  Raises:
+    ValueError: If masks is not of type np.uint8.
+  """
+  if masks.dtype != np.uint8:
+    raise ValueError('Masks type should be np.uint8')
+  return np.packbits(_flatten_masks(masks), axis=1)
+
+
+def unpack_masks(packed_masks, height, width):
+  """Unpacks masks packed by pack_masks.
+
+  Args:
+    packed_masks: a uint8 numpy array with shape [N, ceil(height * width / 8)].
+    height: the height of the masks.
+    width: the width of the masks.
+
+  Returns:
+    a uint8 numpy array with shape [N, height, width] and values in {0,1}.
+  """
+  masks = np.unpackbits(packed_masks, axis=1)[:, :height * width]
+  return np.reshape(masks, [packed_masks.shape[0], height, width])
+
+
+def packed_area(packed_masks):
+  """Computes area of bit-packed masks.
+
+  Args:
+    packed_masks: a uint8 numpy array with shape [N, num_bytes], see
+      pack_masks.
+
+  Returns:
+    a numpy array with shape [N*1] representing mask areas.
+  """
+  return np.sum(_POPCOUNT_TABLE[packed_masks], axis=1, dtype=np.float32)
+
+
+def packed_intersection(packed_masks1, packed_masks2):
+  """Compute pairwise intersection areas between bit-packed masks.
+
+  Args:
+    packed_masks1: a uint8 numpy array with shape [N, num_bytes], see
+      pack_masks.
+    packed_masks2: a uint8 numpy array with shape [M, num_bytes].
+
+  Returns:
+    a numpy array with shape [N*M] representing pairwise intersection area.
+  """
+  return _intersection_of_rows(
+      packed_masks1, packed_masks2,
+      lambda columns: np.unpackbits(columns, axis=1), pixels_per_column=8)
+
+
+def _flatten_masks(masks):
+  """Reshapes [N, height, width] masks to [N, height * width]."""
+  return np.reshape(masks, [masks.shape[0], masks.shape[1] * masks.shape[2]])
+
+
+def _intersection_of_rows(rows1, rows2, unpack_fn, pixels_per_column):
+  """Computes the pairwise intersections of masks as a matrix product.
+
+  The pixels are processed in chunks, so that only a chunk of the masks is
+  converted to float32 at a time. The product of each chunk is exact, since
+  it sums less than 2^24 ones, and the chunks are added in float64.
+
+  Args:
+    rows1: a numpy array with shape [N, num_columns] holding the flattened
+      masks, or the packed masks.
+    rows2: a numpy array with shape [M, num_columns].
+    unpack_fn: a function that maps a [K, num_chunk_columns] array of columns
+      of rows1 or rows2 to the [K, num_chunk_pixels] uint8 pixels of the masks.
+    pixels_per_column: the number of mask pixels in each column of the rows.
+
+  Returns:
+    a float32 numpy array with shape [N, M].
+  """
+  n, m = rows1.shape[0], rows2.shape[0]
+  answer = np.zeros([n, m], dtype=np.float64)
+  num_columns = rows1.shape[1]
+  chunk_size = max(
+      _MAX_CHUNK_PIXELS // (max(n + m, 1) * pixels_per_column), 1)
+  for start in range(0, num_columns, chunk_size):
+    chunk1 = unpack_fn(rows1[:, start:start + chunk_size]).astype(np.float32)
+    chunk2 = unpack_fn(rows2[:, start:start + chunk_size]).astype(np.float32)
+    answer += np.dot(chunk1, chunk2.T)
+  return answer.astype(np.float32)
 
 
 def iou(masks1, masks2):
@@ -93,6 +197,25 @@ def iou(masks1, masks2):
   return intersect / np.maximum(union, EPSILON)
 
 
+def packed_iou(packed_masks1, packed_masks2):
+  """Computes pairwise intersection-over-union between bit-packed masks.
+
+  Args:
+    packed_masks1: a uint8 numpy array with shape [N, num_bytes], see
+      pack_masks.
+    packed_masks2: a uint8 numpy array with shape [M, num_bytes].
+
+  Returns:
+    a numpy array with shape [N, M] representing pairwise iou scores.
+  """
+  intersect = packed_intersection(packed_masks1, packed_masks2)
+  area1 = packed_area(packed_masks1)
+  area2 = packed_area(packed_masks2)
+  union = np.expand_dims(area1, axis=1) + np.expand_dims(
+      area2, axis=0) - intersect
+  return intersect / np.maximum(union, EPSILON)
+
+
 def ioa(masks1, masks2):
   """Computes pairwise intersection-over-area between box collections.
 
@@ -84,5 +84,65 @@ class MaskOpsTests(tf.test.TestCase):
     self.assertAllClose(ioa21, expected_ioa21)
 
 
+class PackedMaskOpsTests(tf.test.TestCase):
+
+  def setUp(self):
+    rng = np.random.RandomState(0)
+    # A number of pixels which is not a multiple of 8.
+    self.masks1 = (rng.uniform(size=[4, 13, 7]) < 0.4).astype(np.uint8)
+    self.masks2 = (rng.uniform(size=[5, 13, 7]) < 0.6).astype(np.uint8)
+
+  def _loop_intersection(self, masks1, masks2):
+    return np.array([[np.sum(np.minimum(mask1, mask2)) for mask2 in masks2]
+                     for mask1 in masks1], dtype=np.float32)
+
+  def testIntersectionMatchesLoop(self):
+    self.assertAllEqual(
+        self._loop_intersection(self.masks1, self.masks2),
+        np_mask_ops.intersection(self.masks1, self.masks2))
+
+  def testIntersectionInChunks(self):
+    max_chunk_pixels = np_mask_ops._MAX_CHUNK_PIXELS
+    np_mask_ops._MAX_CHUNK_PIXELS = 20
+    try:
+      self.assertAllEqual(
+          self._loop_intersection(self.masks1, self.masks2),
+          np_mask_ops.intersection(self.masks1, self.masks2))
+      self.assertAllEqual(
+          self._loop_intersection(self.masks1, self.masks2),
+          np_mask_ops.packed_intersection(
+              np_mask_ops.pack_masks(self.masks1),
+              np_mask_ops.pack_masks(self.masks2)))
+    finally:
+      np_mask_ops._MAX_CHUNK_PIXELS = max_chunk_pixels
+
+  def testIntersectionOfNoMasks(self):
+    self.assertEqual((0, 5), np_mask_ops.intersection(
+        self.masks1[:0], self.masks2).shape)
+
+  def testPackAndUnpackMasks(self):
+    packed_masks = np_mask_ops.pack_masks(self.masks1)
+    self.assertEqual((4, 12), packed_masks.shape)
+    self.assertAllEqual(self.masks1,
+                        np_mask_ops.unpack_masks(packed_masks, 13, 7))
+
+  def testPackedArea(self):
+    self.assertAllEqual(
+        np_mask_ops.area(self.masks1),
+        np_mask_ops.packed_area(np_mask_ops.pack_masks(self.masks1)))
+
+  def testPackedIntersection(self):
+    self.assertAllEqual(
+        np_mask_ops.intersection(self.masks1, self.masks2),
+        np_mask_ops.packed_intersection(np_mask_ops.pack_masks(self.masks1),
+                                        np_mask_ops.pack_masks(self.masks2)))
+
+  def testPackedIOU(self):
+    self.assertAllClose(
+        np_mask_ops.iou(self.masks1, self.masks2),
+        np_mask_ops.packed_iou(np_mask_ops.pack_masks(self.masks1),
+                               np_mask_ops.pack_masks(self.masks2)))
+
+
 if __name__ == '__main__':
   tf.test.main()
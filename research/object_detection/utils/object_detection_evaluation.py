@@ -23,6 +23,8 @@ It supports the following operations:
 3) Evaluate detection metrics on already inserted detection results.
 4) Write evaluation result into a pickle file for future processing or
    visualization.
+5) Merge evaluations of disjoint sets of images, e.g. to evaluate shards of
+   the images in parallel with add_images_in_parallel.
 
 Note: This module operates on numpy boxes and box lists.
 """
@@ -31,11 +33,13 @@ from abc import ABCMeta
 from abc import abstractmethod
 import collections
 import logging
+import multiprocessing
 import numpy as np
 
 from object_detection.core import standard_fields
 from object_detection.utils import label_map_util
 from object_detection.utils import metrics
+from object_detection.utils import np_mask_ops
 from object_detection.utils import per_image_evaluation
 
 
@@ -100,6 +104,16 @@ class DetectionEvaluator(object):
     """Clears the state to prepare for a fresh evaluation."""
     pass
 
+  def merge(self, other):
+    """Merges the images added to another evaluator into this evaluator.
+
+    Args:
+      other: An evaluator of the same class and configuration, to which
+        disjoint images were added.
+    """
+    raise NotImplementedError(
+        '{} does not support merging.'.format(type(self).__name__))
+
 
 class ObjectDetectionEvaluator(DetectionEvaluator):
   """A class to evaluate detections."""
@@ -309,6 +323,25 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
         label_id_offset=self._label_id_offset)
     self._image_ids.clear()
 
+  def merge(self, other):
+    """Merges the images added to another evaluator into this evaluator.
+
+    The result is the same as if the images of other had been added to this
+    evaluator after its own images.
+
+    Args:
+      other: An evaluator of the same class and configuration, to which
+        disjoint images were added.
+
+    Raises:
+      ValueError: If an image was added to both evaluators.
+    """
+    if not self._image_ids.isdisjoint(other._image_ids):
+      raise ValueError('Images with ids {} were added to both evaluators.'
+                       .format(sorted(self._image_ids & other._image_ids)))
+    self._evaluation.merge(other._evaluation)
+    self._image_ids.update(other._image_ids)
+
 
 class PascalDetectionEvaluator(ObjectDetectionEvaluator):
   """A class to evaluate detections using PASCAL metrics."""
@@ -592,6 +625,16 @@ class OpenImagesDetectionChallengeEvaluator(OpenImagesDetectionEvaluator):
     super(OpenImagesDetectionChallengeEvaluator, self).clear()
     self._evaluatable_labels.clear()
 
+  def merge(self, other):
+    """Merges the images added to another evaluator into this evaluator.
+
+    Args:
+      other: An OpenImagesDetectionChallengeEvaluator, to which disjoint images
+        were added.
+    """
+    super(OpenImagesDetectionChallengeEvaluator, self).merge(other)
+    self._evaluatable_labels.update(other._evaluatable_labels)
+
 
 ObjectDetectionEvalMetrics = collections.namedtuple(
     'ObjectDetectionEvalMetrics', [
@@ -599,6 +642,11 @@ ObjectDetectionEvalMetrics = collections.namedtuple(
         'mean_corloc'
     ])
 
+# Groundtruth masks stored with np_mask_ops.pack_masks, which take an eighth of
+# the memory of the uint8 masks, with the [height, width] shape of the masks.
+_PackedMasks = collections.namedtuple('_PackedMasks',
+                                      ['packed_masks', 'shape'])
+
 
 class ObjectDetectionEvaluation(object):
   """Internal implementation of Pascal object detection metrics."""
@@ -673,7 +721,8 @@ class ObjectDetectionEvaluation(object):
           the case that no boxes are groups-of, it is by default set as None.
       groundtruth_masks: uint8 numpy array of shape
         [num_boxes, height, width] containing `num_boxes` groundtruth masks.
-        The mask values range from 0 to 1.
+        The mask values range from 0 to 1. They are kept bit-packed until the
+        detections of the image are added.
     """
     if image_key in self.groundtruth_boxes:
       logging.warn(
@@ -683,6 +732,10 @@ class ObjectDetectionEvaluation(object):
 
     self.groundtruth_boxes[image_key] = groundtruth_boxes
     self.groundtruth_class_labels[image_key] = groundtruth_class_labels
+    if groundtruth_masks is not None and groundtruth_masks.dtype == np.uint8:
+      groundtruth_masks = _PackedMasks(
+          np_mask_ops.pack_masks(groundtruth_masks),
+          groundtruth_masks.shape[1:])
     self.groundtruth_masks[image_key] = groundtruth_masks
     if groundtruth_is_difficult_list is None:
       num_boxes = groundtruth_boxes.shape[0]
@@ -743,6 +796,9 @@ class ObjectDetectionEvaluation(object):
       # to keep all masks in memory which can cause memory overflow.
       groundtruth_masks = self.groundtruth_masks.pop(
           image_key)
+      if isinstance(groundtruth_masks, _PackedMasks):
+        groundtruth_masks = np_mask_ops.unpack_masks(
+            groundtruth_masks.packed_masks, *groundtruth_masks.shape)
       groundtruth_is_difficult_list = self.groundtruth_is_difficult_list[
           image_key]
       groundtruth_is_group_of_list = self.groundtruth_is_group_of_list[
@@ -775,6 +831,49 @@ class ObjectDetectionEvaluation(object):
     (self.num_images_correctly_detected_per_class
     ) += is_class_correctly_detected_in_image
 
+  def merge(self, other):
+    """Merges the images added to another evaluation into this evaluation.
+
+    The groundtruth and the per image matching results of other are appended
+    to the ones of this evaluation, so evaluate() returns the same metrics as
+    if all the images had been added to this evaluation, in this order.
+    Evaluations can be pickled, so they can be computed in other processes.
+
+    Args:
+      other: An ObjectDetectionEvaluation with the same number of classes, to
+        which disjoint images were added.
+
+    Raises:
+      ValueError: If the number of classes differ, or if an image was added to
+        both evaluations.
+    """
+    if other.num_class != self.num_class:
+      raise ValueError('Cannot merge evaluations of {} and {} classes.'.format(
+          self.num_class, other.num_class))
+    common_keys = (set(self.groundtruth_boxes) & set(other.groundtruth_boxes) |
+                   self.detection_keys & other.detection_keys)
+    if common_keys:
+      raise ValueError('Images {} were added to both evaluations.'.format(
+          sorted(common_keys)))
+
+    self.groundtruth_boxes.update(other.groundtruth_boxes)
+    self.groundtruth_class_labels.update(other.groundtruth_class_labels)
+    self.groundtruth_masks.update(other.groundtruth_masks)
+    self.groundtruth_is_difficult_list.update(
+        other.groundtruth_is_difficult_list)
+    self.groundtruth_is_group_of_list.update(other.groundtruth_is_group_of_list)
+    self.num_gt_instances_per_class += other.num_gt_instances_per_class
+    self.num_gt_imgs_per_class += other.num_gt_imgs_per_class
+
+    self.detection_keys.update(other.detection_keys)
+    for class_index in range(self.num_class):
+      self.scores_per_class[class_index].extend(
+          other.scores_per_class[class_index])
+      self.tp_fp_labels_per_class[class_index].extend(
+          other.tp_fp_labels_per_class[class_index])
+    self.num_images_correctly_detected_per_class += (
+        other.num_images_correctly_detected_per_class)
+
   def _update_ground_truth_statistics(self, groundtruth_class_labels,
                                       groundtruth_is_difficult_list,
                                       groundtruth_is_group_of_list):
@@ -861,3 +960,60 @@ class ObjectDetectionEvaluation(object):
     return ObjectDetectionEvalMetrics(
         self.average_precision_per_class, mean_ap, self.precisions_per_class,
         self.recalls_per_class, self.corloc_per_class, mean_corloc)
+
+
+def _evaluate_shard(evaluator_fn_and_image_infos):
+  """Returns an evaluator to which a shard of images was added."""
+  evaluator_fn, image_infos = evaluator_fn_and_image_infos
+  evaluator = evaluator_fn()
+  for image_id, groundtruth_dict, detections_dict in image_infos:
+    evaluator.add_single_ground_truth_image_info(image_id, groundtruth_dict)
+    evaluator.add_single_detected_image_info(image_id, detections_dict)
+  return evaluator
+
+
+def add_images_in_parallel(evaluator_fn, image_infos, num_workers=None,
+                           num_shards=None):
+  """Adds images to evaluators in a pool of processes and merges them.
+
+  The images are split into contiguous shards. Each shard is added to a new
+  evaluator in a worker process, and the evaluators are merged in the order
+  of the shards, so the merged evaluator returns the same metrics as an
+  evaluator to which all the images are added in order.
+
+  Example usage:
+    evaluator = add_images_in_parallel(
+        functools.partial(PascalDetectionEvaluator, categories), image_infos)
+    metrics = evaluator.evaluate()
+
+  Args:
+    evaluator_fn: A picklable function, e.g. a functools.partial of an
+      evaluator class, which takes no arguments and returns a new
+      DetectionEvaluator which supports merge().
+    image_infos: A sequence of (image_id, groundtruth_dict, detections_dict)
+      tuples, see DetectionEvaluator.add_single_ground_truth_image_info and
+      DetectionEvaluator.add_single_detected_image_info.
+    num_workers: The number of worker processes, the number of CPUs by default.
+      If 1, the images are added in this process.
+    num_shards: The number of shards, 4 * num_workers by default, so that the
+      workers stay busy if some shards take longer.
+
+  Returns:
+    The evaluator with all the images added.
+  """
+  num_workers = num_workers or multiprocessing.cpu_count()
+  if num_workers == 1:
+    return _evaluate_shard((evaluator_fn, image_infos))
+  num_shards = max(min(num_shards or 4 * num_workers, len(image_infos)), 1)
+  shard_bounds = np.linspace(0, len(image_infos), num_shards + 1).astype(int)
+  shards = [(evaluator_fn, image_infos[start:end])
+            for start, end in zip(shard_bounds[:-1], shard_bounds[1:])]
+  pool = multiprocessing.Pool(num_workers)
+  try:
+    evaluators = pool.imap(_evaluate_shard, shards)
+    evaluator = next(evaluators)
+    for shard_evaluator in evaluators:
+      evaluator.merge(shard_evaluator)
+  finally:
+    pool.terminate()
+  return evaluator
@@ -15,6 +15,8 @@
 
 """Tests for object_detection.utils.object_detection_evaluation."""
 
+import functools
+
 import numpy as np
 import tensorflow as tf
 
@@ -683,5 +685,102 @@ class ObjectDetectionEvaluationTest(tf.test.TestCase):
     self.assertAlmostEqual(expected_mean_corloc, mean_corloc)
 
 
+class ParallelEvaluationTest(tf.test.TestCase):
+
+  def setUp(self):
+    self.categories = [{'id': 1, 'name': 'cat'}, {'id': 2, 'name': 'dog'},
+                       {'id': 3, 'name': 'elephant'}]
+    rng = np.random.RandomState(0)
+    self.image_infos = []
+    for image_id in range(30):
+      groundtruth_boxes = self._random_boxes(rng, rng.randint(0, 4))
+      num_groundtruth = len(groundtruth_boxes)
+      num_detections = rng.randint(0, 6)
+      detection_boxes = np.concatenate(
+          [groundtruth_boxes + rng.normal(0, 2, size=[num_groundtruth, 4]),
+           self._random_boxes(rng, num_detections)]).astype(np.float32)
+      groundtruth_dict = {
+          standard_fields.InputDataFields.groundtruth_boxes:
+              groundtruth_boxes,
+          standard_fields.InputDataFields.groundtruth_classes:
+              rng.randint(1, 4, size=num_groundtruth),
+          standard_fields.InputDataFields.groundtruth_difficult:
+              rng.uniform(size=num_groundtruth) < 0.2,
+          standard_fields.InputDataFields.groundtruth_group_of:
+              rng.uniform(size=num_groundtruth) < 0.2,
+      }
+      detections_dict = {
+          standard_fields.DetectionResultFields.detection_boxes:
+              detection_boxes,
+          # Rounded scores, so that detections of different shards have the
+          # same scores.
+          standard_fields.DetectionResultFields.detection_scores:
+              np.round(rng.uniform(size=len(detection_boxes)), 1),
+          standard_fields.DetectionResultFields.detection_classes:
+              rng.randint(1, 4, size=len(detection_boxes)),
+      }
+      self.image_infos.append((image_id, groundtruth_dict, detections_dict))
+
+  def _random_boxes(self, rng, num_boxes):
+    corners = rng.uniform(0, 100, size=[num_boxes, 2])
+    sizes = rng.uniform(10, 50, size=[num_boxes, 2])
+    return np.hstack([corners, corners + sizes]).astype(np.float32)
+
+  def _assert_same_metrics_in_parallel(self, evaluator_fn):
+    expected_metrics = object_detection_evaluation.add_images_in_parallel(
+        evaluator_fn, self.image_infos, num_workers=1).evaluate()
+    metrics = object_detection_evaluation.add_images_in_parallel(
+        evaluator_fn, self.image_infos, num_workers=2, num_shards=7).evaluate()
+    self.assertItemsEqual(expected_metrics.keys(), metrics.keys())
+    for key in expected_metrics:
+      self.assertAllEqual(expected_metrics[key], metrics[key])
+
+  def test_pascal_evaluator(self):
+    self._assert_same_metrics_in_parallel(functools.partial(
+        object_detection_evaluation.ObjectDetectionEvaluator,
+        self.categories, evaluate_corlocs=True))
+
+  def test_weighted_pascal_evaluator(self):
+    self._assert_same_metrics_in_parallel(functools.partial(
+        object_detection_evaluation.WeightedPascalDetectionEvaluator,
+        self.categories))
+
+  def test_open_images_challenge_evaluator(self):
+    self._assert_same_metrics_in_parallel(functools.partial(
+        object_detection_evaluation.OpenImagesDetectionChallengeEvaluator,
+        self.categories, evaluate_corlocs=True))
+
+  def test_merge(self):
+    evaluator = object_detection_evaluation.PascalDetectionEvaluator(
+        self.categories)
+    other_evaluator = object_detection_evaluation.PascalDetectionEvaluator(
+        self.categories)
+    for image_id, groundtruth_dict, detections_dict in self.image_infos:
+      if image_id < 10:
+        evaluator.add_single_ground_truth_image_info(image_id, groundtruth_dict)
+        evaluator.add_single_detected_image_info(image_id, detections_dict)
+      else:
+        other_evaluator.add_single_ground_truth_image_info(
+            image_id, groundtruth_dict)
+        other_evaluator.add_single_detected_image_info(
+            image_id, detections_dict)
+    evaluator.merge(other_evaluator)
+    expected_metrics = object_detection_evaluation.add_images_in_parallel(
+        functools.partial(object_detection_evaluation.PascalDetectionEvaluator,
+                          self.categories),
+        self.image_infos, num_workers=1).evaluate()
+    self.assertEqual(expected_metrics, evaluator.evaluate())
+
+  def test_value_error_on_merging_duplicate_images(self):
+    evaluator_fn = functools.partial(
+        object_detection_evaluation.PascalDetectionEvaluator, self.categories)
+    evaluator = object_detection_evaluation.add_images_in_parallel(
+        evaluator_fn, self.image_infos[:10], num_workers=1)
+    other_evaluator = object_detection_evaluation.add_images_in_parallel(
+        evaluator_fn, self.image_infos[5:15], num_workers=1)
+    with self.assertRaises(ValueError):
+      evaluator.merge(other_evaluator)
+
+
 if __name__ == '__main__':
   tf.test.main()
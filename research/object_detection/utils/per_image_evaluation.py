@@ -26,6 +26,7 @@ from object_detection.utils import np_box_list
 from object_detection.utils import np_box_list_ops
 from object_detection.utils import np_box_mask_list
 from object_detection.utils import np_box_mask_list_ops
+from object_detection.utils import np_box_ops
 
 
 class PerImageEvaluation(object):
@@ -66,6 +67,10 @@ class PerImageEvaluation(object):
      2. Detections that are determined as false positives are matched against
         group-of boxes and weighted if matched.
 
+    Boxes are evaluated for all the classes at once when non maximum
+    suppression is disabled (nms_iou_threshold is 1.0), and class by class
+    otherwise, with the same results.
+
     Args:
       detected_boxes: A float numpy array of shape [N, 4], representing N
           regions of detected object regions.
@@ -102,6 +107,17 @@ class PerImageEvaluation(object):
     detected_boxes, detected_scores, detected_class_labels, detected_masks = (
         self._remove_invalid_boxes(detected_boxes, detected_scores,
                                    detected_class_labels, detected_masks))
+    if (detected_masks is None and groundtruth_masks is None and
+        self.nms_iou_threshold == 1.0):
+      return self._compute_tp_fp_and_cor_loc_box_mode(
+          detected_boxes=detected_boxes,
+          detected_scores=detected_scores,
+          detected_class_labels=detected_class_labels,
+          groundtruth_boxes=groundtruth_boxes,
+          groundtruth_class_labels=groundtruth_class_labels,
+          groundtruth_is_difficult_list=groundtruth_is_difficult_list,
+          groundtruth_is_group_of_list=groundtruth_is_group_of_list)
+
     scores, tp_fp_labels = self._compute_tp_fp(
         detected_boxes=detected_boxes,
         detected_scores=detected_scores,
@@ -303,6 +319,157 @@ class PerImageEvaluation(object):
       result_tp_fp_labels.append(tp_fp_labels)
     return result_scores, result_tp_fp_labels
 
+  def _compute_tp_fp_and_cor_loc_box_mode(
+      self, detected_boxes, detected_scores, detected_class_labels,
+      groundtruth_boxes, groundtruth_class_labels,
+      groundtruth_is_difficult_list, groundtruth_is_group_of_list):
+    """Evaluates the detected boxes of an image for all classes at once.
+
+    Computes the same results as _compute_tp_fp and _compute_cor_loc without
+    masks and without non maximum suppression: the detections are sorted once
+    by class and decreasing score, the overlaps of all detections with all
+    groundtruth boxes are computed once, and the overlaps between different
+    classes are masked out. Greedy matching only depends on the highest
+    overlap of each detection, so the true positives are the first detections
+    of each class matched to each groundtruth box, which is computed without
+    visiting the detections one by one.
+
+    Args:
+      detected_boxes: A float numpy array of shape [N, 4], representing N
+          regions of detected object regions.
+          Each row is of the format [y_min, x_min, y_max, x_max]
+      detected_scores: A float numpy array of shape [N, 1], representing
+          the confidence scores of the detected N object instances.
+      detected_class_labels: A integer numpy array of shape [N, 1], repreneting
+          the class labels of the detected N object instances.
+      groundtruth_boxes: A float numpy array of shape [M, 4], representing M
+          regions of object instances in ground truth
+      groundtruth_class_labels: An integer numpy array of shape [M, 1],
+          representing M class labels of object instances in ground truth
+      groundtruth_is_difficult_list: A boolean numpy array of length M denoting
+          whether a ground truth box is a difficult instance or not
+      groundtruth_is_group_of_list: A boolean numpy array of length M denoting
+          whether a ground truth box has group-of tag
+
+    Returns:
+      scores: A list of C float numpy arrays, as returned by _compute_tp_fp.
+      tp_fp_labels: A list of C numpy arrays, as returned by _compute_tp_fp.
+      is_class_correctly_detected_in_image: A numpy integer array of shape
+          [C], as returned by _compute_cor_loc.
+    """
+    num_classes = self.num_groundtruth_classes
+    groundtruth_is_difficult_list = groundtruth_is_difficult_list.astype(bool)
+    groundtruth_is_group_of_list = groundtruth_is_group_of_list.astype(bool)
+    num_detections_per_class = np.bincount(
+        detected_class_labels[(detected_class_labels >= 0) &
+                              (detected_class_labels < num_classes)],
+        minlength=num_classes)
+    num_groundtruth_per_class = np.bincount(
+        groundtruth_class_labels[(groundtruth_class_labels >= 0) &
+                                 (groundtruth_class_labels < num_classes)],
+        minlength=num_classes)
+
+    # CorLoc uses the first detection with the highest score of each class.
+    order = np.lexsort((-detected_scores, detected_class_labels))
+    classes, top_detections = np.unique(detected_class_labels[order],
+                                         return_index=True)
+    top_detections = order[top_detections]
+    top_iou = np.where(
+        classes[:, np.newaxis] == groundtruth_class_labels[np.newaxis, :],
+        np_box_ops.iou(detected_boxes[top_detections], groundtruth_boxes), -1.)
+    is_class_correctly_detected_in_image = np.zeros(num_classes, dtype=int)
+    for class_index, class_iou in zip(classes, top_iou):
+      if (0 <= class_index < num_classes and
+          num_groundtruth_per_class[class_index] and
+          np.max(class_iou) >= self.matching_iou_threshold):
+        is_class_correctly_detected_in_image[class_index] = 1
+
+    # Sorts by class and decreasing score, in the order of
+    # np_box_list_ops.non_max_suppression which also drops the scores which
+    # are not greater than its default score threshold, then keeps the
+    # nms_max_output_boxes highest scores of each class.
+    valid = detected_scores > -10.0
+    order = np.flatnonzero(valid)[np.lexsort(
+        (detected_scores[valid], -detected_class_labels[valid]))[::-1]]
+    labels = detected_class_labels[order]
+    rank = np.arange(labels.size) - np.searchsorted(labels, labels)
+    order = order[rank < self.nms_max_output_boxes]
+    boxes = detected_boxes[order]
+    scores = detected_scores[order]
+    labels = detected_class_labels[order]
+    num_detections = labels.size
+
+    tp_fp_labels = np.zeros(num_detections, dtype=bool)
+    is_evaluated = np.ones(num_detections, dtype=bool)
+    scores_group_of = np.zeros(groundtruth_class_labels.size, dtype=float)
+    if groundtruth_class_labels.size:
+      is_same_class = (
+          labels[:, np.newaxis] == groundtruth_class_labels[np.newaxis, :])
+      intersections = np_box_ops.intersection(boxes, groundtruth_boxes)
+      detected_areas = np_box_ops.area(boxes)[:, np.newaxis]
+      detection_ids = np.arange(num_detections)
+
+      # Matches each detection to the non group-of box of its class with the
+      # highest IOU. A box is detected by the first of the detections matched
+      # to it and the detections matched to difficult boxes are ignored.
+      is_non_group_of = is_same_class & ~groundtruth_is_group_of_list
+      iou = np.where(
+          is_non_group_of,
+          intersections / (detected_areas + np_box_ops.area(groundtruth_boxes)
+                           - intersections), -1.)
+      gt_ids = np.argmax(iou, axis=1)
+      is_matched = (
+          is_non_group_of[detection_ids, gt_ids] &
+          (iou[detection_ids, gt_ids] >= self.matching_iou_threshold))
+      is_matched_to_difficult_box = (
+          is_matched & groundtruth_is_difficult_list[gt_ids])
+      matched_ids = np.flatnonzero(is_matched & ~is_matched_to_difficult_box)
+      _, first_matches = np.unique(gt_ids[matched_ids], return_index=True)
+      tp_fp_labels[matched_ids[first_matches]] = True
+
+      # Matches the remaining detections to the group-of box of their class
+      # with the highest IOA, which scores the highest score of its
+      # detections.
+      is_group_of = is_same_class & groundtruth_is_group_of_list
+      ioa = np.where(is_group_of, intersections / detected_areas, -1.)
+      gt_ids = np.argmax(ioa, axis=1)
+      is_matched_to_group_of_box = (
+          ~tp_fp_labels & ~is_matched_to_difficult_box &
+          is_group_of[detection_ids, gt_ids] &
+          (ioa[detection_ids, gt_ids] >= self.matching_iou_threshold))
+      np.maximum.at(scores_group_of, gt_ids[is_matched_to_group_of_box],
+                    scores[is_matched_to_group_of_box])
+      is_evaluated = ~is_matched_to_difficult_box & ~is_matched_to_group_of_box
+    group_of_ids = np.flatnonzero(scores_group_of > 0)
+    if self.group_of_weight <= 0:
+      group_of_ids = group_of_ids[:0]
+    group_of_ids = group_of_ids[np.argsort(
+        groundtruth_class_labels[group_of_ids], kind='mergesort')]
+
+    starts = np.searchsorted(labels, np.arange(num_classes + 1))
+    group_of_starts = np.searchsorted(
+        groundtruth_class_labels[group_of_ids], np.arange(num_classes + 1))
+    result_scores = [np.array([], dtype=float) for _ in range(num_classes)]
+    result_tp_fp_labels = [
+        np.array([], dtype=bool) for _ in range(num_classes)]
+    for i in np.flatnonzero(num_detections_per_class):
+      start, end = starts[i], starts[i + 1]
+      if not num_groundtruth_per_class[i]:
+        result_scores[i] = scores[start:end]
+        result_tp_fp_labels[i] = np.zeros(end - start, dtype=bool)
+        continue
+      evaluated = is_evaluated[start:end]
+      class_group_of_ids = group_of_ids[group_of_starts[i]:
+                                        group_of_starts[i + 1]]
+      result_scores[i] = np.concatenate(
+          (scores[start:end][evaluated], scores_group_of[class_group_of_ids]))
+      result_tp_fp_labels[i] = np.concatenate(
+          (tp_fp_labels[start:end][evaluated].astype(float),
+           np.full(class_group_of_ids.size, self.group_of_weight,
+                   dtype=float)))
+    return (result_scores, result_tp_fp_labels,
+            is_class_correctly_detected_in_image)
+
   def _get_overlaps_and_scores_mask_mode(
       self, detected_boxes, detected_scores, detected_masks, groundtruth_boxes,
       groundtruth_masks, groundtruth_is_group_of_list):
@@ -506,6 +506,67 @@ class MultiClassesTpFpTest(tf.test.TestCase):
       self.assertTrue(np.array_equal(expected_tp_fp_labels[i], tp_fp_labels[i]))
 
 
+class AllClassesTpFpTest(tf.test.TestCase):
+
+  def _random_boxes(self, rng, num_boxes):
+    y_min_x_min = rng.uniform(0, 50, size=[num_boxes, 2])
+    height_width = rng.uniform(0, 40, size=[num_boxes, 2])
+    return np.concatenate([y_min_x_min, y_min_x_min + height_width], axis=1)
+
+  def test_same_results_as_single_class_evaluation(self):
+    rng = np.random.RandomState(0)
+    for _ in range(200):
+      num_groundtruth_classes = rng.randint(1, 6)
+      eval1 = per_image_evaluation.PerImageEvaluation(
+          num_groundtruth_classes,
+          matching_iou_threshold=rng.choice([0.1, 0.5, 0.7]),
+          nms_iou_threshold=1.0,
+          nms_max_output_boxes=rng.choice([2, 10000]),
+          group_of_weight=rng.choice([0.0, 0.5]))
+      num_groundtruth = rng.randint(0, 12)
+      groundtruth_boxes = self._random_boxes(rng, num_groundtruth)
+      groundtruth_class_labels = rng.randint(
+          0, num_groundtruth_classes, size=num_groundtruth)
+      groundtruth_is_difficult_list = rng.rand(num_groundtruth) < 0.2
+      groundtruth_is_group_of_list = rng.rand(num_groundtruth) < 0.3
+      # Detections around the groundtruth boxes, with distinct scores since
+      # the order of equal scores is not specified.
+      num_detections = rng.randint(0, 30)
+      detected_boxes = self._random_boxes(rng, num_detections)
+      if num_groundtruth:
+        detected_boxes[::2] = (
+            groundtruth_boxes[rng.randint(0, num_groundtruth,
+                                          size=(num_detections + 1) // 2)] +
+            rng.normal(0, 3, size=[(num_detections + 1) // 2, 4]))
+      detected_scores = rng.permutation(num_detections) / 10.0
+      detected_class_labels = rng.randint(
+          0, num_groundtruth_classes, size=num_detections)
+
+      scores, tp_fp_labels, is_class_correctly_detected_in_image = (
+          eval1.compute_object_detection_metrics(
+              detected_boxes, detected_scores, detected_class_labels,
+              groundtruth_boxes, groundtruth_class_labels,
+              groundtruth_is_difficult_list, groundtruth_is_group_of_list))
+
+      (detected_boxes, detected_scores, detected_class_labels,
+       _) = eval1._remove_invalid_boxes(detected_boxes, detected_scores,
+                                        detected_class_labels)
+      expected_scores, expected_tp_fp_labels = eval1._compute_tp_fp(
+          detected_boxes, detected_scores, detected_class_labels,
+          groundtruth_boxes, groundtruth_class_labels,
+          groundtruth_is_difficult_list, groundtruth_is_group_of_list)
+      self.assertAllEqual(
+          eval1._compute_cor_loc(detected_boxes, detected_scores,
+                                 detected_class_labels, groundtruth_boxes,
+                                 groundtruth_class_labels),
+          is_class_correctly_detected_in_image)
+      for i in range(num_groundtruth_classes):
+        self.assertAllEqual(expected_scores[i], scores[i])
+        self.assertAllEqual(expected_tp_fp_labels[i], tp_fp_labels[i])
+        self.assertEqual(expected_tp_fp_labels[i].dtype,
+                         tp_fp_labels[i].dtype)
+
+
 class CorLocTest(tf.test.TestCase):
 
   def test_compute_corloc_with_normal_iou_threshold(self):